@@ -1,10 +1,15 @@
 #!/usr/bin/env python3
 import json
 import re
+import sys
+from pathlib import Path
 
-# Load curriculum
-with open('src/data/curriculum.json', 'r') as f:
-    curriculum = json.load(f)
+sys.path.insert(0, str(Path(__file__).parent / 'scripts'))
+from curriculum_schema import validate_set
+from curriculum_store import open_curriculum
+
+# Load curriculum (sharded store or curriculum.json)
+curriculum = list(open_curriculum().sets())
 
 # Grade level expectations
 grade_expectations = {
@@ -20,16 +25,37 @@ grade_expectations = {
 issues = []
 warnings = []
 
+def grade_label(grade):
+    if not isinstance(grade, int):
+        return "Unknown grade"
+    return f"Grade {grade}" if grade > 0 else "Kindergarten"
+
 print("="*80)
 print("CURRICULUM AGE-APPROPRIATENESS AUDIT")
 print("="*80)
 print(f"\nAnalyzing {len(curriculum)} curriculum sets...\n")
 
 for set_data in curriculum:
+    # Malformed sets and questions are reported, not checked against grade expectations
+    malformed = [e for e in validate_set(set_data) if e.code in ('missing', 'type')]
+    if malformed:
+        issues.append({
+            'set': set_data.get('title') or set_data.get('id') or 'Untitled set',
+            'grade': grade_label(set_data.get('grade_level')),
+            'question_num': 0,
+            'question': '',
+            'issue': f"Malformed set: {'; '.join(str(e) for e in malformed[:3])}"
+                     + (f" (+{len(malformed) - 3} more)" if len(malformed) > 3 else ''),
+            'severity': 'HIGH'
+        })
+        if any(not e.path.startswith('questions[') for e in malformed):
+            continue
     grade = set_data['grade_level']
     expectations = grade_expectations.get(grade, {})
     
     for q_idx, question in enumerate(set_data['questions'], 1):
+        if not isinstance(question, dict) or not isinstance(question.get('question'), str):
+            continue
         q_text = question['question']
         
         # Extract numbers
@@ -122,7 +148,7 @@ if warnings:
 # Grade distribution
 grade_dist = {}
 for set_data in curriculum:
-    grade = f"Grade {set_data['grade_level']}" if set_data['grade_level'] > 0 else "Kindergarten"
+    grade = grade_label(set_data.get('grade_level'))
     grade_dist[grade] = grade_dist.get(grade, 0) + 1
 
 print("\n" + "="*80)
@@ -4,8 +4,12 @@ Generate curriculum sets with SVG images for K-2 students.
 Creates simple, clean SVG graphics for counting, shapes, and basic math.
 """
 
-import json
 import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'scripts'))
+from curriculum_store import open_curriculum
 
 def create_counting_svg(count, shape='circle', color='#4f46e5'):
     """Create SVG with counting objects arranged in rows."""
@@ -310,16 +314,11 @@ for i in range(10):
 
 print(f"Generated {len(new_sets)} new curriculum sets with images!")
 
-# Load existing curriculum
-with open('src/data/curriculum.json', 'r') as f:
-    existing = json.load(f)
-
-# Combine
-all_sets = existing + new_sets
-
-# Save
-with open('src/data/curriculum.json', 'w') as f:
-    json.dump(all_sets, f, indent=2)
+# Add to the curriculum; with the sharded store only the K-2 shards are rewritten
+curriculum = open_curriculum()
+for curriculum_set in new_sets:
+    curriculum.add(curriculum_set)
+curriculum.save()
 
-print(f"Total curriculum sets: {len(all_sets)}")
+print(f"Total curriculum sets: {len(curriculum)}")
 print(f"Images created: {len(new_sets)} sets × ~2 questions each")
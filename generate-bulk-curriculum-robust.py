@@ -1,14 +1,19 @@
 #!/usr/bin/env python3
 """
 Robust Bulk Curriculum Generator with JSON Repair
-Handles malformed JSON responses from Gemini
+Handles malformed JSON responses from Gemini: the response is streamed and
+each set is kept as soon as it closes, so one bad character only costs one set
 """
 
 import os
+import sys
 import json
-import re
+from pathlib import Path
 from google import generativeai as genai
 
+sys.path.insert(0, str(Path(__file__).parent / 'scripts'))
+from json_salvage import StreamingSalvager
+
 # Configure Gemini
 API_KEY = os.getenv('VITE_GEMINI_API_KEY')
 if not API_KEY:
@@ -17,40 +22,9 @@ if not API_KEY:
 
 genai.configure(api_key=API_KEY)
 
-def fix_json_string(json_str):
-    """
-    Attempt to fix common JSON errors in Gemini responses
-    """
-    # Remove markdown code blocks
-    if '```json' in json_str:
-        json_str = json_str.split('```json')[1].split('```')[0]
-    elif '```' in json_str:
-        json_str = json_str.split('```')[1].split('```')[0]
-    
-    json_str = json_str.strip()
-    
-    # Fix unterminated strings by finding the last complete object
-    # Strategy: Find the last complete curriculum set and truncate there
-    if '"explanation"' in json_str:
-        # Find all complete question objects
-        last_complete = json_str.rfind('}')
-        if last_complete > 0:
-            # Find the closing of the questions array
-            after_last = json_str[last_complete:]
-            if ']' in after_last:
-                array_close = last_complete + after_last.find(']')
-                # Find the closing of the set object
-                after_array = json_str[array_close:]
-                if '}' in after_array:
-                    set_close = array_close + after_array.find('}')
-                    # Truncate and close the main array
-                    json_str = json_str[:set_close+1] + '\n]'
-    
-    return json_str
-
 def generate_curriculum_batch(num_sets=20, grade_focus=None):
     """
-    Generate a smaller batch of curriculum sets
+    Generate a smaller batch of curriculum sets, yielding response text chunks
     """
     grade_dist = {
         0: 3, 1: 4, 2: 4, 3: 3, 4: 3, 5: 2, 6: 1
@@ -96,8 +70,9 @@ Return ONLY the JSON array, starting with [ and ending with ]."""
         )
     )
     
-    response = model.generate_content(prompt)
-    return response.text
+    response = model.generate_content(prompt, stream=True)
+    for chunk in response:
+        yield chunk.text
 
 def generate_curriculum_in_chunks(total_sets=100, chunk_size=20):
     """
@@ -114,26 +89,22 @@ def generate_curriculum_in_chunks(total_sets=100, chunk_size=20):
         
         print(f"Chunk {chunk_num}/{chunks_needed}: Generating {sets_this_chunk} sets...", end=' ', flush=True)
         
+        salvager = StreamingSalvager('set')
+        chunk_sets = []
         try:
-            response_text = generate_curriculum_batch(sets_this_chunk)
-            
-            # Try to parse
-            try:
-                chunk_sets = json.loads(response_text)
-            except json.JSONDecodeError as e:
-                print(f"\n⚠️  JSON error, attempting repair...", end=' ', flush=True)
-                fixed_text = fix_json_string(response_text)
-                chunk_sets = json.loads(fixed_text)
-            
-            if isinstance(chunk_sets, list):
-                all_sets.extend(chunk_sets)
-                print(f"✅ Got {len(chunk_sets)} sets (total: {len(all_sets)})")
-            else:
-                print(f"❌ Response was not an array")
-                
+            # Sets are parsed as they stream in; a broken set is skipped, not the chunk
+            for text in generate_curriculum_batch(sets_this_chunk):
+                chunk_sets.extend(salvager.feed(text))
         except Exception as e:
-            print(f"❌ Error: {str(e)}")
-            continue
+            print(f"\n⚠️  Stream interrupted ({str(e)}), keeping completed sets...", end=' ', flush=True)
+        chunk_sets.extend(salvager.finish())
+        
+        all_sets.extend(chunk_sets)
+        if chunk_sets:
+            print(f"✅ Got {len(chunk_sets)} sets (total: {len(all_sets)})", end='')
+            print(f", {salvager.dropped} unrecoverable" if salvager.dropped else '')
+        else:
+            print(f"❌ No complete sets in response")
     
     return all_sets
 
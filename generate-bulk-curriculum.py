@@ -1,13 +1,22 @@
 #!/usr/bin/env python3
 """
 Bulk Curriculum Generator using Gemini AI
-Generates 100+ curriculum sets in a single API call
+Generates 50 curriculum sets packed several to a request, sized to the
+model's output limit (one 100-set request overflowed and broke the JSON)
 """
 
 import os
+import sys
 import json
+from pathlib import Path
 from google import generativeai as genai
 
+sys.path.insert(0, str(Path(__file__).parent / 'scripts'))
+from llm_cache import get_cache
+from progress_events import get_events
+from prompt_packer import generate_packed, output_limit
+from rate_limiter import call_with_limiter, get_limiter
+
 # Configure Gemini
 API_KEY = os.getenv('VITE_GEMINI_API_KEY')
 if not API_KEY:
@@ -15,18 +24,30 @@ if not API_KEY:
     exit(1)
 
 genai.configure(api_key=API_KEY)
-model = genai.GenerativeModel('gemini-2.0-flash-exp')
+MODEL_NAME = 'gemini-2.0-flash-exp'
+model = genai.GenerativeModel(MODEL_NAME)
+limiter = get_limiter('gemini', MODEL_NAME)
+cache = get_cache()  # --cache-only replays earlier responses
 
 # Define curriculum expansion plan
-CURRICULUM_PLAN = """
-Generate a comprehensive math curriculum JSON file with 50 curriculum sets covering grades K-6.
+DISTRIBUTION = {0: 8, 1: 10, 2: 10, 3: 8, 4: 7, 5: 5, 6: 2}  # 50 sets total
+
+TOPICS = {
+    0: ['Counting', 'Number Recognition', 'Shapes', 'Patterns', 'Comparing Numbers', 'Sorting'],
+    1: ['Addition Facts', 'Subtraction Facts', 'Word Problems', 'Time (hour/half-hour)', 'Money (pennies, nickels, dimes)', 'Measurement'],
+    2: ['2-digit Addition', '2-digit Subtraction', 'Place Value (hundreds)', 'Skip Counting', 'Arrays', 'Data & Graphs'],
+    3: ['Multiplication Tables (2-12)', 'Division Facts', 'Fractions (halves, thirds, fourths)', 'Area', 'Perimeter'],
+    4: ['Multi-digit Multiplication', 'Long Division', 'Equivalent Fractions', 'Decimals (tenths, hundredths)', 'Angles'],
+    5: ['Adding/Subtracting Fractions', 'Multiplying Fractions', 'Decimal Operations', 'Volume', 'Coordinate Plane'],
+    6: ['Ratios', 'Percentages', 'Negative Numbers', 'Order of Operations', 'Simple Equations', 'Statistical Thinking'],
+}
 
-CRITICAL REQUIREMENTS:
-1. Output ONLY valid JSON - no markdown, no explanations, just the JSON array
-2. Each set must have: id, title, description, grade_level, topic, difficulty, questions
-3. Each question must have: question, options (4 choices), answer, hints (3 levels), explanation
-4. Follow age-appropriateness rules strictly
-5. Keep questions concise and clear
+# Sent once per packed request
+INSTRUCTIONS = """CRITICAL REQUIREMENTS:
+1. Each set must have: id, title, description, grade_level, topic, difficulty, questions
+2. Each question must have: question, options (4 choices), answer, hints (3 levels), explanation
+3. Follow age-appropriateness rules strictly
+4. Keep questions concise and clear
 
 AGE-APPROPRIATENESS RULES:
 - Kindergarten (grade_level: 0): Counting 1-20, shapes, patterns. NO arithmetic symbols (+, -, ×, ÷)
@@ -37,94 +58,97 @@ AGE-APPROPRIATENESS RULES:
 - Grade 5 (grade_level: 5): Fraction operations, decimal operations, volume
 - Grade 6 (grade_level: 6): Ratios, percentages, negative numbers, basic algebra
 
-DISTRIBUTION (50 sets total):
-- Kindergarten: 8 sets
-- Grade 1: 10 sets
-- Grade 2: 10 sets
-- Grade 3: 8 sets
-- Grade 4: 7 sets
-- Grade 5: 5 sets
-- Grade 6: 2 sets
-
-TOPICS TO COVER:
-Kindergarten: Counting, Number Recognition, Shapes, Patterns, Comparing Numbers, Sorting
-Grade 1: Addition Facts, Subtraction Facts, Word Problems, Time (hour/half-hour), Money (pennies, nickels, dimes), Measurement
-Grade 2: 2-digit Addition, 2-digit Subtraction, Place Value (hundreds), Skip Counting, Arrays, Data & Graphs
-Grade 3: Multiplication Tables (2-12), Division Facts, Fractions (halves, thirds, fourths), Area, Perimeter
-Grade 4: Multi-digit Multiplication, Long Division, Equivalent Fractions, Decimals (tenths, hundredths), Angles
-Grade 5: Adding/Subtracting Fractions, Multiplying Fractions, Decimal Operations, Volume, Coordinate Plane
-Grade 6: Ratios, Percentages, Negative Numbers, Order of Operations, Simple Equations, Statistical Thinking
-
-QUESTION FORMAT:
-Each set should have 10 questions. Example structure:
-{
-  "id": "g1-addition-facts-1-10",
-  "title": "Addition Facts 1-10",
-  "description": "Practice basic addition with numbers 1-10",
-  "grade_level": 1,
-  "topic": "Addition",
-  "difficulty": "easy",
-  "questions": [
-    {
-      "question": "What is 3 + 4?",
-      "options": ["5", "6", "7", "8"],
-      "answer": "7",
-      "hints": [
-        "Start at 3 and count up 4 more numbers",
-        "Try using your fingers: hold up 3, then 4 more",
-        "3 + 4 is the same as 4 + 3"
-      ],
-      "explanation": "When we add 3 + 4, we start at 3 and count up 4 more: 4, 5, 6, 7. So 3 + 4 = 7."
-    }
-  ]
-}
-
 QUALITY GUIDELINES:
 - Questions must be clear and unambiguous
 - Distractors (wrong answers) should be plausible but clearly incorrect
 - Hints should progressively reveal more information (general → specific → strong nudge)
 - Explanations should teach the concept, not just state the answer
 - Use age-appropriate vocabulary and sentence structure
-- Vary question types within each set
+- Vary question types within each set"""
 
-Generate 100 complete curriculum sets following this specification. Return ONLY the JSON array.
-"""
+SET_EXAMPLE = """{
+    "id": "<id given above>",
+    "title": "<title given above>",
+    "description": "Practice basic addition with numbers 1-10",
+    "grade_level": <grade>,
+    "topic": "<topic given above>",
+    "difficulty": "easy",
+    "questions": [
+      {
+        "question": "What is 3 + 4?",
+        "options": ["5", "6", "7", "8"],
+        "answer": "7",
+        "hints": [
+          "Start at 3 and count up 4 more numbers",
+          "Try using your fingers: hold up 3, then 4 more",
+          "3 + 4 is the same as 4 + 3"
+        ],
+        "explanation": "When we add 3 + 4, we start at 3 and count up 4 more: 4, 5, 6, 7. So 3 + 4 = 7."
+      }
+    ]
+  }"""
+
+def call_gemini(prompt, max_tokens):
+    """Call Gemini through the shared rate limiter and response cache"""
+    def request():
+        return call_with_limiter(
+            limiter,
+            model.generate_content,
+            prompt,
+            generation_config=genai.types.GenerationConfig(
+                temperature=0.7,
+                max_output_tokens=max_tokens,
+            )
+        ).text
+    
+    return cache.complete('gemini', MODEL_NAME, prompt, {'max_tokens': max_tokens}, request)
+
+def plan_jobs():
+    """Spread each grade's sets across its topics"""
+    jobs = []
+    for grade, count in DISTRIBUTION.items():
+        topics = TOPICS[grade]
+        for n in range(count):
+            topic = topics[n % len(topics)]
+            set_num = n // len(topics) + 1
+            slug = ''.join(c if c.isalnum() else '-' for c in topic.lower()).strip('-')
+            jobs.append({
+                'id': f"g{grade}-{slug}-{set_num}",
+                'grade': grade,
+                'topic': topic,
+                'subtopic': topic,
+                'set_num': set_num,
+            })
+    return jobs
 
 print("="*80)
 print("BULK CURRICULUM GENERATOR")
 print("="*80)
-print("\nGenerating 50 curriculum sets using Gemini AI...")
-print("This may take 20-40 seconds...\n")
+
+jobs = plan_jobs()
+get_events().run_started(len(jobs))
+print(f"\nGenerating {len(jobs)} curriculum sets using Gemini AI (several per request)...\n")
 
 try:
-    # Generate curriculum
-    response = model.generate_content(
-        CURRICULUM_PLAN,
-        generation_config=genai.types.GenerationConfig(
-            temperature=0.7,
-            max_output_tokens=100000,  # Large output needed
-        )
-    )
-    
-    # Extract JSON from response
-    text = response.text
-    
-    # Remove markdown code blocks if present
-    if '```json' in text:
-        text = text.split('```json')[1].split('```')[0]
-    elif '```' in text:
-        text = text.split('```')[1].split('```')[0]
+    curriculum = []
+    failed = []
+    # Questions with 3 hints each cost about 1.5x a plain question
+    packed = generate_packed(jobs, call_gemini, INSTRUCTIONS, output_limit(MODEL_NAME),
+                             example=SET_EXAMPLE, questions_per_set=10, tokens_per_question=120)
+    for job, set_data in packed:
+        if set_data:
+            curriculum.append(set_data)
+            print(f"  ✅ {job['id']}")
+        else:
+            failed.append(job['id'])
+            print(f"  ❌ {job['id']}")
     
-    text = text.strip()
-    
-    # Parse JSON
-    curriculum = json.loads(text)
-    
-    # Validate structure
-    if not isinstance(curriculum, list):
-        raise ValueError("Response is not a JSON array")
+    if not curriculum:
+        raise ValueError("No valid curriculum sets were generated")
     
     print(f"✅ Successfully generated {len(curriculum)} curriculum sets!")
+    if failed:
+        print(f"⚠️  {len(failed)} sets failed validation after retries: {', '.join(failed)}")
     
     # Statistics
     grade_dist = {}
@@ -163,12 +187,6 @@ try:
     print(f"\n✅ Success! You can now merge this into your main curriculum.")
     print(f"   Run: ./merge-curriculum.sh {output_file}")
     
-except json.JSONDecodeError as e:
-    print(f"❌ Error: Failed to parse JSON response")
-    print(f"   {str(e)}")
-    print(f"\n   Response preview:")
-    print(f"   {text[:500]}...")
-    
 except Exception as e:
     print(f"❌ Error: {str(e)}")
     import traceback
@@ -6,17 +6,33 @@ Phase 2: Convert each item to full JSON with questions
 """
 
 import os
+import sys
 import json
-import time
+from pathlib import Path
 from google import generativeai as genai
 
+sys.path.insert(0, str(Path(__file__).parent / 'scripts'))
+from json_salvage import parse_set
+from llm_cache import get_cache
+from rate_limiter import call_with_limiter, get_limiter
+
 API_KEY = os.getenv('VITE_GEMINI_API_KEY')
 if not API_KEY:
     print("Error: VITE_GEMINI_API_KEY not found")
     exit(1)
 
 genai.configure(api_key=API_KEY)
-model = genai.GenerativeModel('gemini-2.0-flash-exp')
+MODEL_NAME = 'gemini-2.0-flash-exp'
+model = genai.GenerativeModel(MODEL_NAME)
+limiter = get_limiter('gemini', MODEL_NAME)
+cache = get_cache()  # --cache-only replays earlier responses
+
+def call_gemini(prompt):
+    """Call Gemini through the shared rate limiter and response cache"""
+    def request():
+        return call_with_limiter(limiter, model.generate_content, prompt).text
+    
+    return cache.complete('gemini', MODEL_NAME, prompt, {}, request)
 
 def generate_curriculum_list(num_sets=100):
     """Phase 1: Generate simple text list of curriculum topics"""
@@ -46,8 +62,7 @@ Rules:
 
 Return ONLY the list, one per line, no other text."""
 
-    response = model.generate_content(prompt)
-    return response.text.strip().split('\n')
+    return call_gemini(prompt).strip().split('\n')
 
 def generate_questions_for_set(grade, topic, title, difficulty):
     """Phase 2: Generate full JSON for one curriculum set"""
@@ -85,16 +100,10 @@ IMPORTANT:
 - Return ONLY the JSON object, no markdown"""
 
     try:
-        response = model.generate_content(prompt)
-        text = response.text.strip()
+        text = call_gemini(prompt).strip()
         
-        # Remove markdown if present
-        if '```json' in text:
-            text = text.split('```json')[1].split('```')[0].strip()
-        elif '```' in text:
-            text = text.split('```')[1].split('```')[0].strip()
-        
-        return json.loads(text)
+        # Tolerates code fences, trailing commas and a truncated tail
+        return parse_set(text)
     except Exception as e:
         print(f"      ❌ Error: {str(e)[:50]}")
         return None
@@ -139,9 +148,6 @@ for i, line in enumerate(curriculum_list, 1):
             failed += 1
             print(f"❌ (skipped)")
         
-        # Small delay to avoid rate limiting
-        time.sleep(0.5)
-        
     except Exception as e:
         failed += 1
         print(f"❌ Error: {str(e)[:30]}")
@@ -1,8 +1,16 @@
 
+import argparse
 import os
 import json
-import time
 from concurrent.futures import ThreadPoolExecutor
+
+from audit_log import AuditLog, issue, superseded
+from curriculum_store import open_curriculum
+from lesson_plan import parse_grades
+from llm_cache import get_cache
+from near_dupes import normalize
+from question_ids import UID_FIELD, content_hash, diff_since, summary
+from rate_limiter import call_with_limiter, get_limiter
 try:
     from google import generativeai as genai
 except ImportError:
@@ -26,15 +34,37 @@ if not API_KEY:
 
 genai.configure(api_key=API_KEY)
 # Use a lighter model for speed/cost if available, but Flash is good
-model = genai.GenerativeModel('gemini-2.0-flash-exp')
+MODEL_NAME = 'gemini-2.0-flash-exp'
+model = genai.GenerativeModel(MODEL_NAME)
+limiter = get_limiter('gemini', MODEL_NAME)
+cache = get_cache()  # --cache-only replays earlier responses
+
+AUDIT_LOG = 'answers'  # data/audit/answers.jsonl, read by fix_curriculum_errors.py
+
+def parse_errors(text):
+    """The JSON array of errors in an audit response (raises if there is none)"""
+    text = text.strip()
+    if text.startswith("```json"):
+        text = text[7:-3]
+    elif text.startswith("```"):
+        text = text[3:-3]
+    errors = json.loads(text)
+    if not isinstance(errors, list):
+        raise ValueError(f"expected a JSON array, got {type(errors).__name__}")
+    return errors
 
-CURRICULUM_FILE = "src/data/curriculum.json"
-REPORT_FILE = "audit-report.json"
+def call_gemini(prompt):
+    """Call Gemini through the shared rate limiter and response cache; returns the parsed errors"""
+    def request():
+        return call_with_limiter(limiter, model.generate_content, prompt).text
+    
+    # Only responses that parse are cached, so a bad one isn't replayed next run
+    return cache.complete('gemini', MODEL_NAME, prompt, {}, request, parse_errors)
 
 def audit_batch(questions, context):
     """
     Audit a batch of questions.
-    Returns list of indices that are incorrect.
+    Returns the errors found, or None when the batch could not be audited.
     """
     prompt = f"""
     You are a math expert auditing a curriculum.
@@ -60,58 +90,79 @@ def audit_batch(questions, context):
     If all are correct, output empty array: []
     """
     
-    retries = 3
-    for attempt in range(retries):
-        try:
-            response = model.generate_content(prompt)
-            text = response.text.strip()
-            if text.startswith("```json"):
-                text = text[7:-3]
-            elif text.startswith("```"):
-                text = text[3:-3]
-            return json.loads(text)
-        except Exception as e:
-            if "429" in str(e) or "Quota" in str(e):
-                print(f"⚠️ Quota exceeded. Sleeping 60s... (Attempt {attempt+1}/{retries})")
-                time.sleep(60)
-            else:
-                print(f"Error auditing batch: {e}")
-                return []
-    return []
+    try:
+        # The shared limiter retries 429/quota errors after the advised pause
+        return call_gemini(prompt)
+    except Exception as e:
+        print(f"Error auditing batch: {e}")
+        return None
 
 def main():
-    print(f"Loading {CURRICULUM_FILE}...")
-    with open(CURRICULUM_FILE, 'r') as f:
-        data = json.load(f)
+    parser = argparse.ArgumentParser(description='Audit curriculum answers with Gemini')
+    parser.add_argument('--grades', help='Only audit these grades, e.g. 3 or 6-8')
+    parser.add_argument('--changed-since', metavar='SNAPSHOT',
+                        help='Only audit questions added or changed since this curriculum snapshot')
+    args = parser.parse_args()
+
+    print("Loading curriculum...")
+    grades = parse_grades(args.grades)
+    data = list(open_curriculum().sets(grades))
+    if args.changed_since:
+        delta = diff_since(args.changed_since, grades)
+        print(f"🔀 Since {args.changed_since}: {summary(delta)}")
+        changed = {(r['set_id'], r['hash']) for r in delta['added'] + delta['modified']}
+        data = [{**item, 'questions': [q for q in item['questions'] if (item.get('id'), content_hash(q)) in changed]}
+                for item in data]
+        data = [item for item in data if item['questions']]
     
     print(f"Auditing {len(data)} sets...")
     
-    errors = []
+    # Findings are appended as each set finishes; a delta audit keeps the earlier ones
+    # but marks them superseded for every question it checks again
+    log = AuditLog(AUDIT_LOG)
+    if not args.changed_since:
+        log.reset()
+    errors = 0
     
-    # Process in chunks
-    for i, item in enumerate(data):
+    def audit_set(numbered):
+        i, item = numbered
         print(f"Checking set {i+1}/{len(data)}: {item['title']}")
+        # uids stay out of the prompt; errors are matched back to them by text
+        questions = [{k: v for k, v in q.items() if k != UID_FIELD} for q in item['questions']]
+        return audit_batch(questions, f"Grade {item.get('grade_level')} - {item['title']}")
+    
+    # Sets are audited concurrently; the limiter keeps requests near the real quota
+    with ThreadPoolExecutor(max_workers=limiter.maximum) as pool:
+        results = pool.map(audit_set, enumerate(data))
         
-        batch_errors = audit_batch(item['questions'], f"Grade {item['grade_level']} - {item['title']}")
-        
-        if batch_errors:
-            print(f"❌ Found {len(batch_errors)} errors in {item['title']}")
-            for err in batch_errors:
-                err['set_id'] = item.get('id')
-                err['set_title'] = item.get('title')
-                errors.append(err)
-        
-        # Rate limiting: 10 RPM = 1 request every 6s. Let's do 7s to be safe.
-        time.sleep(7)
-
-    # Save report
-    with open(REPORT_FILE, 'w') as f:
-        json.dump(errors, f, indent=2)
+        for item, batch_errors in zip(data, results):
+            if batch_errors is None:
+                continue  # Not audited, so earlier findings still stand
+            records = []
+            if args.changed_since:
+                records = [superseded(item.get('id'), q.get('question'), q.get(UID_FIELD))
+                           for q in item['questions']]
+            if batch_errors:
+                print(f"❌ Found {len(batch_errors)} errors in {item['title']}")
+                uids = {normalize(q.get('question', '')): q.get(UID_FIELD) for q in item['questions']}
+                for err in batch_errors:
+                    err = dict(err)
+                    question = err.pop('question_text', None)
+                    uid = uids.get(normalize(question or ''))
+                    if uid:
+                        err['question_uid'] = uid
+                    records.append(issue('critical', 'wrong_answer', item.get('id'), item.get('title'),
+                                         question=question, **err))
+                    errors += 1
+            if records:
+                log.append(records)
     
+    print(limiter.status())
+
     print(f"\nAudit Complete.")
-    print(f"Total Errors Found: {len(errors)}")
-    if len(errors) > 0:
-        print(f"See {REPORT_FILE} for details.")
+    print(f"Total Errors Found: {errors}")
+    if errors > 0:
+        print(f"See {log.path} (python scripts/audit_log.py query --log {AUDIT_LOG}).")
 
 if __name__ == "__main__":
     main()
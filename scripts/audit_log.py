@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+"""
+Record-per-line audit logs with an offset index
+Audits append one JSON issue per line to data/audit/<name>.jsonl as they
+find it, so a crashed run keeps what it found and no consumer has to load a
+whole report. Every record has severity, type, set_id, set_title,
+question_index and question, plus whatever else the audit reports.
+
+An audit that re-checks only some questions (audit-curriculum.py
+--changed-since) first appends a 'superseded' marker per question it
+re-checked; current() leaves out findings that a later marker replaced, so
+consumers act on the newest audit of each question only.
+
+<name>.jsonl.idx maps each set id, severity and type to the byte offsets of
+its records. Readers extend it from the unindexed tail when the log has
+grown (and rebuild it if the log was replaced), so triaging one skill is a
+small index read and a seek per issue.
+
+Logs:
+  full     scripts/comprehensive-audit.cjs   (was CURRICULUM_AUDIT_FULL.json)
+  visuals  questions that need a picture     (was NEEDS_VISUALS.json)
+  answers  scripts/audit-curriculum.py, read by fix_curriculum_errors.py
+           (was audit-report.json)
+
+Usage:
+  python scripts/audit_log.py import                       # convert the old JSON reports
+  python scripts/audit_log.py query --set 3-fractions-intro [--severity critical] [--join]
+  python scripts/audit_log.py query --type wrong_math_answer --grep fraction --limit 20
+  python scripts/audit_log.py query --log answers --current  # leave out superseded findings
+  python scripts/audit_log.py count --by type [--log full] [--severity high]
+  python scripts/audit_log.py reindex
+"""
+
+import argparse
+import fcntl
+import hashlib
+import json
+import os
+from collections import Counter
+from pathlib import Path
+
+from curriculum_journal import write_json_atomic, write_text_atomic
+
+PROJECT_ROOT = Path(__file__).parent.parent
+AUDIT_DIR = PROJECT_ROOT / 'data' / 'audit'
+INDEX_VERSION = 1
+INDEXED = ('set_id', 'severity', 'type')
+SEVERITIES = ('critical', 'high', 'medium', 'low')
+SUPERSEDED = 'superseded'  # Marker type: findings for this question before here are stale
+HEAD_BYTES = 4096  # Fingerprint of the start of the log, to notice it was replaced
+
+# The single-document reports these logs replace
+LEGACY_REPORTS = {
+    'full': PROJECT_ROOT / 'CURRICULUM_AUDIT_FULL.json',
+    'visuals': PROJECT_ROOT / 'NEEDS_VISUALS.json',
+    'answers': PROJECT_ROOT / 'audit-report.json',
+}
+
+
+def issue(severity, type, set_id=None, set_title=None, question_index=None, question=None, **details):
+    """An audit record in the common shape; details keep whatever else the audit reports"""
+    return {'severity': severity, 'type': type, 'set_id': set_id, 'set_title': set_title,
+            'question_index': question_index, 'question': question, **details}
+
+
+def superseded(set_id, question, question_uid=None):
+    """Marker recording that this question was audited again (earlier findings no longer apply)"""
+    return issue(None, SUPERSEDED, set_id, question=question, question_uid=question_uid)
+
+
+def _question_keys(record):
+    """Ways a record can name its question: the uid and the set id + question text"""
+    from near_dupes import normalize
+    keys = []
+    if record.get('question_uid'):
+        keys.append(('uid', record['question_uid']))
+    if record.get('question'):
+        keys.append(('text', _key(record.get('set_id')), normalize(record['question'])))
+    return keys
+
+
+def _key(value):
+    return '' if value is None else str(value)
+
+
+def _head(f):
+    f.seek(0)
+    return hashlib.blake2b(f.read(HEAD_BYTES), digest_size=8).hexdigest()
+
+
+class AuditLog:
+    """One audit's JSONL log and its index"""
+
+    def __init__(self, name, audit_dir=AUDIT_DIR):
+        path = Path(name)
+        self.path = path if path.suffix == '.jsonl' else Path(audit_dir) / f"{name}.jsonl"
+        self.name = self.path.stem
+        self.index_path = self.path.with_name(self.path.name + '.idx')
+        self._index = None
+
+    def exists(self):
+        return self.path.exists()
+
+    def reset(self):
+        """Start an empty log; a new audit run replaces the previous one"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        write_text_atomic(self.path, '')
+        if self.index_path.exists():
+            self.index_path.unlink()
+        self._index = None
+
+    def append(self, records):
+        """Durably append issues (one locked write, so concurrent writers don't interleave)"""
+        # Escaped, since audits truncate text mid-emoji and leave lone surrogates
+        lines = ''.join(json.dumps(r) + '\n' for r in records)
+        if not lines:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _read_index(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        return index if index.get('version') == INDEX_VERSION else None
+
+    def index(self):
+        """The offset index, extended over records appended since it was written"""
+        if not self.path.exists():
+            return {'version': INDEX_VERSION, 'bytes': 0, 'head': None, 'records': 0,
+                    'by': {field: {} for field in INDEXED}}
+        with open(self.path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            index = self._index or self._read_index()
+            if index and index['bytes'] == size and (self._index is not None or index['head'] == _head(f)):
+                self._index = index
+                return index
+            head = _head(f)
+            # Replaced or truncated logs are indexed again from the start (as are tiny ones)
+            if not index or not HEAD_BYTES <= index['bytes'] <= size or index['head'] != head:
+                index = {'version': INDEX_VERSION, 'bytes': 0, 'head': head, 'records': 0,
+                         'by': {field: {} for field in INDEXED}}
+            f.seek(index['bytes'])
+            offset = index['bytes']
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break  # A write still in progress; index it next time
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    print(f"⚠️  Skipping torn record in {self.path.name} at byte {offset}")
+                else:
+                    for field in INDEXED:
+                        index['by'][field].setdefault(_key(record.get(field)), []).append(offset)
+                    index['records'] += 1
+                offset += len(line)
+            index['bytes'] = offset
+            index['head'] = head
+        write_json_atomic(self.index_path, index, indent=None)
+        self._index = index
+        return index
+
+    def offsets(self, **filters):
+        """
+        Sorted offsets of records matching every indexed filter (a value or a
+        list of values per field), or None when there are no filters
+        """
+        by = self.index()['by']
+        selected = None
+        for field, wanted in filters.items():
+            if wanted is None:
+                continue
+            values = wanted if isinstance(wanted, (list, tuple, set)) else [wanted]
+            matches = set()
+            for value in values:
+                matches.update(by[field].get(_key(value), ()))
+            selected = matches if selected is None else selected & matches
+        return None if selected is None else sorted(selected)
+
+    def read(self, offsets=None):
+        """Records at these offsets, or every record in order"""
+        if not self.path.exists():
+            return
+        with open(self.path, 'rb') as f:
+            if offsets is None:
+                for line in f:
+                    if line.strip():
+                        try:
+                            yield json.loads(line)
+                        except json.JSONDecodeError:
+                            continue
+                return
+            for offset in offsets:
+                f.seek(offset)
+                yield json.loads(f.readline())
+
+    def query(self, where=None, **filters):
+        """Records matching the indexed filters (set_id, severity, type) and the `where` predicate"""
+        for record in self.read(self.offsets(**filters)):
+            if where is None or where(record):
+                yield record
+
+    def current(self, where=None, **filters):
+        """
+        Like query(), leaving out findings that a later 'superseded' marker
+        for the same question (by uid or set id + text) replaced
+        """
+        markers = self.offsets(type=SUPERSEDED, set_id=filters.get('set_id')) or []
+        latest = {}  # question key -> offset of its newest marker
+        for offset, record in zip(markers, self.read(markers)):
+            for key in _question_keys(record):
+                latest[key] = offset
+        offsets = self.offsets(**filters)
+        if offsets is None:
+            offsets = sorted(o for found in self.index()['by']['type'].values() for o in found)
+        for offset, record in zip(offsets, self.read(offsets)):
+            if record.get('type') == SUPERSEDED or (where is not None and not where(record)):
+                continue
+            if all(latest.get(key, -1) < offset for key in _question_keys(record)):
+                yield record
+
+    def count(self, by, where=None, **filters):
+        """Counter of `by` values among matching records; indexed fields are counted from the index alone"""
+        if by in INDEXED and where is None:
+            selected = self.offsets(**filters)
+            selected = None if selected is None else set(selected)
+            counts = Counter()
+            for value, offsets in self.index()['by'][by].items():
+                n = len(offsets) if selected is None else len(selected.intersection(offsets))
+                if n:
+                    counts[value] = n
+            return counts
+        return Counter(_key(r.get(by)) for r in self.query(where, **filters))
+
+
+def logs(names=None, audit_dir=AUDIT_DIR):
+    """AuditLogs by name, or every log in the audit directory"""
+    if names:
+        return [AuditLog(name, audit_dir) for name in names]
+    return [AuditLog(path) for path in sorted(Path(audit_dir).glob('*.jsonl'))]
+
+
+def import_legacy(name, path, audit_dir=AUDIT_DIR):
+    """Convert one of the old single-document reports into a log; returns the record count"""
+    with open(path, 'r', encoding='utf-8') as f:
+        report = json.load(f)
+    records = []
+    if name == 'full':
+        for severity, items in report['issues'].items():
+            for item in items:
+                item = dict(item)
+                records.append(issue(severity, item.pop('type', None), item.pop('setId', None),
+                                     item.pop('setTitle', None), item.pop('questionIndex', None),
+                                     item.pop('question', None), **item))
+    elif name == 'visuals':
+        for category, items in report.items():
+            for item in items:
+                item = {k: v for k, v in item.items() if k != 'type'}
+                records.append(issue('low', 'needs_visual', item.pop('setId', None), None,
+                                     item.pop('qIdx', None), item.pop('question', None),
+                                     visual=category, **item))
+    elif name == 'answers':
+        for item in report:
+            item = dict(item)
+            records.append(issue('critical', 'wrong_answer', item.pop('set_id', None), item.pop('set_title', None),
+                                 None, item.pop('question_text', None), **item))
+    else:
+        raise ValueError(f"No legacy report format for {name}")
+    log = AuditLog(name, audit_dir)
+    log.reset()
+    log.append(records)
+    log.index()
+    return len(records)
+
+
+def locate(record, curriculum):
+    """The curriculum set and question an issue points at, or (None, None) if it has moved or gone"""
+    from near_dupes import normalize
+    text = normalize(record.get('question') or '')
+    for curriculum_set in curriculum.find(record.get('set_id')):
+        questions = curriculum_set.get('questions') or []
+        if record.get('question_uid'):
+            match = next((q for q in questions if q.get('uid') == record['question_uid']), None)
+            if match:
+                return curriculum_set, match
+            continue
+        index = record.get('question_index')
+        if isinstance(index, int) and 0 <= index < len(questions):
+            if normalize(questions[index].get('question', '')).startswith(text):
+                return curriculum_set, questions[index]
+        # Audits truncate question text, so a prefix identifies it
+        match = next((q for q in questions if text and normalize(q.get('question', '')).startswith(text)), None)
+        if match:
+            return curriculum_set, match
+    return None, None
+
+
+def join(records, curriculum):
+    """Attach the current question (or None if it no longer exists) to each record"""
+    for record in records:
+        curriculum_set, question = locate(record, curriculum)
+        record = dict(record)
+        record['current'] = None if question is None else {
+            'grade_level': curriculum_set.get('grade_level'),
+            'topic': curriculum_set.get('topic'),
+            'uid': question.get('uid'),
+            'question': question.get('question'),
+            'answer': question.get('answer'),
+            'options': question.get('options'),
+        }
+        yield record
+
+
+def _where(args):
+    """Predicate for the non-indexed filters"""
+    conditions = [tuple(w.split('=', 1)) for w in args.where or []]
+    needle = args.grep.lower() if args.grep else None
+    if not conditions and not needle:
+        return None
+
+    def where(record):
+        if needle and needle not in json.dumps(record, ensure_ascii=False).lower():
+            return False
+        return all(_key(record.get(field)) == value for field, value in conditions)
+    return where
+
+
+def _print(record, log_name):
+    where = f"{record.get('set_id')}" + (f" q{record['question_index']}" if record.get('question_index') is not None else '')
+    print(f"[{log_name}] {record.get('severity')}/{record.get('type')} {where}: {str(record.get('question'))[:70]!r}")
+    details = {k: v for k, v in record.items()
+               if k not in ('severity', 'type', 'set_id', 'set_title', 'question_index', 'question', 'current')}
+    if details:
+        print(f"   {json.dumps(details, ensure_ascii=False)[:160]}")
+    if 'current' in record:
+        current = record['current']
+        print("   ⚠️  no longer in the curriculum" if current is None
+              else f"   now: {str(current['question'])[:70]!r} → {current['answer']!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Query the audit logs')
+    parser.add_argument('command', choices=['import', 'query', 'count', 'reindex'])
+    parser.add_argument('--log', action='append', help='Log name (repeatable; default: all logs)')
+    parser.add_argument('--set', dest='set_id', action='append', help='Set id (repeatable)')
+    parser.add_argument('--severity', action='append', choices=SEVERITIES)
+    parser.add_argument('--type', action='append', help='Issue type (repeatable)')
+    parser.add_argument('--where', action='append', metavar='FIELD=VALUE', help='Match another field exactly')
+    parser.add_argument('--grep', help='Case-insensitive text anywhere in the record')
+    parser.add_argument('--by', default='severity', help='count: field to group by')
+    parser.add_argument('--join', action='store_true', help='query: attach the current question from the curriculum')
+    parser.add_argument('--current', action='store_true',
+                        help='query: leave out findings superseded by a later re-audit of the question')
+    parser.add_argument('--limit', type=int, help='query: stop after this many records')
+    parser.add_argument('--json', action='store_true', help='query: print records as JSON lines')
+    args = parser.parse_args()
+
+    if args.command == 'import':
+        for name, path in LEGACY_REPORTS.items():
+            if args.log and name not in args.log:
+                continue
+            if not path.exists():
+                print(f"   {path.name} not found, skipping")
+                continue
+            print(f"📥 {path.name} → {AuditLog(name).path.relative_to(PROJECT_ROOT)}: {import_legacy(name, path)} records")
+        return 0
+
+    selected = logs(args.log)
+    if not selected:
+        print(f"No audit logs in {AUDIT_DIR}; run `import` or an audit first")
+        return 1
+
+    if args.command == 'reindex':
+        for log in selected:
+            if log.index_path.exists():
+                log.index_path.unlink()
+            print(f"🗂️  {log.name}: {log.index()['records']} records indexed")
+        return 0
+
+    filters = {'set_id': args.set_id, 'severity': args.severity, 'type': args.type}
+    where = _where(args)
+
+    if args.command == 'count':
+        total = Counter()
+        for log in selected:
+            counts = log.count(args.by, where, **filters)
+            total.update(counts)
+            print(f"{log.name}: {sum(counts.values())}")
+        for value, n in total.most_common():
+            print(f"   {n:>6}  {value or '(none)'}")
+        return 0
+
+    curriculum = None
+    if args.join:
+        from curriculum_store import open_curriculum
+        curriculum = open_curriculum()
+    shown = 0
+    for log in selected:
+        records = log.current(where, **filters) if args.current else log.query(where, **filters)
+        if curriculum is not None:
+            records = join(records, curriculum)
+        for record in records:
+            if args.limit is not None and shown >= args.limit:
+                return 0
+            if args.json:
+                print(json.dumps({'log': log.name, **record}, ensure_ascii=False))
+            else:
+                _print(record, log.name)
+            shown += 1
+    if not args.json:
+        print(f"{shown} records")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Offline throughput benchmark for the generation engine and adaptive limiter
+Starts llm_stub_server.py in-process (no network, no API key) and pushes
+packed curriculum jobs through GenerationEngine + AdaptiveLimiter using the
+Gemini, Anthropic or Ollama wire format. Reports sets/hour, request latency
+percentiles, 429s, parse failures and where the limiter's window settled.
+With --check it exits non-zero if a job was lost or the server saw more
+requests in flight than allowed, so it doubles as a regression test.
+
+Usage:
+  python scripts/bench_generation.py --jobs 200 --latency 0.5 --distribution lognormal
+  python scripts/bench_generation.py --provider anthropic --rpm 300 --malformed-rate 0.1 --check
+  python scripts/bench_generation.py --concurrency 1,4,8,16 --sets-per-request 4
+  python scripts/bench_generation.py --url http://127.0.0.1:11499   # an already-running stub
+  python scripts/bench_generation.py --metrics bench.sqlite --events bench-events   # keep the telemetry
+
+Metrics and progress events go to a temporary directory unless --metrics /
+--events say otherwise, so a benchmark never mixes into data/llm_metrics.sqlite
+or the monitor's data/events/.
+"""
+
+import argparse
+import asyncio
+import http.client
+import json
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from generation_engine import GenerationEngine
+from llm_metrics import MetricsStore, percentile, use_metrics
+from llm_stub_server import DISTRIBUTIONS, LatencyModel, StubServer, load_corpus
+from progress_events import EventLog, use_events
+from prompt_packer import pack, run_batch_async
+from rate_limiter import AdaptiveLimiter
+
+PROVIDERS = ('gemini', 'anthropic', 'ollama')
+MODELS = {
+    'gemini': 'gemini-2.0-flash',
+    'anthropic': 'claude-3-haiku-20240307',
+    'ollama': 'qwen2.5-coder:7b',
+}
+TOPICS = ['Fractions', 'Decimals', 'Geometry', 'Algebra', 'Statistics']
+
+INSTRUCTIONS = "Create 5 multiple choice questions per set with 4 options each."
+MAX_ROUNDS = 2  # Requests per set: a short set is queued again once
+
+
+class StubError(Exception):
+    """Non-2xx reply from the stub; carries the response so retry_after() can read its headers"""
+
+    def __init__(self, message, response):
+        super().__init__(message)
+        self.response = response
+        self.status_code = response.status
+
+
+class StubClient:
+    """Blocking client for one wire format, one keep-alive connection per thread"""
+
+    def __init__(self, url, provider, model):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port
+        self.provider = provider
+        self.model = model
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=120)
+        return conn
+
+    def _request(self, max_tokens, prompt):
+        if self.provider == 'gemini':
+            return (f"/v1beta/models/{self.model}:generateContent",
+                    {'contents': [{'role': 'user', 'parts': [{'text': prompt}]}],
+                     'generationConfig': {'maxOutputTokens': max_tokens, 'temperature': 0.7}})
+        if self.provider == 'anthropic':
+            return ('/v1/messages',
+                    {'model': self.model, 'max_tokens': max_tokens,
+                     'messages': [{'role': 'user', 'content': prompt}]})
+        return ('/api/generate',
+                {'model': self.model, 'prompt': prompt, 'stream': False,
+                 'options': {'num_predict': max_tokens}})
+
+    @staticmethod
+    def _text(provider, payload):
+        if provider == 'gemini':
+            return ''.join(p.get('text', '') for p in payload['candidates'][0]['content']['parts'])
+        if provider == 'anthropic':
+            return ''.join(block.get('text', '') for block in payload['content'])
+        return payload['response']
+
+    def complete(self, prompt, max_tokens=4096):
+        path, body = self._request(max_tokens, prompt)
+        data = json.dumps(body).encode('utf-8')
+        conn = self._connection()
+        try:
+            conn.request('POST', path, body=data, headers={'Content-Type': 'application/json'})
+            response = conn.getresponse()
+            raw = response.read()
+        except (ConnectionError, http.client.HTTPException):
+            conn.close()
+            self._local.conn = None
+            raise
+        if response.status != 200:
+            raise StubError(f"HTTP {response.status}: {raw.decode('utf-8', 'replace')[:300]}", response)
+        return self._text(self.provider, json.loads(raw))
+
+
+def plan_jobs(count):
+    jobs = []
+    for n in range(count):
+        grade = 1 + n % 9
+        topic = TOPICS[n % len(TOPICS)]
+        jobs.append({
+            'id': f"bench-{n}",
+            'title': f"{topic} Practice {n}",
+            'grade': grade,
+            'topic': topic,
+            'subtopic': topic,
+            'set_num': n,
+        })
+    return jobs
+
+
+def run_bench(url, provider, jobs, concurrency, sets_per_request, max_attempts=6, cooldown=5.0):
+    """One engine run against the stub at `url`; returns a result dict"""
+    client = StubClient(url, provider, MODELS[provider])
+    limiter = AdaptiveLimiter(f"stub/{provider}", initial=min(2, concurrency),
+                              maximum=concurrency, cooldown=cooldown)
+    latencies = []
+    counts = {'requests': 0, 'throttled': 0, 'accepted': 0, 'failed': 0, 'questions': 0}
+
+    async def complete(prompt, max_tokens):
+        counts['requests'] += 1
+        start = time.perf_counter()
+        text = await asyncio.to_thread(client.complete, prompt, max_tokens)
+        latencies.append(time.perf_counter() - start)
+        return text
+
+    rounds = {}
+    partial = {}
+
+    async def worker(batch):
+        # One request per engine job, so every request goes through the limiter
+        final = rounds.get(batch[0]['id'], 1) >= MAX_ROUNDS
+        return await run_batch_async(batch, complete, INSTRUCTIONS, questions_per_set=5, max_rounds=1,
+                                     log=lambda message: None, partial=partial, take_short=final)
+
+    def on_error(batch, error):
+        counts['throttled'] += 1
+
+    def on_result(batch, results):
+        retry = [job for job, curriculum_set in results or ()
+                 if curriculum_set is None and rounds.get(job['id'], 1) < MAX_ROUNDS]
+        for job in retry:
+            rounds[job['id']] = rounds.get(job['id'], 1) + 1
+        if retry:
+            engine.submit(retry)
+        for job, curriculum_set in results or [(job, None) for job in batch]:
+            if job in retry:
+                continue
+            if curriculum_set:
+                counts['accepted'] += 1
+                counts['questions'] += len(curriculum_set['questions'])
+            else:
+                counts['failed'] += 1
+
+    batches = pack(jobs, limit=10 ** 6, questions_per_set=5, max_sets=sets_per_request)
+    engine = GenerationEngine(worker, concurrency=concurrency, max_attempts=max_attempts,
+                              retry_delay=0.1, limiter=limiter)
+    start = time.perf_counter()
+    engine.run_sync(batches, on_result, on_error)
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'provider': provider,
+        'concurrency': concurrency,
+        'sets_per_request': sets_per_request,
+        'jobs': len(jobs),
+        'elapsed': elapsed,
+        'sets_per_hour': counts['accepted'] * 3600 / elapsed if elapsed else 0,
+        'latency_p50': percentile(latencies, 50),
+        'latency_p90': percentile(latencies, 90),
+        'latency_p99': percentile(latencies, 99),
+        'window': limiter.window,
+        **counts,
+    }
+
+
+def fetch_stats(url):
+    parts = urlsplit(url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=10)
+    conn.request('GET', '/stats')
+    return json.loads(conn.getresponse().read())
+
+
+def bench(args):
+    """Run every requested concurrency; False if a --check failed"""
+    concurrencies = [int(c) for c in args.concurrency.split(',') if c.strip()]
+    jobs = plan_jobs(args.jobs)
+    corpus = load_corpus(args.corpus) if args.corpus else None
+
+    print(f"🏁 {args.jobs} sets over the {args.provider} wire format, "
+          f"{args.sets_per_request} per request, concurrency {args.concurrency}")
+
+    ok = True
+    results = []
+    for concurrency in concurrencies:
+        server = None
+        url = args.url
+        if not url:
+            # A fresh server per run so RPM windows and counters start empty
+            server = StubServer(0, LatencyModel(args.latency, args.distribution, args.spread, args.tokens_per_second),
+                                args.parallel, load_time=0, seed=args.seed, rate_limit_rate=args.rate_limit_rate,
+                                rpm=args.rpm, malformed_rate=args.malformed_rate, corpus=corpus)
+            url = server.start()
+
+        result = run_bench(url, args.provider, jobs, concurrency, args.sets_per_request,
+                           args.max_attempts, args.cooldown)
+        stats = fetch_stats(url)
+        result['max_in_flight'] = stats['max_in_flight']
+        result['malformed'] = stats['malformed']
+        results.append(result)
+        if server:
+            server.shutdown()
+            server.server_close()
+
+        p50 = result['latency_p50'] or 0
+        p99 = result['latency_p99'] or 0
+        print(f"  c={concurrency:<3} {result['elapsed']:6.1f}s  {result['sets_per_hour']:9.0f} sets/hour  "
+              f"p50 {p50:.2f}s p99 {p99:.2f}s  {result['requests']} requests, {result['throttled']} 429s, "
+              f"{result['malformed']} malformed  {result['accepted']}/{args.jobs} sets  "
+              f"window {result['window']}  peak in flight {result['max_in_flight']}")
+
+        if args.check:
+            if result['accepted'] + result['failed'] != args.jobs:
+                print(f"    ❌ {args.jobs - result['accepted'] - result['failed']} jobs lost")
+                ok = False
+            if not args.url and result['max_in_flight'] > concurrency:
+                print(f"    ❌ {result['max_in_flight']} requests in flight, limit was {concurrency}")
+                ok = False
+            if not (args.rpm or args.rate_limit_rate or args.malformed_rate) and result['failed']:
+                print(f"    ❌ {result['failed']} sets failed without injected faults")
+                ok = False
+
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the generation engine against a local stub LLM')
+    parser.add_argument('--provider', choices=PROVIDERS, default='gemini', help='Wire format to speak')
+    parser.add_argument('--jobs', type=int, default=100, help='Curriculum sets to generate')
+    parser.add_argument('--concurrency', default='8', help='Engine concurrency; a comma list runs a sweep')
+    parser.add_argument('--sets-per-request', type=int, default=1, help='Sets packed into one prompt')
+    parser.add_argument('--max-attempts', type=int, default=6)
+    parser.add_argument('--cooldown', type=float, default=5.0, help='Limiter pause after a 429 without a hint')
+    parser.add_argument('--url', help='Use a running stub server instead of starting one')
+    parser.add_argument('--check', action='store_true', help='Exit 1 on lost jobs or exceeded concurrency')
+    parser.add_argument('--metrics', help='Metrics database to write (default: a temporary file)')
+    parser.add_argument('--events', help='Directory for progress events (default: a temporary directory)')
+    server_args = parser.add_argument_group('in-process stub server')
+    server_args.add_argument('--latency', type=float, default=0.2)
+    server_args.add_argument('--distribution', choices=DISTRIBUTIONS, default='fixed')
+    server_args.add_argument('--spread', type=float, default=0.5)
+    server_args.add_argument('--tokens-per-second', type=float)
+    server_args.add_argument('--parallel', type=int, default=64, help='Server slots (set below concurrency to queue)')
+    server_args.add_argument('--rpm', type=int)
+    server_args.add_argument('--rate-limit-rate', type=float, default=0.0)
+    server_args.add_argument('--malformed-rate', type=float, default=0.0)
+    server_args.add_argument('--corpus', help='Curriculum file to draw canned questions from')
+    server_args.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    # Keep benchmark traffic out of the real metrics database and event log
+    scratch = tempfile.TemporaryDirectory(prefix='bench_generation-')
+    metrics = use_metrics(MetricsStore(args.metrics or Path(scratch.name) / 'llm_metrics.sqlite',
+                                       run='bench_generation'))
+    events = use_events(EventLog('bench_generation', args.events or Path(scratch.name) / 'events'))
+    try:
+        ok = bench(args)
+    finally:
+        events.close()
+        metrics.close()
+        scratch.cleanup()
+
+    if args.check:
+        print("✅ Checks passed" if ok else "❌ Checks failed")
+        sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
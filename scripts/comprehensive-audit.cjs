@@ -221,20 +221,25 @@ curriculum.forEach((set, setIdx) => {
     });
 });
 
-// Generate report
-const report = {
-    timestamp: new Date().toISOString(),
-    stats: {
-        ...stats,
-        criticalIssues: issues.critical.length,
-        highIssues: issues.high.length,
-        mediumIssues: issues.medium.length,
-        lowIssues: issues.low.length
-    },
-    issues
-};
-
-fs.writeFileSync('CURRICULUM_AUDIT_FULL.json', JSON.stringify(report, null, 2));
+// Write one issue per line; scripts/audit_log.py indexes and queries it
+const AUDIT_LOG = 'data/audit/full.jsonl';
+const lines = [];
+for (const [severity, list] of Object.entries(issues)) {
+    for (const { type, setId, setTitle, questionIndex, question, ...details } of list) {
+        lines.push(JSON.stringify({
+            severity,
+            type,
+            set_id: setId ?? null,
+            set_title: setTitle ?? null,
+            question_index: questionIndex ?? null,
+            question: question ?? null,
+            ...details
+        }) + '\n');
+    }
+}
+fs.mkdirSync('data/audit', { recursive: true });
+fs.writeFileSync(AUDIT_LOG, lines.join(''));
+fs.rmSync(`${AUDIT_LOG}.idx`, { force: true });
 
 // Console summary
 console.log('=== CURRICULUM AUDIT COMPLETE ===\n');
@@ -247,7 +252,7 @@ console.log(`  🟠 HIGH: ${issues.high.length}`);
 console.log(`  🟡 MEDIUM: ${issues.medium.length}`);
 console.log(`  🟢 LOW: ${issues.low.length}`);
 console.log('');
-console.log('Full report saved to CURRICULUM_AUDIT_FULL.json');
+console.log(`Full report saved to ${AUDIT_LOG} (python scripts/audit_log.py query --log full)`);
 
 // Show sample critical issues
 if (issues.critical.length > 0) {
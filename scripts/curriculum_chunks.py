@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Per-skill curriculum chunks for the web app
+Splits the curriculum into one compact JSON file per skill (set) plus one
+index per grade listing that grade's skills, so the app's first load
+fetches the manifest, one grade index and the skill being practiced
+instead of the whole question bank. File names carry a content hash, so
+everything except manifest.json can be cached forever ("immutable"); a
+rebuild only writes the chunks whose content changed and removes the
+ones nothing refers to any more.
+
+Each chunk also gets a .gz variant and, when the brotli package is
+installed, a .br variant, for hosts that serve precompressed files
+(nginx gzip_static/brotli_static and the like).
+
+Runs before every `npm run build` (the prebuild script), since the output is
+gitignored and a deploy from git only runs the build.
+
+Output (public/curriculum/, copied into dist/ by vite build):
+  manifest.json                     grade -> index file with its sha256 and sizes
+  index/grade-3.<hash>.json         {grade_level, skills: [{id, title, ..., questions, file, sha256}]}
+  skills/<id>.<hash>.json(.gz|.br)  the set exactly as in curriculum.json
+
+Usage:
+  python scripts/curriculum_chunks.py [--out public/curriculum] [--no-brotli]
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import tempfile
+from pathlib import Path
+
+from curriculum_store import open_curriculum, shard_name
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+PROJECT_ROOT = Path(__file__).parent.parent
+CHUNK_DIR = PROJECT_ROOT / 'public' / 'curriculum'
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+HASH_LENGTH = 12  # Hex digits of the sha256 in file names
+VARIANTS = ('.gz', '.br')
+
+# Fields copied from a set into its grade index entry
+INDEX_FIELDS = ('id', 'title', 'description', 'topic', 'difficulty')
+
+
+def _encode(value):
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _file_name(directory, stem, data):
+    stem = re.sub(r'[^A-Za-z0-9_-]+', '-', str(stem)).strip('-') or 'set'
+    return f"{directory}/{stem}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}.json"
+
+
+def _write_bytes(path, data):
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.chmod(tmp_path, 0o644)  # Served by the web server, not just read by us
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def _compress(data, suffix):
+    if suffix == '.gz':
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    return brotli.compress(data, quality=11)
+
+
+def _emit(out_dir, name, data, use_brotli):
+    """Write a content-addressed file and its compressed variants unless already there"""
+    path = out_dir / name
+    entry = {'sha256': hashlib.sha256(data).hexdigest(), 'bytes': len(data)}
+    written = 0
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        _write_bytes(path, data)
+        written += 1
+    for suffix in VARIANTS if use_brotli else ('.gz',):
+        variant = path.with_name(path.name + suffix)
+        if not variant.exists():
+            _write_bytes(variant, _compress(data, suffix))
+            written += 1
+        entry[suffix[1:]] = variant.stat().st_size
+    return entry, written
+
+
+def build(sets, out_dir=CHUNK_DIR, use_brotli=True):
+    """
+    Write skill chunks, grade indexes and the manifest for these sets and
+    prune files from earlier builds. Returns (manifest, stats).
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    use_brotli = use_brotli and brotli is not None
+    stats = {'skills': 0, 'written': 0, 'removed': 0, 'bytes': 0, 'gz': 0, 'br': 0, 'largest': None}
+    names = []
+    indexes = {}
+
+    for curriculum_set in sets:
+        data = _encode(curriculum_set)
+        name = _file_name('skills', curriculum_set.get('id'), data)
+        chunk, written = _emit(out_dir, name, data, use_brotli)
+        names.append(name)
+        stats['skills'] += 1
+        stats['written'] += written
+        for key in ('bytes', 'gz', 'br'):
+            stats[key] += chunk.get(key, 0)
+        if stats['largest'] is None or chunk['bytes'] > stats['largest']['bytes']:
+            stats['largest'] = chunk
+        entry = {field: curriculum_set.get(field) for field in INDEX_FIELDS}
+        entry['questions'] = len(curriculum_set.get('questions') or [])
+        entry['file'] = name
+        entry['sha256'] = chunk['sha256']
+        grade = shard_name(curriculum_set).split('/')[0]
+        index = indexes.setdefault(grade, {'grade_level': curriculum_set.get('grade_level'), 'skills': []})
+        index['skills'].append(entry)
+
+    grades = {}
+    for grade, index in sorted(indexes.items(), key=lambda item: _grade_key(item[1]['grade_level'])):
+        data = _encode(index)
+        name = _file_name('index', grade, data)
+        entry, written = _emit(out_dir, name, data, use_brotli)
+        names.append(name)
+        stats['written'] += written
+        grades[grade] = {'file': name, 'grade_level': index['grade_level'], 'skills': len(index['skills']), **entry}
+
+    # Anything left over from earlier builds is no longer referenced
+    keep = {name + suffix for name in names for suffix in ('',) + VARIANTS}
+    for directory in ('skills', 'index'):
+        for path in (out_dir / directory).glob('*'):
+            if f"{directory}/{path.name}" not in keep:
+                path.unlink()
+                stats['removed'] += 1
+
+    # Small and not content-addressed: the one file clients revalidate
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'hash': hashlib.sha256(_encode([g['sha256'] for g in grades.values()])).hexdigest()[:HASH_LENGTH],
+        'grades': grades,
+    }
+    _write_bytes(out_dir / MANIFEST_NAME, (json.dumps(manifest, indent=2) + '\n').encode('utf-8'))
+    return manifest, stats
+
+
+def _grade_key(grade):
+    return (0, grade, '') if isinstance(grade, int) else (1, 0, str(grade))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build per-skill curriculum chunks for the web app')
+    parser.add_argument('--out', default=str(CHUNK_DIR))
+    parser.add_argument('--curriculum', help='Build from this JSON file instead of the curriculum store')
+    parser.add_argument('--no-brotli', action='store_true', help='Only write gzip variants')
+    args = parser.parse_args()
+
+    if brotli is None and not args.no_brotli:
+        print("⚠️  brotli not installed (pip3 install brotli); writing gzip variants only")
+
+    manifest, stats = build(open_curriculum(args.curriculum).sets(), args.out, not args.no_brotli)
+    print(f"📦 {stats['skills']} skill chunks in {len(manifest['grades'])} grades → {args.out}")
+    print(f"   {stats['written']} files written, {stats['removed']} stale files removed")
+    print(f"   skills: {stats['bytes'] / 1e6:.2f} MB raw, {stats['gz'] / 1e6:.2f} MB gzip"
+          + (f", {stats['br'] / 1e6:.2f} MB brotli" if stats['br'] else ''))
+    if stats['largest']:
+        largest = stats['largest']
+        index = max(manifest['grades'].values(), key=lambda g: g['bytes'])
+        print(f"   largest skill {largest['bytes'] / 1e3:.1f} KB ({largest['gz'] / 1e3:.1f} KB gzip), "
+              f"largest grade index {index['bytes'] / 1e3:.1f} KB ({index['gz'] / 1e3:.1f} KB gzip)")
+
+
+if __name__ == '__main__':
+    main()
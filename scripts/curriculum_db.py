@@ -0,0 +1,481 @@
+#!/usr/bin/env python3
+"""
+SQLite index of the curriculum for offline tooling
+Sets, questions, options and hints are imported into normalized tables
+with indexes on set id, grade, topic and a hash of the normalized question
+text, plus an FTS5 index over question text and explanations. Fixes,
+audits and reports become indexed queries instead of passes over every set.
+
+The database is derived data: sync() re-imports only the sources that
+changed (one per shard of the sharded store, or curriculum.json as a
+whole), and export writes the exact JSON back out, key order included.
+
+Usage:
+  python scripts/curriculum_db.py sync [--from curriculum.json]
+  python scripts/curriculum_db.py stats [--grades 3-5]
+  python scripts/curriculum_db.py search "equivalent fractions" [--grades 3] [--limit 10]
+  python scripts/curriculum_db.py find <set-id> ["question text"]
+  python scripts/curriculum_db.py check
+  python scripts/curriculum_db.py export --out curriculum.json
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+from pathlib import Path
+
+from curriculum_journal import write_json_atomic
+from curriculum_store import CurriculumStore, JsonCurriculum, open_curriculum
+from lesson_plan import parse_grades
+from near_dupes import normalize
+
+PROJECT_ROOT = Path(__file__).parent.parent
+DB_FILE = PROJECT_ROOT / 'data' / 'curriculum.sqlite'
+
+SET_FIELDS = ('id', 'title', 'description', 'grade_level', 'topic', 'difficulty')
+QUESTION_FIELDS = ('question', 'answer', 'explanation', 'uid')
+SCHEMA_VERSION = 2  # Bump when the tables change; the index is rebuilt from the curriculum
+FUZZY_OVERLAP = 0.6  # Word overlap a full-text match needs to count as the same question
+_SCALAR = (str, int, float)
+_WORD = re.compile(r'\w+')
+
+# Value columns are declared without a type so SQLite keeps ints, floats and
+# strings as given (a TEXT column would turn an answer of 5 into '5')
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS sources (
+        name TEXT PRIMARY KEY,
+        sha256 TEXT NOT NULL,
+        ordinal INTEGER NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS sets (
+        pk INTEGER PRIMARY KEY,
+        source TEXT NOT NULL,
+        position INTEGER NOT NULL,
+        id,
+        title,
+        description,
+        grade,
+        topic,
+        difficulty,
+        fields TEXT NOT NULL,
+        extra TEXT
+    );
+    CREATE TABLE IF NOT EXISTS questions (
+        pk INTEGER PRIMARY KEY,
+        set_pk INTEGER NOT NULL REFERENCES sets(pk) ON DELETE CASCADE,
+        position INTEGER NOT NULL,
+        question,
+        answer,
+        explanation,
+        uid,
+        question_hash TEXT,
+        fields TEXT NOT NULL,
+        extra TEXT
+    );
+    CREATE TABLE IF NOT EXISTS options (
+        question_pk INTEGER NOT NULL REFERENCES questions(pk) ON DELETE CASCADE,
+        position INTEGER NOT NULL,
+        text,
+        PRIMARY KEY (question_pk, position)
+    );
+    CREATE TABLE IF NOT EXISTS hints (
+        question_pk INTEGER NOT NULL REFERENCES questions(pk) ON DELETE CASCADE,
+        position INTEGER NOT NULL,
+        text,
+        PRIMARY KEY (question_pk, position)
+    );
+    CREATE INDEX IF NOT EXISTS idx_sets_source ON sets(source, position);
+    CREATE INDEX IF NOT EXISTS idx_sets_id ON sets(id);
+    CREATE INDEX IF NOT EXISTS idx_sets_grade_topic ON sets(grade, topic);
+    CREATE INDEX IF NOT EXISTS idx_sets_topic ON sets(topic);
+    CREATE INDEX IF NOT EXISTS idx_questions_set ON questions(set_pk, position);
+    CREATE INDEX IF NOT EXISTS idx_questions_hash ON questions(question_hash);
+    CREATE INDEX IF NOT EXISTS idx_questions_uid ON questions(uid);
+'''
+
+
+def question_hash(text):
+    """Hash of the normalized question text (case, punctuation and spacing ignored)"""
+    return hashlib.blake2b(normalize(text).encode('utf-8'), digest_size=8).hexdigest()
+
+
+def _scalar_list(value):
+    return isinstance(value, list) and all(isinstance(v, _SCALAR) and not isinstance(v, bool) for v in value)
+
+
+def _scalar(value):
+    return value is None or (isinstance(value, _SCALAR) and not isinstance(value, bool))
+
+
+def _split(record, columns, tabled):
+    """
+    (column values, extra JSON) for a record. `tabled` maps keys stored in
+    child tables to a check of their shape; values that fit neither a
+    column nor a child table, and unknown keys, are kept in extra.
+    """
+    values = {}
+    extra = {}
+    for key, value in record.items():
+        if key in columns and _scalar(value):
+            values[key] = value
+        elif key in tabled and tabled[key](value):
+            continue
+        else:
+            extra[key] = value
+    return values, (json.dumps(extra, ensure_ascii=False) if extra else None)
+
+
+def _overlap(a, b):
+    """Share of distinct words the two texts have in common (Jaccard)"""
+    a, b = set(_WORD.findall(normalize(a))), set(_WORD.findall(normalize(b)))
+    return len(a & b) / len(a | b) if a | b else 0.0
+
+
+def _fts_query(text):
+    """OR of the distinct words, quoted so FTS5 syntax in questions can't break the query"""
+    words = dict.fromkeys(w.lower() for w in _WORD.findall(str(text)))
+    return ' OR '.join(f'"{w}"' for w in words)
+
+
+class CurriculumDB:
+    """Normalized, indexed copy of the curriculum; safe to share across threads"""
+
+    def __init__(self, path=DB_FILE):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Autocommit; imports use BEGIN IMMEDIATE
+        self._db = sqlite3.connect(str(self.path), timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA foreign_keys=ON')
+        if self._db.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+            # Derived data: drop tables from an older layout and re-import on the next sync
+            for table in ('questions_fts', 'hints', 'options', 'questions', 'sets', 'sources'):
+                self._db.execute(f'DROP TABLE IF EXISTS {table}')
+            self._db.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        self._db.executescript(SCHEMA)
+        try:
+            self._db.execute('CREATE VIRTUAL TABLE IF NOT EXISTS questions_fts USING fts5(question, explanation)')
+            self.fts = True
+        except sqlite3.OperationalError:
+            print("⚠️  SQLite was built without FTS5; text search falls back to LIKE")
+            self.fts = False
+
+    def close(self):
+        self._db.close()
+
+    # Import
+
+    def _insert_set(self, source, position, curriculum_set):
+        values, extra = _split(curriculum_set, SET_FIELDS, {'questions': lambda v: isinstance(v, list)})
+        cursor = self._db.execute('''
+            INSERT INTO sets (source, position, id, title, description, grade, topic, difficulty, fields, extra)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (source, position, values.get('id'), values.get('title'), values.get('description'),
+              values.get('grade_level'), values.get('topic'), values.get('difficulty'),
+              json.dumps(list(curriculum_set)), extra))
+        set_pk = cursor.lastrowid
+        questions = curriculum_set.get('questions')
+        for q_position, question in enumerate(questions if isinstance(questions, list) else []):
+            if not isinstance(question, dict):
+                # Kept verbatim; export restores it from extra
+                self._db.execute(
+                    'INSERT INTO questions (set_pk, position, fields, extra) VALUES (?, ?, ?, ?)',
+                    (set_pk, q_position, 'null', json.dumps(question, ensure_ascii=False)))
+                continue
+            values, extra = _split(question, QUESTION_FIELDS, {'options': _scalar_list, 'hints': _scalar_list})
+            text = values.get('question')
+            cursor = self._db.execute('''
+                INSERT INTO questions (set_pk, position, question, answer, explanation, uid, question_hash, fields, extra)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (set_pk, q_position, text, values.get('answer'), values.get('explanation'), values.get('uid'),
+                  question_hash(text) if text is not None else None, json.dumps(list(question)), extra))
+            question_pk = cursor.lastrowid
+            for table in ('options', 'hints'):
+                items = question.get(table)
+                if _scalar_list(items):
+                    self._db.executemany(
+                        f'INSERT INTO {table} (question_pk, position, text) VALUES (?, ?, ?)',
+                        [(question_pk, i, item) for i, item in enumerate(items)])
+            if self.fts and text is not None:
+                self._db.execute('INSERT INTO questions_fts (rowid, question, explanation) VALUES (?, ?, ?)',
+                                 (question_pk, str(text), str(values.get('explanation') or '')))
+
+    def _drop_source(self, source):
+        if self.fts:
+            self._db.execute('''
+                DELETE FROM questions_fts WHERE rowid IN (
+                    SELECT q.pk FROM questions q JOIN sets s ON s.pk = q.set_pk WHERE s.source = ?)
+            ''', (source,))
+        self._db.execute('DELETE FROM sets WHERE source = ?', (source,))
+        self._db.execute('DELETE FROM sources WHERE name = ?', (source,))
+
+    def sync(self, curriculum=None):
+        """
+        Bring the database up to date with the curriculum (store or JSON,
+        as open_curriculum() picks). Only sources whose sha256 changed are
+        re-imported. Returns (sources imported, sources dropped).
+        """
+        curriculum = open_curriculum() if curriculum is None else curriculum
+        if isinstance(curriculum, CurriculumStore):
+            names = curriculum.shard_names()
+            wanted = {name: curriculum.manifest['shards'][name]['sha256'] for name in names}
+
+            def load(name):
+                # Read directly so syncing doesn't leave every shard cached in the store
+                return json.loads((curriculum.root / name).read_text(encoding='utf-8'))
+        elif isinstance(curriculum, JsonCurriculum):
+            data = curriculum.path.read_bytes() if curriculum.path.exists() else b'[]'
+            names = [curriculum.path.name]
+            wanted = {names[0]: hashlib.sha256(data).hexdigest()}
+
+            def load(name):
+                return json.loads(data)
+        else:
+            raise TypeError(f"Cannot sync from {type(curriculum).__name__}")
+
+        with self._lock:
+            current = {row['name']: row['sha256'] for row in self._db.execute('SELECT name, sha256 FROM sources')}
+            changed = [name for name in names if current.get(name) != wanted[name]]
+            dropped = [name for name in current if name not in wanted]
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                for name in dropped + changed:
+                    self._drop_source(name)
+                for name in changed:
+                    for position, curriculum_set in enumerate(load(name)):
+                        self._insert_set(name, position, curriculum_set)
+                    self._db.execute('INSERT INTO sources (name, sha256, ordinal) VALUES (?, ?, 0)',
+                                     (name, wanted[name]))
+                # Export order follows the source order (grade, then topic for the store)
+                self._db.executemany('UPDATE sources SET ordinal = ? WHERE name = ?',
+                                     [(i, name) for i, name in enumerate(names)])
+                self._db.execute('COMMIT')
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+        return len(changed), len(dropped)
+
+    # Export
+
+    def _question(self, row, options, hints):
+        if row['fields'] == 'null':
+            return json.loads(row['extra'])
+        extra = json.loads(row['extra']) if row['extra'] else {}
+        columns = {'question': row['question'], 'answer': row['answer'], 'explanation': row['explanation'],
+                   'uid': row['uid'], 'options': options.get(row['pk'], []), 'hints': hints.get(row['pk'], [])}
+        return {key: extra[key] if key in extra else columns[key] for key in json.loads(row['fields'])}
+
+    def export(self, grades=None):
+        """The curriculum as a list of sets, exactly as imported"""
+        where, params = '', []
+        if grades is not None:
+            where = f"WHERE s.grade IN ({','.join('?' * len(grades))})"
+            params = list(grades)
+        with self._lock:
+            set_rows = self._db.execute(f'''
+                SELECT s.* FROM sets s JOIN sources src ON src.name = s.source {where}
+                ORDER BY src.ordinal, s.position
+            ''', params).fetchall()
+            question_rows = self._db.execute(f'''
+                SELECT q.* FROM questions q JOIN sets s ON s.pk = q.set_pk {where} ORDER BY q.set_pk, q.position
+            ''', params).fetchall()
+            children = {}
+            for table in ('options', 'hints'):
+                rows = self._db.execute(f'SELECT question_pk, text FROM {table} ORDER BY question_pk, position')
+                children[table] = {}
+                for row in rows:
+                    children[table].setdefault(row['question_pk'], []).append(row['text'])
+
+        questions = {}
+        for row in question_rows:
+            questions.setdefault(row['set_pk'], []).append(
+                self._question(row, children['options'], children['hints']))
+        sets = []
+        for row in set_rows:
+            extra = json.loads(row['extra']) if row['extra'] else {}
+            columns = {'id': row['id'], 'title': row['title'], 'description': row['description'],
+                       'grade_level': row['grade'], 'topic': row['topic'], 'difficulty': row['difficulty'],
+                       'questions': questions.get(row['pk'], [])}
+            sets.append({key: extra[key] if key in extra else columns[key] for key in json.loads(row['fields'])})
+        return sets
+
+    # Queries
+
+    def query(self, sql, params=()):
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def find_uid(self, uid):
+        """The question with this uid (see question_ids.py), as a find_question() row, or None"""
+        rows = self.query('''
+            SELECT s.pk AS set_pk, s.id, s.title, q.position, q.question FROM questions q
+            JOIN sets s ON s.pk = q.set_pk WHERE q.uid = ?
+        ''', (uid,))
+        return rows[0] if rows else None
+
+    def find_question(self, set_id, text, title=None):
+        """
+        Where a question lives: rows of (set pk, id, title, position,
+        question), exact normalized match first, then full-text matches
+        within the set that share at least `FUZZY_OVERLAP` of their words.
+        `title` breaks ties between sets sharing an id.
+        """
+        rows = self.query('''
+            SELECT s.pk AS set_pk, s.id, s.title, q.position, q.question FROM questions q
+            JOIN sets s ON s.pk = q.set_pk
+            WHERE q.question_hash = ? AND s.id = ?
+        ''', (question_hash(text), set_id))
+        if not rows:
+            rows = [row for row in self.search(text, set_id=set_id, limit=5)
+                    if _overlap(text, row['question']) >= FUZZY_OVERLAP]
+        if title is not None:
+            rows = sorted(rows, key=lambda row: row['title'] != title)
+        return rows
+
+    def search(self, text, set_id=None, grades=None, limit=20):
+        """Full-text search over question text and explanations, best match first"""
+        filters, params = [], []
+        if set_id is not None:
+            filters.append('s.id = ?')
+            params.append(set_id)
+        if grades is not None:
+            filters.append(f"s.grade IN ({','.join('?' * len(grades))})")
+            params.extend(grades)
+        if self.fts:
+            query = _fts_query(text)
+            if not query:
+                return []
+            sql = f'''
+                SELECT s.pk AS set_pk, s.id, s.title, s.grade, q.position, q.question, q.answer
+                FROM questions_fts f JOIN questions q ON q.pk = f.rowid JOIN sets s ON s.pk = q.set_pk
+                WHERE questions_fts MATCH ? {''.join(' AND ' + f for f in filters)}
+                ORDER BY bm25(questions_fts) LIMIT ?
+            '''
+            return self.query(sql, [query, *params, limit])
+        sql = f'''
+            SELECT s.pk AS set_pk, s.id, s.title, s.grade, q.position, q.question, q.answer
+            FROM questions q JOIN sets s ON s.pk = q.set_pk
+            WHERE q.question LIKE ? {''.join(' AND ' + f for f in filters)} LIMIT ?
+        '''
+        return self.query(sql, [f"%{text}%", *params, limit])
+
+    def distribution(self, grades=None):
+        """Rows of (grade, topic, sets, questions)"""
+        where, params = '', []
+        if grades is not None:
+            where = f"WHERE s.grade IN ({','.join('?' * len(grades))})"
+            params = list(grades)
+        return self.query(f'''
+            SELECT s.grade, s.topic, COUNT(DISTINCT s.pk) AS sets, COUNT(q.pk) AS questions
+            FROM sets s LEFT JOIN questions q ON q.set_pk = s.pk {where}
+            GROUP BY s.grade, s.topic ORDER BY s.grade, s.topic
+        ''', params)
+
+    def answers_not_in_options(self):
+        return self.query('''
+            SELECT s.id, s.grade, q.position, q.question, q.answer FROM questions q
+            JOIN sets s ON s.pk = q.set_pk
+            WHERE EXISTS (SELECT 1 FROM options o WHERE o.question_pk = q.pk)
+              AND NOT EXISTS (SELECT 1 FROM options o WHERE o.question_pk = q.pk AND o.text = q.answer)
+            ORDER BY s.grade, s.id, q.position
+        ''')
+
+    def duplicate_questions(self, min_sets=2):
+        """Normalized question texts that appear in at least `min_sets` sets"""
+        return self.query('''
+            SELECT q.question_hash, MIN(q.question) AS question, COUNT(DISTINCT q.set_pk) AS sets
+            FROM questions q WHERE q.question_hash IS NOT NULL
+            GROUP BY q.question_hash HAVING sets >= ? ORDER BY sets DESC
+        ''', (min_sets,))
+
+    def thin_sets(self, max_questions):
+        return self.query('''
+            SELECT s.id, s.grade, s.topic, s.title, COUNT(q.pk) AS questions
+            FROM sets s LEFT JOIN questions q ON q.set_pk = s.pk
+            GROUP BY s.pk HAVING questions <= ? ORDER BY s.grade, s.id
+        ''', (max_questions,))
+
+
+def _grade_label(grade):
+    return 'K' if grade == 0 else grade
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build and query the SQLite curriculum index')
+    parser.add_argument('command', choices=['sync', 'stats', 'search', 'find', 'check', 'export'])
+    parser.add_argument('terms', nargs='*', help='search: text; find: set id and optional question text')
+    parser.add_argument('--db', default=str(DB_FILE))
+    parser.add_argument('--from', dest='source', help='Curriculum JSON file (default: the store or curriculum.json)')
+    parser.add_argument('--grades', help='e.g. 3-5')
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--thin', type=int, default=4, help='check: report sets with at most this many questions')
+    parser.add_argument('--out', help='export: output file')
+    args = parser.parse_args()
+
+    db = CurriculumDB(args.db)
+    grades = parse_grades(args.grades)
+    imported, dropped = db.sync(open_curriculum(args.source))
+    if args.command == 'sync' or imported or dropped:
+        print(f"🗄️  Synced {args.db}: {imported} sources re-imported, {dropped} dropped")
+
+    if args.command == 'stats':
+        current = None
+        total_sets = total_questions = 0
+        for row in db.distribution(grades):
+            if row['grade'] != current:
+                current = row['grade']
+                print(f"\nGrade {_grade_label(current)}")
+            print(f"   {row['topic']}: {row['sets']} sets, {row['questions']} questions")
+            total_sets += row['sets']
+            total_questions += row['questions']
+        print(f"\n📊 {total_sets} sets, {total_questions} questions")
+
+    elif args.command == 'search':
+        for row in db.search(' '.join(args.terms), grades=grades, limit=args.limit):
+            print(f"   [{row['id']} q{row['position']}] {row['question'][:90]} -> {row['answer']}")
+
+    elif args.command == 'find':
+        if not args.terms:
+            parser.error('find needs a set id')
+        set_id = args.terms[0]
+        if len(args.terms) > 1:
+            rows = db.find_question(set_id, ' '.join(args.terms[1:]))
+        else:
+            rows = db.query('''
+                SELECT s.pk AS set_pk, s.id, s.title, q.position, q.question FROM sets s
+                JOIN questions q ON q.set_pk = s.pk WHERE s.id = ? ORDER BY s.pk, q.position
+            ''', (set_id,))
+        for row in rows:
+            print(f"   [{row['id']} '{row['title']}' q{row['position']}] {row['question']}")
+        if not rows:
+            print(f"❌ Nothing found for {set_id}")
+
+    elif args.command == 'check':
+        missing = db.answers_not_in_options()
+        print(f"🔍 {len(missing)} answers not among their options")
+        for row in missing[:args.limit]:
+            print(f"   {row['id']} q{row['position']}: {row['question'][:70]!r} -> {row['answer']!r}")
+        dupes = db.duplicate_questions()
+        print(f"🔍 {len(dupes)} questions repeated across sets")
+        for row in dupes[:args.limit]:
+            print(f"   {row['sets']} sets: {row['question'][:80]!r}")
+        thin = db.thin_sets(args.thin)
+        print(f"🔍 {len(thin)} sets with {args.thin} or fewer questions")
+
+    elif args.command == 'export':
+        if not args.out:
+            parser.error('export needs --out')
+        sets = db.export(grades)
+        write_json_atomic(args.out, sets)
+        print(f"💾 Exported {len(sets)} sets to {args.out}")
+
+    db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Append-only JSONL journal for generated curriculum sets
+Generators append each finished set as one fsync'd line instead of
+rewriting the whole curriculum.json; `compact` folds the journals into the
+canonical file with a single atomic replace. Sets that fail the schema
+(curriculum_schema.py) are not folded in; they go to rejected/ with their
+errors.
+
+Usage:
+  python scripts/curriculum_journal.py status
+  python scripts/curriculum_journal.py compact [--keep]
+"""
+
+import argparse
+import fcntl
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+CURRICULUM_FILE = PROJECT_ROOT / 'src' / 'data' / 'curriculum.json'
+JOURNAL_DIR = PROJECT_ROOT / 'data' / 'journal'
+REJECTED_DIR = 'rejected'
+
+
+class Journal:
+    """One writer's journal file; holds a shared lock so compaction skips it while open"""
+
+    def __init__(self, name, journal_dir=JOURNAL_DIR):
+        journal_dir = Path(journal_dir)
+        journal_dir.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        self.path = journal_dir / f"{name}-{stamp}-{os.getpid()}.jsonl"
+        self.count = 0
+        self._file = open(self.path, 'a', encoding='utf-8')
+        fcntl.flock(self._file.fileno(), fcntl.LOCK_SH)
+
+    def append(self, record):
+        """Durably append one curriculum set"""
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.count += 1
+
+    def close(self):
+        if not self._file.closed:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_journal(path):
+    """Yield records from a journal, ignoring a torn final line from a crash"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                print(f"⚠️  Skipping torn record in {Path(path).name}")
+
+
+def _try_lock(path):
+    """Exclusive lock on a journal, or None if a writer still has it open"""
+    f = open(path, 'r', encoding='utf-8')
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        f.close()
+        return None
+    return f
+
+
+@contextmanager
+def atomic_writer(path):
+    """A text file that replaces `path` only when the block finishes without error"""
+    path = Path(path)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def write_text_atomic(path, text):
+    """Write text to a temp file in the same directory and rename it into place"""
+    with atomic_writer(path) as f:
+        f.write(text)
+
+
+def write_json_atomic(path, data, indent=2):
+    """Atomically replace `path` with `data` as JSON"""
+    write_text_atomic(path, json.dumps(data, indent=indent, ensure_ascii=False))
+
+
+def compact(curriculum_file=None, journal_dir=JOURNAL_DIR, journals=None, keep=False):
+    """
+    Fold journals into the canonical curriculum (the sharded store once it
+    is split, else curriculum.json; or the given file). Sets whose id is
+    already present are skipped, so re-running after a crash is safe; sets
+    that fail validation are written to <journal_dir>/rejected/ instead.
+    Returns (added, skipped).
+    """
+    # Imported late: curriculum_store builds on this module's atomic writes
+    from curriculum_store import open_curriculum
+
+    paths = sorted(Path(journal_dir).glob('*.jsonl')) if journals is None else [Path(p) for p in journals]
+
+    locked = []
+    for path in paths:
+        handle = _try_lock(path)
+        if handle is None:
+            print(f"⏭️  {path.name} is still being written, leaving it for the next compaction")
+            continue
+        locked.append((path, handle))
+
+    if not locked:
+        return 0, 0
+
+    try:
+        curriculum = open_curriculum(curriculum_file)
+        # One writer lock across load -> merge -> save -> journal removal, so
+        # two compactions can't both fold into the same old curriculum
+        with curriculum.locked():
+            return _fold(curriculum, [path for path, _ in locked], journal_dir, keep)
+    finally:
+        for _, handle in locked:
+            handle.close()
+
+
+def _fold(curriculum, paths, journal_dir, keep):
+    from curriculum_schema import validate_set
+    from question_ids import assign_uids
+
+    existing_ids = curriculum.ids()
+    new_sets = []
+    rejected = {}
+    skipped = 0
+    for path in paths:
+        for record in read_journal(path):
+            if record.get('id') in existing_ids:
+                skipped += 1
+                continue
+            errors = validate_set(record)
+            if errors:
+                rejected.setdefault(path.name, []).append(
+                    {'errors': [e.to_dict() for e in errors], 'set': record})
+                continue
+            new_sets.append(record)
+            existing_ids.add(record.get('id'))
+    added = len(new_sets)
+
+    if added:
+        # New set ids, so their uids can't collide with existing questions
+        assign_uids(new_sets)
+        for record in new_sets:
+            curriculum.add(record)
+        curriculum.save()
+
+    if rejected:
+        rejected_dir = Path(journal_dir) / REJECTED_DIR
+        rejected_dir.mkdir(parents=True, exist_ok=True)
+        for name, records in rejected.items():
+            with open(rejected_dir / name, 'a', encoding='utf-8') as f:
+                f.writelines(json.dumps(r, ensure_ascii=False) + '\n' for r in records)
+        count = sum(len(records) for records in rejected.values())
+        print(f"⚠️  {count} sets failed validation and were moved to {rejected_dir}")
+
+    if not keep:
+        for path in paths:
+            path.unlink()
+
+    return added, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect or compact generation journals')
+    parser.add_argument('command', choices=['status', 'compact'])
+    parser.add_argument('--keep', action='store_true', help='Keep journal files after compaction')
+    parser.add_argument('--curriculum', help='Compact into this file instead of the curriculum store')
+    parser.add_argument('--journal-dir', default=str(JOURNAL_DIR))
+    args = parser.parse_args()
+
+    if args.command == 'status':
+        paths = sorted(Path(args.journal_dir).glob('*.jsonl'))
+        if not paths:
+            print("No pending journals")
+        for path in paths:
+            count = sum(1 for _ in read_journal(path))
+            print(f"  {path.name}: {count} sets")
+        return
+
+    added, skipped = compact(args.curriculum, args.journal_dir, keep=args.keep)
+    print(f"✅ Compacted: {added} sets added, {skipped} already present")
+
+
+if __name__ == '__main__':
+    main()
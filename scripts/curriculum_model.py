@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+Compact in-memory curriculum model
+json.load gives every question its own dict, its own option list and its
+own copy of every string. CurriculumSet and Question are __slots__
+classes instead, and while a corpus loads, equal strings (topics, answers,
+options such as "0"-"20", hint boilerplate, repeated question text), equal
+option and hint lists and each key layout are stored once. Sets are
+converted one at a time as the JSON streams in, so the full dict tree
+never exists.
+
+Both classes read like the dicts they came from (get, [], in, keys,
+items), so whole-corpus passes such as audits and dedup use them as they
+are, and to_dict() gives back exactly the original JSON, key order and
+value types included. Options and hints read as tuples; assign a new list
+to change them.
+
+Usage:
+  python scripts/curriculum_model.py check                    # exact round trip of the curriculum
+  python scripts/curriculum_model.py bench [--questions 100000]
+"""
+
+import argparse
+import gc
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from curriculum_journal import write_json_atomic
+from curriculum_store import CURRICULUM_FILE, MANIFEST_NAME, STORE_DIR, iter_sets, write_sets
+
+
+class _Interner:
+    """Shares equal strings, string tuples and key layouts while a corpus loads"""
+
+    def __init__(self):
+        self.strings = {}
+        self.tuples = {}
+        self.layouts = {}
+
+    def string(self, value):
+        return self.strings.setdefault(value, value) if type(value) is str else value
+
+    def sequence(self, value):
+        if not value or set(map(type, value)) != _ONLY_STR:
+            # Only all-string tuples are shared: 1, 1.0 and True are equal but not interchangeable
+            return tuple([self.string(v) for v in value])
+        items = tuple(map(self.strings.setdefault, value, value))
+        return self.tuples.setdefault(items, items)
+
+    def layout(self, cls, keys):
+        """The shared key tuple for this key order and the slots it leaves unset"""
+        keys = tuple(keys)
+        layout = self.layouts.get((cls, keys))
+        if layout is None:
+            keys = tuple(map(self.strings.setdefault, keys, keys))
+            layout = self.layouts[(cls, keys)] = (keys, tuple(f for f in cls.FIELDS if f not in keys))
+        return layout
+
+
+_ONLY_STR = {str}
+
+
+class _Record:
+    """A JSON object with a fixed set of slotted fields; other keys go to `_extra`"""
+
+    __slots__ = ()
+    FIELDS = ()
+    _FIELD_SET = frozenset()
+
+    @classmethod
+    def from_dict(cls, data, interner=None):
+        interner = interner or _Interner()
+        string = interner.strings.setdefault
+        fields = cls._FIELD_SET
+        record = cls.__new__(cls)
+        extra = None
+        for key, value in data.items():
+            if key in fields:
+                if type(value) is str:
+                    value = string(value, value)
+                elif type(value) is list:
+                    value = record._convert(key, value, interner)
+                setattr(record, key, value)
+            else:
+                if extra is None:
+                    extra = {}
+                extra[key] = value
+        record._keys, unset = interner.layout(cls, data)
+        for name in unset:
+            setattr(record, name, None)
+        record._extra = extra
+        return record
+
+    def _convert(self, key, value, interner):
+        """A field value as stored; strings are interned before this is called"""
+        return value
+
+    def _export(self, key, value):
+        return value
+
+    def _raw(self, key):
+        return getattr(self, key) if key in self._FIELD_SET else self._extra[key]
+
+    def to_dict(self):
+        """The JSON object this was loaded from, with any edits"""
+        return {key: self._export(key, self._raw(key)) for key in self._keys}
+
+    def __getitem__(self, key):
+        if key not in self._keys:
+            raise KeyError(key)
+        return self._raw(key)
+
+    def get(self, key, default=None):
+        if key not in self._keys:
+            return default
+        return getattr(self, key) if key in self._FIELD_SET else self._extra[key]
+
+    def __setitem__(self, key, value):
+        if type(value) is list:
+            value = self._convert(key, value, _Interner())
+        if key in self._FIELD_SET:
+            setattr(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+        if key not in self._keys:
+            self._keys = self._keys + (key,)
+
+    def __delitem__(self, key):
+        if key not in self._keys:
+            raise KeyError(key)
+        if key in self._FIELD_SET:
+            setattr(self, key, None)
+        else:
+            del self._extra[key]
+        self._keys = tuple(k for k in self._keys if k != key)
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def keys(self):
+        return self._keys
+
+    def items(self):
+        return [(key, self._raw(key)) for key in self._keys]
+
+    def __eq__(self, other):
+        if isinstance(other, _Record):
+            other = other.to_dict()
+        return self.to_dict() == other if isinstance(other, dict) else NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+class Question(_Record):
+    FIELDS = ('question', 'options', 'answer', 'explanation', 'hints', 'uid')
+    _FIELD_SET = frozenset(FIELDS)
+    __slots__ = FIELDS + ('_keys', '_extra')
+
+    def _convert(self, key, value, interner):
+        return interner.sequence(value) if key in ('options', 'hints') else value
+
+    def _export(self, key, value):
+        return list(value) if type(value) is tuple else value
+
+
+class CurriculumSet(_Record):
+    FIELDS = ('id', 'title', 'description', 'grade_level', 'topic', 'difficulty', 'questions')
+    _FIELD_SET = frozenset(FIELDS)
+    __slots__ = FIELDS + ('_keys', '_extra')
+
+    def _convert(self, key, value, interner):
+        if key == 'questions':
+            return [Question.from_dict(q, interner) if type(q) is dict else q for q in value]
+        return value
+
+    def _export(self, key, value):
+        if key == 'questions' and type(value) is list:
+            return [q.to_dict() if isinstance(q, Question) else q for q in value]
+        return value
+
+
+def from_json(sets):
+    """CurriculumSets from an iterable of set dicts, sharing strings across all of them"""
+    interner = _Interner()
+    return [CurriculumSet.from_dict(s, interner) for s in sets]
+
+
+def load(path=None, grades=None):
+    """
+    The curriculum as CurriculumSets: a JSON file, store directory or .cpk
+    pack, by default the store when it has been split, else curriculum.json.
+    Each set is converted as it is read, so only the compact model stays.
+    """
+    if path is None:
+        path = STORE_DIR if (STORE_DIR / MANIFEST_NAME).exists() else CURRICULUM_FILE
+    return from_json(iter_sets(path, grades))
+
+
+def dump(sets, path):
+    """Write CurriculumSets (or dicts) as curriculum JSON, one set at a time"""
+    return write_sets(path, (s.to_dict() if isinstance(s, CurriculumSet) else s for s in sets))
+
+
+def check(curriculum):
+    """Problems found round-tripping edge cases and the curriculum through the model"""
+    cases = [
+        [],
+        [{'id': 'a', 'questions': []}],
+        [{'questions': [{'question': 'Q', 'options': [1, 1.0, True, '1'], 'answer': 1}]}],
+        [{'id': 'b', 'questions': [{'answer': True, 'options': None, 'hints': []}, 'bare string', None]}],
+        [{'title': None, 'extra': {'nested': [1, {'x': None}]}, 'questions': 'not a list', 'id': 'c'}],
+        [{'id': 'd', 'questions': [{'uid': 'u1', 'options': [['nested'], 'x'], 'image': '/a.png', 'question': '½ 🍕'}]}],
+        [{'id': 'e', 'grade_level': 'K', 'questions': [{'question': 'x'}]},
+         {'id': 'e', 'grade_level': 'K', 'questions': [{'question': 'x'}]}],
+    ]
+    problems = []
+    for n, sets in enumerate(cases + [curriculum]):
+        label = f"case {n}" if n < len(cases) else "curriculum"
+        expected = json.dumps(sets, ensure_ascii=False)
+        model = from_json(sets)
+        if json.dumps([s.to_dict() for s in model], ensure_ascii=False) != expected:
+            problems.append(f"{label}: to_dict() does not reproduce the JSON")
+        for original, record in zip(sets, model):
+            if dict(record.items()).keys() != original.keys():
+                problems.append(f"{label}: keys differ for set {original.get('id')!r}")
+                break
+    # Edits through the mapping interface
+    record = from_json([{'id': 'f', 'questions': [{'question': 'q', 'options': ['1', '2']}]}])[0]
+    question = record['questions'][0]
+    question['options'] = ['3', '4']
+    question['image'] = 'x.png'
+    del question['question']
+    record['questions'] = record['questions'] + [{'question': 'new'}]
+    if record.to_dict() != {'id': 'f', 'questions': [{'options': ['3', '4'], 'image': 'x.png'}, {'question': 'new'}]}:
+        problems.append("edits: to_dict() does not reflect the changes")
+    return problems
+
+
+def _peak_rss_kb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1])
+    return 0
+
+
+def _current_rss_kb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    return 0
+
+
+def _measure(mode, path):
+    """Runs in a child process so each measurement gets its own peak RSS"""
+    start = time.perf_counter()
+    if mode == 'json':
+        with open(path, 'r', encoding='utf-8') as f:
+            sets = json.load(f)
+    elif mode == 'model':
+        sets = load(path)
+    else:
+        sets = []
+    loaded = time.perf_counter() - start
+    # A whole-corpus pass: every question's text and answer
+    start = time.perf_counter()
+    chars = sum(len(str(q.get('question', ''))) + len(str(q.get('answer', '')))
+                for s in sets for q in s.get('questions', []))
+    scanned = time.perf_counter() - start
+    gc.collect()
+    print(json.dumps({'load': loaded, 'scan': scanned, 'peak_kb': _peak_rss_kb(),
+                      'held_kb': _current_rss_kb(), 'chars': chars}))
+
+
+def bench(questions, repeat):
+    from curriculum_pack import synthetic_corpus
+    corpus = synthetic_corpus(questions)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'curriculum.json'
+        write_json_atomic(path, corpus)
+        del corpus
+        print(f"📦 {questions} synthetic questions ({path.stat().st_size / 1e6:.1f} MB of JSON)")
+        labels = {'baseline': 'interpreter only', 'json': 'json.load dicts', 'model': 'slotted model'}
+        results = {}
+        for mode in labels:
+            runs = []
+            for _ in range(repeat):
+                output = subprocess.run([sys.executable, __file__, '_measure', mode, str(path)],
+                                        capture_output=True, text=True, check=True).stdout
+                runs.append(json.loads(output))
+            results[mode] = {key: min(r[key] for r in runs) for key in ('load', 'scan')}
+            results[mode].update({key: max(r[key] for r in runs) for key in ('peak_kb', 'held_kb')})
+        base = results['baseline']
+        for mode, label in labels.items():
+            r = results[mode]
+            print(f"   {label:<18} load {r['load'] * 1000:7.0f} ms  scan {r['scan'] * 1000:6.0f} ms  "
+                  f"peak {(r['peak_kb'] - base['peak_kb']) / 1024:6.1f} MB  "
+                  f"held {(r['held_kb'] - base['held_kb']) / 1024:6.1f} MB")
+
+
+def main():
+    if len(sys.argv) == 4 and sys.argv[1] == '_measure':
+        _measure(sys.argv[2], sys.argv[3])
+        return 0
+
+    parser = argparse.ArgumentParser(description='Check or benchmark the compact curriculum model')
+    parser.add_argument('command', choices=['check', 'bench'])
+    parser.add_argument('--questions', type=int, default=100000, help='bench: synthetic corpus size')
+    parser.add_argument('--repeat', type=int, default=2, help='bench: runs per measurement')
+    args = parser.parse_args()
+
+    if args.command == 'check':
+        path = STORE_DIR if (STORE_DIR / MANIFEST_NAME).exists() else CURRICULUM_FILE
+        problems = check(list(iter_sets(path)))
+        for problem in problems:
+            print(f"❌ {problem}")
+        if problems:
+            return 1
+        print("✅ Every case round-trips exactly")
+    else:
+        bench(args.questions, args.repeat)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,587 @@
+#!/usr/bin/env python3
+"""
+Compact binary curriculum format with a memory-mapped loader
+A .cpk file stores the curriculum column-wise: fixed-width rows of 32-bit
+value references for sets and questions, flat option and hint columns,
+and one table of interned strings (each distinct text stored once). Opening
+a file maps it and reads a 36-byte header; a set is only decoded when it
+is accessed, and filtering by grade or topic touches just those columns.
+Round-trips are exact, key order included; anything that doesn't fit the
+columns is kept as JSON.
+
+Usage:
+  python scripts/curriculum_pack.py pack [--out data/curriculum.cpk]
+  python scripts/curriculum_pack.py unpack --out curriculum.json [--file data/curriculum.cpk]
+  python scripts/curriculum_pack.py check
+  python scripts/curriculum_pack.py bench [--questions 100000] [--repeat 3]
+"""
+
+import argparse
+import json
+import mmap
+import os
+import random
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+from array import array
+from pathlib import Path
+
+from curriculum_journal import write_json_atomic
+from curriculum_store import open_curriculum
+
+PROJECT_ROOT = Path(__file__).parent.parent
+PACK_FILE = PROJECT_ROOT / 'data' / 'curriculum.cpk'
+
+MAGIC = b'CPK1'
+HEADER = struct.Struct('<4s8I')  # magic, version, flags, strings, sets, questions, options, hints, blob bytes
+VERSION = 1
+FLAG_SEPARATED = 1  # No string contains NUL, so the table decodes with one split
+
+SET_COLUMNS = ('id', 'title', 'description', 'grade_level', 'topic', 'difficulty')
+QUESTION_COLUMNS = ('question', 'answer', 'explanation')
+SET_ROW = 1 + len(SET_COLUMNS) + 3  # keys, columns, extra, first question, question count
+QUESTION_ROW = 1 + len(QUESTION_COLUMNS) + 5  # keys, columns, extra, options start/count, hints start/count
+
+# A value is one u32: payload << 2 | tag
+TAG_STRING, TAG_INT, TAG_CONST, TAG_JSON = range(4)
+INT_BIAS = 1 << 29
+CONSTANTS = (None, False, True)
+NULL = TAG_CONST  # Encoded None
+
+
+class _Writer:
+    def __init__(self):
+        self.strings = {}
+        self.sets = array('I')
+        self.questions = array('I')
+        self.options = array('I')
+        self.hints = array('I')
+
+    def string(self, text):
+        index = self.strings.get(text)
+        if index is None:
+            index = self.strings[text] = len(self.strings)
+        return index
+
+    def value(self, value):
+        if isinstance(value, str):
+            return self.string(value) << 2 | TAG_STRING
+        if value is None or isinstance(value, bool):
+            return CONSTANTS.index(value) << 2 | TAG_CONST
+        if isinstance(value, int) and -INT_BIAS <= value < INT_BIAS:
+            return (value + INT_BIAS) << 2 | TAG_INT
+        # Floats, big ints, lists and dicts
+        return self.string(json.dumps(value, ensure_ascii=False)) << 2 | TAG_JSON
+
+    def _keys(self, record):
+        return self.string(json.dumps(list(record), ensure_ascii=False)) << 2 | TAG_STRING
+
+    def _list(self, column, items):
+        start = len(column)
+        column.extend(self.value(item) for item in items)
+        return start, len(items)
+
+    def add_question(self, question):
+        if not isinstance(question, dict):
+            # Kept whole: null keys mark a question that isn't an object
+            self.questions.extend([NULL, *[NULL] * len(QUESTION_COLUMNS), self.value(question), 0, 0, 0, 0])
+            return
+        extra = {k: v for k, v in question.items()
+                 if k not in QUESTION_COLUMNS and not (k in ('options', 'hints') and isinstance(v, list))}
+        options = question.get('options') if isinstance(question.get('options'), list) else []
+        hints = question.get('hints') if isinstance(question.get('hints'), list) else []
+        self.questions.extend([
+            self._keys(question),
+            *(self.value(question.get(column)) for column in QUESTION_COLUMNS),
+            self.value(extra) if extra else NULL,
+            *self._list(self.options, options),
+            *self._list(self.hints, hints),
+        ])
+
+    def add_set(self, curriculum_set):
+        questions = curriculum_set.get('questions')
+        questions = questions if isinstance(questions, list) else []
+        extra = {k: v for k, v in curriculum_set.items()
+                 if k not in SET_COLUMNS and not (k == 'questions' and isinstance(v, list))}
+        first = len(self.questions) // QUESTION_ROW
+        for question in questions:
+            self.add_question(question)
+        self.sets.extend([
+            self._keys(curriculum_set),
+            *(self.value(curriculum_set.get(column)) for column in SET_COLUMNS),
+            self.value(extra) if extra else NULL,
+            first, len(questions),
+        ])
+
+    def write(self, path):
+        # Strings are NUL-terminated; offsets[i] is where string i starts
+        blob = bytearray()
+        offsets = array('I', [0])
+        flags = FLAG_SEPARATED
+        for text in self.strings:
+            if '\0' in text:
+                flags = 0
+            blob += text.encode('utf-8') + b'\0'
+            offsets.append(len(blob))
+        columns = (offsets, self.sets, self.questions, self.options, self.hints)
+        if sys.byteorder == 'big':
+            for column in columns:
+                column.byteswap()
+        header = HEADER.pack(MAGIC, VERSION, flags, len(self.strings), len(self.sets) // SET_ROW,
+                             len(self.questions) // QUESTION_ROW, len(self.options), len(self.hints), len(blob))
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(header)
+                for column in columns:
+                    column.tofile(f)
+                f.write(blob)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+
+def dump(curriculum, path):
+    """Write sets (any iterable of set dicts) to a .cpk file; returns the set count"""
+    writer = _Writer()
+    for curriculum_set in curriculum:
+        writer.add_set(curriculum_set)
+    writer.write(path)
+    return len(writer.sets) // SET_ROW
+
+
+class PackedCurriculum:
+    """
+    Read-only, memory-mapped view of a .cpk file; sets are decoded on access.
+    A file that is not a pack, or is truncated or padded, raises ValueError.
+    """
+
+    def __init__(self, path=PACK_FILE):
+        self.path = Path(path)
+        self._file = open(self.path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"{self.path} is empty, not a curriculum pack")
+        problem = self._check_layout()
+        if problem:
+            self._map.close()
+            self._file.close()
+            raise ValueError(f"{self.path}: {problem}")
+        magic, version, self._flags, strings, sets, questions, options, hints, blob = HEADER.unpack_from(self._map)
+        self._count = sets
+        self._table = None
+        view = memoryview(self._map)
+        position = HEADER.size
+        columns = []
+        for length in (strings + 1, sets * SET_ROW, questions * QUESTION_ROW, options, hints):
+            column = view[position:position + length * 4].cast('I')
+            if sys.byteorder == 'big':
+                column = array('I', column)
+                column.byteswap()
+            columns.append(column)
+            position += length * 4
+        self._offsets, self._sets, self._questions, self._options, self._hints = columns
+        self._blob = view[position:position + blob]
+        self._keys = {}
+
+    def _check_layout(self):
+        """Why the mapped bytes can't be this format's layout, or None"""
+        size = len(self._map)
+        if size < HEADER.size:
+            return f"{size} bytes is shorter than the header"
+        magic, version, _, strings, sets, questions, options, hints, blob = HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != VERSION:
+            return f"not a version {VERSION} curriculum pack"
+        expected = HEADER.size + 4 * (strings + 1 + sets * SET_ROW + questions * QUESTION_ROW + options + hints) + blob
+        if size != expected:
+            return f"{size} bytes but the header describes {expected} (truncated or corrupt)"
+        # The last string offset is the blob length and the blob ends with a terminator
+        last_offset = HEADER.size + 4 * strings
+        (end,) = struct.unpack_from('<I', self._map, last_offset)
+        if end != blob or (blob and self._map[size - 1] != 0):
+            return "string table does not match the header (corrupt)"
+        return None
+
+    def close(self):
+        # Views must be released before the map can close
+        for name in ('_offsets', '_sets', '_questions', '_options', '_hints', '_blob'):
+            column = self.__dict__.pop(name, None)
+            if isinstance(column, memoryview):
+                column.release()
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self._count
+
+    def _string(self, index):
+        if self._table is not None:
+            return self._table[index]
+        return str(self._blob[self._offsets[index]:self._offsets[index + 1] - 1], 'utf-8')
+
+    def _materialize(self):
+        """Decode the string table and copy the rows out in bulk, for reading everything"""
+        if self._table is not None:
+            return
+        if self._flags & FLAG_SEPARATED:
+            table = str(self._blob, 'utf-8').split('\0')[:-1]
+        else:
+            table = [self._string(i) for i in range(len(self._offsets) - 1)]
+        self._table = table
+        self._sets = self._sets.tolist()
+        self._questions = self._questions.tolist()
+        self._options = self._options.tolist()
+        self._hints = self._hints.tolist()
+
+    def _value(self, encoded):
+        tag, payload = encoded & 3, encoded >> 2
+        if tag == TAG_STRING:
+            return self._string(payload)
+        if tag == TAG_INT:
+            return payload - INT_BIAS
+        if tag == TAG_CONST:
+            return CONSTANTS[payload]
+        return json.loads(self._string(payload))
+
+    def _key_order(self, encoded):
+        keys = self._keys.get(encoded)
+        if keys is None:
+            keys = self._keys[encoded] = tuple(json.loads(self._string(encoded >> 2)))
+        return keys
+
+    def _question(self, index):
+        row = self._questions[index * QUESTION_ROW:(index + 1) * QUESTION_ROW]
+        if row[0] == NULL:
+            return self._value(row[1 + len(QUESTION_COLUMNS)])
+        extra = self._value(row[1 + len(QUESTION_COLUMNS)]) or {}
+        question = {}
+        for key in self._key_order(row[0]):
+            if key in extra:
+                question[key] = extra[key]
+            elif key in QUESTION_COLUMNS:
+                question[key] = self._value(row[1 + QUESTION_COLUMNS.index(key)])
+            else:
+                column, start, count = (self._options, row[-4], row[-3]) if key == 'options' else \
+                    (self._hints, row[-2], row[-1])
+                question[key] = [self._value(v) for v in column[start:start + count]]
+        return question
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError(index)
+        row = self._sets[index * SET_ROW:(index + 1) * SET_ROW]
+        extra = self._value(row[1 + len(SET_COLUMNS)]) or {}
+        first, count = row[-2], row[-1]
+        curriculum_set = {}
+        for key in self._key_order(row[0]):
+            if key in extra:
+                curriculum_set[key] = extra[key]
+            elif key == 'questions':
+                curriculum_set[key] = [self._question(i) for i in range(first, first + count)]
+            else:
+                curriculum_set[key] = self._value(row[1 + SET_COLUMNS.index(key)])
+        return curriculum_set
+
+    def column(self, name):
+        """One set column (e.g. 'grade_level') for every set, without decoding the sets"""
+        offset = 1 + SET_COLUMNS.index(name)
+        return [self._value(self._sets[i * SET_ROW + offset]) for i in range(self._count)]
+
+    def decode_all(self):
+        """
+        Every set, decoded in bulk: the string table is split once and each
+        column is decoded in one pass, several times faster than set by set
+        """
+        self._materialize()
+        table, sets, questions = self._table, self._sets, self._questions
+        loads = json.loads
+
+        def value(v):
+            tag = v & 3
+            if tag == TAG_STRING:
+                return table[v >> 2]
+            if tag == TAG_INT:
+                return (v >> 2) - INT_BIAS
+            if tag == TAG_CONST:
+                return CONSTANTS[v >> 2]
+            return loads(table[v >> 2])
+
+        def column(values):
+            return [table[v >> 2] if not v & 3 else value(v) for v in values]
+
+        def lists(flat, rows, start_at, count_at):
+            flat = column(flat)
+            return [flat[s:s + c] for s, c in zip(rows[start_at::QUESTION_ROW], rows[count_at::QUESTION_ROW])]
+
+        # Each key maps to a per-question list; `extra` overrides for the rare odd question
+        sources = {key: column(questions[1 + i::QUESTION_ROW]) for i, key in enumerate(QUESTION_COLUMNS)}
+        sources['options'] = lists(self._options, questions, QUESTION_ROW - 4, QUESTION_ROW - 3)
+        sources['hints'] = lists(self._hints, questions, QUESTION_ROW - 2, QUESTION_ROW - 1)
+        plans = {}
+        decoded = []
+        for i, (keys, extra) in enumerate(zip(questions[0::QUESTION_ROW], questions[1 + len(QUESTION_COLUMNS)::QUESTION_ROW])):
+            if keys == NULL:
+                decoded.append(value(extra))
+                continue
+            plan = plans.get(keys)
+            if plan is None:
+                order = self._key_order(keys)
+                plan = plans[keys] = (order, [sources.get(key) for key in order])
+            order, lists_for_keys = plan
+            if extra == NULL:
+                decoded.append(dict(zip(order, [source[i] for source in lists_for_keys])))
+            else:
+                extra = value(extra)
+                decoded.append({key: extra[key] if key in extra else source[i]
+                                for key, source in zip(order, lists_for_keys)})
+
+        result = []
+        extra_at = 1 + len(SET_COLUMNS)
+        for base in range(0, len(sets), SET_ROW):
+            extra = sets[base + extra_at]
+            extra = value(extra) if extra != NULL else {}
+            curriculum_set = {}
+            for key in self._key_order(sets[base]):
+                if key in extra:
+                    curriculum_set[key] = extra[key]
+                elif key == 'questions':
+                    first = sets[base + SET_ROW - 2]
+                    curriculum_set[key] = decoded[first:first + sets[base + SET_ROW - 1]]
+                else:
+                    curriculum_set[key] = value(sets[base + 1 + SET_COLUMNS.index(key)])
+            result.append(curriculum_set)
+        return result
+
+    def sets(self, grades=None, topics=None):
+        """Iterate sets, decoding only those whose grade and topic match"""
+        if grades is None and topics is None:
+            yield from self.decode_all()
+            return
+        grade_at = 1 + SET_COLUMNS.index('grade_level')
+        topic_at = 1 + SET_COLUMNS.index('topic')
+        for i in range(self._count):
+            if grades is not None and self._value(self._sets[i * SET_ROW + grade_at]) not in grades:
+                continue
+            if topics is not None and self._value(self._sets[i * SET_ROW + topic_at]) not in topics:
+                continue
+            yield self[i]
+
+    def __iter__(self):
+        return self.sets()
+
+
+def load(path=PACK_FILE):
+    """The whole curriculum as a list of set dicts"""
+    with PackedCurriculum(path) as packed:
+        return packed.decode_all()
+
+
+def _same(a, b):
+    """Equal values with the same key order everywhere"""
+    return json.dumps(a, ensure_ascii=False) == json.dumps(b, ensure_ascii=False) and a == b
+
+
+EDGE_CASES = [
+    {'id': 'edge-1', 'grade_level': 'K', 'title': 7, 'topic': None, 'questions': [
+        {'answer': 4, 'question': 'What is 2 + 2?', 'options': [4, 5.5, '6', None], 'hints': None},
+        {'question': 'Big numbers', 'options': [2 ** 40, -3, 1e-9, True], 'answer': 2 ** 40, 'meta': {'a': [1]}},
+        'not an object', None, {}, {'options': 'abc', 'hints': []},
+    ]},
+    {'id': 'edge-2', 'questions': 'not a list', 'generated': True, 'tags': ['x', 'ü', '🧮']},
+    {},
+]
+
+
+def synthetic_corpus(questions=100000, per_set=10, seed=7):
+    """Curriculum-shaped sets with varied text, hints on early grades and some images"""
+    rng = random.Random(seed)
+    topics = ['Addition', 'Subtraction', 'Multiplication', 'Division', 'Fractions', 'Decimals',
+              'Geometry', 'Measurement', 'Ratios', 'Algebra', 'Statistics', 'Probability']
+    sets = []
+    for n in range(questions // per_set):
+        grade = rng.randint(0, 9)
+        topic = rng.choice(topics)
+        items = []
+        for _ in range(per_set):
+            a, b = rng.randint(1, 10 ** min(grade + 1, 4)), rng.randint(1, 99)
+            answer = str(a + b)
+            options = [answer, str(a + b + 1), str(a + b - 1), str(a + b + 10)]
+            rng.shuffle(options)
+            question = {
+                'question': f"{rng.choice(['What is', 'Calculate', 'Find'])} {a} + {b}?",
+                'options': options,
+                'answer': answer,
+                'explanation': f"Add {a} and {b} to get {answer}. Line up the place values and carry when needed.",
+            }
+            if grade <= 2:
+                question['hints'] = [f"Start at {a}.", f"Count on {b} more."]
+            if rng.random() < 0.05:
+                question['image'] = f"/curriculum-images/grade{grade}-{topic.lower()}-{n}.png"
+            items.append(question)
+        sets.append({
+            'id': f"{grade}-{topic.lower()}-{n}",
+            'title': f"{topic} Practice - Set {n}",
+            'description': f"Practice {topic.lower()} for Grade {grade}",
+            'grade_level': grade,
+            'topic': topic,
+            'questions': items,
+        })
+    return sets
+
+
+def check(curriculum=None):
+    """Round-trip problems for the edge cases, a synthetic corpus and the real curriculum"""
+    cases = [('edge cases', EDGE_CASES), ('synthetic', synthetic_corpus(5000))]
+    if curriculum:
+        cases.append(('curriculum', curriculum))
+    problems = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'check.cpk'
+        for name, sets in cases:
+            dump(sets, path)
+            with PackedCurriculum(path) as packed:
+                decoded = list(packed)
+                if len(packed) != len(sets) or not _same(decoded, sets):
+                    bad = next((i for i, (a, b) in enumerate(zip(decoded, sets)) if not _same(a, b)), len(decoded))
+                    problems.append(f"{name}: set {bad} does not round-trip")
+                grades = {s.get('grade_level') for s in sets[:3] if isinstance(s.get('grade_level'), int)}
+                if grades and not _same(list(packed.sets(grades)), [s for s in sets if s.get('grade_level') in grades]):
+                    problems.append(f"{name}: grade filter returns different sets")
+            print(f"   {name}: {len(sets)} sets {'✅' if not problems else '❌'}")
+    return problems
+
+
+MEASURES = ('baseline', 'json', 'pack-full', 'pack-grade', 'pack-open')
+
+
+def _peak_rss_kb():
+    # getrusage's maxrss survives exec on Linux (the child would report the
+    # parent's peak), so prefer the per-process high-water mark
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == 'darwin' else rss  # bytes on macOS, KiB on Linux
+
+
+def _measure(mode, path):
+    """Runs in a child process so each measurement gets its own peak RSS"""
+    start = time.perf_counter()
+    if mode == 'json':
+        with open(path, 'r', encoding='utf-8') as f:
+            count = len(json.load(f))
+    elif mode == 'pack-full':
+        count = len(load(path))
+    elif mode == 'pack-grade':
+        with PackedCurriculum(path) as packed:
+            count = sum(1 for _ in packed.sets({3}))
+    elif mode == 'pack-open':
+        with PackedCurriculum(path) as packed:
+            count = len(packed[len(packed) // 2]['questions'])
+    else:
+        count = 0
+    elapsed = time.perf_counter() - start
+    rss = _peak_rss_kb()
+    print(json.dumps({'seconds': elapsed, 'rss_kb': rss, 'count': count}))
+
+
+def bench(questions, repeat):
+    corpus = synthetic_corpus(questions)
+    with tempfile.TemporaryDirectory() as tmp:
+        files = {
+            'json': Path(tmp) / 'curriculum.json',
+            'compact': Path(tmp) / 'curriculum.min.json',
+            'pack': Path(tmp) / 'curriculum.cpk',
+        }
+        write_json_atomic(files['json'], corpus)
+        with open(files['compact'], 'w', encoding='utf-8') as f:
+            json.dump(corpus, f, ensure_ascii=False, separators=(',', ':'))
+        dump(corpus, files['pack'])
+        count = sum(len(s['questions']) for s in corpus)
+        del corpus
+
+        print(f"📦 {count} questions in {questions // 10} sets")
+        print(f"   JSON indent=2: {files['json'].stat().st_size / 1e6:.1f} MB")
+        print(f"   JSON compact:  {files['compact'].stat().st_size / 1e6:.1f} MB")
+        print(f"   .cpk:          {files['pack'].stat().st_size / 1e6:.1f} MB")
+
+        labels = {
+            'baseline': 'interpreter only',
+            'json': 'json.load (indent=2)',
+            'pack-full': '.cpk, decode everything',
+            'pack-grade': '.cpk, decode grade 3 only',
+            'pack-open': '.cpk, open + one set',
+        }
+        for mode in MEASURES:
+            path = files['pack'] if mode.startswith('pack') else files['json']
+            runs = []
+            for _ in range(repeat):
+                output = subprocess.run([sys.executable, __file__, '_measure', mode, str(path)],
+                                        capture_output=True, text=True, check=True).stdout
+                runs.append(json.loads(output))
+            seconds = min(r['seconds'] for r in runs)
+            rss = max(r['rss_kb'] for r in runs)
+            print(f"   {labels[mode]:<28} {seconds * 1000:8.1f} ms  peak RSS {rss / 1024:6.1f} MB")
+
+
+def main():
+    if len(sys.argv) == 4 and sys.argv[1] == '_measure':
+        _measure(sys.argv[2], sys.argv[3])
+        return 0
+
+    parser = argparse.ArgumentParser(description='Pack the curriculum into the binary .cpk format and benchmark it')
+    parser.add_argument('command', choices=['pack', 'unpack', 'check', 'bench'])
+    parser.add_argument('--file', default=str(PACK_FILE), help='unpack: .cpk to read')
+    parser.add_argument('--out', help='pack: .cpk to write; unpack: JSON to write')
+    parser.add_argument('--questions', type=int, default=100000, help='bench: synthetic corpus size')
+    parser.add_argument('--repeat', type=int, default=3, help='bench: runs per measurement (best time is kept)')
+    args = parser.parse_args()
+
+    if args.command == 'pack':
+        out = args.out or str(PACK_FILE)
+        count = dump(open_curriculum(), out)
+        print(f"💾 Packed {count} sets into {out} ({Path(out).stat().st_size / 1e6:.1f} MB)")
+    elif args.command == 'unpack':
+        if not args.out:
+            parser.error('unpack needs --out')
+        sets = load(args.file)
+        write_json_atomic(args.out, sets)
+        print(f"💾 Unpacked {len(sets)} sets to {args.out}")
+    elif args.command == 'check':
+        problems = check(list(open_curriculum()))
+        for problem in problems:
+            print(f"❌ {problem}")
+        if problems:
+            return 1
+        print("✅ Every case round-trips exactly")
+    else:
+        bench(args.questions, args.repeat)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
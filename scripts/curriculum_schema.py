@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Shape validation for curriculum data
+The shapes the app and Supabase rely on (src/services/schema.sql and the
+assignment migration): curriculum sets and their questions, learning
+paths and assignments. Each schema is compiled once, at import, into a
+flat list of (field, allowed types, extra check) steps, so checking a
+record is a handful of dict lookups and type tests; 100k questions take
+a fraction of a second and the check can run on every write.
+
+Validators return a list of SchemaError records (path, code, message),
+empty when the value is valid:
+
+    errors = validate_set(curriculum_set)
+    for error in errors:
+        print(error)            # questions[3].answer: answer '7' is not one of the options
+
+Usage:
+  python scripts/curriculum_schema.py                       # validate the curriculum
+  python scripts/curriculum_schema.py --kind paths --file src/data/learning_paths.json
+  python scripts/curriculum_schema.py bench [--questions 100000]
+"""
+
+import argparse
+import json
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+LEARNING_PATHS_FILE = PROJECT_ROOT / 'src' / 'data' / 'learning_paths.json'
+
+OPTION_COUNT = 4
+MAX_GRADE = 12
+ID_LENGTH = 100      # curriculum_set_id / learning_path_id are VARCHAR(100)
+TITLE_LENGTH = 255   # assignments.title is VARCHAR(255)
+ASSIGNMENT_TYPES = ('curriculum_set', 'learning_path')
+ASSIGNMENT_STATUSES = ('assigned', 'in_progress', 'completed', 'submitted')
+
+STR = (str,)
+INT = (int,)
+SCALAR = (str, int, float)
+LIST = (list,)
+_TYPE_NAMES = {str: 'a string', int: 'an integer', float: 'a number', list: 'a list',
+               dict: 'an object', bool: 'a boolean', type(None): 'null'}
+_MISSING = object()
+
+
+class SchemaError:
+    """One problem with a value: where it is, a stable code and a readable message"""
+
+    __slots__ = ('path', 'code', 'message')
+
+    def __init__(self, path, code, message):
+        self.path = path
+        self.code = code
+        self.message = message
+
+    def to_dict(self):
+        return {'path': self.path, 'code': self.code, 'message': self.message}
+
+    def __str__(self):
+        return f"{self.path or '<root>'}: {self.message}"
+
+    def __repr__(self):
+        return f"SchemaError({self.path!r}, {self.code!r}, {self.message!r})"
+
+
+class Field:
+    """
+    One key of an object. `types` are exact types (so True is not an
+    integer); `check(value)` returns an error message or None and `nested`
+    validates each item of a list field (or the value itself for objects).
+    """
+
+    __slots__ = ('name', 'types', 'required', 'nullable', 'check', 'nested')
+
+    def __init__(self, name, types, required=False, nullable=None, check=None, nested=None):
+        self.name = name
+        self.types = types
+        self.required = required
+        # Optional columns are nullable in the SQL schema; required ones never are
+        self.nullable = not required if nullable is None else nullable
+        self.check = check
+        self.nested = nested
+
+
+def non_empty(value):
+    return None if value.strip() else 'must not be empty'
+
+
+def max_length(limit):
+    def check(value):
+        if not value.strip():
+            return 'must not be empty'
+        return f"is {len(value)} characters, longer than {limit}" if len(value) > limit else None
+    return check
+
+
+def between(low, high):
+    def check(value):
+        return None if low <= value <= high else f"{value} is outside {low}-{high}"
+    return check
+
+
+def one_of(*choices):
+    def check(value):
+        return None if value in choices else f"{value!r} is not one of {', '.join(choices)}"
+    return check
+
+
+def items_of(types):
+    names = ' or '.join(_TYPE_NAMES[t] for t in types)
+
+    def check(value):
+        for item in value:
+            if type(item) not in types:
+                return f"has {_TYPE_NAMES.get(type(item), type(item).__name__)} where {names} was expected"
+        return None
+    return check
+
+
+def compile_schema(fields, rules=()):
+    """
+    A validator for objects with these fields. `rules(value, path, errors)`
+    run after the fields check out, for constraints across fields.
+    Returns validate(value, path='') -> [SchemaError].
+    """
+    steps = tuple(
+        (f.name, frozenset(f.types) | ({type(None)} if f.nullable else set()), f.required, f.check, f.nested,
+         ' or '.join(_TYPE_NAMES[t] for t in f.types))
+        for f in fields
+    )
+
+    def validate(value, path=''):
+        if type(value) is not dict:
+            return [SchemaError(path, 'type', f"expected an object, got {_TYPE_NAMES.get(type(value), type(value).__name__)}")]
+        errors = []
+        get = value.get
+        prefix = f"{path}." if path else ''
+        for name, types, required, check, nested, expected in steps:
+            item = get(name, _MISSING)
+            if item is _MISSING:
+                if required:
+                    errors.append(SchemaError(prefix + name, 'missing', f"{name} is required"))
+                continue
+            if type(item) not in types:
+                got = _TYPE_NAMES.get(type(item), type(item).__name__)
+                errors.append(SchemaError(prefix + name, 'type', f"{name} should be {expected}, got {got}"))
+                continue
+            if item is None:
+                continue
+            if check is not None:
+                message = check(item)
+                if message:
+                    errors.append(SchemaError(prefix + name, 'value', f"{name} {message}"))
+                    continue
+            if nested is not None:
+                if type(item) is list:
+                    for i, element in enumerate(item):
+                        found = nested(element, f"{prefix}{name}[{i}]")
+                        if found:
+                            errors.extend(found)
+                else:
+                    errors.extend(nested(item, prefix + name))
+        if not errors:
+            for rule in rules:
+                rule(value, path, errors)
+        return errors
+
+    return validate
+
+
+def _answer_in_options(question, path, errors):
+    options = question['options']
+    if len(options) != OPTION_COUNT:
+        errors.append(SchemaError(_join(path, 'options'), 'option_count',
+                                  f"has {len(options)} options, expected {OPTION_COUNT}"))
+    answer = question['answer']
+    if answer not in options and str(answer).strip() not in [str(o).strip() for o in options]:
+        errors.append(SchemaError(_join(path, 'answer'), 'answer_not_in_options',
+                                  f"answer {answer!r} is not one of the options"))
+
+
+def _assignment_target(assignment, path, errors):
+    # CONSTRAINT assignment_type_check
+    kind = assignment['assignment_type']
+    column = f"{kind}_id"
+    if assignment.get(column) is None:
+        errors.append(SchemaError(_join(path, column), 'missing', f"{column} is required for a {kind} assignment"))
+
+
+def _join(path, name):
+    return f"{path}.{name}" if path else name
+
+
+# Questions inside sets and inside the older assignments.questions jsonb
+validate_question = compile_schema([
+    Field('question', STR, required=True, check=non_empty),
+    Field('options', LIST, required=True, check=items_of(SCALAR)),
+    Field('answer', SCALAR, required=True),
+    Field('explanation', STR),
+    Field('hints', LIST, check=items_of(STR)),
+    Field('uid', STR, check=non_empty),
+    Field('image', STR),
+], rules=[_answer_in_options])
+
+validate_set = compile_schema([
+    Field('id', STR, required=True, check=max_length(ID_LENGTH)),
+    Field('title', STR, required=True, check=non_empty),
+    Field('description', STR),
+    Field('grade_level', INT, required=True, check=between(0, MAX_GRADE)),
+    Field('topic', STR, required=True, check=non_empty),
+    Field('difficulty', STR),
+    Field('questions', LIST, required=True, check=lambda v: None if v else 'must not be empty',
+          nested=validate_question),
+])
+
+# Modules are set ids in converted markdown paths, objects in the app's paths
+_validate_module_object = compile_schema([
+    Field('id', STR, required=True, check=non_empty),
+    Field('title', STR),
+    Field('type', STR),
+])
+
+
+def _validate_module(module, path):
+    if type(module) is str:
+        return [SchemaError(path, 'value', "module id must not be empty")] if not module.strip() else []
+    return _validate_module_object(module, path)
+
+
+validate_learning_path = compile_schema([
+    Field('id', STR, required=True, check=max_length(ID_LENGTH)),
+    Field('title', STR, required=True, check=non_empty),
+    Field('description', STR),
+    Field('grade_level', INT, required=True, check=between(0, MAX_GRADE)),
+    Field('topic', STR),
+    Field('modules', LIST, required=True, nested=_validate_module),
+    Field('estimated_time', INT, check=between(0, 24 * 60)),
+    Field('total_questions', INT, check=between(0, 10000)),
+    Field('prerequisites', LIST, check=items_of(STR)),
+    Field('next_paths', LIST, check=items_of(STR)),
+    Field('created_at', STR),
+])
+
+validate_assignment = compile_schema([
+    Field('id', STR, check=non_empty),
+    Field('teacher_id', STR, required=True, check=non_empty),
+    Field('class_id', STR),
+    Field('student_id', STR),
+    Field('assignment_type', STR, required=True, check=one_of(*ASSIGNMENT_TYPES)),
+    Field('curriculum_set_id', STR, check=max_length(ID_LENGTH)),
+    Field('learning_path_id', STR, check=max_length(ID_LENGTH)),
+    Field('title', STR, required=True, check=max_length(TITLE_LENGTH)),
+    Field('description', STR),
+    Field('due_date', STR),
+    Field('score', INT, check=between(0, 100)),
+    Field('status', STR, check=one_of(*ASSIGNMENT_STATUSES)),
+    Field('questions', LIST, nested=validate_question),
+], rules=[_assignment_target])
+
+VALIDATORS = {
+    'sets': validate_set,
+    'questions': validate_question,
+    'paths': validate_learning_path,
+    'assignments': validate_assignment,
+}
+
+
+def validate_all(records, validator=validate_set):
+    """Yield (index, record, errors) for each record that has errors"""
+    for index, record in enumerate(records):
+        errors = validator(record, f"[{index}]")
+        if errors:
+            yield index, record, errors
+
+
+def bench(questions):
+    from curriculum_pack import synthetic_corpus
+    sets = synthetic_corpus(questions)
+    start = time.perf_counter()
+    invalid = sum(1 for _ in validate_all(sets))
+    elapsed = time.perf_counter() - start
+    print(f"⏱️  {questions} questions in {len(sets)} sets: {elapsed * 1000:.0f} ms "
+          f"({elapsed / questions * 1e6:.2f} µs/question), {invalid} invalid sets")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Validate curriculum, learning path or assignment JSON')
+    parser.add_argument('command', nargs='?', choices=['check', 'bench'], default='check')
+    parser.add_argument('--kind', choices=sorted(VALIDATORS), default='sets')
+    parser.add_argument('--file', help='JSON array to check (default: the curriculum, or learning_paths.json)')
+    parser.add_argument('--show', type=int, default=10, help='Print this many errors')
+    parser.add_argument('--json', action='store_true', help='Print errors as JSON lines')
+    parser.add_argument('--questions', type=int, default=100000, help='bench: synthetic corpus size')
+    args = parser.parse_args()
+
+    if args.command == 'bench':
+        bench(args.questions)
+        return 0
+
+    if args.file:
+        from curriculum_store import iter_sets
+        records = iter_sets(args.file)
+    elif args.kind == 'paths':
+        with open(LEARNING_PATHS_FILE, 'r', encoding='utf-8') as f:
+            records = json.load(f)
+    elif args.kind == 'sets':
+        from curriculum_store import open_curriculum
+        records = open_curriculum().sets()
+    else:
+        parser.error(f"--file is required for --kind {args.kind}")
+
+    records = list(records)
+    invalid = shown = 0
+    codes = Counter()
+    for _, record, errors in validate_all(records, VALIDATORS[args.kind]):
+        invalid += 1
+        codes.update(e.code for e in errors)
+        label = record.get('id') if type(record) is dict else None
+        for error in errors:
+            if args.json:
+                print(json.dumps({'id': label, **error.to_dict()}, ensure_ascii=False))
+            elif shown < args.show:
+                print(f"   ❌ {label or ''} {error}")
+                shown += 1
+    if not args.json:
+        status = '✅' if not invalid else '⚠️ '
+        print(f"{status} {len(records)} {args.kind} checked, {invalid} with errors"
+              + (f" ({', '.join(f'{c}: {n}' for c, n in codes.most_common())})" if codes else ''))
+    return 1 if invalid else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
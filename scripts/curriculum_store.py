@@ -0,0 +1,590 @@
+#!/usr/bin/env python3
+"""
+Sharded curriculum store
+The curriculum lives in src/data/curriculum/ as one JSON file per grade and
+topic (grade-7/algebra.json) plus manifest.json, which records each
+shard's grade, topics, set ids, counts and sha256. Tools read the manifest,
+load only the shards they touch and, on save(), rewrite only the shards
+whose content changed. A set whose grade or topic was edited moves to its
+new shard on save.
+
+curriculum.json stays the file the web app imports (its static fallback):
+every save() to the project's store rebuilds it from the shards, and
+`export` does the same by hand. Until a tree has been split, open_curriculum() returns
+the same interface over curriculum.json, so tools work either way.
+
+Usage:
+  python scripts/curriculum_store.py split [--from src/data/curriculum.json]
+  python scripts/curriculum_store.py status
+  python scripts/curriculum_store.py verify [--against src/data/curriculum.json]
+  python scripts/curriculum_store.py export [--out src/data/curriculum.json]
+"""
+
+import argparse
+import fcntl
+import hashlib
+import json
+import re
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from curriculum_journal import atomic_writer, write_json_atomic, write_text_atomic
+
+PROJECT_ROOT = Path(__file__).parent.parent
+CURRICULUM_FILE = PROJECT_ROOT / 'src' / 'data' / 'curriculum.json'
+STORE_DIR = PROJECT_ROOT / 'src' / 'data' / 'curriculum'
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+CHUNK_SIZE = 1 << 20  # Read size when streaming a curriculum JSON file
+_decoder = json.JSONDecoder()
+_SEPARATORS = re.compile(r'[\s,]*')
+
+
+def _slug(text):
+    return re.sub(r'[^a-z0-9]+', '-', str(text).lower()).strip('-')
+
+
+def shard_name(curriculum_set):
+    """Relative shard path for a set: grade-<grade>/<topic slug>.json"""
+    grade = curriculum_set.get('grade_level')
+    grade = 'unknown' if grade is None else _slug(grade) or 'unknown'
+    return f"grade-{grade}/{_slug(curriculum_set.get('topic') or '') or 'general'}.json"
+
+
+def _dump(sets):
+    return json.dumps(sets, indent=2, ensure_ascii=False) + '\n'
+
+
+def _digest(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _grade_order(grade):
+    """Sort key putting numeric grades first, in numeric order"""
+    return (0, grade, '') if isinstance(grade, int) else (1, 0, str(grade))
+
+
+def _entry(sets, text):
+    grades = Counter(s.get('grade_level') for s in sets)
+    return {
+        'grade': grades.most_common(1)[0][0] if grades else None,
+        'topics': sorted({str(s.get('topic') or '') for s in sets}),
+        'sets': len(sets),
+        'questions': sum(len(s.get('questions') or []) for s in sets),
+        'bytes': len(text.encode('utf-8')),
+        'sha256': _digest(text),
+        'ids': [s.get('id') for s in sets],
+    }
+
+
+class CurriculumStore:
+    """
+    Lazily loaded shards under `root`; save() writes only what changed and,
+    when anything did, re-exports `export_to` (curriculum.json for the
+    project's store, nothing for stores elsewhere; False to never export)
+    """
+
+    def __init__(self, root=STORE_DIR, export_to=None):
+        self.root = Path(root)
+        if export_to is None and self.root.resolve() == STORE_DIR.resolve():
+            export_to = CURRICULUM_FILE
+        self.export_to = export_to
+        self.manifest = self._read_manifest()
+        self._loaded = {}  # shard name -> list of sets
+        self._hashes = {}  # shard name -> sha256 when loaded (None for new shards)
+        self._lock_depth = 0
+
+    @property
+    def manifest_path(self):
+        return self.root / MANIFEST_NAME
+
+    def _read_manifest(self):
+        try:
+            with open(self.root / MANIFEST_NAME, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'version': MANIFEST_VERSION, 'sets': 0, 'questions': 0, 'shards': {}}
+
+    @contextmanager
+    def locked(self):
+        """
+        Exclusive writer lock on the store, held by save() and by callers
+        that need a whole read-modify-write to be atomic (compaction).
+        Re-entrant within this object; the manifest is re-read on entry if
+        nothing has been loaded yet, so reads inside see the latest state.
+        """
+        if self._lock_depth:
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+            return
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.root / '.lock', 'w') as lock:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            if not self._loaded:
+                self.manifest = self._read_manifest()
+            self._lock_depth = 1
+            try:
+                yield
+            finally:
+                self._lock_depth = 0
+
+    def shard_names(self, grades=None, topics=None):
+        """Shards in the manifest, filtered by grade and topic, in grade order"""
+        slugs = {_slug(t) for t in topics} if topics else None
+        names = []
+        for name, entry in self.manifest['shards'].items():
+            if grades is not None and entry['grade'] not in grades:
+                continue
+            if slugs is not None and not slugs & {_slug(t) for t in entry['topics']}:
+                continue
+            names.append(name)
+        shards = self.manifest['shards']
+        return sorted(names, key=lambda n: (_grade_order(shards[n]['grade']), n))
+
+    def shard(self, name):
+        """The sets in one shard (loaded once, then cached); mutate in place and save()"""
+        if name not in self._loaded:
+            path = self.root / name
+            if name in self.manifest['shards'] and path.exists():
+                text = path.read_text(encoding='utf-8')
+                self._loaded[name] = json.loads(text)
+                self._hashes[name] = _digest(text)
+            else:
+                self._loaded[name] = []
+                self._hashes[name] = None
+        return self._loaded[name]
+
+    def sets(self, grades=None, topics=None):
+        """Iterate sets, loading only the matching shards as they are reached"""
+        slugs = {_slug(t) for t in topics} if topics else None
+        names = self.shard_names(grades, topics)
+        # Shards created in this session are not in the manifest yet
+        names += [n for n in self._loaded if n not in self.manifest['shards']]
+        for name in names:
+            for curriculum_set in self.shard(name):
+                if grades is not None and curriculum_set.get('grade_level') not in grades:
+                    continue
+                if slugs is not None and _slug(curriculum_set.get('topic') or '') not in slugs:
+                    continue
+                yield curriculum_set
+
+    def __iter__(self):
+        return self.sets()
+
+    def __len__(self):
+        return self.manifest['sets'] + sum(
+            len(sets) - self.manifest['shards'].get(name, {}).get('sets', 0) for name, sets in self._loaded.items())
+
+    def ids(self):
+        """Every set id, read from the manifest for shards that are not loaded"""
+        ids = set()
+        for name, entry in self.manifest['shards'].items():
+            if name not in self._loaded:
+                ids.update(entry['ids'])
+        for sets in self._loaded.values():
+            ids.update(s.get('id') for s in sets)
+        return ids
+
+    def find(self, set_id):
+        """All sets with this id (ids are not unique in older data); loads only their shards"""
+        names = [n for n, e in self.manifest['shards'].items() if n not in self._loaded and set_id in e['ids']]
+        for name in names:
+            self.shard(name)
+        return [s for sets in self._loaded.values() for s in sets if s.get('id') == set_id]
+
+    def counts(self):
+        """{grade: (sets, questions)} from the manifest alone"""
+        counts = {}
+        for entry in self.manifest['shards'].values():
+            sets, questions = counts.get(entry['grade'], (0, 0))
+            counts[entry['grade']] = (sets + entry['sets'], questions + entry['questions'])
+        return dict(sorted(counts.items(), key=lambda item: _grade_order(item[0])))
+
+    def add(self, curriculum_set):
+        self.shard(shard_name(curriculum_set)).append(curriculum_set)
+
+    def remove(self, curriculum_set):
+        """Remove this set object from whichever loaded shard holds it"""
+        for sets in self._loaded.values():
+            for i, candidate in enumerate(sets):
+                if candidate is curriculum_set:
+                    del sets[i]
+                    return
+        raise ValueError(f"Set {curriculum_set.get('id')} is not in a loaded shard")
+
+    def save(self):
+        """
+        Write loaded shards whose content changed and refresh the manifest.
+        Returns the names of the shards written or deleted. Raises
+        RuntimeError if another process rewrote one of those shards since
+        it was loaded here.
+        """
+        # Sets whose grade or topic changed move to their new shard
+        moved = []
+        for name, sets in list(self._loaded.items()):
+            keep = [s for s in sets if shard_name(s) == name]
+            if len(keep) != len(sets):
+                moved.extend(s for s in sets if shard_name(s) != name)
+                sets[:] = keep
+        for curriculum_set in moved:
+            self.add(curriculum_set)
+
+        with self.locked():
+            manifest = self._read_manifest()
+            shards = manifest['shards']
+            changed = []
+            for name, sets in self._loaded.items():
+                text = _dump(sets)
+                digest = _digest(text)
+                on_disk = shards.get(name, {}).get('sha256')
+                if digest == on_disk:
+                    self._hashes[name] = digest
+                    continue
+                if on_disk != self._hashes[name]:
+                    raise RuntimeError(f"{name} was changed by another writer since it was loaded; reload and retry")
+                path = self.root / name
+                if sets:
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    write_text_atomic(path, text)
+                    shards[name] = _entry(sets, text)
+                    self._hashes[name] = digest
+                else:
+                    if path.exists():
+                        path.unlink()
+                    shards.pop(name, None)
+                    self._hashes[name] = None
+                changed.append(name)
+            if changed:
+                manifest['version'] = MANIFEST_VERSION
+                manifest['sets'] = sum(e['sets'] for e in shards.values())
+                manifest['questions'] = sum(e['questions'] for e in shards.values())
+                manifest['updated'] = datetime.now().isoformat(timespec='seconds')
+                manifest['shards'] = dict(sorted(shards.items()))
+                write_json_atomic(self.manifest_path, manifest)
+            self.manifest = manifest
+            if changed and self.export_to:
+                # The web app still imports the single file; keep it in step with the shards
+                self.export_json(self.export_to)
+        return changed
+
+    def export_json(self, path=CURRICULUM_FILE):
+        """Rebuild the single-file curriculum (grade, then topic order) for the web app"""
+        sets = [s for name in self.shard_names() for s in self.shard(name)]
+        write_json_atomic(path, sets)
+        return len(sets)
+
+
+class JsonCurriculum:
+    """The CurriculumStore interface over a single curriculum.json (for unsplit trees)"""
+
+    def __init__(self, path=CURRICULUM_FILE):
+        self.path = Path(path)
+        self._sets = None
+        self._hash = None
+        self._file_hash = None  # sha256 of the file as read, to spot other writers
+        self._by_id = None
+        self._lock_depth = 0
+
+    def _read_file(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _all(self):
+        if self._sets is None:
+            text = self._read_file()
+            self._sets = json.loads(text) if text is not None else []
+            self._file_hash = _digest(text) if text is not None else None
+            self._hash = _digest(json.dumps(self._sets, indent=2, ensure_ascii=False))
+        return self._sets
+
+    @contextmanager
+    def locked(self):
+        """Exclusive writer lock on the file (<name>.lock beside it), re-entrant within this object"""
+        if self._lock_depth:
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path.with_name(self.path.name + '.lock'), 'w') as lock:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            self._lock_depth = 1
+            try:
+                yield
+            finally:
+                self._lock_depth = 0
+
+    def sets(self, grades=None, topics=None):
+        slugs = {_slug(t) for t in topics} if topics else None
+        for curriculum_set in self._all():
+            if grades is not None and curriculum_set.get('grade_level') not in grades:
+                continue
+            if slugs is not None and _slug(curriculum_set.get('topic') or '') not in slugs:
+                continue
+            yield curriculum_set
+
+    def __iter__(self):
+        return self.sets()
+
+    def __len__(self):
+        return len(self._all())
+
+    def ids(self):
+        return {s.get('id') for s in self._all()}
+
+    def find(self, set_id):
+        if self._by_id is None:
+            self._by_id = {}
+            for s in self._all():
+                self._by_id.setdefault(s.get('id'), []).append(s)
+        return list(self._by_id.get(set_id, []))
+
+    def counts(self):
+        counts = {}
+        for s in self._all():
+            sets, questions = counts.get(s.get('grade_level'), (0, 0))
+            counts[s.get('grade_level')] = (sets + 1, questions + len(s.get('questions') or []))
+        return dict(sorted(counts.items(), key=lambda item: _grade_order(item[0])))
+
+    def add(self, curriculum_set):
+        self._all().append(curriculum_set)
+        self._by_id = None
+
+    def remove(self, curriculum_set):
+        sets = self._all()
+        for i, candidate in enumerate(sets):
+            if candidate is curriculum_set:
+                del sets[i]
+                self._by_id = None
+                return
+        raise ValueError(f"Set {curriculum_set.get('id')} is not in {self.path.name}")
+
+    def save(self):
+        """
+        Write the file if its content changed. Raises RuntimeError if
+        another process rewrote it since it was loaded here.
+        """
+        if self._sets is None:
+            return []
+        text = json.dumps(self._sets, indent=2, ensure_ascii=False)
+        if _digest(text) == self._hash:
+            return []
+        with self.locked():
+            on_disk = self._read_file()
+            if (_digest(on_disk) if on_disk is not None else None) != self._file_hash:
+                raise RuntimeError(f"{self.path.name} was changed by another writer since it was loaded; reload and retry")
+            write_text_atomic(self.path, text)
+        self._hash = self._file_hash = _digest(text)
+        return [self.path.name]
+
+
+def open_curriculum(path=None, root=STORE_DIR):
+    """
+    The sharded store when it has been split, otherwise curriculum.json.
+    An explicit `path` always means that single JSON file.
+    """
+    if path is not None:
+        return JsonCurriculum(path)
+    if (Path(root) / MANIFEST_NAME).exists():
+        return CurriculumStore(root)
+    return JsonCurriculum(CURRICULUM_FILE)
+
+
+def iter_json_array(path, chunk_size=CHUNK_SIZE, with_text=False):
+    """
+    Yield the items of a top-level JSON array one at a time, reading the
+    file in chunks; with_text yields (item, its source text) instead
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        buf, pos, eof, started = '', 0, False, False
+        while True:
+            pos = _SEPARATORS.match(buf, pos).end()
+            if pos < len(buf):
+                if not started:
+                    if buf[pos] != '[':
+                        raise ValueError(f"{path} is not a JSON array")
+                    started = True
+                    pos += 1
+                    continue
+                if buf[pos] == ']':
+                    return
+                try:
+                    item, end = _decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                else:
+                    # A value ending exactly at the buffer edge may continue in the next chunk
+                    if end < len(buf) or eof:
+                        yield (item, buf[pos:end]) if with_text else item
+                        pos = end
+                        continue
+            elif eof:
+                if started:
+                    raise ValueError(f"{path}: unexpected end of JSON array")
+                return  # Empty file, e.g. git's base for a file added on both branches
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buf = buf[pos:] + chunk
+            pos = 0
+
+
+def _store_sets(root, grades=None):
+    store = CurriculumStore(root)
+    for name in store.shard_names(grades):
+        # Read directly rather than through shard(), which caches every shard
+        with open(store.root / name, 'r', encoding='utf-8') as f:
+            yield from json.load(f)
+
+
+def _pack_sets(path):
+    from curriculum_pack import PackedCurriculum
+    with PackedCurriculum(path) as pack:
+        for i in range(len(pack)):
+            yield pack[i]
+
+
+def iter_sets(path, grades=None):
+    """
+    Stream the sets of a curriculum JSON file, store directory or .cpk pack
+    (None is empty), one set or shard at a time; only `grades`, when given
+    """
+    if path is None:
+        return iter(())
+    path = Path(path)
+    if path.is_dir():
+        if not (path / MANIFEST_NAME).exists():
+            raise FileNotFoundError(f"{path} has no {MANIFEST_NAME}")
+        return _store_sets(path, grades)
+    sets = _pack_sets(path) if path.suffix == '.cpk' else iter_json_array(path)
+    if grades is None:
+        return sets
+    return (s for s in sets if s.get('grade_level') in grades)
+
+
+def write_sets(path, sets):
+    """
+    Stream sets into a JSON file laid out exactly like json.dumps(sets,
+    indent=2); items that are strings are already-encoded sets copied as
+    they are. Returns the set count.
+    """
+    count = 0
+    with atomic_writer(path) as f:
+        for curriculum_set in sets:
+            f.write(',\n  ' if count else '[\n  ')
+            if isinstance(curriculum_set, str):
+                f.write(curriculum_set)
+            else:
+                f.write(json.dumps(curriculum_set, indent=2, ensure_ascii=False).replace('\n', '\n  '))
+            count += 1
+        f.write('\n]' if count else '[]')
+    return count
+
+
+def split(source=CURRICULUM_FILE, root=STORE_DIR):
+    """Create the store from a single curriculum file; returns (sets, shards)"""
+    with open(source, 'r', encoding='utf-8') as f:
+        curriculum = json.load(f)
+    # The source is the single file; don't rewrite it in shard order
+    store = CurriculumStore(root, export_to=False)
+    for curriculum_set in curriculum:
+        store.add(curriculum_set)
+    return len(curriculum), len(store.save())
+
+
+def _canonical(sets):
+    return sorted(json.dumps(s, sort_keys=True, ensure_ascii=False) for s in sets)
+
+
+def verify(root=STORE_DIR, against=None):
+    """Problems found checking shard hashes and counts (and contents against a JSON file)"""
+    store = CurriculumStore(root)
+    problems = []
+    for name, entry in store.manifest['shards'].items():
+        path = store.root / name
+        if not path.exists():
+            problems.append(f"{name}: missing")
+            continue
+        text = path.read_text(encoding='utf-8')
+        if _digest(text) != entry['sha256']:
+            problems.append(f"{name}: sha256 does not match the manifest")
+        sets = json.loads(text)
+        if len(sets) != entry['sets'] or [s.get('id') for s in sets] != entry['ids']:
+            problems.append(f"{name}: sets do not match the manifest")
+        misplaced = sum(1 for s in sets if shard_name(s) != name)
+        if misplaced:
+            problems.append(f"{name}: {misplaced} sets belong in another shard")
+    listed = set(store.manifest['shards'])
+    for path in store.root.glob('grade-*/*.json'):
+        if str(path.relative_to(store.root)) not in listed:
+            problems.append(f"{path.relative_to(store.root)}: not in the manifest")
+    if against is not None:
+        with open(against, 'r', encoding='utf-8') as f:
+            expected = json.load(f)
+        if _canonical(expected) != _canonical(store.sets()):
+            problems.append(f"contents differ from {against}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Split, inspect, verify or export the sharded curriculum')
+    parser.add_argument('command', choices=['split', 'status', 'verify', 'export'])
+    parser.add_argument('--root', default=str(STORE_DIR), help='Store directory')
+    parser.add_argument('--from', dest='source', default=str(CURRICULUM_FILE), help='split: source curriculum file')
+    parser.add_argument('--against', help='verify: also compare contents with this curriculum file')
+    parser.add_argument('--out', default=str(CURRICULUM_FILE), help='export: output file')
+    parser.add_argument('--force', action='store_true', help='split: replace an existing store')
+    args = parser.parse_args()
+    root = Path(args.root)
+
+    if args.command == 'split':
+        if (root / MANIFEST_NAME).exists() and not args.force:
+            print(f"❌ {root} already has a manifest (use --force to re-split)")
+            return 1
+        if args.force:
+            for path in root.glob('grade-*/*.json'):
+                path.unlink()
+            (root / MANIFEST_NAME).unlink(missing_ok=True)
+        sets, shards = split(args.source, root)
+        print(f"✅ Split {sets} sets into {shards} shards under {root}")
+        return 0
+
+    if not (root / MANIFEST_NAME).exists():
+        print(f"❌ No manifest in {root}; run `split` first")
+        return 1
+    store = CurriculumStore(root)
+
+    if args.command == 'status':
+        manifest = store.manifest
+        print(f"📚 {manifest['sets']} sets, {manifest['questions']} questions in "
+              f"{len(manifest['shards'])} shards (updated {manifest.get('updated', '?')})")
+        for grade, (sets, questions) in store.counts().items():
+            shards = len(store.shard_names([grade]))
+            print(f"   Grade {'K' if grade == 0 else grade}: {sets} sets, {questions} questions, {shards} shards")
+        return 0
+
+    if args.command == 'verify':
+        problems = verify(root, args.against)
+        for problem in problems:
+            print(f"❌ {problem}")
+        if not problems:
+            print(f"✅ {len(store.manifest['shards'])} shards match the manifest")
+        return 1 if problems else 0
+
+    count = store.export_json(args.out)
+    print(f"💾 Exported {count} sets to {args.out}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -1,8 +1,10 @@
-import json
 import re
 
-CURRICULUM_FILE = 'src/data/curriculum.json'
-REPORT_FILE = 'audit-report.json'
+from audit_log import AuditLog
+from curriculum_db import CurriculumDB
+from curriculum_store import open_curriculum
+
+AUDIT_LOG = 'answers'  # Written by scripts/audit-curriculum.py
 LOG_FILE = 'fix_log.txt'
 
 def normalize(text):
@@ -11,19 +13,18 @@ def normalize(text):
 
 def main():
     print("Loading files...")
-    with open(CURRICULUM_FILE, 'r') as f:
-        curriculum = json.load(f)
+    # Sets are looked up by id, so only shards named in the report are loaded
+    curriculum = open_curriculum()
+    db = CurriculumDB()
+    db.sync(curriculum)
     
-    with open(REPORT_FILE, 'r') as f:
-        report = json.load(f)
-
-    # Index curriculum by set_id, handling duplicates
-    curr_map = {}
-    for item in curriculum:
-        sid = item.get('id')
-        if sid not in curr_map:
-            curr_map[sid] = []
-        curr_map[sid].append(item)
+    audit = AuditLog(AUDIT_LOG)
+    if not audit.exists():
+        print(f"{audit.path} not found; run scripts/audit-curriculum.py "
+              f"or `python scripts/audit_log.py import` for an old audit-report.json")
+        return
+    # A delta re-audit supersedes earlier findings for the questions it checked again
+    report = list(audit.current(type='wrong_answer'))
     
     fixes = []
     skipped = 0
@@ -48,51 +49,33 @@ def main():
 
         set_id = item.get('set_id')
         set_title = item.get('set_title')
-        q_text = item.get('question_text')
-        
-        if set_id not in curr_map:
-            print(f"Set ID {set_id} not found.")
+        q_text = item.get('question')
+        
+        # A question uid pins the question even if it moved; otherwise an
+        # indexed lookup by normalized question hash within the set id, then
+        # full-text ranking; the set title breaks ties between duplicate ids
+        uid = item.get('question_uid')
+        match = db.find_uid(uid) if uid else None
+        matches = [match] if match else db.find_question(set_id, q_text, set_title)
+        if not matches:
+            if not curriculum.find(set_id):
+                print(f"Set ID {set_id} not found.")
+            else:
+                print(f"Question not found in set {set_id}: {q_text}")
             continue
-            
-        # Find the correct set among duplicates using title
-        candidates = curr_map[set_id]
-        curriculum_set = None
+        match = matches[0]
         
-        if len(candidates) == 1:
-            curriculum_set = candidates[0]
-        else:
-            # Try to match title
-            for c in candidates:
-                if c.get('title') == set_title:
-                    curriculum_set = c
-                    break
-            # Fallback if title mismatch (audit title might be slightly diff?)
-            if not curriculum_set and candidates:
-                # Search all candidates for the question
-                for c in candidates:
-                     for q in c.get('questions', []):
-                         if q_text in q['question'] or q['question'] in q_text:
-                             curriculum_set = c
-                             break
-                             
-        if not curriculum_set:
-             print(f"Could not disambiguate set {set_id} with title '{set_title}'")
-             continue
-        
-        # Find the specific question
+        curriculum_set = None
         target_q = None
-        for q in curriculum_set['questions']:
-            if q['question'] == q_text:
-                target_q = q
+        candidates = curriculum.find(match['id'])
+        for c in sorted(candidates, key=lambda c: c.get('title') != match['title']):
+            # Matched by uid or indexed text, so earlier deletions don't shift anything
+            target_q = next((q for q in c.get('questions', [])
+                             if (q.get('uid') == uid if uid else q.get('question') == match['question'])), None)
+            if target_q:
+                curriculum_set = c
                 break
         
-        if not target_q:
-            # Try fuzzy match
-            for q in curriculum_set['questions']:
-                if q_text in q['question'] or q['question'] in q_text:
-                    target_q = q
-                    break
-        
         if not target_q:
             print(f"Question not found in set {set_id}: {q_text}")
             continue
@@ -171,9 +154,8 @@ def main():
         f.write(f"Fixed {fixed_count} questions. Deleted {deleted_count} questions. Skipped {skipped} false positives.\n\n")
         f.write("\n".join(fixes))
         
-    # Save Curriculum
-    with open(CURRICULUM_FILE, 'w') as f:
-        json.dump(curriculum, f, indent=4)
+    # Save Curriculum (only the shards that changed)
+    curriculum.save()
 
     print(f"Done. Fixed {fixed_count}, Deleted {deleted_count}. Log saved to {LOG_FILE}.")
 
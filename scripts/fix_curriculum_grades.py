@@ -3,15 +3,18 @@
 Fix curriculum grade levels by analyzing topics
 """
 
-import json
-from pathlib import Path
+import argparse
 
-# Load curriculum
-PROJECT_ROOT = Path(__file__).parent.parent
-CURRICULUM_FILE = PROJECT_ROOT / 'src' / 'data' / 'curriculum.json'
+from curriculum_store import open_curriculum
+from lesson_plan import parse_grades
 
-with open(CURRICULUM_FILE, 'r') as f:
-    curriculum = json.load(f)
+parser = argparse.ArgumentParser(description='Re-infer grade levels from set ids and topics')
+parser.add_argument('--grades', help='Only re-check sets currently in these grades, e.g. 3-5')
+args = parser.parse_args()
+
+# Load curriculum (only the requested grades' shards once it is split)
+curriculum = open_curriculum()
+grades = parse_grades(args.grades)
 
 print(f"Total sets: {len(curriculum)}")
 
@@ -57,7 +60,7 @@ def infer_grade(curriculum_set):
 fixed_count = 0
 grade_distribution = {i: 0 for i in range(7)}
 
-for curriculum_set in curriculum:
+for curriculum_set in curriculum.sets(grades):
     old_grade = curriculum_set.get('grade_level', 0)
     new_grade = infer_grade(curriculum_set)
     
@@ -66,7 +69,7 @@ for curriculum_set in curriculum:
         fixed_count += 1
         print(f"Fixed: {curriculum_set.get('id')} from Grade {old_grade} to Grade {new_grade}")
     
-    grade_distribution[new_grade] += 1
+    grade_distribution[new_grade] = grade_distribution.get(new_grade, 0) + 1
 
 print(f"\n✅ Fixed {fixed_count} curriculum sets")
 print(f"\nNew distribution:")
@@ -74,8 +77,6 @@ for grade, count in sorted(grade_distribution.items()):
     if count > 0:
         print(f"  Grade {grade}: {count} sets")
 
-# Save fixed curriculum
-with open(CURRICULUM_FILE, 'w') as f:
-    json.dump(curriculum, f, indent=2)
-
-print(f"\n✅ Saved to {CURRICULUM_FILE}")
+# Save fixed curriculum; moved sets change shard, untouched shards are not rewritten
+written = curriculum.save()
+print(f"\n✅ Saved {len(written)} changed file(s): {', '.join(written) or 'none'}")
@@ -1,15 +1,25 @@
 #!/usr/bin/env python3
 """
-Generate 200 curriculum sets for Grades 7-9 using Gemini API
+Generate the Grades 7-9 sets still missing from data/lesson_plan.json using Gemini API
 Robust version with proper file handling, rate limiting, and progress tracking
+Requests run concurrently through the async generation engine
 """
 
 import os
-import json
 import time
 from datetime import datetime
 from pathlib import Path
 
+from curriculum_journal import Journal, compact
+from curriculum_store import open_curriculum
+from generation_engine import GenerationEngine, estimate_duration
+from lesson_plan import compile_jobs
+from llm_metrics import get_metrics, note_response
+from progress_events import get_events
+from prompt_packer import ILLUSTRATED_SET_EXAMPLE, output_limit, pack, run_batch_async
+from rate_limiter import get_limiter
+from work_ledger import WorkLedger, import_progress
+
 try:
     from google import generativeai as genai
 except ImportError:
@@ -24,20 +34,31 @@ if not GEMINI_API_KEY:
     exit(1)
 
 genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel('gemini-2.0-flash-exp')
+MODEL_NAME = 'gemini-2.0-flash-exp'
+model = genai.GenerativeModel(MODEL_NAME)
 
 # Paths
 PROJECT_ROOT = Path(__file__).parent.parent
-CURRICULUM_FILE = PROJECT_ROOT / 'src' / 'data' / 'curriculum.json'
-PROGRESS_FILE = PROJECT_ROOT / 'progress_gemini.json'
+PROGRESS_FILE = PROJECT_ROOT / 'progress_gemini.json'  # Legacy, imported into the ledger once
 LOG_FILE = PROJECT_ROOT / 'generation_200_gemini.log'
 IMAGES_DIR = PROJECT_ROOT / 'public' / 'curriculum-images'
 
 IMAGES_DIR.mkdir(parents=True, exist_ok=True)
 
-# Rate limiting: Gemini free tier = 15 RPM
-# 15 requests per minute = 1 request per 4 seconds
-RATE_LIMIT_DELAY = 4.0
+# Rate limiting: Gemini free tier = 15 RPM / 1M TPM
+# The engine enforces the budget; the adaptive limiter grows the number of
+# requests in flight up to CONCURRENCY and backs off on 429s
+REQUESTS_PER_MINUTE = 15
+TOKENS_PER_MINUTE = 1_000_000
+CONCURRENCY = 8
+# Several sets are packed into each request, up to the model's output limit
+MAX_OUTPUT_TOKENS = output_limit(MODEL_NAME)
+TOKENS_PER_REQUEST = MAX_OUTPUT_TOKENS + 800  # prompt + max_output_tokens, settled after each call
+# Each request is one engine job; sets it leaves short are queued again, up to this many requests
+MAX_ROUNDS = 3
+
+RUN_NAME = 'generate_200_lessons_gemini'
+SKIPPED = object()  # Worker result when other processes hold every lease in a batch
 
 def log(message):
     """Log to console and file"""
@@ -47,121 +68,61 @@ def log(message):
     with open(LOG_FILE, 'a') as f:
         f.write(log_message + '\n')
 
-def save_progress(completed_lessons):
-    """Save progress to resume later"""
-    with open(PROGRESS_FILE, 'w') as f:
-        json.dump({
-            'completed': completed_lessons,
-            'timestamp': datetime.now().isoformat()
-        }, f, indent=2)
-
-def load_progress():
-    """Load progress from previous run"""
-    if PROGRESS_FILE.exists():
-        with open(PROGRESS_FILE, 'r') as f:
-            data = json.load(f)
-            return set(data.get('completed', []))
-    return set()
-
-def generate_curriculum_set(grade, topic, subtopic, set_number):
-    """Generate a curriculum set using Gemini"""
-    try:
-        illustration_guidance = ""
-        if topic in ['Geometry', 'Graphing', 'Coordinate Plane', 'Functions', 'Algebra', 'Trigonometry']:
-            illustration_guidance = """
-For visual problems, include an "illustration" field with description.
-Format: "illustration": "Description of diagram/graph"
-"""
-        
-        prompt = f"""Generate a math curriculum set for Grade {grade}.
-
-Topic: {topic}
-Subtopic: {subtopic}
-
-Create 8-10 multiple choice questions appropriate for Grade {grade}.
+# Sent once per packed request, however many sets it asks for
+INSTRUCTIONS = """Create multiple choice questions appropriate for the set's grade.
 Each question should have 4 options.
-{illustration_guidance}
 
-Return ONLY valid JSON (no markdown) in this exact format:
-{{
-  "id": "{grade}-{topic.lower().replace(' ', '-')}-{subtopic.lower().replace(' ', '-')}-{set_number}",
-  "title": "{subtopic} - Set {set_number}",
-  "description": "Practice {subtopic.lower()} for Grade {grade}",
-  "grade_level": {grade},
-  "topic": "{topic}",
-  "questions": [
-    {{
-      "question": "Question text",
-      "options": ["Option A", "Option B", "Option C", "Option D"],
-      "answer": "Option A",
-      "explanation": "Why this is correct",
-      "illustration": "Optional: Description if needed"
-    }}
-  ]
-}}
+For visual problems (geometry, graphing, functions, trigonometry), include an "illustration" field with description.
+Format: "illustration": "Description of diagram/graph"
 
 Make questions progressively harder. Use real-world contexts.
 For algebra, show work steps. For geometry, include diagrams where helpful."""
 
-        response = model.generate_content(
-            prompt,
-            generation_config=genai.types.GenerationConfig(
-                temperature=0.7,
-                max_output_tokens=4096,
+async def generate_batch(lessons, budget=None, partial=None, final=True):
+    """
+    Generate several curriculum sets in one packed Gemini request; returns
+    [(lesson, set or None)]. Short sets wait in `partial` for the next
+    request unless this is the `final` round.
+    """
+    async def complete(prompt, max_tokens):
+        with get_metrics().call('gemini', MODEL_NAME, prompt) as call:
+            response = await model.generate_content_async(
+                prompt,
+                generation_config=genai.types.GenerationConfig(
+                    temperature=0.7,
+                    max_output_tokens=max_tokens,
+                )
             )
-        )
-        
-        response_text = response.text.strip()
-        
-        # Clean markdown
-        if '```json' in response_text:
-            response_text = response_text.split('```json')[1].split('```')[0].strip()
-        elif '```' in response_text:
-            response_text = response_text.split('```')[1].split('```')[0].strip()
+            note_response(response)
+            call.text = response.text
         
-        curriculum_set = json.loads(response_text)
-        curriculum_set['grade_level'] = grade
+        usage = getattr(response, 'usage_metadata', None)
+        if budget and usage:
+            budget.settle(TOKENS_PER_REQUEST, usage.total_token_count)
         
-        # Process illustrations
+        return call.text
+    
+    # One request per call: the engine reserved its quota and limiter slot
+    results = await run_batch_async(lessons, complete, INSTRUCTIONS, MAX_OUTPUT_TOKENS,
+                                    example=ILLUSTRATED_SET_EXAMPLE, max_rounds=1, log=log,
+                                    partial=partial, take_short=final)
+    
+    # Process illustrations
+    for lesson, curriculum_set in results:
+        if not curriculum_set:
+            continue
         for i, question in enumerate(curriculum_set.get('questions', [])):
             if 'illustration' in question and question['illustration']:
-                img_filename = f"grade{grade}-{topic.lower().replace(' ', '-')}-set{set_number}-q{i+1}.png"
+                img_filename = f"grade{lesson['grade']}-{lesson['topic'].lower().replace(' ', '-')}-set{lesson['set_num']}-q{i+1}.png"
                 question['image'] = f"/curriculum-images/{img_filename}"
                 question['illustration_description'] = question.pop('illustration')
-        
-        return curriculum_set
-        
-    except Exception as e:
-        log(f"❌ Error: {e}")
-        return None
-
-# 200 lessons across Grades 7-9
-# Structured for comprehensive coverage
-LESSON_PLAN = [
-    # ===== GRADE 7 (70 lessons) =====
-    {'grade': 7, 'topic': 'Pre-Algebra', 'subtopics': ['Variables and Expressions', 'Solving Equations', 'Order of Operations', 'Distributive Property', 'Combining Like Terms'], 'sets_per': 4},
-    {'grade': 7, 'topic': 'Ratios and Proportions', 'subtopics': ['Unit Rates', 'Proportional Relationships', 'Scale Drawings', 'Percent Problems'], 'sets_per': 4},
-    {'grade': 7, 'topic': 'Geometry Basics', 'subtopics': ['Angles', 'Triangles', 'Quadrilaterals', 'Area and Perimeter'], 'sets_per': 4},
-    {'grade': 7, 'topic': 'Statistics', 'subtopics': ['Mean, Median, Mode', 'Data Displays', 'Probability'], 'sets_per': 3},
-    {'grade': 7, 'topic': 'Number Theory', 'subtopics': ['Divisibility', 'GCF and LCM', 'Prime Factorization'], 'sets_per': 3},
-    {'grade': 7, 'topic': 'Rational Numbers', 'subtopics': ['Fractions', 'Decimals', 'Negative Numbers'], 'sets_per': 2},
-    
-    # ===== GRADE 8 (65 lessons) =====
-    {'grade': 8, 'topic': 'Algebra I', 'subtopics': ['Linear Equations', 'Systems of Equations', 'Slope', 'Graphing Lines', 'Inequalities'], 'sets_per': 4},
-    {'grade': 8, 'topic': 'Functions', 'subtopics': ['Function Notation', 'Linear Functions', 'Comparing Functions'], 'sets_per': 5},
-    {'grade': 8, 'topic': 'Geometry', 'subtopics': ['Pythagorean Theorem', 'Volume', 'Transformations', 'Congruence'], 'sets_per': 4},
-    {'grade': 8, 'topic': 'Exponents', 'subtopics': ['Laws of Exponents', 'Scientific Notation', 'Square Roots'], 'sets_per': 3},
-    {'grade': 8, 'topic': 'Data Analysis', 'subtopics': ['Scatter Plots', 'Two-Way Tables', 'Outliers'], 'sets_per': 3},
     
-    # ===== GRADE 9 (65 lessons) =====
-    {'grade': 9, 'topic': 'Algebra II', 'subtopics': ['Polynomials', 'Factoring', 'Rational Expressions', 'Radical Equations', 'Complex Numbers'], 'sets_per': 4},
-    {'grade': 9, 'topic': 'Quadratic Functions', 'subtopics': ['Graphing Parabolas', 'Quadratic Formula', 'Completing the Square', 'Applications'], 'sets_per': 4},
-    {'grade': 9, 'topic': 'Exponential Functions', 'subtopics': ['Growth and Decay', 'Logarithms', 'Applications'], 'sets_per': 3},
-    {'grade': 9, 'topic': 'Trigonometry', 'subtopics': ['Right Triangle Trig', 'Unit Circle', 'Trig Identities'], 'sets_per': 3},
-    {'grade': 9, 'topic': 'Advanced Geometry', 'subtopics': ['Circles', 'Similarity', 'Coordinate Geometry'], 'sets_per': 3},
-]
+    return results
+
+# Topics and target set counts live in data/lesson_plan.json
+GRADES = [7, 8, 9]
 
-def main(limit=None):
+def main(limit=None, concurrency=CONCURRENCY, rpm=REQUESTS_PER_MINUTE, tpm=TOKENS_PER_MINUTE):
     """Generate 200 curriculum sets for Grades 7-9"""
     log("=" * 60)
     log("🚀 Generating 200 Curriculum Sets (Grades 7-9)")
@@ -169,44 +130,32 @@ def main(limit=None):
         log(f"⚠️  TEST MODE: Limited to {limit} sets")
     log("=" * 60)
     
-    # Load existing curriculum ONCE
-    if CURRICULUM_FILE.exists():
-        with open(CURRICULUM_FILE, 'r') as f:
-            curriculum = json.load(f)
-    else:
-        curriculum = []
+    # Load existing curriculum ONCE (the sharded store once it has been split)
+    curriculum = list(open_curriculum().sets())
     
     initial_count = len(curriculum)
     log(f"📚 Loaded {initial_count} existing sets")
     
-    # Load progress
-    completed = load_progress()
-    if completed:
-        log(f"📋 Resuming: {len(completed)} lessons already completed")
+    # Only subtopics the curriculum hasn't saturated yet; finished lessons are skipped on restart
+    lesson_plan = compile_jobs(GRADES, curriculum)
+    log(f"📐 Lesson plan: {len(lesson_plan)} sets still needed for Grades 7-9")
     
-    # Build lesson queue
-    lesson_queue = []
-    for topic_data in LESSON_PLAN:
-        grade = topic_data['grade']
-        topic = topic_data['topic']
-        subtopics = topic_data['subtopics']
-        sets_per = topic_data['sets_per']
-        
-        for subtopic in subtopics:
-            for set_num in range(1, sets_per + 1):
-                lesson_id = f"{grade}-{topic}-{subtopic}-{set_num}"
-                if lesson_id not in completed:
-                    lesson_queue.append({
-                        'id': lesson_id,
-                        'grade': grade,
-                        'topic': topic,
-                        'subtopic': subtopic,
-                        'set_num': set_num
-                    })
+    ledger = WorkLedger(RUN_NAME)
+    # Pending lessons from earlier runs that the curriculum now covers are retired
+    ledger.plan(lesson_plan, retire=True)
+    imported = import_progress(ledger, PROGRESS_FILE)
+    if imported:
+        log(f"📋 Imported {imported} completed lessons from {PROGRESS_FILE.name}")
+    
+    counts = ledger.counts().get(RUN_NAME, {})
+    if counts.get('done'):
+        log(f"📋 Resuming: {counts['done']} lessons already completed, {counts.get('failed', 0)} failed")
     
+    lesson_queue = ledger.pending()
+    if limit:
+        lesson_queue = lesson_queue[:limit]
     total_lessons = len(lesson_queue)
-    if limit and limit < total_lessons:
-        total_lessons = limit
+    get_events().run_started(total_lessons)
         
     log(f"📝 {total_lessons} lessons to generate")
     
@@ -214,50 +163,86 @@ def main(limit=None):
         log("✅ All lessons already completed!")
         return
     
+    batches = pack(lesson_queue, MAX_OUTPUT_TOKENS)
+    log(f"📦 Packed into {len(batches)} requests")
+    
     # Estimate time
-    estimated_minutes = (total_lessons * RATE_LIMIT_DELAY) / 60
+    estimated_minutes = estimate_duration(len(batches), concurrency, rpm) / 60
     log(f"⏱️  Estimated time: {estimated_minutes:.1f} minutes")
-    log(f"🔄 Rate limit: {RATE_LIMIT_DELAY}s per request (15 RPM)")
+    log(f"🔄 Rate limit: {rpm} RPM, {tpm} TPM, up to {concurrency} requests in flight")
     log("")
     
-    # Generate lessons
-    generated_count = 0
-    save_interval = 10
+    # Generate lessons; each finished set is appended to the journal
+    journal = Journal('generate_200_lessons_gemini')
+    state = {'generated': 0, 'finished': 0}
+    rounds = {}  # lesson id -> requests made for it so far
+    partial = {}  # lesson id -> short set kept for its next request
     
-    for i, lesson in enumerate(lesson_queue, 1):
-        if limit and generated_count >= limit:
-            log(f"🛑 Reached limit of {limit} sets")
-            break
-            
-        log(f"[{i}/{total_lessons}] Grade {lesson['grade']} - {lesson['topic']} - {lesson['subtopic']} - Set {lesson['set_num']}")
+    async def worker(batch):
+        # Claim before paying for the request; retries renew our own leases
+        claimed = [lesson for lesson in batch if ledger.claim(lesson['id']) or ledger.renew(lesson['id'])]
+        if not claimed:
+            return SKIPPED
+        final = rounds.get(claimed[0]['id'], 1) >= MAX_ROUNDS
+        return await generate_batch(claimed, budget=engine.budget, partial=partial, final=final)
+    
+    def on_result(batch, results):
+        if results is SKIPPED:
+            state['finished'] += len(batch)
+            log(f"[{state['finished']}/{total_lessons}] ⏭️  {len(batch)} lessons leased by another worker")
+            return
         
-        curriculum_set = generate_curriculum_set(
-            lesson['grade'],
-            lesson['topic'],
-            lesson['subtopic'],
-            lesson['set_num']
-        )
+        # None: the request itself kept failing; sets a response left short get another request
+        retry = []
+        if results is None:
+            results = [(lesson, None) for lesson in batch]
+        else:
+            retry = [lesson for lesson, curriculum_set in results
+                     if curriculum_set is None and rounds.get(lesson['id'], 1) < MAX_ROUNDS]
+        if retry:
+            for lesson in retry:
+                rounds[lesson['id']] = rounds.get(lesson['id'], 1) + 1
+            log(f"🔁 {len(results) - len(retry)} accepted, queued {len(retry)} sets for another request")
+            engine.submit(retry)
         
-        if curriculum_set:
-            curriculum.append(curriculum_set)
-            completed.add(lesson['id'])
-            generated_count += 1
+        for lesson, curriculum_set in results:
+            if lesson in retry:
+                continue
+            state['finished'] += 1
+            status = "✅" if curriculum_set else "❌"
+            log(f"[{state['finished']}/{total_lessons}] {status} Grade {lesson['grade']} - {lesson['topic']} - {lesson['subtopic']} - Set {lesson['set_num']}")
             
-            # Save progress every 10 lessons
-            if generated_count % save_interval == 0:
-                with open(CURRICULUM_FILE, 'w') as f:
-                    json.dump(curriculum, f, indent=2)
-                save_progress(list(completed))
-                log(f"💾 Saved progress: {len(curriculum)} total sets ({generated_count} new)")
-        
-        # Rate limiting
-        if i < total_lessons:  # Don't sleep after last request
-            time.sleep(RATE_LIMIT_DELAY)
+            if not curriculum_set:
+                ledger.fail(lesson['id'], 'no valid set after retries')
+                continue
+            
+            curriculum.append(curriculum_set)
+            journal.append(curriculum_set)
+            ledger.complete(lesson['id'], f"{journal.path.name}#{curriculum_set['id']}")
+            state['generated'] += 1
+    
+    engine = GenerationEngine(
+        worker,
+        concurrency=concurrency,
+        rpm=rpm,
+        tpm=tpm,
+        tokens_per_request=TOKENS_PER_REQUEST,
+        limiter=get_limiter('gemini', MODEL_NAME, maximum=concurrency),
+    )
+    
+    try:
+        engine.run_sync(batches, on_result)
+    except KeyboardInterrupt:
+        log("\n👋 Stopped by user")
+    finally:
+        journal.close()
+        ledger.release_all()
+    
+    generated_count = state['generated']
     
-    # Final save
-    with open(CURRICULUM_FILE, 'w') as f:
-        json.dump(curriculum, f, indent=2)
-    save_progress(list(completed))
+    # Fold this run's journal into the curriculum in one atomic write
+    added, _ = compact(journals=[journal.path])
+    log(f"💾 Compacted {added} journaled sets into the curriculum")
     
     log("")
     log("=" * 60)
@@ -279,6 +264,9 @@ if __name__ == '__main__':
     import argparse
     parser = argparse.ArgumentParser()
     parser.add_argument('--limit', type=int, help='Limit number of sets to generate (for testing)')
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY, help='Requests kept in flight')
+    parser.add_argument('--rpm', type=int, default=REQUESTS_PER_MINUTE, help='Requests-per-minute budget')
+    parser.add_argument('--tpm', type=int, default=TOKENS_PER_MINUTE, help='Tokens-per-minute budget')
     args = parser.parse_args()
     
-    main(limit=args.limit)
+    main(limit=args.limit, concurrency=args.concurrency, rpm=args.rpm, tpm=args.tpm)
@@ -2,15 +2,24 @@
 """
 Automated Content Generation for Abacus Learn
 Generates curriculum sets and learning paths using Claude API
+Planned sets live in the work ledger, so an interrupted run resumes where it stopped
 """
 
 import os
-import json
-import time
 import subprocess
 from datetime import datetime
 from pathlib import Path
 
+from curriculum_journal import Journal, compact
+from curriculum_store import open_curriculum
+from json_salvage import parse_set
+from lesson_plan import compile_jobs
+from llm_metrics import get_metrics
+from progress_events import get_events
+from question_validator import describe_rejections, filter_set, request_count
+from rate_limiter import call_with_limiter, get_limiter
+from work_ledger import WorkLedger
+
 # Import Anthropic (Claude)
 try:
     from anthropic import Anthropic
@@ -28,21 +37,19 @@ if not CLAUDE_API_KEY:
 
 # Initialize Claude client
 client = Anthropic(api_key=CLAUDE_API_KEY)
+MODEL = "claude-3-5-sonnet-20241022"
+QUESTIONS_PER_SET = 10
+MIN_QUESTIONS = 5
+limiter = get_limiter('claude', MODEL)
 
 # Paths
 PROJECT_ROOT = Path(__file__).parent.parent
-CURRICULUM_FILE = PROJECT_ROOT / 'src' / 'data' / 'curriculum.json'
 PATHS_MD_FILE = PROJECT_ROOT / 'data' / 'learning_paths.md'
 LOG_FILE = PROJECT_ROOT / 'generation_log.txt'
+RUN_NAME = 'generate_all_content'
 
-# Progress tracking
-progress = {
-    'curriculum_sets_generated': 0,
-    'learning_paths_generated': 0,
-    'errors': [],
-    'start_time': None,
-    'end_time': None
-}
+# Errors from this run (job states persist in the work ledger)
+errors = []
 
 def log(message):
     """Log to both console and file"""
@@ -52,17 +59,9 @@ def log(message):
     with open(LOG_FILE, 'a') as f:
         f.write(log_message + '\n')
 
-def save_progress():
-    """Save progress to checkpoint file"""
-    with open(PROJECT_ROOT / 'generation_progress.json', 'w') as f:
-        json.dump(progress, f, indent=2)
-
 def load_existing_curriculum():
-    """Load existing curriculum to avoid duplicates"""
-    if CURRICULUM_FILE.exists():
-        with open(CURRICULUM_FILE, 'r') as f:
-            return json.load(f)
-    return []
+    """Load existing curriculum to avoid duplicates (the sharded store once it has been split)"""
+    return list(open_curriculum().sets())
 
 def generate_curriculum_set(grade, topic, subtopic, set_number):
     """Generate a single curriculum set using Claude"""
@@ -73,10 +72,10 @@ Topic: {topic}
 Subtopic: {subtopic}
 Set Number: {set_number}
 
-Create 12 multiple choice questions with 4 options each.
+Create {request_count(QUESTIONS_PER_SET)} multiple choice questions with 4 options each.
 Format as JSON with this structure:
 {{
-  "id": "{grade}-{topic.lower().replace(' ', '-')}-{set_number}",
+  "id": "{grade}-{topic.lower().replace(' ', '-')}-{subtopic.lower().replace(' ', '-')}-{set_number}",
   "title": "{subtopic} - Set {set_number}",
   "description": "Practice {subtopic.lower()}",
   "grade_level": {grade},
@@ -93,73 +92,53 @@ Format as JSON with this structure:
 
 Make questions progressively harder. Include variety. Return ONLY the JSON, no markdown formatting."""
 
-        # Call Claude API
-        message = client.messages.create(
-            model="claude-3-5-sonnet-20241022",
-            max_tokens=4096,
-            messages=[
-                {"role": "user", "content": prompt}
-            ]
-        )
-        
-        # Extract text from Claude response
-        response_text = message.content[0].text.strip()
-        
-        # Clean up markdown formatting if present
-        if response_text.startswith('```json'):
-            response_text = response_text.split('```json')[1].split('```')[0].strip()
-        elif response_text.startswith('```'):
-            response_text = response_text.split('```')[1].split('```')[0].strip()
-        
-        # Parse JSON
-        curriculum_set = json.loads(response_text)
+        # Call Claude API (tokens and latency go to the metrics store)
+        metrics = get_metrics()
+        with metrics.call('claude', MODEL, prompt, grade) as call:
+            message = call_with_limiter(
+                limiter,
+                client.messages.create,
+                model=MODEL,
+                max_tokens=4096,
+                messages=[
+                    {"role": "user", "content": prompt}
+                ]
+            )
+            
+            # Extract text from Claude response
+            response_text = call.text = message.content[0].text.strip()
         
+        # Parse JSON (tolerates code fences, trailing commas and a truncated tail)
+        try:
+            curriculum_set = parse_set(response_text)
+        except ValueError:
+            metrics.record_yield(1, 0, 0)
+            raise
         # Ensure grade_level is correct (Claude sometimes changes it)
         curriculum_set['grade_level'] = grade
         
+        # Over-generated: keep the best QUESTIONS_PER_SET that pass the local checks
+        rejected = filter_set(curriculum_set, grade, keep=QUESTIONS_PER_SET)
+        if len(curriculum_set['questions']) < MIN_QUESTIONS:
+            metrics.record_yield(1, 0, 0)
+            log(f"❌ Only {len(curriculum_set['questions'])} usable questions for {grade}-{topic} {describe_rejections(rejected)}")
+            errors.append(f"Validation: {grade}-{topic}-{subtopic}-{set_number}")
+            return None
+        metrics.record_yield(1, 1, len(curriculum_set['questions']))
+        
         return curriculum_set
         
-    except json.JSONDecodeError as e:
+    except ValueError as e:
         log(f"❌ JSON parse error for {grade}-{topic}: {e}")
-        progress['errors'].append(f"JSON error: {grade}-{topic}-{set_number}")
+        errors.append(f"JSON error: {grade}-{topic}-{subtopic}-{set_number}")
         return None
     except Exception as e:
         log(f"❌ Error generating {grade}-{topic}: {e}")
-        progress['errors'].append(f"Generation error: {grade}-{topic}-{set_number}: {str(e)}")
+        errors.append(f"Generation error: {grade}-{topic}-{subtopic}-{set_number}: {str(e)}")
         return None
 
-# Curriculum topics by grade
-topics = [
-    # Grade K
-    {'grade': 0, 'topic': 'Counting', 'subtopics': ['Numbers 1-10', 'Numbers 11-20', 'Counting Objects']},
-    {'grade': 0, 'topic': 'Shapes', 'subtopics': ['Basic Shapes', 'Shape Properties', 'Pattern Recognition']},
-    {'grade': 0, 'topic': 'Addition', 'subtopics': ['Adding 1-5', 'Adding 6-10', 'Picture Addition']},
-    
-    # Grade 1
-    {'grade': 1, 'topic': 'Addition', 'subtopics': ['Facts to 10', 'Facts to 20', 'Word Problems']},
-    {'grade': 1, 'topic': 'Subtraction', 'subtopics': ['Facts to 10', 'Facts to 20', 'Missing Numbers']},
-    {'grade': 1, 'topic': 'Place Value', 'subtopics': ['Tens and Ones', 'Comparing Numbers', 'Number Patterns']},
-    
-    # Grade 2
-    {'grade': 2, 'topic': 'Addition', 'subtopics': ['2-Digit Addition', '3-Digit Addition', 'Regrouping']},
-    {'grade': 2, 'topic': 'Subtraction', 'subtopics': ['2-Digit Subtraction', '3-Digit Subtraction', 'Borrowing']},
-    {'grade': 2, 'topic': 'Measurement', 'subtopics': ['Length', 'Weight', 'Time']},
-    
-    # Grade 3
-    {'grade': 3, 'topic': 'Multiplication', 'subtopics': ['Tables 2-5', 'Tables 6-9', 'Arrays']},
-    {'grade': 3, 'topic': 'Division', 'subtopics': ['Basic Division', 'Division with Remainders', 'Word Problems']},
-    {'grade': 3, 'topic': 'Fractions', 'subtopics': ['Unit Fractions', 'Comparing Fractions', 'Equivalent Fractions']},
-    
-    # Grade 4
-    {'grade': 4, 'topic': 'Multiplication', 'subtopics': ['Multi-Digit', 'Factors', 'Prime Numbers']},
-    {'grade': 4, 'topic': 'Division', 'subtopics': ['Long Division', 'Multiples', 'Word Problems']},
-    {'grade': 4, 'topic': 'Fractions', 'subtopics': ['Mixed Numbers', 'Adding Fractions', 'Subtracting Fractions']},
-    
-    # Grade 5
-    {'grade': 5, 'topic': 'Decimals', 'subtopics': ['Place Value', 'Operations', 'Rounding']},
-    {'grade': 5, 'topic': 'Fractions', 'subtopics': ['Multiplying', 'Dividing', 'Converting']},
-    {'grade': 5, 'topic': 'Geometry', 'subtopics': ['Coordinate Plane', 'Volume', 'Surface Area']},
-]
+# Topics and target set counts live in data/lesson_plan.json
+GRADES = [0, 1, 2, 3, 4, 5]
 
 def generate_all_curriculum(target_count=1000):
     """Generate curriculum sets"""
@@ -169,53 +148,51 @@ def generate_all_curriculum(target_count=1000):
     curriculum = load_existing_curriculum()
     log(f"📚 Loaded {len(curriculum)} existing sets")
     
-    sets_per_topic = max(1, (target_count - len(curriculum)) // len(topics))
-    log(f"📊 Generating ~{sets_per_topic} sets per topic")
+    # Breadth first over the subtopics the curriculum hasn't saturated yet
+    ledger = WorkLedger(RUN_NAME)
+    # Pending jobs from earlier runs that the curriculum now covers are retired
+    lesson_plan = compile_jobs(GRADES, curriculum)
+    needed = {job['id'] for job in lesson_plan}
+    ledger.plan(lesson_plan[:target_count], retire=lambda job: job['id'] not in needed)
+    jobs = ledger.pending()
+    get_events().run_started(len(jobs))
+    counts = ledger.counts().get(RUN_NAME, {})
+    log(f"📊 {len(jobs)} sets to generate ({counts.get('done', 0)} done in earlier runs, {counts.get('failed', 0)} failed)")
     
-    for topic_data in topics:
-        grade = topic_data['grade']
-        topic = topic_data['topic']
-        subtopics = topic_data['subtopics']
-        
-        for subtopic in subtopics:
-            for set_num in range(1, sets_per_topic + 1):
-                if len(curriculum) >= target_count:
-                    break
-                    
-                log(f"📝 Generating Grade {grade} - {topic} - {subtopic} - Set {set_num}")
-                
-                curriculum_set = generate_curriculum_set(grade, topic, subtopic, set_num)
-                
-                if curriculum_set:
-                    curriculum.append(curriculum_set)
-                    progress['curriculum_sets_generated'] += 1
-                    
-                    # Save every 10 sets
-                    if len(curriculum) % 10 == 0:
-                        with open(CURRICULUM_FILE, 'w') as f:
-                            json.dump(curriculum, f, indent=2)
-                        log(f"✅ Saved {len(curriculum)} sets")
-                        save_progress()
-                
-                # Rate limiting - Claude can handle faster requests
-                time.sleep(0.5)
+    generated = 0
+    # Each set is appended to the journal as it finishes; the journal is
+    # folded into curriculum.json once at the end (or on interrupt)
+    journal = Journal('generate_all_content')
+    try:
+        for job in jobs:
+            # Another worker may have taken it since we listed pending jobs
+            if not ledger.claim(job['id']):
+                continue
+            
+            log(f"📝 Generating Grade {job['grade']} - {job['topic']} - {job['subtopic']} - Set {job['set_num']}")
+            
+            curriculum_set = generate_curriculum_set(job['grade'], job['topic'], job['subtopic'], job['set_num'])
+            
+            if curriculum_set:
+                journal.append(curriculum_set)
+                ledger.complete(job['id'], f"{journal.path.name}#{curriculum_set['id']}")
+                generated += 1
                 
-            if len(curriculum) >= target_count:
-                break
-        if len(curriculum) >= target_count:
-            break
-    
-    # Final save
-    with open(CURRICULUM_FILE, 'w') as f:
-        json.dump(curriculum, f, indent=2)
+                if generated % 10 == 0:
+                    log(f"✅ Journaled {journal.count} sets")
+            else:
+                ledger.fail(job['id'], errors[-1] if errors else None)
+    finally:
+        journal.close()
+        ledger.release_all()
+        added, _ = compact(journals=[journal.path])
+        log(f"💾 Compacted {added} journaled sets into the curriculum")
     
-    log(f"✅ Generated {len(curriculum)} total curriculum sets")
-    return len(curriculum)
+    log(f"✅ Generated {generated} new curriculum sets ({len(curriculum) + added} total)")
+    return generated
 
 def main():
     """Main execution"""
-    progress['start_time'] = datetime.now().isoformat()
-    
     log("=" * 60)
     log("🚀 Abacus Learn Content Generation (Claude API)")
     log("=" * 60)
@@ -224,26 +201,21 @@ def main():
         # Generate curriculum
         total_sets = generate_all_curriculum(target_count=100)  # Start with 100 for testing
         
-        progress['end_time'] = datetime.now().isoformat()
-        save_progress()
-        
         log("=" * 60)
         log("✅ GENERATION COMPLETE!")
         log(f"📊 Curriculum Sets: {total_sets}")
-        log(f"❌ Errors: {len(progress['errors'])}")
+        log(f"❌ Errors: {len(errors)}")
         log("=" * 60)
         
-        if progress['errors']:
+        if errors:
             log("\n⚠️  Errors encountered:")
-            for error in progress['errors'][:10]:  # Show first 10
+            for error in errors[:10]:  # Show first 10
                 log(f"  - {error}")
         
     except KeyboardInterrupt:
-        log("\n⚠️  Generation interrupted by user")
-        save_progress()
+        log("\n⚠️  Generation interrupted by user (rerun to resume)")
     except Exception as e:
         log(f"\n❌ Fatal error: {e}")
-        save_progress()
         raise
 
 if __name__ == '__main__':
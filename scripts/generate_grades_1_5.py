@@ -5,12 +5,18 @@ Target: ~80 sets per grade to balance distribution
 """
 
 import os
-import json
-import time
 from datetime import datetime
 from pathlib import Path
 from anthropic import Anthropic
 
+from curriculum_journal import Journal, compact
+from curriculum_store import open_curriculum
+from llm_cache import get_cache
+from progress_events import get_events
+from prompt_packer import generate_packed, output_limit
+from rate_limiter import call_with_limiter, get_limiter
+from work_ledger import WorkLedger
+
 # Configuration
 CLAUDE_API_KEY = os.getenv('CLAUDE_API_KEY')
 if not CLAUDE_API_KEY:
@@ -19,11 +25,14 @@ if not CLAUDE_API_KEY:
     exit(1)
 
 client = Anthropic(api_key=CLAUDE_API_KEY)
+MODEL = "claude-3-haiku-20240307"  # Using Haiku (available with this API key)
+limiter = get_limiter('claude', MODEL)
+cache = get_cache()  # --cache-only replays earlier responses
 
 # Paths
 PROJECT_ROOT = Path(__file__).parent.parent
-CURRICULUM_FILE = PROJECT_ROOT / 'src' / 'data' / 'curriculum.json'
 LOG_FILE = PROJECT_ROOT / 'generation_log.txt'
+RUN_NAME = 'generate_grades_1_5'
 
 def log(message):
     """Log to console and file"""
@@ -33,59 +42,25 @@ def log(message):
     with open(LOG_FILE, 'a') as f:
         f.write(log_message + '\n')
 
-def generate_curriculum_set(grade, topic, subtopic, set_number):
-    """Generate a curriculum set using Claude"""
-    try:
-        prompt = f"""Generate a math curriculum set for Grade {grade}.
-
-Topic: {topic}
-Subtopic: {subtopic}
+def call_claude(prompt, max_tokens=4096):
+    """Call Claude through the shared rate limiter and response cache"""
+    def request():
+        message = call_with_limiter(
+            limiter,
+            client.messages.create,
+            model=MODEL,
+            max_tokens=max_tokens,
+            messages=[{"role": "user", "content": prompt}]
+        )
+        return message.content[0].text
+    
+    return cache.complete('claude', MODEL, prompt, {'max_tokens': max_tokens}, request)
 
-Create 8-10 multiple choice questions appropriate for Grade {grade}.
+# Sent once per packed request, however many sets it asks for
+INSTRUCTIONS = """Create multiple choice questions appropriate for the set's grade.
 Each question should have 4 options.
-
-Return ONLY valid JSON (no markdown) in this exact format:
-{{
-  "id": "{grade}-{topic.lower().replace(' ', '-')}-{subtopic.lower().replace(' ', '-')}-{set_number}",
-  "title": "{subtopic} - Set {set_number}",
-  "description": "Practice {subtopic.lower()} for Grade {grade}",
-  "grade_level": {grade},
-  "topic": "{topic}",
-  "questions": [
-    {{
-      "question": "Question text",
-      "options": ["Option A", "Option B", "Option C", "Option D"],
-      "answer": "Option A",
-      "explanation": "Why this is correct"
-    }}
-  ]
-}}
-
 Make questions progressively harder within the set. Use real-world contexts."""
 
-        message = client.messages.create(
-            model="claude-3-haiku-20240307",  # Using Haiku (available with this API key)
-            max_tokens=4096,
-            messages=[{"role": "user", "content": prompt}]
-        )
-        
-        response_text = message.content[0].text.strip()
-        
-        # Clean markdown if present
-        if response_text.startswith('```json'):
-            response_text = response_text.split('```json')[1].split('```')[0].strip()
-        elif response_text.startswith('```'):
-            response_text = response_text.split('```')[1].split('```')[0].strip()
-        
-        curriculum_set = json.loads(response_text)
-        curriculum_set['grade_level'] = grade  # Ensure correct grade
-        
-        return curriculum_set
-        
-    except Exception as e:
-        log(f"❌ Error: {e}")
-        return None
-
 # Topics for Grades 1-5 (excluding Kindergarten)
 topics = [
     # Grade 1 - Need ~80 more sets
@@ -125,9 +100,9 @@ def main():
     log("🚀 Generating Curriculum for Grades 1-5")
     log("=" * 60)
     
-    # Load existing
-    with open(CURRICULUM_FILE, 'r') as f:
-        curriculum = json.load(f)
+    # Load existing (the sharded store once it has been split)
+    curriculum = list(open_curriculum().sets())
+    existing_ids = {item['id'] for item in curriculum}
     
     log(f"📚 Loaded {len(curriculum)} existing sets")
     
@@ -141,37 +116,55 @@ def main():
     for grade in sorted(grade_counts.keys()):
         log(f"  Grade {grade}: {grade_counts[grade]} sets")
     
-    # Generate new content
+    # Generate new content, several sets per request
     sets_per_subtopic = 4  # 4 sets per subtopic
     total_generated = 0
+    jobs = [
+        {
+            'id': f"{topic_data['grade']}-{topic_data['topic'].lower().replace(' ', '-')}-{subtopic.lower().replace(' ', '-')}-{set_num}",
+            'grade': topic_data['grade'],
+            'topic': topic_data['topic'],
+            'subtopic': subtopic,
+            'set_num': set_num,
+        }
+        for topic_data in topics
+        for subtopic in topic_data['subtopics']
+        for set_num in range(1, sets_per_subtopic + 1)
+    ]
+    # Compaction skips ids the curriculum already has, so don't pay to regenerate them
+    jobs = [job for job in jobs if job['id'] not in existing_ids]
+
+    # The ledger skips jobs a parallel or earlier run already finished
+    ledger = WorkLedger(RUN_NAME)
+    ledger.plan(jobs, retire=True)
+    jobs = ledger.pending()
+    get_events().run_started(len(jobs))
     
-    for topic_data in topics:
-        grade = topic_data['grade']
-        topic = topic_data['topic']
-        subtopics = topic_data['subtopics']
-        
-        for subtopic in subtopics:
-            for set_num in range(1, sets_per_subtopic + 1):
-                log(f"📝 Grade {grade} - {topic} - {subtopic} - Set {set_num}")
-                
-                curriculum_set = generate_curriculum_set(grade, topic, subtopic, set_num)
-                
-                if curriculum_set:
-                    curriculum.append(curriculum_set)
-                    total_generated += 1
-                    
-                    # Save every 10 sets
-                    if total_generated % 10 == 0:
-                        with open(CURRICULUM_FILE, 'w') as f:
-                            json.dump(curriculum, f, indent=2)
-                        log(f"✅ Saved {len(curriculum)} total sets ({total_generated} new)")
-                
-                # Rate limiting (Claude can handle 0.5s)
-                time.sleep(0.5)
+    # Every set is fsync'd to the journal as it arrives and folded in at the end
+    journal = Journal('generate_grades_1_5')
+    try:
+        packed = generate_packed(jobs, call_claude, INSTRUCTIONS, output_limit(MODEL), log=log,
+                                 claim=lambda job: ledger.claim(job['id']) or ledger.renew(job['id']))
+        for job, curriculum_set in packed:
+            if not curriculum_set:
+                log(f"❌ Grade {job['grade']} - {job['topic']} - {job['subtopic']} - Set {job['set_num']}")
+                ledger.fail(job['id'], 'no valid set after retries')
+                continue
+            
+            log(f"📝 Grade {job['grade']} - {job['topic']} - {job['subtopic']} - Set {job['set_num']}")
+            journal.append(curriculum_set)
+            ledger.complete(job['id'], f"{journal.path.name}#{curriculum_set['id']}")
+            total_generated += 1
+            
+            if total_generated % 10 == 0:
+                log(f"✅ Journaled {journal.count} sets ({total_generated} new)")
+    finally:
+        ledger.release_all()
+        journal.close()
+        added, _ = compact(journals=[journal.path])
+        log(f"💾 Compacted {added} journaled sets into the curriculum")
     
-    # Final save
-    with open(CURRICULUM_FILE, 'w') as f:
-        json.dump(curriculum, f, indent=2)
+    curriculum = list(open_curriculum().sets())
     
     log("=" * 60)
     log(f"✅ COMPLETE! Generated {total_generated} new sets")
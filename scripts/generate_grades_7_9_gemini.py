@@ -5,11 +5,17 @@ Generates different subtopics to avoid conflicts
 """
 
 import os
-import json
-import time
 from datetime import datetime
 from pathlib import Path
 
+from curriculum_journal import Journal, compact
+from curriculum_store import open_curriculum
+from llm_metrics import get_metrics
+from progress_events import get_events
+from prompt_packer import ILLUSTRATED_SET_EXAMPLE, generate_packed, output_limit
+from rate_limiter import call_with_limiter, get_limiter
+from work_ledger import WorkLedger
+
 try:
     from google import generativeai as genai
 except ImportError:
@@ -23,12 +29,14 @@ if not GEMINI_API_KEY:
     exit(1)
 
 genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel('gemini-2.0-flash-exp')
+MODEL_NAME = 'gemini-2.0-flash-exp'
+model = genai.GenerativeModel(MODEL_NAME)
+limiter = get_limiter('gemini', MODEL_NAME)
 
 # Paths
 PROJECT_ROOT = Path(__file__).parent.parent
-CURRICULUM_FILE = PROJECT_ROOT / 'src' / 'data' / 'curriculum.json'
 LOG_FILE = PROJECT_ROOT / 'generation_7_9_gemini.log'
+RUN_NAME = 'generate_grades_7_9_gemini'
 IMAGES_DIR = PROJECT_ROOT / 'public' / 'curriculum-images'
 
 IMAGES_DIR.mkdir(parents=True, exist_ok=True)
@@ -41,77 +49,39 @@ def log(message):
     with open(LOG_FILE, 'a') as f:
         f.write(log_message + '\n')
 
-def generate_curriculum_set(grade, topic, subtopic, set_number):
-    """Generate a curriculum set using Gemini"""
-    try:
-        illustration_guidance = ""
-        if topic in ['Geometry', 'Graphing', 'Coordinate Plane', 'Functions', 'Algebra']:
-            illustration_guidance = """
+# Sent once per packed request, however many sets it asks for
+INSTRUCTIONS = """Create multiple choice questions appropriate for the set's grade.
+Each question should have 4 options.
+
 For visual problems, include an "illustration" field with description.
 Format: "illustration": "Description of diagram/graph"
-"""
-        
-        prompt = f"""Generate a math curriculum set for Grade {grade}.
-
-Topic: {topic}
-Subtopic: {subtopic}
-
-Create 8-10 multiple choice questions appropriate for Grade {grade}.
-Each question should have 4 options.
-{illustration_guidance}
-
-Return ONLY valid JSON (no markdown) in this exact format:
-{{
-  "id": "{grade}-{topic.lower().replace(' ', '-')}-{subtopic.lower().replace(' ', '-')}-{set_number}",
-  "title": "{subtopic} - Set {set_number}",
-  "description": "Practice {subtopic.lower()} for Grade {grade}",
-  "grade_level": {grade},
-  "topic": "{topic}",
-  "questions": [
-    {{
-      "question": "Question text",
-      "options": ["Option A", "Option B", "Option C", "Option D"],
-      "answer": "Option A",
-      "explanation": "Why this is correct",
-      "illustration": "Optional: Description if needed"
-    }}
-  ]
-}}
 
 Make questions progressively harder. Use real-world contexts.
 For algebra, show work steps. For geometry, include diagrams where helpful."""
 
-        response = model.generate_content(
+def call_gemini(prompt, max_tokens=4096):
+    """Call Gemini through the shared rate limiter (recorded in the metrics store)"""
+    with get_metrics().call('gemini', MODEL_NAME, prompt) as call:
+        response = call_with_limiter(
+            limiter,
+            model.generate_content,
             prompt,
             generation_config=genai.types.GenerationConfig(
                 temperature=0.7,
-                max_output_tokens=4096,
+                max_output_tokens=max_tokens,
             )
         )
-        
-        response_text = response.text.strip()
-        
-        # Clean markdown
-        if '```json' in response_text:
-            response_text = response_text.split('```json')[1].split('```')[0].strip()
-        elif '```' in response_text:
-            response_text = response_text.split('```')[1].split('```')[0].strip()
-        
-        curriculum_set = json.loads(response_text)
-        curriculum_set['grade_level'] = grade
-        
-        # Process illustrations
-        for i, question in enumerate(curriculum_set.get('questions', [])):
-            if 'illustration' in question and question['illustration']:
-                img_filename = f"grade{grade}-{topic.lower().replace(' ', '-')}-set{set_number}-q{i+1}.png"
-                question['image'] = f"/curriculum-images/{img_filename}"
-                question['illustration_description'] = question.pop('illustration')
-        
-        return curriculum_set
-        
-    except Exception as e:
-        log(f"❌ Error: {e}")
-        return None
+        call.text = response.text
+    return call.text
+
+def attach_illustrations(curriculum_set, job):
+    """Convert illustration descriptions to placeholder image paths"""
+    for i, question in enumerate(curriculum_set.get('questions', [])):
+        if 'illustration' in question and question['illustration']:
+            img_filename = f"grade{job['grade']}-{job['topic'].lower().replace(' ', '-')}-set{job['set_num']}-q{i+1}.png"
+            question['image'] = f"/curriculum-images/{img_filename}"
+            question['illustration_description'] = question.pop('illustration')
+    return curriculum_set
 
 # Topics for Grades 7-9 (DIFFERENT from Claude to avoid conflicts)
 # These are additional subtopics not covered by the Claude script
@@ -138,13 +108,11 @@ def main():
     log("🚀 Generating Curriculum for Grades 7-9 (Gemini)")
     log("=" * 60)
     
-    # Load existing - need to coordinate with Claude script
-    # We'll use a lock-free approach: load, append, save
-    if CURRICULUM_FILE.exists():
-        with open(CURRICULUM_FILE, 'r') as f:
-            curriculum = json.load(f)
-    else:
-        curriculum = []
+    # Load existing (the sharded store once it has been split). New sets go to
+    # a journal and are folded in under the store's lock, so this can run
+    # alongside the Claude script
+    curriculum = list(open_curriculum().sets())
+    existing_ids = {item['id'] for item in curriculum}
     
     initial_count = len(curriculum)
     log(f"📚 Loaded {initial_count} existing sets")
@@ -159,41 +127,57 @@ def main():
     for grade in sorted(grade_counts.keys()):
         log(f"  Grade {grade}: {grade_counts[grade]} sets")
     
-    # Generate new content
+    # Generate new content, several sets per request
     sets_per_subtopic = 4  # 4 sets per subtopic
     total_generated = 0
+    jobs = [
+        {
+            'id': f"{topic_data['grade']}-{topic_data['topic'].lower().replace(' ', '-')}-{subtopic.lower().replace(' ', '-')}-{set_num}",
+            'grade': topic_data['grade'],
+            'topic': topic_data['topic'],
+            'subtopic': subtopic,
+            'set_num': set_num,
+        }
+        for topic_data in topics
+        for subtopic in topic_data['subtopics']
+        for set_num in range(1, sets_per_subtopic + 1)
+    ]
+    # Compaction skips ids the curriculum already has, so don't pay to regenerate them
+    jobs = [job for job in jobs if job['id'] not in existing_ids]
+
+    # The ledger skips jobs a parallel or earlier run already finished
+    ledger = WorkLedger(RUN_NAME)
+    ledger.plan(jobs, retire=True)
+    jobs = ledger.pending()
+    get_events().run_started(len(jobs))
     
-    for topic_data in topics:
-        grade = topic_data['grade']
-        topic = topic_data['topic']
-        subtopics = topic_data['subtopics']
-        
-        for subtopic in subtopics:
-            for set_num in range(1, sets_per_subtopic + 1):
-                log(f"📝 Grade {grade} - {topic} - {subtopic} - Set {set_num}")
-                
-                curriculum_set = generate_curriculum_set(grade, topic, subtopic, set_num)
-                
-                if curriculum_set:
-                    # Reload file to get latest (in case Claude saved)
-                    with open(CURRICULUM_FILE, 'r') as f:
-                        curriculum = json.load(f)
-                    
-                    curriculum.append(curriculum_set)
-                    total_generated += 1
-                    
-                    # Save every 10 sets
-                    if total_generated % 10 == 0:
-                        with open(CURRICULUM_FILE, 'w') as f:
-                            json.dump(curriculum, f, indent=2)
-                        log(f"✅ Saved {len(curriculum)} total sets ({total_generated} new from Gemini)")
-                
-                # Rate limiting - 1 second to avoid conflicts with Claude
-                time.sleep(1.0)
+    # Every set is fsync'd to the journal as it arrives
+    journal = Journal('generate_grades_7_9_gemini')
+    try:
+        packed = generate_packed(jobs, call_gemini, INSTRUCTIONS, output_limit(MODEL_NAME),
+                                 example=ILLUSTRATED_SET_EXAMPLE, log=log,
+                                 claim=lambda job: ledger.claim(job['id']) or ledger.renew(job['id']))
+        for job, curriculum_set in packed:
+            if not curriculum_set:
+                log(f"❌ Grade {job['grade']} - {job['topic']} - {job['subtopic']} - Set {job['set_num']}")
+                ledger.fail(job['id'], 'no valid set after retries')
+                continue
+            
+            log(f"📝 Grade {job['grade']} - {job['topic']} - {job['subtopic']} - Set {job['set_num']}")
+            curriculum_set = attach_illustrations(curriculum_set, job)
+            journal.append(curriculum_set)
+            ledger.complete(job['id'], f"{journal.path.name}#{curriculum_set['id']}")
+            total_generated += 1
+            
+            if total_generated % 10 == 0:
+                log(f"✅ Journaled {journal.count} sets ({total_generated} new from Gemini)")
+    finally:
+        ledger.release_all()
+        journal.close()
+        added, _ = compact(journals=[journal.path])
+        log(f"💾 Compacted {added} journaled sets into the curriculum")
     
-    # Final save
-    with open(CURRICULUM_FILE, 'r') as f:
-        curriculum = json.load(f)
+    curriculum = list(open_curriculum().sets())
     
     log("=" * 60)
     log(f"✅ COMPLETE! Generated {total_generated} new sets (Gemini)")
@@ -2,21 +2,38 @@
 """
 Generate curriculum for Grades 7-9 using local Ollama (Qwen 2.5 Coder 7B)
 Zero cost, runs entirely on your M4 Mac
+
+Talks to the Ollama HTTP API over keep-alive connections with the model
+pinned in memory, running one request per server slot. Start Ollama with
+OLLAMA_NUM_PARALLEL=4 (or pass --parallel to match your server).
 """
 
-import json
+import argparse
 import time
-import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from pathlib import Path
 
+from curriculum_journal import Journal, compact
+from curriculum_store import open_curriculum
+from json_salvage import parse_set
+from lesson_plan import compile_jobs
+from llm_metrics import get_metrics
+from ollama_client import OllamaClient
+from progress_events import get_events
+from question_validator import describe_rejections, filter_set, request_count
+from work_ledger import WorkLedger
+
 # Configuration
 MODEL = "qwen2.5-coder:7b"
+SET_LIMIT = 50  # Stop after 50 sets for testing
+QUESTIONS_PER_SET = 5
+MIN_QUESTIONS = 3
 
 # Paths
 PROJECT_ROOT = Path(__file__).parent.parent
-CURRICULUM_FILE = PROJECT_ROOT / 'src' / 'data' / 'curriculum.json'
 LOG_FILE = PROJECT_ROOT / 'generation_7_9_local.log'
+RUN_NAME = 'generate_grades_7_9_local'
 IMAGES_DIR = PROJECT_ROOT / 'public' / 'curriculum-images'
 
 IMAGES_DIR.mkdir(parents=True, exist_ok=True)
@@ -29,19 +46,16 @@ def log(message):
     with open(LOG_FILE, 'a') as f:
         f.write(log_message + '\n')
 
-def call_ollama(prompt):
-    """Call Ollama API"""
+client = None
+
+def call_ollama(prompt, grade=None):
+    """Call Ollama API (streamed over a pooled keep-alive connection)"""
     try:
-        result = subprocess.run(
-            ['ollama', 'run', MODEL],
-            input=prompt,
-            capture_output=True,
-            text=True,
-            timeout=120  # Increased to 120 seconds for complex JSON generation
-        )
-        return result.stdout.strip()
-    except subprocess.TimeoutExpired:
-        log("⚠️ Ollama timeout (120s)")
+        with get_metrics().call('ollama', MODEL, prompt, grade) as call:
+            call.text = client.generate(prompt).strip()
+        return call.text
+    except TimeoutError:
+        log(f"⚠️ Ollama timeout ({client.timeout}s)")
         return None
     except Exception as e:
         log(f"❌ Ollama error: {e}")
@@ -61,7 +75,7 @@ For visual problems, include an "illustration" field with description.
 Topic: {topic}
 Subtopic: {subtopic}
 
-Create 5-6 multiple choice questions appropriate for Grade {grade}.
+Create {request_count(QUESTIONS_PER_SET)} multiple choice questions appropriate for Grade {grade}.
 Each question should have 4 options.
 {illustration_guidance}
 
@@ -85,20 +99,27 @@ Return ONLY valid JSON (no markdown, no explanations) in this exact format:
 Make questions progressively harder. Use real-world contexts.
 IMPORTANT: Return ONLY the JSON object, nothing else."""
 
-        response_text = call_ollama(prompt)
+        response_text = call_ollama(prompt, grade)
         
         if not response_text:
             return None
         
-        # Clean markdown if present
-        if '```json' in response_text:
-            response_text = response_text.split('```json')[1].split('```')[0].strip()
-        elif '```' in response_text:
-            response_text = response_text.split('```')[1].split('```')[0].strip()
-        
-        curriculum_set = json.loads(response_text)
+        # Tolerates code fences, trailing commas and a truncated tail
+        try:
+            curriculum_set = parse_set(response_text)
+        except ValueError:
+            get_metrics().record_yield(1, 0, 0)
+            raise
         curriculum_set['grade_level'] = grade
         
+        # Over-generated: keep the best QUESTIONS_PER_SET that pass the local checks
+        rejected = filter_set(curriculum_set, grade, keep=QUESTIONS_PER_SET)
+        if len(curriculum_set['questions']) < MIN_QUESTIONS:
+            get_metrics().record_yield(1, 0, 0)
+            log(f"⚠️ Only {len(curriculum_set['questions'])} usable questions {describe_rejections(rejected)}")
+            return None
+        get_metrics().record_yield(1, 1, len(curriculum_set['questions']))
+        
         # Process illustrations
         for i, question in enumerate(curriculum_set.get('questions', [])):
             if 'illustration' in question and question['illustration']:
@@ -112,39 +133,27 @@ IMPORTANT: Return ONLY the JSON object, nothing else."""
         log(f"❌ Error: {e}")
         return None
 
-# Topics for Grades 7-9 (Same as Claude script)
-topics = [
-    # Grade 7
-    {'grade': 7, 'topic': 'Pre-Algebra', 'subtopics': ['Integers', 'Order of Operations', 'Expressions', 'Equations', 'Inequalities']},
-    {'grade': 7, 'topic': 'Ratios and Proportions', 'subtopics': ['Ratios', 'Rates', 'Proportions', 'Scale Drawings', 'Percent']},
-    {'grade': 7, 'topic': 'Geometry', 'subtopics': ['Angles', 'Triangles', 'Quadrilaterals', 'Circles', 'Area and Perimeter']},
-    {'grade': 7, 'topic': 'Statistics', 'subtopics': ['Mean and Median', 'Data Analysis', 'Probability']},
-    
-    # Grade 8
-    {'grade': 8, 'topic': 'Algebra', 'subtopics': ['Linear Equations', 'Systems of Equations', 'Functions', 'Slope', 'Graphing']},
-    {'grade': 8, 'topic': 'Geometry', 'subtopics': ['Pythagorean Theorem', 'Volume', 'Surface Area', 'Transformations', 'Congruence']},
-    {'grade': 8, 'topic': 'Exponents', 'subtopics': ['Powers', 'Scientific Notation', 'Square Roots', 'Cube Roots']},
-    {'grade': 8, 'topic': 'Statistics', 'subtopics': ['Scatter Plots', 'Linear Models', 'Two-Way Tables']},
-    
-    # Grade 9
-    {'grade': 9, 'topic': 'Algebra I', 'subtopics': ['Polynomials', 'Factoring', 'Quadratic Equations', 'Quadratic Functions', 'Exponential Functions']},
-    {'grade': 9, 'topic': 'Geometry', 'subtopics': ['Coordinate Geometry', 'Parallel Lines', 'Triangle Properties', 'Similarity', 'Right Triangles']},
-    {'grade': 9, 'topic': 'Functions', 'subtopics': ['Function Notation', 'Domain and Range', 'Transformations', 'Inverse Functions']},
-    {'grade': 9, 'topic': 'Statistics', 'subtopics': ['Data Distributions', 'Standard Deviation', 'Regression']},
-]
+# Topics and target set counts live in data/lesson_plan.json
+GRADES = [7, 8, 9]
 
 def main():
     """Generate content for Grades 7-9 using local Ollama"""
+    global client
+
+    parser = argparse.ArgumentParser(description='Generate Grades 7-9 with local Ollama')
+    parser.add_argument('--parallel', type=int, help='Concurrent requests (default: OLLAMA_NUM_PARALLEL or 4)')
+    parser.add_argument('--limit', type=int, default=SET_LIMIT, help='Number of sets to generate')
+    args = parser.parse_args()
+
+    client = OllamaClient(MODEL, parallel=args.parallel)
+    client.warm()
+
     log("=" * 60)
-    log(f"🚀 Generating Curriculum for Grades 7-9 (Local Ollama - {MODEL})")
+    log(f"🚀 Generating Curriculum for Grades 7-9 (Local Ollama - {MODEL}, {client.parallel} slots)")
     log("=" * 60)
     
-    # Load existing
-    if CURRICULUM_FILE.exists():
-        with open(CURRICULUM_FILE, 'r') as f:
-            curriculum = json.load(f)
-    else:
-        curriculum = []
+    # Load existing (the sharded store once it has been split)
+    curriculum = list(open_curriculum().sets())
     
     initial_count = len(curriculum)
     log(f"📚 Loaded {initial_count} existing sets")
@@ -159,62 +168,62 @@ def main():
     for grade in sorted(grade_counts.keys()):
         log(f"  Grade {grade}: {grade_counts[grade]} sets")
     
-    # Generate new content
-    sets_per_subtopic = 4
+    # Generate only what the lesson plan still needs; the ledger skips jobs
+    # a parallel or earlier run already finished
+    ledger = WorkLedger(RUN_NAME)
+    ledger.plan(compile_jobs(GRADES, curriculum), retire=True)
+    jobs = ledger.pending(args.limit)
+    get_events().run_started(len(jobs))
     total_generated = 0
     start_time = time.time()
-    
-    for topic_data in topics:
-        grade = topic_data['grade']
-        topic = topic_data['topic']
-        subtopics = topic_data['subtopics']
-        
-        for subtopic in subtopics:
-            for set_num in range(1, sets_per_subtopic + 1):
-                # Stop after 50 sets for testing
-                if total_generated >= 50:
-                    log("🛑 Reached 50 sets limit (test run)")
-                    break
-                
-                log(f"📝 Grade {grade} - {topic} - {subtopic} - Set {set_num}")
-                
-                set_start = time.time()
-                curriculum_set = generate_curriculum_set(grade, topic, subtopic, set_num)
-                set_time = time.time() - set_start
-                
+
+    def timed_generate(job):
+        # Claim just before the request so parallel runs never pay twice
+        if not ledger.claim(job['id']):
+            return None, None
+        log(f"📝 Grade {job['grade']} - {job['topic']} - {job['subtopic']} - Set {job['set_num']}")
+        set_start = time.time()
+        curriculum_set = generate_curriculum_set(job['grade'], job['topic'], job['subtopic'], job['set_num'])
+        return curriculum_set, time.time() - set_start
+
+    # Every set is fsync'd to the journal as it arrives and folded in at the end
+    journal = Journal('generate_grades_7_9_local')
+    try:
+        # One request per server slot; the model stays loaded between requests
+        with ThreadPoolExecutor(max_workers=client.parallel) as executor:
+            futures = {executor.submit(timed_generate, job): job for job in jobs}
+
+            for future in as_completed(futures):
+                job = futures[future]
+                subtopic, set_num = job['subtopic'], job['set_num']
+                curriculum_set, set_time = future.result()
+
+                if set_time is None:
+                    continue  # Another run holds this job
                 if curriculum_set:
-                    curriculum.append(curriculum_set)
+                    journal.append(curriculum_set)
+                    ledger.complete(job['id'], f"{journal.path.name}#{curriculum_set.get('id', job['set_id'])}")
                     total_generated += 1
-                    log(f"   ✅ Generated in {set_time:.1f}s")
-                    
-                    # Save every 10 sets
+                    log(f"   ✅ Generated in {set_time:.1f}s ({subtopic} - Set {set_num})")
+
                     if total_generated % 10 == 0:
-                        with open(CURRICULUM_FILE, 'w') as f:
-                            json.dump(curriculum, f, indent=2)
-                        
                         elapsed = time.time() - start_time
                         avg_time = elapsed / total_generated
-                        remaining = (240 - total_generated) * avg_time
-                        
-                        log(f"💾 Saved {len(curriculum)} total sets ({total_generated} new)")
+                        remaining = (len(jobs) - total_generated) * avg_time
+
+                        log(f"💾 Journaled {journal.count} sets ({total_generated} new)")
                         log(f"   ⏱️  Avg: {avg_time:.1f}s/set, ETA: {remaining/60:.1f} min")
                 else:
-                    log(f"   ❌ Failed")
-                
-                # Small delay to prevent overheating
-                time.sleep(0.5)
-            
-            # Break subtopic loop if limit reached
-            if total_generated >= 50:
-                break
-        
-        # Break topic loop if limit reached
-        if total_generated >= 50:
-            break
+                    ledger.fail(job['id'], 'no valid set')
+                    log(f"   ❌ Failed ({subtopic} - Set {set_num})")
+    finally:
+        ledger.release_all()
+        client.close()
+        journal.close()
+        added, _ = compact(journals=[journal.path])
+        log(f"💾 Compacted {added} journaled sets into the curriculum")
     
-    # Final save
-    with open(CURRICULUM_FILE, 'w') as f:
-        json.dump(curriculum, f, indent=2)
+    curriculum = list(open_curriculum().sets())
     
     total_time = time.time() - start_time
     
@@ -222,7 +231,7 @@ def main():
     log(f"✅ COMPLETE! Generated {total_generated} new sets")
     log(f"📊 Total curriculum sets: {len(curriculum)}")
     log(f"⏱️  Total time: {total_time/60:.1f} minutes")
-    log(f"📈 Average: {total_time/total_generated:.1f} seconds per set")
+    log(f"📈 Average: {total_time/max(total_generated, 1):.1f} seconds per set ({total_generated * 3600 / total_time:.0f} sets/hour)")
     log("=" * 60)
     
     # Show new distribution
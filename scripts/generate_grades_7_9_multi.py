@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Generate curriculum for Grades 7-9 across several LLM providers at once
+Replaces running generate_grades_7_9.py (Claude), generate_grades_7_9_gemini.py
+and generate_grades_7_9_local.py (Ollama) side by side: one job list is
+fanned out to whichever provider has spare quota or capacity.
+
+Usage:
+  python scripts/generate_grades_7_9_multi.py --providers claude,gemini,ollama
+"""
+
+import argparse
+import time
+from datetime import datetime
+from pathlib import Path
+
+from curriculum_journal import Journal, compact
+from curriculum_store import open_curriculum
+from json_salvage import parse_set
+from lesson_plan import compile_jobs
+from llm_backends import FanOutScheduler, create_backends
+from progress_events import get_events
+from question_validator import describe_rejections, filter_set, request_count
+from work_ledger import WorkLedger
+
+# Paths
+PROJECT_ROOT = Path(__file__).parent.parent
+LOG_FILE = PROJECT_ROOT / 'generation_7_9_multi.log'
+RUN_NAME = 'generate_grades_7_9_multi'
+
+GRADES = [7, 8, 9]
+MAX_TOKENS = 4096
+QUESTIONS_PER_SET = 8
+MIN_QUESTIONS = 5
+ILLUSTRATED_TOPICS = ['Geometry', 'Graphing', 'Coordinate Plane', 'Functions', 'Algebra']
+
+def log(message):
+    """Log to console and file"""
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    log_message = f"[{timestamp}] {message}"
+    print(log_message)
+    with open(LOG_FILE, 'a') as f:
+        f.write(log_message + '\n')
+
+def slug(text):
+    return text.lower().replace(' ', '-')
+
+def set_id_for(job):
+    # Jobs planned before the lesson plan was used carry the set id as their key
+    return job.get('set_id', job['id'])
+
+def build_prompt(job):
+    """Same prompt for every provider so outputs are interchangeable"""
+    grade, topic, subtopic, set_number = job['grade'], job['topic'], job['subtopic'], job['set_num']
+    set_id = set_id_for(job)
+
+    illustration_guidance = ""
+    if topic in ILLUSTRATED_TOPICS:
+        illustration_guidance = """
+For geometric or graphing questions, include an "illustration" field with a detailed description
+of what should be drawn. Format: "illustration": "Description of diagram/graph to generate"
+"""
+
+    prompt = f"""Generate a math curriculum set for Grade {grade}.
+
+Topic: {topic}
+Subtopic: {subtopic}
+
+Create {request_count(QUESTIONS_PER_SET)} multiple choice questions appropriate for Grade {grade}.
+Each question should have 4 options.
+{illustration_guidance}
+
+Return ONLY valid JSON (no markdown) in this exact format:
+{{
+  "id": "{set_id}",
+  "title": "{subtopic} - Set {set_number}",
+  "description": "Practice {subtopic.lower()} for Grade {grade}",
+  "grade_level": {grade},
+  "topic": "{topic}",
+  "questions": [
+    {{
+      "question": "Question text",
+      "options": ["Option A", "Option B", "Option C", "Option D"],
+      "answer": "Option A",
+      "explanation": "Why this is correct",
+      "illustration": "Optional: Description of diagram if needed"
+    }}
+  ]
+}}
+
+Make questions progressively harder within the set. Use real-world contexts.
+For algebra questions, show work steps in explanations.
+IMPORTANT: Return ONLY the JSON object, nothing else."""
+    return prompt, MAX_TOKENS
+
+def parse_response(job, text):
+    """Turn a provider response into a curriculum set (raises on unusable output)"""
+    curriculum_set = parse_set(text)
+    curriculum_set['id'] = set_id_for(job)
+    curriculum_set['grade_level'] = job['grade']
+
+    # Over-generated: keep the best QUESTIONS_PER_SET; a shortfall goes back to the scheduler
+    rejected = filter_set(curriculum_set, job['grade'], keep=QUESTIONS_PER_SET)
+    if len(curriculum_set['questions']) < MIN_QUESTIONS:
+        raise ValueError(f"only {len(curriculum_set['questions'])} usable questions {describe_rejections(rejected)}")
+
+    for i, question in enumerate(curriculum_set.get('questions', [])):
+        if question.get('illustration'):
+            img_filename = f"grade{job['grade']}-{slug(job['topic'])}-set{job['set_num']}-q{i+1}.png"
+            question['image'] = f"/curriculum-images/{img_filename}"
+            question['illustration_description'] = question.pop('illustration')
+
+    return curriculum_set
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate Grades 7-9 across several LLM providers')
+    parser.add_argument('--providers', default='claude,gemini', help='Comma-separated, e.g. claude,gemini:gemini-2.0-flash,ollama')
+    parser.add_argument('--limit', type=int, help='Limit number of sets (for testing)')
+    parser.add_argument('--cache-only', action='store_true', help='Replay cached responses only')
+    parser.add_argument('--no-cache', action='store_true', help='Bypass the response cache')
+    args = parser.parse_args()
+
+    backends = create_backends([p.strip() for p in args.providers.split(',') if p.strip()])
+    ledger = WorkLedger(RUN_NAME)
+    # Only the sets the lesson plan still needs, numbered after the existing ones;
+    # pending jobs from earlier runs that other generators have since covered are retired
+    ledger.plan(compile_jobs(GRADES, open_curriculum().sets()), retire=True)
+    jobs = ledger.pending(args.limit)
+    get_events().run_started(len(jobs))
+    done = ledger.counts().get(RUN_NAME, {}).get('done', 0)
+
+    log("=" * 60)
+    log(f"🚀 Generating Curriculum for Grades 7-9 via {', '.join(map(repr, backends))}")
+    log(f"📝 {len(jobs)} sets queued ({done} done in earlier runs)")
+    log("=" * 60)
+
+    journal = Journal('generate_grades_7_9_multi')
+    state = {'done': 0, 'ok': 0}
+    start_time = time.time()
+
+    def on_result(job, curriculum_set, backend, error):
+        state['done'] += 1
+        if curriculum_set:
+            journal.append(curriculum_set)
+            ledger.complete(job['id'], f"{journal.path.name}#{curriculum_set['id']}")
+            state['ok'] += 1
+            log(f"[{state['done']}/{len(jobs)}] ✅ {backend!r} Grade {job['grade']} - {job['topic']} - {job['subtopic']} - Set {job['set_num']}")
+        else:
+            ledger.fail(job['id'], error)
+            log(f"[{state['done']}/{len(jobs)}] ❌ Grade {job['grade']} - {job['subtopic']} - Set {job['set_num']}: {error}")
+
+    scheduler = FanOutScheduler(backends)
+    try:
+        # Retries across providers renew the same lease instead of claiming again
+        scheduler.run(jobs, build_prompt, parse_response, on_result,
+                      claim=lambda job: ledger.claim(job['id']) or ledger.renew(job['id']))
+    except KeyboardInterrupt:
+        log("\n👋 Stopped by user")
+    finally:
+        journal.close()
+        ledger.release_all()
+        added, _ = compact(journals=[journal.path])
+
+    elapsed = time.time() - start_time
+    log("=" * 60)
+    log(f"✅ COMPLETE! Generated {state['ok']} sets in {elapsed/60:.1f} minutes ({added} new in curriculum.json)")
+    for name, stats in scheduler.stats.items():
+        log(f"  {name}: {stats['ok']} ok, {stats['failed']} failed, {stats['stolen']} stolen")
+    log("=" * 60)
+
+if __name__ == '__main__':
+    main()
@@ -2,13 +2,14 @@ import os
 import json
 from google import generativeai as genai
 
+from curriculum_store import open_curriculum
+
 # Configure Gemini
 genai.configure(api_key=os.getenv('VITE_GEMINI_API_KEY'))
 model = genai.GenerativeModel('gemini-2.0-flash-exp')
 
 # Load existing curriculum to see what modules we have
-with open('src/data/curriculum.json', 'r') as f:
-    curriculum = json.load(f)
+curriculum = list(open_curriculum().sets())
 
 # Get all module IDs organized by grade
 modules_by_grade = {}
@@ -3,16 +3,28 @@
 Safe Bulk Curriculum Generator using Gemini API
 Target: Grades 1-6
 Constraint: Respect free tier rate limits (~15 RPM)
+Requests run concurrently through the async generation engine
 """
 
 import os
-import json
 import time
 import random
+import argparse
 import google.generativeai as genai
 from pathlib import Path
 from dotenv import load_dotenv
 
+from curriculum_journal import Journal, compact
+from curriculum_store import open_curriculum
+from generation_engine import GenerationEngine, estimate_duration
+from json_salvage import parse_set
+from lesson_plan import compile_jobs
+from llm_metrics import get_metrics, note_response
+from near_dupes import QuestionDeduper
+from progress_events import get_events
+from question_validator import describe_rejections, filter_set, request_count
+from rate_limiter import get_limiter, is_rate_limited
+
 # Load environment variables
 load_dotenv(Path(__file__).parent.parent / '.env')
 
@@ -26,70 +38,22 @@ genai.configure(api_key=GEMINI_API_KEY)
 
 # Constants
 MODEL_NAME = "gemini-2.0-flash"
-DELAY_SECONDS = 4.0  # Safe buffer for 15 RPM limit
-BATCH_SIZE = 1  # Save after every set to prevent data loss
+REQUESTS_PER_MINUTE = 15  # Free tier limit
+TOKENS_PER_MINUTE = 1_000_000
+CONCURRENCY = 8  # Upper bound; the adaptive limiter backs off on 429s
 MAX_RETRIES = 5
+RETRY_DELAY_SECONDS = 2  # Non-quota failures (bad JSON etc.)
+QUESTIONS_PER_SET = 10
+MIN_QUESTIONS = 5  # Sets left with fewer after validation or near-duplicate filtering are dropped
 
-# Paths
-PROJECT_ROOT = Path(__file__).parent.parent
-CURRICULUM_FILE = PROJECT_ROOT / 'src' / 'data' / 'curriculum.json'
-
-# Topics Configuration
-TOPICS = [
-    # Grade 1
-    {'grade': 1, 'topic': 'Addition', 'subtopics': ['Sums to 10', 'Sums to 20', 'Word Problems', 'Missing Addends']},
-    {'grade': 1, 'topic': 'Subtraction', 'subtopics': ['From 10', 'From 20', 'Word Problems', 'Find the Difference']},
-    {'grade': 1, 'topic': 'Place Value', 'subtopics': ['Tens and Ones', 'Counting to 120', 'Comparing Numbers']},
-    {'grade': 1, 'topic': 'Geometry', 'subtopics': ['2D Shapes', '3D Shapes', 'Partitioning Shapes']},
-    {'grade': 1, 'topic': 'Measurement', 'subtopics': ['Length', 'Time to Hour', 'Money (Coins)']},
-
-    # Grade 2
-    {'grade': 2, 'topic': 'Addition', 'subtopics': ['2-Digit with Regrouping', '3-Digit Addition', 'Mental Math']},
-    {'grade': 2, 'topic': 'Subtraction', 'subtopics': ['2-Digit with Regrouping', '3-Digit Subtraction', 'Word Problems']},
-    {'grade': 2, 'topic': 'Place Value', 'subtopics': ['Hundreds', 'Skip Counting', 'Standard Form']},
-    {'grade': 2, 'topic': 'Measurement', 'subtopics': ['Inches and Feet', 'Time to 5 Mins', 'Money (Mixed Coins)']},
-    {'grade': 2, 'topic': 'Data', 'subtopics': ['Bar Graphs', 'Line Plots']},
-
-    # Grade 3
-    {'grade': 3, 'topic': 'Multiplication', 'subtopics': ['Arrays', 'Facts 0-5', 'Facts 6-9', 'Properties']},
-    {'grade': 3, 'topic': 'Division', 'subtopics': ['Equal Groups', 'Facts 1-10', 'Inverse Operations']},
-    {'grade': 3, 'topic': 'Fractions', 'subtopics': ['Unit Fractions', 'Fractions on Number Line', 'Equivalent Fractions']},
-    {'grade': 3, 'topic': 'Area and Perimeter', 'subtopics': ['Rectangle Area', 'Perimeter Calculations']},
-    {'grade': 3, 'topic': 'Time', 'subtopics': ['Elapsed Time', 'Nearest Minute']},
-
-    # Grade 4
-    {'grade': 4, 'topic': 'Multiplication', 'subtopics': ['Multi-Digit', 'Factors and Multiples', 'Prime vs Composite']},
-    {'grade': 4, 'topic': 'Division', 'subtopics': ['Long Division', 'Remainders', 'Word Problems']},
-    {'grade': 4, 'topic': 'Fractions', 'subtopics': ['Adding Like Denominators', 'Mixed Numbers', 'Multiplying Fractions']},
-    {'grade': 4, 'topic': 'Decimals', 'subtopics': ['Tenths and Hundredths', 'Comparing Decimals']},
-    {'grade': 4, 'topic': 'Geometry', 'subtopics': ['Lines and Angles', 'Symmetry', 'Classifying Shapes']},
-
-    # Grade 5
-    {'grade': 5, 'topic': 'Decimals', 'subtopics': ['Add/Sub Decimals', 'Multiply/Divide Decimals', 'Rounding']},
-    {'grade': 5, 'topic': 'Fractions', 'subtopics': ['Add/Sub Unlike Denominators', 'Multiplying Mixed Numbers', 'Dividing Fractions']},
-    {'grade': 5, 'topic': 'Volume', 'subtopics': ['Unit Cubes', 'Volume Formula', 'Composite Volume']},
-    {'grade': 5, 'topic': 'Coordinate Plane', 'subtopics': ['Plotting Points', 'Real World Problems']},
-    {'grade': 5, 'topic': 'Algebraic Thinking', 'subtopics': ['Order of Operations', 'Numerical Expressions']},
-
-    # Grade 6
-    {'grade': 6, 'topic': 'Ratios', 'subtopics': ['Ratio Language', 'Unit Rates', 'Percentages']},
-    {'grade': 6, 'topic': 'Number System', 'subtopics': ['Dividing Fractions', 'Multi-Digit Decimals', 'Negative Numbers']},
-    {'grade': 6, 'topic': 'Expressions', 'subtopics': ['Variables', 'Evaluate Expressions', 'Equivalent Expressions']},
-    {'grade': 6, 'topic': 'Equations', 'subtopics': ['One-Step Equations', 'Inequalities']},
-    {'grade': 6, 'topic': 'Statistics', 'subtopics': ['Mean, Median, Mode', 'Box Plots', 'Histograms']},
-]
+# Topics and target set counts live in data/lesson_plan.json
+GRADES = [1, 2, 3, 4, 5, 6]
 
 def load_curriculum():
-    if CURRICULUM_FILE.exists():
-        with open(CURRICULUM_FILE, 'r') as f:
-            return json.load(f)
-    return []
-
-def save_curriculum(data):
-    with open(CURRICULUM_FILE, 'w') as f:
-        json.dump(data, f, indent=2)
+    # The sharded store once it has been split, else curriculum.json
+    return list(open_curriculum().sets())
 
-def generate_set(grade, topic, subtopic, existing_ids):
+async def generate_set(grade, topic, subtopic, existing_ids):
     model = genai.GenerativeModel(MODEL_NAME)
     
     # Unique seed for this generation to encourage variety
@@ -100,7 +64,7 @@ def generate_set(grade, topic, subtopic, existing_ids):
     Topic: {topic}
     Subtopic: {subtopic}
     
-    Generate 10 multiple-choice questions.
+    Generate {request_count(QUESTIONS_PER_SET)} multiple-choice questions.
     Requirements:
     1. Questions must be age-appropriate for Grade {grade}.
     2. Include 4 options per question.
@@ -127,10 +91,24 @@ def generate_set(grade, topic, subtopic, existing_ids):
     Return ONLY JSON. No markdown formatting.
     """
     
+    metrics = get_metrics()
     try:
-        response = model.generate_content(prompt)
-        text = response.text.replace('```json', '').replace('```', '').strip()
-        data = json.loads(text)
+        with metrics.call('gemini', MODEL_NAME, prompt, grade) as call:
+            response = await model.generate_content_async(prompt)
+            note_response(response)
+            call.text = response.text
+        try:
+            data = parse_set(call.text)
+        except ValueError:
+            metrics.record_yield(1, 0, 0)
+            raise
+        # Over-generated: keep the best QUESTIONS_PER_SET, re-request only on a shortfall
+        rejected = filter_set(data, grade, keep=QUESTIONS_PER_SET)
+        if len(data['questions']) < MIN_QUESTIONS:
+            metrics.record_yield(1, 0, 0)
+            print(f"    ⚠️ Only {len(data['questions'])} usable questions, retrying {describe_rejections(rejected)}")
+            return None
+        metrics.record_yield(1, 1, len(data['questions']))
         
         # Add metadata
         timestamp = int(time.time())
@@ -147,74 +125,89 @@ def generate_set(grade, topic, subtopic, existing_ids):
         return data
         
     except Exception as e:
+        if is_rate_limited(e):
+            raise
         print(f"    ⚠️ Generation failed: {e}")
         return None
 
-def main():
-    print(f"🚀 Starting Safe Bulk Generator (Gemini 1.5 Flash)")
-    print(f"⏱️  Rate Limit Delay: {DELAY_SECONDS}s between requests")
+def main(concurrency=CONCURRENCY, rpm=REQUESTS_PER_MINUTE, tpm=TOKENS_PER_MINUTE):
+    print(f"🚀 Starting Safe Bulk Generator ({MODEL_NAME})")
+    print(f"⏱️  Budget: {rpm} RPM, {tpm} TPM, up to {concurrency} requests in flight")
     
     curriculum = load_curriculum()
     existing_ids = {item['id'] for item in curriculum}
     print(f"📚 Loaded {len(curriculum)} existing sets")
     
-    total_new = 0
-    consecutive_errors = 0
+    # Questions that reword existing ones are dropped as sets arrive
+    deduper = QuestionDeduper()
+    deduper.add_curriculum(curriculum)
+    
+    # Only the sets the lesson plan still needs; saturated subtopics cost nothing
+    jobs = compile_jobs(GRADES, curriculum)
+    get_events().run_started(len(jobs))
+    
+    print(f"📝 {len(jobs)} sets queued, est. {estimate_duration(len(jobs), concurrency, rpm) / 60:.1f} minutes")
+    
+    # Every set is fsync'd to the journal as it arrives, so nothing is lost on a crash
+    journal = Journal('generate_safe_bulk_gemini')
+    state = {'total_new': 0, 'consecutive_errors': 0}
     
-    # Generating 4 sets per subtopic for variety
-    SETS_PER_SUBTOPIC = 4
+    async def worker(job):
+        return await generate_set(job['grade'], job['topic'], job['subtopic'], existing_ids)
+    
+    def on_error(job, error):
+        print(f"    ⚠️ Rate limited on Grade {job['grade']} | {job['subtopic']}, backing off: {error}")
+    
+    def on_result(job, new_set):
+        label = f"Grade {job['grade']} | {job['topic']} | {job['subtopic']} | Set {job['set_num']}"
+        
+        if not new_set:
+            state['consecutive_errors'] += 1
+            print(f"📍 {label} ❌ Skipped after retries")
+            if state['consecutive_errors'] >= 5:
+                print("\n🛑 Too many consecutive errors. Stopping script to protect API key.")
+                engine.stop()
+            return
+        
+        # Concurrent sets for one subtopic can share a timestamp
+        if new_set['id'] in existing_ids:
+            new_set['id'] += f"-{random.randint(100, 999)}"
+        
+        duplicates = deduper.filter_set(new_set)
+        if len(new_set['questions']) < MIN_QUESTIONS:
+            print(f"📍 {label} ♻️  Skipped: {len(duplicates)} near-duplicate questions")
+            return
+        
+        journal.append(new_set)
+        existing_ids.add(new_set['id'])
+        state['total_new'] += 1
+        state['consecutive_errors'] = 0
+        print(f"📍 {label} ✅ Done" + (f" ({len(duplicates)} near-duplicates dropped)" if duplicates else ""))
+    
+    engine = GenerationEngine(
+        worker,
+        concurrency=concurrency,
+        rpm=rpm,
+        tpm=tpm,
+        max_attempts=MAX_RETRIES,
+        retry_delay=RETRY_DELAY_SECONDS,
+        limiter=get_limiter('gemini', MODEL_NAME, maximum=concurrency),
+    )
     
     try:
-        for item in TOPICS:
-            grade = item['grade']
-            topic = item['topic']
-            
-            for subtopic in item['subtopics']:
-                print(f"\n📍 Grade {grade} | {topic} | {subtopic}")
-                
-                for i in range(SETS_PER_SUBTOPIC):
-                    print(f"    Generating Set {i+1}/{SETS_PER_SUBTOPIC}...", end="", flush=True)
-                    
-                    # Rate limit wait FIRST
-                    time.sleep(DELAY_SECONDS)
-                    
-                    retries = 0
-                    success = False
-                    
-                    while retries < MAX_RETRIES:
-                        new_set = generate_set(grade, topic, subtopic, existing_ids)
-                        
-                        if new_set:
-                            curriculum.append(new_set)
-                            existing_ids.add(new_set['id'])
-                            total_new += 1
-                            consecutive_errors = 0
-                            success = True
-                            print(" ✅ Done")
-                            
-                            # Incremental Save
-                            if total_new % BATCH_SIZE == 0:
-                                save_curriculum(curriculum)
-                            break
-                        else:
-                            retries += 1
-                            wait_time = 30 * (2 ** (retries - 1)) # 30s, 60s, 120s...
-                            print(f"\n    ⚠️ Error (429?). Waiting {wait_time}s...")
-                            time.sleep(wait_time)
-                    
-                    if not success:
-                        consecutive_errors += 1
-                        print(" ❌ Skipped after retries")
-                        
-                    if consecutive_errors >= 5:
-                        print("\n🛑 Too many consecutive errors. Stopping script to protect API key.")
-                        return
-
+        engine.run_sync(jobs, on_result, on_error)
     except KeyboardInterrupt:
         print("\n👋 Script stopped by user.")
     finally:
-        save_curriculum(curriculum)
-        print(f"\n💾 Saved! Total curriculum sets: {len(curriculum)} (+{total_new} new)")
+        journal.close()
+        added, _ = compact(journals=[journal.path])
+        print(f"\n💾 Saved! Total curriculum sets: {len(curriculum) + added} (+{added} new)")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY, help='Requests kept in flight')
+    parser.add_argument('--rpm', type=int, default=REQUESTS_PER_MINUTE, help='Requests-per-minute budget')
+    parser.add_argument('--tpm', type=int, default=TOKENS_PER_MINUTE, help='Tokens-per-minute budget')
+    args = parser.parse_args()
+    
+    main(concurrency=args.concurrency, rpm=args.rpm, tpm=args.tpm)
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Async generation engine shared by the curriculum generators
+Keeps several LLM requests in flight under a shared requests-per-minute
+and tokens-per-minute budget instead of sleeping between serial calls
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+
+from progress_events import get_events
+from rate_limiter import is_rate_limited, retry_after
+
+WINDOW_SECONDS = 60.0
+
+
+class QuotaBudget:
+    """Sliding one-minute window over request count and token usage"""
+
+    def __init__(self, rpm=None, tpm=None):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.requests = deque()  # timestamps
+        self.tokens = deque()  # (timestamp, tokens)
+        self.tokens_in_window = 0
+
+    def _expire(self, now):
+        while self.requests and now - self.requests[0] >= WINDOW_SECONDS:
+            self.requests.popleft()
+        while self.tokens and now - self.tokens[0][0] >= WINDOW_SECONDS:
+            self.tokens_in_window -= self.tokens.popleft()[1]
+
+    def _wait_time(self, tokens, now):
+        """Seconds until a request of `tokens` fits, or 0 if it fits now"""
+        wait = 0
+        if self.rpm is not None and len(self.requests) >= self.rpm:
+            wait = self.requests[0] + WINDOW_SECONDS - now
+        # An oversized request is let through on an empty window so it cannot block forever
+        if (self.tpm is not None and self.tokens
+                and self.tokens_in_window + tokens > self.tpm):
+            wait = max(wait, self.tokens[0][0] + WINDOW_SECONDS - now)
+        return max(wait, 0.05) if wait else 0
+
+    async def reserve(self, tokens=0):
+        """Wait until the window has room, then book one request"""
+        while True:
+            now = time.monotonic()
+            self._expire(now)
+            wait = self._wait_time(tokens, now)
+            if wait == 0:
+                self.requests.append(now)
+                if tokens:
+                    self.tokens.append((now, tokens))
+                    self.tokens_in_window += tokens
+                return
+            await asyncio.sleep(wait)
+
+    def settle(self, reserved, actual):
+        """Correct a reservation once the real token usage is known"""
+        delta = actual - reserved
+        if delta:
+            self.tokens.append((time.monotonic(), delta))
+            self.tokens_in_window += delta
+
+
+class GenerationEngine:
+    """
+    Runs `worker(job)` coroutines with up to `concurrency` in flight.
+    Jobs are taken from the queue in order; failed jobs go back on the
+    queue, not to be started before `retry_delay` has passed, and are
+    retried up to `max_attempts` times before `on_result(job, None)` is
+    reported. Runners stay up while any job is queued or in flight, so a
+    retry never leaves the run at lower concurrency.
+
+    With an AdaptiveLimiter the number in flight follows the limiter's
+    window (capped at `concurrency`), and a worker raising a rate-limit
+    error shrinks the window instead of triggering a fixed sleep.
+
+    Every attempt is reported as job_started / job_finished progress
+    events, so the monitor can show what is in flight and how long jobs take.
+    """
+
+    def __init__(self, worker, concurrency=4, rpm=None, tpm=None,
+                 tokens_per_request=0, max_attempts=3, retry_delay=5.0, limiter=None):
+        self.worker = worker
+        self.concurrency = max(1, concurrency)
+        self.limiter = limiter
+        self.budget = QuotaBudget(rpm=rpm, tpm=tpm)
+        self.tokens_per_request = tokens_per_request
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.stopped = False
+        self._wake = None
+
+    def stop(self):
+        """Stop handing out new jobs; in-flight requests still finish"""
+        self.stopped = True
+        if self._wake is not None:
+            self._wake.set()
+
+    def submit(self, job):
+        """Queue another job during a run, e.g. from on_result for the unfinished part of a batch"""
+        self._put(job, 1)
+        self._unfinished += 1
+
+    def _put(self, job, attempt, not_before=0.0):
+        heapq.heappush(self._queue, (not_before, next(self._order), job, attempt))
+        self._wake.set()
+
+    async def _next_job(self):
+        """The next job whose retry time has come, or None once there is no work left"""
+        while not self.stopped:
+            self._wake.clear()
+            if self._queue:
+                wait = self._queue[0][0] - time.monotonic()
+                if wait <= 0:
+                    _, _, job, attempt = heapq.heappop(self._queue)
+                    return job, attempt
+            elif not self._unfinished:
+                return None
+            else:
+                wait = None
+            # Woken early when a job is queued, finishes, or the run is stopped
+            try:
+                await asyncio.wait_for(self._wake.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+        return None
+
+    async def _run_one(self, on_result, on_error):
+        while True:
+            taken = await self._next_job()
+            if taken is None:
+                return
+            job, attempt = taken
+
+            if self.limiter:
+                await self.limiter.acquire_async()
+            await self.budget.reserve(self.tokens_per_request)
+            if self.stopped:
+                if self.limiter:
+                    self.limiter.release()
+                return
+
+            throttled = False
+            error = None
+            events = get_events()
+            events.job_started(job, attempt)
+            started = time.monotonic()
+            try:
+                result = await self.worker(job)
+            except Exception as e:
+                result = None
+                error = e
+                throttled = self.limiter is not None and is_rate_limited(e)
+                if on_error:
+                    on_error(job, e)
+            events.job_finished(job, time.monotonic() - started, result is not None, attempt, error)
+
+            if self.limiter:
+                if throttled:
+                    self.limiter.throttled(retry_after(error))
+                elif result is None:
+                    self.limiter.release()
+                else:
+                    self.limiter.success()
+
+            if result is None and attempt < self.max_attempts:
+                # The limiter already paused new requests after a 429
+                delay = 0 if throttled else self.retry_delay
+                self._put(job, attempt + 1, time.monotonic() + delay)
+                continue
+
+            self._unfinished -= 1
+            self._wake.set()
+            on_result(job, result)
+
+    async def run(self, jobs, on_result, on_error=None):
+        """Process every job, calling on_result(job, result) as each finishes"""
+        self._queue = []
+        self._order = itertools.count()
+        self._wake = asyncio.Event()
+        self._unfinished = 0
+        for job in jobs:
+            self._put(job, 1)
+            self._unfinished += 1
+
+        runners = [self._run_one(on_result, on_error) for _ in range(self.concurrency)]
+        await asyncio.gather(*runners)
+
+    def run_sync(self, jobs, on_result, on_error=None):
+        """Blocking wrapper for scripts that are not async themselves"""
+        asyncio.run(self.run(jobs, on_result, on_error))
+
+
+def estimate_duration(total_jobs, concurrency, rpm=None, avg_latency=8.0):
+    """Rough wall-clock estimate in seconds for a run"""
+    latency_bound = total_jobs * avg_latency / max(1, concurrency)
+    quota_bound = total_jobs * WINDOW_SECONDS / rpm if rpm else 0
+    return max(latency_bound, quota_bound)
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Streaming, incremental JSON salvage parser for LLM responses
+Consumes a response chunk by chunk and yields each complete curriculum set
+(or question) object as soon as its closing brace arrives. One bad
+character only costs the object it is in, not the whole response.
+
+Repairs: code fences and prose around the JSON, trailing commas, raw
+control characters in strings, and a truncated tail (unterminated final
+string / unclosed brackets) which is closed at the last complete element.
+"""
+
+import json
+
+# Keep at most this much already-consumed text before trimming the buffer
+TRIM_THRESHOLD = 64 * 1024
+
+QUESTION_KEYS = ('question', 'options', 'answer')
+
+
+def is_question(obj):
+    return isinstance(obj, dict) and all(key in obj for key in QUESTION_KEYS)
+
+
+def is_set(obj):
+    return isinstance(obj, dict) and isinstance(obj.get('questions'), list)
+
+
+def remove_trailing_commas(text):
+    """Drop commas directly followed by } or ], ignoring string contents"""
+    out = []
+    in_string = False
+    escape = False
+    pending_comma = None  # index in out of a comma we may need to drop
+
+    for c in text:
+        if in_string:
+            out.append(c)
+            if escape:
+                escape = False
+            elif c == '\\':
+                escape = True
+            elif c == '"':
+                in_string = False
+            continue
+
+        if c in '}]' and pending_comma is not None:
+            out[pending_comma] = ''
+        if not c.isspace():
+            pending_comma = None
+
+        if c == '"':
+            in_string = True
+        elif c == ',':
+            pending_comma = len(out)
+        out.append(c)
+
+    return ''.join(out)
+
+
+def loads_lenient(text):
+    """json.loads with the cheap repairs applied on failure; None if unrecoverable"""
+    try:
+        return json.loads(text, strict=False)
+    except json.JSONDecodeError:
+        pass
+    try:
+        return json.loads(remove_trailing_commas(text), strict=False)
+    except json.JSONDecodeError:
+        return None
+
+
+class StreamingSalvager:
+    """
+    Incremental scanner over a streamed response.
+
+    kind='set' yields objects with a "questions" list; kind='question'
+    yields objects with question/options/answer.
+    """
+
+    def __init__(self, kind='set'):
+        if kind not in ('set', 'question'):
+            raise ValueError(f"Unknown kind: {kind}")
+        self.kind = kind
+        self.buf = ''
+        self.base = 0  # absolute offset of buf[0]
+        self.pos = 0  # absolute scan position
+        self.stack = []  # [opener, absolute start, absolute position of last comma]
+        self.in_string = False
+        self.escape = False
+        self.emitted = 0
+        self.dropped = 0
+
+    def _accept(self, obj):
+        return is_set(obj) if self.kind == 'set' else is_question(obj)
+
+    def _looks_like_target(self, text):
+        return '"questions"' in text if self.kind == 'set' else '"question"' in text
+
+    def feed(self, chunk):
+        """Consume a chunk of text; return the objects it completed"""
+        out = []
+        self.buf += chunk
+        buf = self.buf
+        base = self.base
+        i = self.pos - base
+        n = len(buf)
+
+        while i < n:
+            c = buf[i]
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif c == '\\':
+                    self.escape = True
+                elif c == '"':
+                    self.in_string = False
+            elif c == '"':
+                # Quotes in prose outside the JSON are not strings
+                if self.stack:
+                    self.in_string = True
+            elif c == '{' or c == '[':
+                self.stack.append([c, base + i, None])
+            elif c == '}' or c == ']':
+                if self.stack:
+                    opener, start, _ = self.stack.pop()
+                    if opener == '{' and c == '}':
+                        text = buf[start - base:i + 1]
+                        obj = loads_lenient(text)
+                        if obj is not None and self._accept(obj):
+                            out.append(obj)
+                        elif obj is None and self._looks_like_target(text):
+                            self.dropped += 1
+            elif c == ',' and self.stack:
+                self.stack[-1][2] = base + i
+            i += 1
+
+        self.pos = base + i
+        self._trim()
+        self.emitted += len(out)
+        return out
+
+    def _trim(self):
+        """Forget text that no open object can still need"""
+        starts = [start for opener, start, _ in self.stack if opener == '{']
+        keep = min(starts) if starts else self.pos
+        if keep - self.base > TRIM_THRESHOLD:
+            self.buf = self.buf[keep - self.base:]
+            self.base = keep
+
+    def _tail_candidates(self, index):
+        """Repaired versions of the unfinished object at stack[index], most complete first"""
+        containers = self.stack[index:]
+        start = containers[0][1] - self.base
+        text = self.buf[start:]
+        if self.in_string:
+            text += '"'
+
+        def closers(entries):
+            return ''.join('}' if opener == '{' else ']' for opener, _, _ in reversed(entries))
+
+        yield text + closers(containers)
+        # Cut the partial element off each container, innermost first
+        for k in range(len(containers) - 1, -1, -1):
+            comma = containers[k][2]
+            if comma is not None and comma >= containers[k][1]:
+                yield self.buf[start:comma - self.base] + closers(containers[:k + 1])
+
+    def finish(self):
+        """Salvage the truncated tail once the stream has ended"""
+        out = []
+        for index, (opener, _, _) in enumerate(self.stack):
+            if opener != '{':
+                continue
+            for candidate in self._tail_candidates(index):
+                obj = loads_lenient(candidate)
+                if obj is None or not self._accept(obj):
+                    continue
+                if self.kind == 'set':
+                    # The last question is usually the one cut off
+                    obj['questions'] = [q for q in obj['questions'] if is_question(q)]
+                    if not obj['questions']:
+                        continue
+                out.append(obj)
+                break
+            if out:
+                break
+
+        if not out and any(opener == '{' for opener, _, _ in self.stack):
+            self.dropped += 1
+
+        self.stack = []
+        self.in_string = False
+        self.escape = False
+        self.emitted += len(out)
+        return out
+
+
+def iter_objects(chunks, kind='set'):
+    """Yield complete objects from an iterable of text chunks as they close"""
+    salvager = StreamingSalvager(kind)
+    for chunk in chunks:
+        yield from salvager.feed(chunk)
+    yield from salvager.finish()
+
+
+def salvage(text, kind='set'):
+    """All objects recoverable from a complete response"""
+    return list(iter_objects([text], kind))
+
+
+def parse_set(text):
+    """The first curriculum set in a single-set response; raises ValueError if none"""
+    sets = salvage(text, 'set')
+    if not sets:
+        raise ValueError(f"No curriculum set found in response ({len(text)} chars)")
+    return sets[0]
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Compile the declarative lesson plan into generation jobs
+data/lesson_plan.json lists grade -> topic -> subtopic -> target number of
+sets. The compiler counts what the curriculum already has for each
+subtopic (in questions, so thin sets count partially) and emits jobs only
+for the sets still missing, breadth first so a --limit still touches
+every subtopic. Generators call compile_jobs(grades=...) instead of
+keeping their own topic lists.
+
+Usage:
+  python scripts/lesson_plan.py diff [--grades 7-9] [--all]
+  python scripts/lesson_plan.py jobs [--grades 1-6] [--out jobs.json]
+  python scripts/lesson_plan.py diff --coverage thin-skills-to-expand.json
+"""
+
+import argparse
+import json
+import re
+from pathlib import Path
+
+from curriculum_store import CURRICULUM_FILE, MANIFEST_NAME, STORE_DIR, open_curriculum
+
+PROJECT_ROOT = Path(__file__).parent.parent
+PLAN_FILE = PROJECT_ROOT / 'data' / 'lesson_plan.json'
+THIN_SKILLS_FILE = PROJECT_ROOT / 'thin-skills-to-expand.json'
+
+DEFAULT_QUESTIONS_PER_SET = 8
+
+
+def slug(text):
+    return str(text).lower().replace(' ', '-')
+
+
+def _compact(text):
+    return re.sub(r'[^a-z0-9]', '', str(text).lower())
+
+
+def parse_grades(spec):
+    """'7-9' / '1,3,5' / '0-2,6' -> sorted list of ints (None passes through)"""
+    if not spec:
+        return None
+    grades = set()
+    for part in str(spec).split(','):
+        low, _, high = part.strip().partition('-')
+        grades.update(range(int(low), int(high or low) + 1))
+    return sorted(grades)
+
+
+def load_plan(path=PLAN_FILE):
+    """(entries, questions_per_set); entries are {grade, topic, subtopic, target}"""
+    with open(path, 'r') as f:
+        plan = json.load(f)
+    entries = []
+    for grade, topics in plan['grades'].items():
+        for topic, subtopics in topics.items():
+            for subtopic, target in subtopics.items():
+                entries.append({'grade': int(grade), 'topic': topic, 'subtopic': subtopic, 'target': target})
+    return entries, plan.get('questions_per_set', DEFAULT_QUESTIONS_PER_SET)
+
+
+def coverage_from_curriculum(curriculum):
+    """One record per existing set: {id, title, topic, grade, questions}"""
+    return [{
+        'id': s.get('id', ''),
+        'title': s.get('title', ''),
+        'topic': s.get('topic', ''),
+        'grade': s.get('grade_level'),
+        'questions': len(s.get('questions', [])),
+    } for s in curriculum]
+
+
+def coverage_from_thin_skills(thin_skills):
+    """Records from thin-skills-to-expand.json ({grade: [{id, title, topic, current, needed}]})"""
+    return [{
+        'id': skill.get('id', ''),
+        'title': skill.get('title', ''),
+        'topic': skill.get('topic', ''),
+        'grade': int(grade),
+        'questions': skill.get('current', 0),
+    } for grade, skills in thin_skills.items() for skill in skills]
+
+
+def load_coverage(path=None):
+    """
+    Coverage records from a curriculum file or a thin-skills file (detected
+    by shape). By default the curriculum (the sharded store once it has been
+    split), falling back to thin-skills, which only lists under-filled
+    skills and so undercounts coverage.
+    """
+    if path is None:
+        if (STORE_DIR / MANIFEST_NAME).exists() or CURRICULUM_FILE.exists():
+            return coverage_from_curriculum(open_curriculum().sets())
+        if THIN_SKILLS_FILE.exists():
+            print(f"⚠️  {CURRICULUM_FILE.name} not found, using {THIN_SKILLS_FILE.name} (thin skills only)")
+            path = THIN_SKILLS_FILE
+        else:
+            return []
+    with open(path, 'r') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        return coverage_from_thin_skills(data)
+    return coverage_from_curriculum(data)
+
+
+def matches(entry, record):
+    """Does an existing set/skill cover this plan entry? (same grade, topic and subtopic)"""
+    if record['grade'] != entry['grade']:
+        return False
+    topic = _compact(entry['topic'])
+    subtopic = _compact(entry['subtopic'])
+    set_id = _compact(record['id'])
+    if topic != _compact(record['topic']) and topic not in set_id:
+        return False
+    return subtopic in set_id or subtopic in _compact(record['title'])
+
+
+def last_set_number(entry, covered):
+    """Highest N among covered ids shaped like this entry's '<grade>-<topic>-<subtopic>-N'"""
+    prefix = f"{entry['grade']}-{slug(entry['topic'])}-{slug(entry['subtopic'])}-"
+    numbers = [int(r['id'][len(prefix):]) for r in covered
+               if r['id'].startswith(prefix) and r['id'][len(prefix):].isdigit()]
+    return max(numbers, default=0)
+
+
+def diff(entries, coverage, questions_per_set=DEFAULT_QUESTIONS_PER_SET):
+    """Per plan entry: current sets/questions and how many sets are still needed"""
+    by_grade = {}
+    for record in coverage:
+        by_grade.setdefault(record['grade'], []).append(record)
+
+    rows = []
+    for entry in entries:
+        covered = [r for r in by_grade.get(entry['grade'], []) if matches(entry, r)]
+        questions = sum(r['questions'] for r in covered)
+        # Thin sets count for the questions they have, not as whole sets
+        equivalent_sets = questions // questions_per_set
+        rows.append({
+            **entry,
+            'current_sets': len(covered),
+            'current_questions': questions,
+            # Ids can have gaps (deleted or renamed sets), so new ones go after the highest
+            'last_set': max(len(covered), last_set_number(entry, covered)),
+            'needed': max(0, entry['target'] - equivalent_sets),
+        })
+    return rows
+
+
+def jobs_from_diff(rows):
+    """Jobs for the missing sets, breadth first; set numbers continue after the highest existing one"""
+    jobs = []
+    rounds = max((row['needed'] for row in rows), default=0)
+    for k in range(rounds):
+        for row in rows:
+            if k >= row['needed']:
+                continue
+            grade, topic, subtopic = row['grade'], row['topic'], row['subtopic']
+            set_num = row['last_set'] + k + 1
+            jobs.append({
+                'id': f"{grade}-{topic}-{subtopic}-{set_num}",
+                'set_id': f"{grade}-{slug(topic)}-{slug(subtopic)}-{set_num}",
+                'title': f"{subtopic} - Set {set_num}",
+                'grade': grade,
+                'topic': topic,
+                'subtopic': subtopic,
+                'set_num': set_num,
+            })
+    return jobs
+
+
+def compile_jobs(grades=None, curriculum=None, plan_file=PLAN_FILE):
+    """Jobs still needed for the given grades, against `curriculum` (or the default coverage file)"""
+    entries, questions_per_set = load_plan(plan_file)
+    if grades is not None:
+        entries = [e for e in entries if e['grade'] in grades]
+    coverage = load_coverage() if curriculum is None else coverage_from_curriculum(curriculum)
+    return jobs_from_diff(diff(entries, coverage, questions_per_set))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Diff the lesson plan against the curriculum and emit needed jobs')
+    parser.add_argument('command', choices=['diff', 'jobs'])
+    parser.add_argument('--grades', help='e.g. 7-9 or 0,1,2')
+    parser.add_argument('--plan', default=str(PLAN_FILE))
+    parser.add_argument('--coverage', help='Curriculum or thin-skills file (default: the curriculum)')
+    parser.add_argument('--all', action='store_true', help='diff: also list saturated subtopics')
+    parser.add_argument('--out', help='jobs: write to this file instead of stdout')
+    args = parser.parse_args()
+
+    grades = parse_grades(args.grades)
+    entries, questions_per_set = load_plan(args.plan)
+    if grades is not None:
+        entries = [e for e in entries if e['grade'] in grades]
+    rows = diff(entries, load_coverage(args.coverage), questions_per_set)
+
+    if args.command == 'jobs':
+        jobs = jobs_from_diff(rows)
+        text = json.dumps(jobs, indent=2, ensure_ascii=False)
+        if args.out:
+            with open(args.out, 'w') as f:
+                f.write(text + '\n')
+            print(f"💾 {len(jobs)} jobs written to {args.out}")
+        else:
+            print(text)
+        return
+
+    current_grade = None
+    for row in rows:
+        if not row['needed'] and not args.all:
+            continue
+        if row['grade'] != current_grade:
+            current_grade = row['grade']
+            print(f"\nGrade {'K' if current_grade == 0 else current_grade}")
+        status = f"need +{row['needed']}" if row['needed'] else 'saturated'
+        print(f"   {row['topic']} / {row['subtopic']}: {row['current_sets']} sets, "
+              f"{row['current_questions']}q of {row['target']} sets ({status})")
+
+    target = sum(row['target'] for row in rows)
+    needed = sum(row['needed'] for row in rows)
+    saturated = sum(1 for row in rows if not row['needed'])
+    print(f"\n📊 {len(rows)} subtopics, {saturated} saturated; {needed} of {target} planned sets still needed")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Provider-agnostic LLM backends and a work-stealing fan-out scheduler
+Claude, Gemini and Ollama share one `complete(prompt)` interface (with the
+response cache), and the scheduler hands jobs to whichever provider has
+spare capacity in its adaptive rate limiter.
+"""
+
+import os
+import threading
+from collections import deque
+
+from llm_cache import get_cache
+from llm_metrics import get_metrics
+from ollama_client import OllamaClient
+from rate_limiter import get_limiter, is_rate_limited, retry_after
+
+DEFAULT_MODELS = {
+    'claude': 'claude-3-haiku-20240307',
+    'gemini': 'gemini-2.0-flash-exp',
+    'ollama': 'qwen2.5-coder:7b',
+}
+
+
+class Backend:
+    """Base class; subclasses implement request(prompt, max_tokens) -> text"""
+
+    provider = None
+    # Remote APIs start low and grow their window; a local server can start full
+    ramp_up = True
+
+    def __init__(self, model=None, max_concurrency=None):
+        self.model = model or DEFAULT_MODELS[self.provider]
+        overrides = {'maximum': max_concurrency} if max_concurrency else {}
+        if max_concurrency and not self.ramp_up:
+            overrides['initial'] = max_concurrency
+        self.limiter = get_limiter(self.provider, self.model, **overrides)
+        self.cache = get_cache()
+
+    def __repr__(self):
+        return f"{self.provider}/{self.model}"
+
+    def request(self, prompt, max_tokens):
+        raise NotImplementedError
+
+    def complete(self, prompt, max_tokens=4096, parse=None):
+        """
+        Response text from the cache, or a raw request (caller holds a limiter
+        slot); with parse(text), its result, and only parsed responses are cached
+        """
+        return self.cache.complete(
+            self.provider, self.model, prompt, {'max_tokens': max_tokens},
+            lambda: self.request(prompt, max_tokens), parse
+        )
+
+
+class ClaudeBackend(Backend):
+    provider = 'claude'
+
+    def __init__(self, model=None, max_concurrency=None):
+        super().__init__(model, max_concurrency)
+        from anthropic import Anthropic
+        self.client = Anthropic(api_key=os.getenv('CLAUDE_API_KEY'))
+
+    def request(self, prompt, max_tokens):
+        message = self.client.messages.create(
+            model=self.model,
+            max_tokens=max_tokens,
+            messages=[{"role": "user", "content": prompt}]
+        )
+        return message.content[0].text
+
+
+class GeminiBackend(Backend):
+    provider = 'gemini'
+
+    def __init__(self, model=None, max_concurrency=None):
+        super().__init__(model, max_concurrency)
+        from google import generativeai as genai
+        endpoint = os.getenv('GEMINI_API_ENDPOINT')  # e.g. llm_stub_server.py
+        if endpoint:
+            genai.configure(api_key=os.getenv('VITE_GEMINI_API_KEY'), transport='rest',
+                            client_options={'api_endpoint': endpoint})
+        else:
+            genai.configure(api_key=os.getenv('VITE_GEMINI_API_KEY'))
+        self.genai = genai
+        self.client = genai.GenerativeModel(self.model)
+
+    def request(self, prompt, max_tokens):
+        response = self.client.generate_content(
+            prompt,
+            generation_config=self.genai.types.GenerationConfig(
+                temperature=0.7,
+                max_output_tokens=max_tokens,
+            )
+        )
+        return response.text
+
+
+class OllamaBackend(Backend):
+    provider = 'ollama'
+    ramp_up = False
+
+    def __init__(self, model=None, max_concurrency=None, timeout=120):
+        self.client = OllamaClient(model or DEFAULT_MODELS['ollama'], parallel=max_concurrency, timeout=timeout)
+        # One worker per server slot; extra requests would only queue inside Ollama
+        super().__init__(model, max_concurrency or self.client.parallel)
+        self.client.warm()
+
+    def request(self, prompt, max_tokens):
+        return self.client.generate(prompt, max_tokens)
+
+
+BACKENDS = {
+    'claude': ClaudeBackend,
+    'gemini': GeminiBackend,
+    'ollama': OllamaBackend,
+}
+
+API_KEY_ENV = {
+    'claude': 'CLAUDE_API_KEY',
+    'gemini': 'VITE_GEMINI_API_KEY',
+}
+
+
+def create_backends(names):
+    """Instantiate the named providers ("claude", "gemini:gemini-2.0-flash", ...), skipping ones without keys"""
+    backends = []
+    for name in names:
+        provider, _, model = name.partition(':')
+        if provider not in BACKENDS:
+            raise ValueError(f"Unknown provider: {provider}")
+        key_env = API_KEY_ENV.get(provider)
+        if key_env and not os.getenv(key_env):
+            print(f"⚠️  {key_env} not set, skipping {provider}")
+            continue
+        try:
+            backends.append(BACKENDS[provider](model or None))
+        except OSError as e:
+            print(f"⚠️  {provider} unreachable ({e}), skipping")
+    return backends
+
+
+class FanOutScheduler:
+    """
+    Work-stealing scheduler across providers.
+
+    Jobs are dealt round-robin (or by a job's 'provider' preference) into one
+    deque per backend. Each backend runs up to its limiter's maximum worker
+    threads; a worker waits for a limiter slot, takes from the front of its
+    own deque and, once that is empty, steals from the back of the longest
+    other deque. Slow or throttled providers therefore end up with fewer jobs.
+    """
+
+    def __init__(self, backends, max_attempts=3):
+        if not backends:
+            raise ValueError("No LLM backends available")
+        self.backends = backends
+        self.max_attempts = max_attempts
+        self.queues = {id(b): deque() for b in backends}
+        self._lock = threading.Lock()
+        self._outstanding = 0
+        self._done = threading.Event()
+        self.stats = {repr(b): {'ok': 0, 'failed': 0, 'stolen': 0} for b in backends}
+
+    def _deal(self, jobs):
+        for i, job in enumerate(jobs):
+            preferred = [b for b in self.backends if b.provider == job.get('provider')]
+            backend = preferred[0] if preferred else self.backends[i % len(self.backends)]
+            self.queues[id(backend)].append((job, 1))
+            self._outstanding += 1
+
+    def _take(self, backend):
+        with self._lock:
+            own = self.queues[id(backend)]
+            if own:
+                return own.popleft()
+            victim = max(self.queues.values(), key=len)
+            if victim:
+                self.stats[repr(backend)]['stolen'] += 1
+                return victim.pop()
+            return None
+
+    def _requeue(self, backend, job, attempt):
+        with self._lock:
+            # Put it on the back of another provider's queue so a different model gets a try
+            others = [b for b in self.backends if b is not backend] or [backend]
+            target = min(others, key=lambda b: len(self.queues[id(b)]))
+            self.queues[id(target)].append((job, attempt + 1))
+
+    def _finish_job(self):
+        with self._lock:
+            self._outstanding -= 1
+            if self._outstanding == 0:
+                self._done.set()
+
+    def _worker(self, backend, prompt_for, parse, on_result, claim):
+        while not self._done.is_set():
+            backend.limiter.acquire()
+            item = self._take(backend)
+            if item is None:
+                backend.limiter.release()
+                # Jobs may still come back from a failing provider
+                if self._done.wait(0.5):
+                    return
+                continue
+
+            job, attempt = item
+            if claim and not claim(job):
+                # Finished or leased elsewhere (e.g. another process on the same ledger)
+                backend.limiter.release()
+                self._finish_job()
+                continue
+
+            prompt, max_tokens = prompt_for(job)
+            metrics = get_metrics()
+
+            def parse_job(text, job=job):
+                try:
+                    return parse(job, text)
+                except Exception:
+                    metrics.record_yield(1, 0, 0, grade=job.get('grade'))
+                    raise
+
+            try:
+                # A response that doesn't parse is never cached, so a retry asks again
+                result = backend.complete(prompt, max_tokens, parse_job)
+            except Exception as e:
+                if is_rate_limited(e):
+                    backend.limiter.throttled(retry_after(e))
+                else:
+                    backend.limiter.release()
+                self.stats[repr(backend)]['failed'] += 1
+                if attempt < self.max_attempts:
+                    self._requeue(backend, job, attempt)
+                else:
+                    on_result(job, None, backend, e)
+                    self._finish_job()
+                continue
+
+            backend.limiter.success()
+            metrics.record_yield(1, 1, len(result.get('questions', [])) if isinstance(result, dict) else 0,
+                                 grade=job.get('grade'))
+            self.stats[repr(backend)]['ok'] += 1
+            on_result(job, result, backend, None)
+            self._finish_job()
+
+    def run(self, jobs, prompt_for, parse, on_result, claim=None):
+        """
+        claim(job) -> bool, if given, is checked before each request; jobs
+        it refuses are dropped without calling on_result.
+        prompt_for(job) -> (prompt, max_tokens)
+        parse(job, text) -> result, raising on unusable output
+        on_result(job, result, backend, error) is called once per job,
+        with result None after max_attempts failures. Calls are serialized.
+        """
+        self._deal(jobs)
+        if self._outstanding == 0:
+            return
+
+        result_lock = threading.Lock()
+
+        def locked_on_result(*args):
+            with result_lock:
+                on_result(*args)
+
+        threads = []
+        for backend in self.backends:
+            for _ in range(backend.limiter.maximum):
+                t = threading.Thread(
+                    target=self._worker,
+                    args=(backend, prompt_for, parse, locked_on_result, claim),
+                    daemon=True,
+                )
+                t.start()
+                threads.append(t)
+
+        self._done.wait()
+        for t in threads:
+            t.join(timeout=1)
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache for LLM responses
+Keyed by a hash of provider, model, generation config and prompt; raw
+responses are stored compressed in SQLite with size-based LRU eviction.
+
+Modes (LLM_CACHE env var or flags on the calling script):
+  on          read and write the cache (default)
+  off         always call the API              (--no-cache)
+  only        replay from the cache, never call (--cache-only)
+
+Only responses the caller could use are kept: with `parse`, complete()
+stores a response once parse accepts it and drops a stored one parse
+rejects. Asking for the same prompt again in one process means the caller
+is retrying what it got, so that bypasses the stored response and
+overwrites it.
+
+Usage:
+  python scripts/llm_cache.py stats
+  python scripts/llm_cache.py evict --max-mb 200
+  python scripts/llm_cache.py clear
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from pathlib import Path
+
+from llm_metrics import get_metrics
+
+PROJECT_ROOT = Path(__file__).parent.parent
+CACHE_FILE = PROJECT_ROOT / '.llm_cache' / 'responses.sqlite'
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+class CacheMiss(Exception):
+    """Raised in cache-only mode when a prompt has no stored response"""
+
+
+def cache_key(provider, model, prompt, config=None):
+    """Stable hash of everything that determines a response"""
+    payload = json.dumps({
+        'provider': provider,
+        'model': model,
+        'config': config or {},
+        'prompt': prompt,
+    }, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def mode_from_args(argv=None):
+    """Resolve the cache mode from --cache-only / --no-cache or LLM_CACHE"""
+    argv = sys.argv if argv is None else argv
+    if '--cache-only' in argv:
+        return 'only'
+    if '--no-cache' in argv:
+        return 'off'
+    return os.getenv('LLM_CACHE', 'on')
+
+
+class ResponseCache:
+    """SQLite-backed response store shared across threads"""
+
+    def __init__(self, path=CACHE_FILE, max_bytes=DEFAULT_MAX_BYTES, mode='on'):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+        self._served = set()  # Keys answered in this process; asking again is a retry
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('''
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                provider TEXT,
+                model TEXT,
+                body BLOB,
+                size INTEGER,
+                created REAL,
+                last_used REAL
+            )
+        ''')
+        self._db.execute('CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses(last_used)')
+        self._db.commit()
+
+    def get(self, key):
+        """Stored response text, or None"""
+        with self._lock:
+            row = self._db.execute('SELECT body FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            self._db.execute('UPDATE responses SET last_used = ? WHERE key = ?', (time.time(), key))
+            self._db.commit()
+        return zlib.decompress(row[0]).decode('utf-8')
+
+    def put(self, key, provider, model, text):
+        """Store a response and evict old entries if over budget"""
+        body = zlib.compress(text.encode('utf-8'), 6)
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (key, provider, model, body, len(body), now, now)
+            )
+            self._db.commit()
+        self.evict()
+
+    def discard(self, key):
+        with self._lock:
+            self._db.execute('DELETE FROM responses WHERE key = ?', (key,))
+            self._db.commit()
+
+    def total_bytes(self):
+        with self._lock:
+            return self._db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+    def evict(self, max_bytes=None):
+        """Drop least recently used entries until the store fits in max_bytes"""
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        total = self.total_bytes()
+        if total <= limit:
+            return 0
+
+        removed = 0
+        target = int(limit * 0.9)  # Leave headroom so we don't evict on every put
+        with self._lock:
+            rows = self._db.execute('SELECT key, size FROM responses ORDER BY last_used').fetchall()
+            doomed = []
+            for key, size in rows:
+                if total <= target:
+                    break
+                doomed.append((key,))
+                total -= size
+            self._db.executemany('DELETE FROM responses WHERE key = ?', doomed)
+            self._db.commit()
+            removed = len(doomed)
+        return removed
+
+    def complete(self, provider, model, prompt, config, request, parse=None):
+        """
+        Return the response text for this prompt, calling `request()` only on
+        a cache miss. `request` must return the raw response text. With
+        `parse(text)`, its result is returned instead and the response is
+        only stored if parse doesn't raise. A prompt already answered in this
+        process is a retry and goes to the API. Hits and requests are both
+        recorded in the metrics store.
+        """
+        key = cache_key(provider, model, prompt, config)
+        metrics = get_metrics()
+        with self._lock:
+            retry = key in self._served
+            self._served.add(key)
+
+        if self.mode != 'off' and (not retry or self.mode == 'only'):
+            text = self.get(key)
+            if text is not None:
+                try:
+                    result = text if parse is None else parse(text)
+                except Exception:
+                    if self.mode == 'only':
+                        raise
+                    self.discard(key)  # Unusable; ask again below
+                else:
+                    self.hits += 1
+                    metrics.cached(provider, model, prompt, text)
+                    return result
+            elif self.mode == 'only':
+                self.misses += 1
+                raise CacheMiss(f"No cached response for {provider}/{model} ({key[:12]})")
+
+        self.misses += 1
+        with metrics.call(provider, model, prompt) as call:
+            text = call.text = request()
+        result = text if parse is None else parse(text)
+        if self.mode != 'off' and text:
+            self.put(key, provider, model, text)
+        return result
+
+    def stats(self):
+        with self._lock:
+            rows = self._db.execute('''
+                SELECT provider, model, COUNT(*), SUM(size) FROM responses
+                GROUP BY provider, model ORDER BY provider, model
+            ''').fetchall()
+        return rows
+
+
+_cache = None
+
+
+def get_cache():
+    """Process-wide cache configured from the command line / environment"""
+    global _cache
+    if _cache is None:
+        max_mb = os.getenv('LLM_CACHE_MAX_MB')
+        max_bytes = int(max_mb) * 1024 * 1024 if max_mb else DEFAULT_MAX_BYTES
+        _cache = ResponseCache(max_bytes=max_bytes, mode=mode_from_args())
+    return _cache
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect or trim the LLM response cache')
+    parser.add_argument('command', choices=['stats', 'evict', 'clear'])
+    parser.add_argument('--max-mb', type=int, help='Size budget for evict')
+    args = parser.parse_args()
+
+    if not CACHE_FILE.exists():
+        print(f"No cache at {CACHE_FILE}")
+        return
+
+    cache = ResponseCache()
+
+    if args.command == 'stats':
+        total = 0
+        for provider, model, count, size in cache.stats():
+            total += size
+            print(f"  {provider}/{model}: {count} responses, {size / 1024:.0f} KB")
+        print(f"Total: {total / 1024 / 1024:.1f} MB in {CACHE_FILE}")
+    elif args.command == 'evict':
+        max_bytes = args.max_mb * 1024 * 1024 if args.max_mb else DEFAULT_MAX_BYTES
+        removed = cache.evict(max_bytes)
+        print(f"Evicted {removed} responses")
+    elif args.command == 'clear':
+        cache.evict(0)
+        print("Cache cleared")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+Token, cost and throughput telemetry for LLM calls
+Every request made through the response cache (or wrapped in
+metrics.call()) becomes one row in a local SQLite store: provider, model,
+grade, input/output tokens, latency, rate-limit retries, cache hit and
+error. Generators attach the outcome of parsing the response to the same
+row (sets requested and accepted, questions kept), so the report can
+compare accepted questions per hour and per dollar across providers.
+The same facts go out as live progress events (progress_events.py).
+
+Usage:
+  python scripts/llm_metrics.py report [--by provider,model,grade] [--since 24] [--run NAME]
+  python scripts/llm_metrics.py report --json
+"""
+
+import argparse
+import contextlib
+import contextvars
+import json
+import math
+import sqlite3
+import sys
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from progress_events import get_events
+
+PROJECT_ROOT = Path(__file__).parent.parent
+METRICS_FILE = PROJECT_ROOT / 'data' / 'llm_metrics.sqlite'
+
+# List prices in USD per million (input, output) tokens; local models are free
+PRICES = {
+    'claude-3-haiku-20240307': (0.25, 1.25),
+    'claude-3-5-sonnet-20241022': (3.00, 15.00),
+    'gemini-2.0-flash-exp': (0.10, 0.40),
+    'gemini-2.0-flash': (0.10, 0.40),
+    'gemini-1.5-flash': (0.075, 0.30),
+}
+GROUP_COLUMNS = ('run', 'provider', 'model', 'grade')
+
+# The call in flight and the last finished call in this thread / asyncio task
+_active = contextvars.ContextVar('llm_metrics_active', default=None)
+_last = contextvars.ContextVar('llm_metrics_last', default=None)
+
+
+def _estimate_tokens(text):
+    return len(text or '') // 4 + 1
+
+
+def cost(provider, model, input_tokens, output_tokens):
+    """USD for one request at list price"""
+    if provider == 'ollama':
+        return 0.0
+    price_in, price_out = PRICES.get(model, (0.0, 0.0))
+    return (input_tokens * price_in + output_tokens * price_out) / 1_000_000
+
+
+class CallRecord:
+    """One LLM request; token counts fall back to estimates from the prompt and response text"""
+
+    __slots__ = ('provider', 'model', 'prompt', 'grade', 'text', 'input_tokens',
+                 'output_tokens', 'retries', 'cached', 'error', 'row_id')
+
+    def __init__(self, provider, model, prompt='', grade=None, cached=False):
+        self.provider = provider
+        self.model = model
+        self.prompt = prompt
+        self.grade = grade
+        self.text = None
+        self.input_tokens = None
+        self.output_tokens = None
+        self.retries = 0
+        self.cached = cached
+        self.error = None
+        self.row_id = None
+
+
+def note_usage(input_tokens, output_tokens):
+    """Exact token counts for the call in flight (no-op outside metrics.call())"""
+    call = _active.get()
+    if call is not None:
+        call.input_tokens = input_tokens
+        call.output_tokens = output_tokens
+
+
+def note_response(response):
+    """Pick token usage off an Anthropic message, Gemini response or Ollama final event"""
+    usage = getattr(response, 'usage', None)
+    if usage is not None and hasattr(usage, 'input_tokens'):
+        note_usage(usage.input_tokens, usage.output_tokens)
+        return
+    usage = getattr(response, 'usage_metadata', None)
+    if usage is not None and getattr(usage, 'prompt_token_count', None) is not None:
+        note_usage(usage.prompt_token_count, getattr(usage, 'candidates_token_count', 0) or 0)
+        return
+    if isinstance(response, dict) and 'eval_count' in response:
+        # Ollama leaves out prompt_eval_count when the prompt was cached
+        note_usage(response.get('prompt_eval_count'), response['eval_count'])
+
+
+def note_retry():
+    """Count a rate-limited attempt against the call in flight"""
+    call = _active.get()
+    if call is not None:
+        call.retries += 1
+        get_events().emit('throttled', provider=call.provider, model=call.model)
+
+
+class MetricsStore:
+    """SQLite store of per-request metrics; writes never interrupt generation"""
+
+    def __init__(self, path=METRICS_FILE, run=None):
+        self.path = Path(path)
+        self.run = run or (Path(sys.argv[0]).stem if sys.argv[0] not in ('', '-c') else 'interactive')
+        self._lock = threading.Lock()
+        self._warned = False
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('''
+            CREATE TABLE IF NOT EXISTS calls (
+                id INTEGER PRIMARY KEY,
+                ts REAL NOT NULL,
+                run TEXT,
+                provider TEXT,
+                model TEXT,
+                grade INTEGER,
+                input_tokens INTEGER,
+                output_tokens INTEGER,
+                latency REAL,
+                retries INTEGER,
+                cached INTEGER,
+                error TEXT,
+                sets_requested INTEGER,
+                sets_accepted INTEGER,
+                questions INTEGER
+            )
+        ''')
+        self._db.execute('CREATE INDEX IF NOT EXISTS idx_calls_ts ON calls(ts)')
+
+    @contextlib.contextmanager
+    def call(self, provider, model, prompt='', grade=None):
+        """
+        Time one request. Inside the block, set `record.text` to the response
+        (or call note_response()/note_usage() for exact token counts).
+        """
+        record = CallRecord(provider, model, prompt, grade)
+        token = _active.set(record)
+        start = time.perf_counter()
+        try:
+            yield record
+        except Exception as e:
+            record.error = f"{type(e).__name__}: {e}"[:300]
+            raise
+        finally:
+            _active.reset(token)
+            self._save(record, time.perf_counter() - start)
+            _last.set(record)
+
+    def cached(self, provider, model, prompt, text, grade=None):
+        """Record a response replayed from the cache (no latency, no cost)"""
+        record = CallRecord(provider, model, prompt, grade, cached=True)
+        record.text = text
+        self._save(record, 0.0)
+        _last.set(record)
+
+    def _save(self, record, latency):
+        input_tokens = record.input_tokens if record.input_tokens is not None else _estimate_tokens(record.prompt)
+        output_tokens = record.output_tokens
+        if output_tokens is None:
+            output_tokens = _estimate_tokens(record.text) if record.text else 0
+        get_events(self.run).emit('request', provider=record.provider, model=record.model, grade=record.grade,
+                                  input_tokens=input_tokens, output_tokens=output_tokens,
+                                  latency=round(latency, 3), cached=record.cached, error=record.error)
+        try:
+            with self._lock:
+                cursor = self._db.execute('''
+                    INSERT INTO calls (ts, run, provider, model, grade, input_tokens, output_tokens,
+                                       latency, retries, cached, error)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (time.time(), self.run, record.provider, record.model, record.grade,
+                      input_tokens, output_tokens, latency, record.retries, int(record.cached), record.error))
+                record.row_id = cursor.lastrowid
+        except sqlite3.Error as e:
+            self._warn(e)
+
+    def record_yield(self, sets_requested, sets_accepted, questions, grade=None, call=None):
+        """Attach what was kept from a response to its row (default: the last call in this context)"""
+        get_events(self.run).emit('sets', requested=sets_requested, accepted=sets_accepted,
+                                  questions=questions, grade=grade)
+        call = call or _last.get()
+        if call is None or call.row_id is None:
+            return
+        _last.set(None)
+        try:
+            with self._lock:
+                self._db.execute('''
+                    UPDATE calls SET sets_requested = ?, sets_accepted = ?, questions = ?,
+                        grade = COALESCE(?, grade)
+                    WHERE id = ?
+                ''', (sets_requested, sets_accepted, questions, grade, call.row_id))
+        except sqlite3.Error as e:
+            self._warn(e)
+
+    def _warn(self, error):
+        if not self._warned:
+            self._warned = True
+            print(f"⚠️  Metrics not recorded ({error})")
+
+    def rows(self, since_hours=None, run=None):
+        sql = 'SELECT * FROM calls WHERE 1 = 1'
+        params = []
+        if since_hours:
+            sql += ' AND ts >= ?'
+            params.append(time.time() - since_hours * 3600)
+        if run:
+            sql += ' AND run = ?'
+            params.append(run)
+        with self._lock:
+            cursor = self._db.execute(sql + ' ORDER BY ts', params)
+            columns = [c[0] for c in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def last_call():
+    """The most recently finished call in this thread / asyncio task"""
+    return _last.get()
+
+
+_metrics = None
+
+
+def get_metrics():
+    """Process-wide metrics store, tagged with the running script's name"""
+    global _metrics
+    if _metrics is None:
+        _metrics = MetricsStore()
+    return _metrics
+
+
+def use_metrics(store):
+    """Make `store` the process-wide metrics store (e.g. a scratch file for benchmarks)"""
+    global _metrics
+    _metrics = store
+    return store
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return None
+    rank = min(len(sorted_values), max(1, math.ceil(pct / 100 * len(sorted_values)))) - 1
+    return sorted_values[rank]
+
+
+def _round(value, digits=3):
+    return None if value is None else round(value, digits)
+
+
+def summarize(rows, by=('provider', 'model')):
+    """Aggregate rows into one summary dict per group of `by` columns"""
+    groups = defaultdict(list)
+    for row in rows:
+        groups[tuple(row[c] for c in by)].append(row)
+
+    summaries = []
+    for key, group in sorted(groups.items(), key=lambda item: tuple(str(k) for k in item[0])):
+        live = [r for r in group if not r['cached']]
+        latencies = sorted(r['latency'] for r in live if not r['error'])
+        dollars = sum(cost(r['provider'], r['model'], r['input_tokens'], r['output_tokens']) for r in live)
+        parsed = [r for r in group if r['sets_requested']]
+        requested = sum(r['sets_requested'] for r in parsed)
+        accepted = sum(r['sets_accepted'] for r in parsed)
+        questions = sum(r['questions'] or 0 for r in parsed)
+        # Wall-clock span from the first request's start to the last one's end
+        span = max(r['ts'] for r in group) - min(r['ts'] - (r['latency'] or 0) for r in group)
+        hours = span / 3600
+
+        summaries.append({
+            **dict(zip(by, key)),
+            'requests': len(live),
+            'cached': len(group) - len(live),
+            'errors': sum(1 for r in live if r['error']),
+            'retries': sum(r['retries'] or 0 for r in live),
+            'input_tokens': sum(r['input_tokens'] for r in live),
+            'output_tokens': sum(r['output_tokens'] for r in live),
+            'cost': round(dollars, 4),
+            'latency_p50': _round(percentile(latencies, 50)),
+            'latency_p90': _round(percentile(latencies, 90)),
+            'latency_p99': _round(percentile(latencies, 99)),
+            'sets_requested': requested,
+            'sets_accepted': accepted,
+            'parse_failure_rate': round(1 - accepted / requested, 3) if requested else None,
+            'questions': questions,
+            'questions_per_hour': round(questions / hours) if hours > 0 and questions else None,
+            'cost_per_100_questions': round(dollars * 100 / questions, 4) if questions else None,
+        })
+    return summaries
+
+
+def _fmt(value, spec=''):
+    return '-' if value is None else format(value, spec)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Summarize LLM token, cost and throughput metrics')
+    parser.add_argument('command', choices=['report'])
+    parser.add_argument('--by', default='provider,model,grade',
+                        help=f"Comma-separated grouping columns from {', '.join(GROUP_COLUMNS)}")
+    parser.add_argument('--since', type=float, help='Only the last N hours')
+    parser.add_argument('--run', help='Only one generator script (e.g. generate_grades_1_5)')
+    parser.add_argument('--json', action='store_true', help='Print the summary as JSON')
+    parser.add_argument('--db', default=str(METRICS_FILE))
+    args = parser.parse_args()
+
+    by = tuple(c.strip() for c in args.by.split(',') if c.strip())
+    unknown = [c for c in by if c not in GROUP_COLUMNS]
+    if unknown:
+        parser.error(f"Unknown grouping column(s): {', '.join(unknown)}")
+
+    if not Path(args.db).exists():
+        print(f"No metrics at {args.db}")
+        return
+
+    store = MetricsStore(args.db, run='report')
+    summaries = summarize(store.rows(args.since, args.run), by)
+
+    if args.json:
+        print(json.dumps(summaries, indent=2))
+        return
+    if not summaries:
+        print("No calls recorded")
+        return
+
+    print(f"📊 LLM usage by {', '.join(by)}" + (f" (last {args.since:g}h)" if args.since else ''))
+    for s in summaries:
+        label = ' / '.join('-' if s[c] is None else str(s[c]) for c in by)
+        print(f"\n  {label}")
+        print(f"     requests {s['requests']} (+{s['cached']} cached), errors {s['errors']}, retries {s['retries']}")
+        print(f"     tokens {s['input_tokens']:,} in / {s['output_tokens']:,} out, cost ${s['cost']:.4f}")
+        print(f"     latency p50 {_fmt(s['latency_p50'], '.1f')}s  p90 {_fmt(s['latency_p90'], '.1f')}s  "
+              f"p99 {_fmt(s['latency_p99'], '.1f')}s")
+        if s['sets_requested']:
+            print(f"     sets {s['sets_accepted']}/{s['sets_requested']} accepted "
+                  f"({s['parse_failure_rate']:.1%} failed), {s['questions']} questions, "
+                  f"{_fmt(s['questions_per_hour'])}/hour, ${_fmt(s['cost_per_100_questions'], '.4f')} per 100")
+
+    total = sum(s['cost'] for s in summaries)
+    questions = sum(s['questions'] for s in summaries)
+    print(f"\n💰 Total ${total:.4f} for {questions} accepted questions")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,469 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for an LLM server, for exercising generators without a GPU or API key
+Speaks three wire formats on one port, with keep-alive and a fixed number of
+parallel slots:
+  Ollama     POST /api/generate (streamed NDJSON or not), GET /api/tags
+  Anthropic  POST /v1/messages (JSON or SSE with "stream": true)
+  Gemini     POST /v1beta/models/<model>:generateContent / :streamGenerateContent
+Every prompt is answered with canned curriculum JSON (one set, or an array
+for packed prompts; questions can be drawn from a real curriculum file).
+Latency follows a fixed/uniform/exponential/lognormal distribution, and
+429s (random or from an RPM quota) and malformed JSON can be injected.
+Given a seed, the n-th request always gets the same latency, faults and payload.
+
+Usage:
+  python scripts/llm_stub_server.py --port 11499 --latency 0.5 --parallel 4
+  python scripts/llm_stub_server.py --latency 2 --distribution lognormal --rpm 60 --malformed-rate 0.1
+  OLLAMA_HOST=http://127.0.0.1:11499 python scripts/generate_grades_7_9_local.py
+  ANTHROPIC_BASE_URL=http://127.0.0.1:11499 python scripts/generate_grades_1_5.py
+  GEMINI_API_ENDPOINT=http://127.0.0.1:11499 python scripts/test_simple_gen.py   # SDK over REST
+  curl http://127.0.0.1:11499/stats
+"""
+
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+DEFAULT_PORT = 11499
+DISTRIBUTIONS = ('fixed', 'uniform', 'exponential', 'lognormal')
+MALFORMATIONS = ('truncate', 'fence', 'trailing_comma', 'prose')
+QUESTIONS_PER_SET = 5
+
+GEMINI_PATH = re.compile(r'^/v1(?:beta)?/models/([^/:]+):(generateContent|streamGenerateContent)$')
+# One line per set in a packed prompt (prompt_packer.describe)
+PACKED_JOB = re.compile(r'id "([^"]+)", title "([^"]+)", grade_level (\d+), topic "([^"]+)"')
+PACKED_COUNT = re.compile(r'Write (\d+) questions per set')
+
+
+class LatencyModel:
+    """Seconds per response: a base distribution plus optional time per output token"""
+
+    def __init__(self, mean=0.2, distribution='fixed', spread=0.5, tokens_per_second=None):
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution: {distribution}")
+        self.mean = mean
+        self.distribution = distribution
+        self.spread = spread
+        self.tokens_per_second = tokens_per_second
+
+    def sample(self, rng, output_tokens=0):
+        if self.mean <= 0:
+            base = 0.0
+        elif self.distribution == 'uniform':
+            base = rng.uniform(self.mean * (1 - self.spread), self.mean * (1 + self.spread))
+        elif self.distribution == 'exponential':
+            base = rng.expovariate(1 / self.mean)
+        elif self.distribution == 'lognormal':
+            # spread is sigma; mu keeps the mean at self.mean (long right tail)
+            base = rng.lognormvariate(math.log(self.mean) - self.spread ** 2 / 2, self.spread)
+        else:
+            base = self.mean
+        if self.tokens_per_second:
+            base += output_tokens / self.tokens_per_second
+        return max(0.0, base)
+
+    def __str__(self):
+        text = f"{self.distribution} {self.mean}s"
+        if self.distribution in ('uniform', 'lognormal'):
+            text += f" ±{self.spread}"
+        if self.tokens_per_second:
+            text += f" + {self.tokens_per_second} tok/s"
+        return text
+
+
+def load_corpus(path):
+    """Questions from a curriculum file, for realistic payload sizes and wording"""
+    with open(path, 'r') as f:
+        return [q for s in json.load(f) for q in s.get('questions', []) if q.get('options')]
+
+
+def canned_questions(rng, corpus=None, count=QUESTIONS_PER_SET):
+    if corpus:
+        return [dict(q) for q in rng.sample(corpus, min(count, len(corpus)))]
+    questions = []
+    for _ in range(count):
+        a, b = rng.randint(1, 20), rng.randint(1, 20)
+        answer = str(a + b)
+        questions.append({
+            'question': f"What is {a} + {b}?",
+            'options': [answer, str(a + b + 1), str(a + b - 1), str(a + b + 10)],
+            'answer': answer,
+            'explanation': f"{a} + {b} = {answer}",
+        })
+    return questions
+
+
+def canned_set(prompt, rng=None, corpus=None):
+    """A valid curriculum set, reusing the id/grade/topic the prompt asked for"""
+    def field(name, default):
+        match = re.search(rf'"{name}":\s*"?([^",\n]+)"?', prompt)
+        return match.group(1) if match else default
+
+    grade = field('grade_level', '7')
+    return {
+        'id': field('id', 'stub-set'),
+        'title': field('title', 'Stub Set'),
+        'description': 'Canned response from llm_stub_server.py',
+        'grade_level': int(grade) if grade.isdigit() else 7,
+        'topic': field('topic', 'Stub'),
+        'questions': canned_questions(rng or random.Random(prompt), corpus),
+    }
+
+
+def canned_response(prompt, rng, corpus=None):
+    """Response text for any prompt the generators or the auditor send"""
+    jobs = PACKED_JOB.findall(prompt)
+    if jobs:
+        count = PACKED_COUNT.search(prompt)
+        count = int(count.group(1)) if count else QUESTIONS_PER_SET
+        return json.dumps([{
+            'id': job_id,
+            'title': title,
+            'description': 'Canned response from llm_stub_server.py',
+            'grade_level': int(grade),
+            'topic': topic,
+            'questions': canned_questions(rng, corpus, count),
+        } for job_id, title, grade, topic in jobs], indent=2)
+    if 'auditing a curriculum' in prompt:
+        return '[]'  # Audit: no errors found
+    return json.dumps(canned_set(prompt, rng, corpus), indent=2)
+
+
+def malform(text, kind, rng):
+    """Damage a JSON response the way real models do"""
+    if kind == 'truncate':
+        return text[:rng.randint(len(text) // 3, max(len(text) // 3, len(text) - 2))]
+    if kind == 'fence':
+        return f"Here is the curriculum set you asked for:\n```json\n{text}\n```\nLet me know if you need more."
+    if kind == 'trailing_comma':
+        return re.sub(r'(\])(\s*[}\]])', r'\1,\2', text, count=1)
+    return "I'm sorry, I can't produce that in JSON right now."
+
+
+def _tokens(text):
+    return len(text) // 4 + 1
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep connections open between requests
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length', 0))
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _start_chunked(self, content_type):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+    def _send_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+
+    def _end_chunked(self):
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _send_event(self, payload, event=None):
+        prefix = f"event: {event}\n" if event else ''
+        self._send_chunk(f"{prefix}data: {json.dumps(payload)}\n\n".encode('utf-8'))
+
+    def do_GET(self):
+        if self.path == '/api/tags':
+            self._send_json(200, {'models': [{'name': name} for name in sorted(self.server.loaded)]})
+        elif self.path == '/stats':
+            self._send_json(200, self.server.stats())
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        path = urlsplit(self.path).path
+        request = self._read_json()
+        gemini = GEMINI_PATH.match(path)
+        if path == '/api/generate':
+            self._ollama(request)
+        elif path == '/v1/messages':
+            self._anthropic(request)
+        elif gemini:
+            self._gemini(request, gemini.group(1), gemini.group(2) == 'streamGenerateContent')
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    # Ollama
+
+    def _ollama(self, request):
+        model = request.get('model', '')
+        prompt = request.get('prompt', '')
+
+        if not prompt:
+            # Load/unload only
+            if request.get('keep_alive') == 0:
+                self.server.loaded.discard(model)
+            else:
+                self.server.loaded.add(model)
+            self._send_json(200, {'model': model, 'response': '', 'done': True})
+            return
+
+        text, wait = self.server.respond('ollama', model, prompt)
+        if text is None:
+            self._send_json(429, {'error': f"too many requests, retry in {wait:.1f}s"},
+                            {'Retry-After': f"{wait:.1f}"})
+            return
+
+        usage = {'prompt_eval_count': _tokens(prompt), 'eval_count': _tokens(text)}
+        if not request.get('stream', True):
+            self._send_json(200, {'model': model, 'response': text, 'done': True, **usage})
+            return
+
+        self._start_chunked('application/x-ndjson')
+        for i in range(0, len(text), 64):
+            self._send_chunk(json.dumps({'model': model, 'response': text[i:i + 64], 'done': False}).encode() + b'\n')
+        self._send_chunk(json.dumps({'model': model, 'response': '', 'done': True, **usage}).encode() + b'\n')
+        self._end_chunked()
+
+    # Anthropic Messages API
+
+    def _anthropic(self, request):
+        model = request.get('model', '')
+        prompt = '\n'.join(
+            m['content'] if isinstance(m.get('content'), str)
+            else ''.join(part.get('text', '') for part in m.get('content', []))
+            for m in request.get('messages', [])
+        )
+        text, wait = self.server.respond('anthropic', model, prompt)
+        if text is None:
+            self._send_json(429, {'type': 'error', 'error': {
+                'type': 'rate_limit_error',
+                'message': 'Number of requests has exceeded your per-minute rate limit',
+            }}, {'retry-after': str(max(1, math.ceil(wait)))})
+            return
+
+        message_id = f"msg_stub{self.server.request_count:08d}"
+        usage = {'input_tokens': _tokens(prompt), 'output_tokens': _tokens(text)}
+        if not request.get('stream'):
+            self._send_json(200, {
+                'id': message_id, 'type': 'message', 'role': 'assistant', 'model': model,
+                'content': [{'type': 'text', 'text': text}],
+                'stop_reason': 'end_turn', 'stop_sequence': None, 'usage': usage,
+            })
+            return
+
+        self._start_chunked('text/event-stream')
+        self._send_event({'type': 'message_start', 'message': {
+            'id': message_id, 'type': 'message', 'role': 'assistant', 'model': model, 'content': [],
+            'stop_reason': None, 'stop_sequence': None,
+            'usage': {'input_tokens': usage['input_tokens'], 'output_tokens': 0},
+        }}, 'message_start')
+        self._send_event({'type': 'content_block_start', 'index': 0,
+                          'content_block': {'type': 'text', 'text': ''}}, 'content_block_start')
+        for i in range(0, len(text), 64):
+            self._send_event({'type': 'content_block_delta', 'index': 0,
+                              'delta': {'type': 'text_delta', 'text': text[i:i + 64]}}, 'content_block_delta')
+        self._send_event({'type': 'content_block_stop', 'index': 0}, 'content_block_stop')
+        self._send_event({'type': 'message_delta', 'delta': {'stop_reason': 'end_turn', 'stop_sequence': None},
+                          'usage': {'output_tokens': usage['output_tokens']}}, 'message_delta')
+        self._send_event({'type': 'message_stop'}, 'message_stop')
+        self._end_chunked()
+
+    # Gemini generateContent
+
+    def _gemini(self, request, model, stream):
+        prompt = '\n'.join(
+            part.get('text', '')
+            for content in request.get('contents', [])
+            for part in content.get('parts', [])
+        )
+        text, wait = self.server.respond('gemini', model, prompt)
+        if text is None:
+            self._send_json(429, {'error': {
+                'code': 429,
+                'message': f"Resource has been exhausted (e.g. check quota). Please retry in {wait:.1f}s.",
+                'status': 'RESOURCE_EXHAUSTED',
+                'details': [{'@type': 'type.googleapis.com/google.rpc.RetryInfo',
+                             'retryDelay': f"{max(1, math.ceil(wait))}s"}],
+            }})
+            return
+
+        def chunk(part, finished, output_tokens):
+            candidate = {'content': {'parts': [{'text': part}], 'role': 'model'}, 'index': 0}
+            if finished:
+                candidate['finishReason'] = 'STOP'
+            return {'candidates': [candidate], 'usageMetadata': {
+                'promptTokenCount': _tokens(prompt),
+                'candidatesTokenCount': output_tokens,
+                'totalTokenCount': _tokens(prompt) + output_tokens,
+            }, 'modelVersion': model}
+
+        if not stream:
+            self._send_json(200, chunk(text, True, _tokens(text)))
+            return
+
+        parts = [text[i:i + 256] for i in range(0, len(text), 256)] or ['']
+        sse = 'alt=sse' in self.path
+        self._start_chunked('text/event-stream' if sse else 'application/json')
+        if not sse:
+            self._send_chunk(b'[')
+        for i, part in enumerate(parts):
+            last = i == len(parts) - 1
+            payload = chunk(part, last, _tokens(text[:(i + 1) * 256]))
+            if sse:
+                self._send_event(payload)
+            else:
+                self._send_chunk(json.dumps(payload).encode('utf-8') + (b']' if last else b','))
+        self._end_chunked()
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port=DEFAULT_PORT, latency=0.2, parallel=4, load_time=2.0, verbose=False,
+                 seed=0, rate_limit_rate=0.0, rpm=None, malformed_rate=0.0, corpus=None):
+        super().__init__(('127.0.0.1', port), StubHandler)
+        # A bare number keeps the old fixed-latency behaviour
+        self.latency = latency if isinstance(latency, LatencyModel) else LatencyModel(latency)
+        self.load_time = load_time
+        self.slots = threading.BoundedSemaphore(parallel)
+        self.parallel = parallel
+        self.loaded = set()
+        self.verbose = verbose
+        self.seed = seed
+        self.rate_limit_rate = rate_limit_rate
+        self.rpm = rpm
+        self.malformed_rate = malformed_rate
+        self.corpus = corpus
+        self._lock = threading.Lock()
+        self._recent = deque()  # Admission times within the last minute (RPM quota)
+        self.request_count = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.counters = {'requests': 0, 'ok': 0, 'throttled': 0, 'malformed': 0, 'by_provider': {}}
+
+    @property
+    def requests(self):
+        return self.counters['requests']
+
+    def start(self):
+        """Serve on a background thread (for scripted checks); returns the base URL"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def _admit(self, provider):
+        """(request number, seconds to wait) where a wait means answer 429"""
+        now = time.monotonic()
+        with self._lock:
+            self.request_count += 1
+            number = self.request_count
+            self.counters['requests'] += 1
+            by_provider = self.counters['by_provider']
+            by_provider[provider] = by_provider.get(provider, 0) + 1
+
+            rng = random.Random(f"{self.seed}:{number}:admit")
+            if self.rpm:
+                while self._recent and now - self._recent[0] >= 60:
+                    self._recent.popleft()
+                if len(self._recent) >= self.rpm:
+                    self.counters['throttled'] += 1
+                    return number, self._recent[0] + 60 - now
+            if self.rate_limit_rate and rng.random() < self.rate_limit_rate:
+                self.counters['throttled'] += 1
+                return number, rng.uniform(0.5, 2.0)
+            if self.rpm:
+                self._recent.append(now)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            return number, None
+
+    def respond(self, provider, model, prompt):
+        """(response text, None) after the simulated latency, or (None, retry seconds) when throttled"""
+        number, wait = self._admit(provider)
+        if wait is not None:
+            return None, wait
+
+        rng = random.Random(f"{self.seed}:{number}")
+        try:
+            with self.slots:
+                if provider == 'ollama' and model not in self.loaded:
+                    time.sleep(self.load_time)  # Cold model load
+                    self.loaded.add(model)
+                text = canned_response(prompt, rng, self.corpus)
+                if self.malformed_rate and rng.random() < self.malformed_rate:
+                    text = malform(text, rng.choice(MALFORMATIONS), rng)
+                    with self._lock:
+                        self.counters['malformed'] += 1
+                time.sleep(self.latency.sample(rng, _tokens(text)))
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+                self.counters['ok'] += 1
+        return text, None
+
+    def stats(self):
+        with self._lock:
+            return {**self.counters, 'by_provider': dict(self.counters['by_provider']),
+                    'in_flight': self.in_flight, 'max_in_flight': self.max_in_flight,
+                    'parallel': self.parallel, 'latency': str(self.latency)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in LLM server')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--latency', type=float, default=0.2, help='Mean seconds per generation')
+    parser.add_argument('--distribution', choices=DISTRIBUTIONS, default='fixed', help='Latency distribution')
+    parser.add_argument('--spread', type=float, default=0.5,
+                        help='Relative width (uniform) or sigma (lognormal) of the latency distribution')
+    parser.add_argument('--tokens-per-second', type=float, help='Add output_tokens / rate to each latency')
+    parser.add_argument('--parallel', type=int, default=4, help='Concurrent generation slots')
+    parser.add_argument('--load-time', type=float, default=2.0, help='Seconds to "load" a cold Ollama model')
+    parser.add_argument('--seed', type=int, default=0, help='Same seed, same latencies, faults and payloads')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='Fraction of requests answered 429')
+    parser.add_argument('--rpm', type=int, help='Answer 429 beyond this many requests per minute')
+    parser.add_argument('--malformed-rate', type=float, default=0.0,
+                        help='Fraction of responses with broken JSON (truncated, fenced, trailing comma, prose)')
+    parser.add_argument('--corpus', help='Draw canned questions from this curriculum file')
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    latency = LatencyModel(args.latency, args.distribution, args.spread, args.tokens_per_second)
+    corpus = load_corpus(args.corpus) if args.corpus else None
+    server = StubServer(args.port, latency, args.parallel, args.load_time, args.verbose, seed=args.seed,
+                        rate_limit_rate=args.rate_limit_rate, rpm=args.rpm,
+                        malformed_rate=args.malformed_rate, corpus=corpus)
+    print(f"🧪 Stub LLM server on http://127.0.0.1:{args.port} ({args.parallel} slots, {latency} latency)")
+    faults = []
+    if args.rpm:
+        faults.append(f"{args.rpm} RPM quota")
+    if args.rate_limit_rate:
+        faults.append(f"{args.rate_limit_rate:.0%} random 429s")
+    if args.malformed_rate:
+        faults.append(f"{args.malformed_rate:.0%} malformed JSON")
+    if faults:
+        print(f"   Injecting {', '.join(faults)}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Stopped")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,41 +1,416 @@
+#!/usr/bin/env python3
+"""
+Three-way curriculum merge
+Merges THEIRS into OURS relative to their common BASE, per set and per
+question instead of per line. Sets are paired by id (where older data
+repeats an id, by content hash, then title, then order); a set whose
+content hash matches the base is unchanged on that side, so the other
+side's version wins outright. Sets edited on both sides
+are merged field by field, and their questions are paired by uid, then
+content hash, then position. Anything both sides changed differently keeps
+our version and is written to a conflicts sidecar for review.
+
+All inputs are streamed one set (or shard) at a time. Beyond an id, title
+and 16-byte digest per set, memory holds only the sets THEIRS changed and
+their base versions, so it follows the size of the delta, not the corpus. Sets THEIRS adds are
+filtered for near-duplicates of ours, as generated batches always were.
+
+Inputs are curriculum JSON files, store directories or .cpk packs. OURS
+defaults to the current curriculum and is updated in place (only changed
+shards are rewritten); without --base the base is empty, which merges a
+generated batch into the curriculum.
+
+Usage:
+  python scripts/merge_curriculum.py generated.json
+  python scripts/merge_curriculum.py --base base.json --ours ours.json theirs.json [--out merged.json]
+
+As a git merge driver for curriculum files (exits 1 when there are conflicts):
+  git config merge.curriculum.driver \\
+    'python3 scripts/merge_curriculum.py --base %O --ours %A %B --conflicts %P.conflicts.json'
+  # .gitattributes
+  src/data/curriculum.json merge=curriculum
+  src/data/curriculum/grade-*/*.json merge=curriculum
+"""
+
+import argparse
+import hashlib
 import json
-import os
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+from curriculum_journal import write_json_atomic
+from curriculum_store import (CURRICULUM_FILE, MANIFEST_NAME, STORE_DIR, CurriculumStore, iter_json_array,
+                              iter_sets, write_sets)
+from near_dupes import QuestionDeduper
+from question_ids import UID_FIELD, assign_uids, content_hash
 
-MAIN_FILE = 'src/data/curriculum.json'
 NEW_FILE = 'data/curriculum_7_9.json'
+MIN_QUESTIONS = 3  # Added sets left with fewer after near-duplicate filtering are skipped
 
-def main():
-    if not os.path.exists(NEW_FILE):
-        print(f"Error: {NEW_FILE} not found.")
-        return
-
-    print("Loading curriculum files...")
-    with open(MAIN_FILE, 'r') as f:
-        main_data = json.load(f)
-    
-    with open(NEW_FILE, 'r') as f:
-        new_data = json.load(f)
-    
-    # Create a set of existing IDs
-    existing_ids = {item['id'] for item in main_data}
-    
-    added_count = 0
-    skipped_count = 0
-    
-    for item in new_data:
-        if item['id'] in existing_ids:
-            skipped_count += 1
+MISSING = object()  # A field or question one side does not have
+
+
+def _entries(path):
+    """(id, title, digest) of every set, in stream order"""
+    return [(s.get('id'), s.get('title'), _digest(s)) for s in iter_sets(path)]
+
+
+def _pair_sets(base_entries, entries):
+    """
+    The base index each set pairs with, given (id, title, digest) entries
+    in stream order. Within an id (older data repeats ids), identical
+    content pairs first, then the same title, then the remaining copies in
+    order. Unpaired sets get ('new', id, occurrence).
+    """
+    by_id = {}
+    for i, (set_id, _, _) in enumerate(base_entries):
+        by_id.setdefault(set_id, []).append(i)
+    keys, used = [None] * len(entries), set()
+    for field in (2, 1, None):
+        for n, entry in enumerate(entries):
+            if keys[n] is not None:
+                continue
+            for i in by_id.get(entry[0], ()):
+                if i not in used and (field is None or base_entries[i][field] == entry[field]):
+                    keys[n] = i
+                    used.add(i)
+                    break
+    added = Counter()
+    for n, (set_id, _, _) in enumerate(entries):
+        if keys[n] is None:
+            added[set_id] += 1
+            keys[n] = ('new', set_id, added[set_id])
+    return keys
+
+
+def _digest(value):
+    canonical = json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(',', ':'), check_circular=False)
+    return hashlib.blake2b(canonical.encode('utf-8'), digest_size=16).digest()
+
+
+def _uid(question):
+    return question.get(UID_FIELD) if isinstance(question, dict) else None
+
+
+def _plain(value):
+    return None if value is MISSING else value
+
+
+class Conflicts:
+    """Collects what could not be merged automatically, for the sidecar file"""
+
+    def __init__(self):
+        self.records = []
+
+    def add(self, kind, curriculum_set, base, ours, theirs, **where):
+        self.records.append({
+            'kind': kind,
+            'set_id': curriculum_set.get('id'),
+            'set_title': curriculum_set.get('title'),
+            **where,
+            'resolution': 'kept theirs' if kind == 'delete/edit' else 'kept ours',
+            'base': _plain(base),
+            'ours': _plain(ours),
+            'theirs': _plain(theirs),
+        })
+
+    def __len__(self):
+        return len(self.records)
+
+
+def _merge_value(base, ours, theirs):
+    """(merged value, clean); on a conflict ours is kept"""
+    if ours == theirs or theirs == base:
+        return ours, True
+    if ours == base:
+        return theirs, True
+    return ours, False
+
+
+def _merge_fields(base, ours, theirs, report):
+    """Three-way merge of two dicts key by key, in our key order"""
+    merged = {}
+    for key in list(ours) + [k for k in theirs if k not in ours]:
+        b, o, t = base.get(key, MISSING), ours.get(key, MISSING), theirs.get(key, MISSING)
+        value, clean = _merge_value(b, o, t)
+        if not clean:
+            report('edit/edit', b, o, t, field=key)
+        if value is not MISSING:
+            merged[key] = value
+    return merged
+
+
+def _pair(base_questions, questions):
+    """For each question, the index of its base question (uid, then content hash, then position) or None"""
+    by_uid, by_hash = {}, {}
+    for i, question in enumerate(base_questions):
+        if _uid(question):
+            by_uid.setdefault(_uid(question), i)
+        by_hash.setdefault(content_hash(question), []).append(i)
+
+    used, pairs = set(), []
+    for question in questions:
+        uid = _uid(question)
+        i = by_uid.get(uid) if uid else None
+        if i is None or i in used:
+            i = next((j for j in by_hash.get(content_hash(question), ())
+                      if j not in used and _uid(base_questions[j]) in (None, uid)), None)
+        if i is not None:
+            used.add(i)
+        pairs.append(i)
+    # Same slot, content edited (only for questions without conflicting uids)
+    for position, question in enumerate(questions):
+        if (pairs[position] is None and position < len(base_questions) and position not in used
+                and (not _uid(question) or not _uid(base_questions[position]))):
+            pairs[position] = position
+            used.add(position)
+    return pairs
+
+
+def _merge_question(base, ours, theirs, report):
+    value, clean = _merge_value(base, ours, theirs)
+    if clean:
+        return value
+    if isinstance(base, dict) and isinstance(ours, dict) and isinstance(theirs, dict):
+        return _merge_fields(base, ours, theirs, lambda kind, b, o, t, **where: report(
+            kind, b, o, t, question_uid=_uid(ours), question=ours.get('question'), **where))
+    report('edit/edit', base, ours, theirs, question_uid=_uid(ours))
+    return ours
+
+
+def _merge_questions(base, ours, theirs, report):
+    ours_pairs, theirs_pairs = _pair(base, ours), _pair(base, theirs)
+    theirs_by_base = {i: q for i, q in zip(theirs_pairs, theirs) if i is not None}
+    ours_base = {i for i in ours_pairs if i is not None}
+    ours_added = [q for i, q in zip(ours_pairs, ours) if i is None]
+    added_uids = {_uid(q): q for q in ours_added if _uid(q)}
+    added_hashes = Counter(content_hash(q) for q in ours_added)
+
+    merged = []
+    for i, question in zip(ours_pairs, ours):
+        if i is None:
+            merged.append(question)
+        elif i in theirs_by_base:
+            merged.append(_merge_question(base[i], question, theirs_by_base[i], report))
+        elif question != base[i]:
+            # We edited what they deleted: keep the edit
+            report('edit/delete', base[i], question, MISSING, question_uid=_uid(question))
+            merged.append(question)
+
+    for i, question in zip(theirs_pairs, theirs):
+        if i is not None:
+            if i not in ours_base and question != base[i]:
+                report('delete/edit', base[i], MISSING, question, question_uid=_uid(question))
+                merged.append(question)
+            continue
+        # Added by them; both sides adding the same question keeps one copy
+        uid, digest = _uid(question), content_hash(question)
+        if uid in added_uids:
+            if added_uids[uid] != question:
+                report('add/add', MISSING, added_uids[uid], question, question_uid=uid)
+            continue
+        if added_hashes[digest]:
+            added_hashes[digest] -= 1
+            continue
+        merged.append(question)
+    return merged
+
+
+def merge_set(base, ours, theirs, conflicts):
+    """Merge one set edited on both sides"""
+    def report(kind, b, o, t, **where):
+        conflicts.add(kind, ours, b, o, t, **where)
+
+    def fields(s):
+        return {k: v for k, v in s.items() if k != 'questions'}
+
+    merged = _merge_fields(fields(base), fields(ours), fields(theirs), report)
+    merged['questions'] = _merge_questions(base.get('questions') or [], ours.get('questions') or [],
+                                           theirs.get('questions') or [], report)
+    order = [k for k in ours if k in merged] + [k for k in merged if k not in ours]
+    return {k: merged[k] for k in order}
+
+
+class CurriculumMerge:
+    """
+    Three-way merge of the snapshots at `base`, `ours` and `theirs`.
+    run() fills `changes` (position of an OURS set -> its replacement, or
+    None to drop it), `added` (new sets from THEIRS), `restored` (sets they
+    edited but we deleted), `conflicts` and `stats`; write() or apply()
+    then produces the result from one more pass over OURS.
+    """
+
+    def __init__(self, base, ours, theirs):
+        self.base, self.ours, self.theirs = base, ours, theirs
+        self.changes, self.added, self.restored = {}, [], []
+        self.conflicts = Conflicts()
+        self.stats = Counter()
+
+    def run(self):
+        # Small per-set entries pair the snapshots; full sets are kept only for the delta
+        base_entries, theirs_entries, ours_entries = _entries(self.base), _entries(self.theirs), _entries(self.ours)
+        theirs_keys = _pair_sets(base_entries, theirs_entries)
+        ours_keys = _pair_sets(base_entries, ours_entries)
+
+        theirs_changed = {}
+        changed = {n for n, key in enumerate(theirs_keys)
+                   if isinstance(key, tuple) or base_entries[key][2] != theirs_entries[n][2]}
+        for n, curriculum_set in enumerate(iter_sets(self.theirs) if changed else ()):
+            if n in changed:
+                theirs_changed[theirs_keys[n]] = curriculum_set
+        deleted = set(range(len(base_entries))) - set(theirs_keys)
+        del theirs_keys, theirs_entries
+
+        # Base versions are needed only where both sides may have edited
+        wanted = {key for key in theirs_changed if not isinstance(key, tuple)}
+        base_sets = {i: s for i, s in enumerate(iter_sets(self.base)) if i in wanted} if wanted else {}
+
+        # Ours is read again only if their side touches any of its sets
+        seen = set()
+        touched = any(key in deleted or key in theirs_changed for key in ours_keys)
+        for position, curriculum_set in enumerate(iter_sets(self.ours) if touched else ()):
+            key = ours_keys[position]
+            digest = ours_entries[position][2]
+            if key in deleted:
+                if digest == base_entries[key][2]:
+                    self.changes[position] = None
+                    self.stats['deleted'] += 1
+                else:
+                    self.conflicts.add('edit/delete', curriculum_set, MISSING, curriculum_set, MISSING)
+                continue
+            if key not in theirs_changed:
+                continue
+            seen.add(key)
+            theirs_set = theirs_changed[key]
+            if isinstance(key, tuple):
+                # Both added a set under this id: keep ours, theirs goes to the sidecar
+                if digest != _digest(theirs_set):
+                    self.conflicts.add('add/add', curriculum_set, MISSING, curriculum_set, theirs_set)
+                continue
+            if digest == base_entries[key][2]:
+                self.changes[position] = theirs_set
+                self.stats['taken'] += 1
+                continue
+            merged = merge_set(base_sets[key], curriculum_set, theirs_set, self.conflicts)
+            if merged != curriculum_set:
+                self.changes[position] = merged
+                self.stats['merged'] += 1
+
+        for key, theirs_set in theirs_changed.items():
+            if key in seen:
+                continue
+            if isinstance(key, tuple):
+                self.added.append(theirs_set)
+            else:
+                # We deleted what they edited: keep their edit
+                self.conflicts.add('delete/edit', theirs_set, base_sets[key], MISSING, theirs_set)
+                self.restored.append(theirs_set)
+        return self
+
+    def drop_near_duplicates(self):
+        """Filter added sets against our questions in their grades; returns (dropped questions, thin sets)"""
+        grades = {s.get('grade_level') for s in self.added}
+        deduper = QuestionDeduper()
+        deduper.add_curriculum(s for s in iter_sets(self.ours) if s.get('grade_level') in grades)
+        kept, duplicates = [], 0
+        for curriculum_set in self.added:
+            duplicates += len(deduper.filter_set(curriculum_set))
+            if len(curriculum_set.get('questions', [])) >= MIN_QUESTIONS:
+                kept.append(curriculum_set)
+        thin = len(self.added) - len(kept)
+        self.added = kept
+        return duplicates, thin
+
+    @property
+    def appended(self):
+        return self.restored + self.added
+
+    def write(self, out):
+        """
+        Stream the result into a JSON file laid out like curriculum.json;
+        sets we keep unchanged are copied as they were. Returns the set count.
+        """
+        if Path(self.ours).is_file() and Path(self.ours).suffix != '.cpk':
+            ours = iter_json_array(self.ours, with_text=True)
         else:
-            main_data.append(item)
-            existing_ids.add(item['id'])
-            added_count += 1
-            
-    print(f"Merged {added_count} new sets. Skipped {skipped_count} existing sets.")
-    
-    with open(MAIN_FILE, 'w') as f:
-        json.dump(main_data, f, indent=4)
-        
-    print(f"Saved to {MAIN_FILE}")
+            ours = ((s, None) for s in iter_sets(self.ours))
+
+        def merged():
+            for position, (curriculum_set, text) in enumerate(ours):
+                if position not in self.changes:
+                    yield text or curriculum_set
+                elif self.changes[position] is not None:
+                    yield self.changes[position]
+            yield from self.appended
+        return write_sets(out, merged())
+
+    def apply(self, root):
+        """Apply the result to the store OURS names, loading only shards with a changed set"""
+        store = CurriculumStore(root)
+        start = 0
+        for name in store.shard_names():
+            end = start + store.manifest['shards'][name]['sets']
+            if any(start <= position < end for position in self.changes):
+                sets = store.shard(name)
+                replaced = (self.changes.get(start + i, s) for i, s in enumerate(sets))
+                sets[:] = [s for s in replaced if s is not None]
+            start = end
+        for curriculum_set in self.appended:
+            store.add(curriculum_set)
+        return store.save()
+
+
+def main():
+    default_ours = STORE_DIR if (STORE_DIR / MANIFEST_NAME).exists() else CURRICULUM_FILE
+    parser = argparse.ArgumentParser(description='Three-way merge of curriculum snapshots')
+    parser.add_argument('theirs', nargs='?', default=NEW_FILE, help=f'Sets to merge in (default {NEW_FILE})')
+    parser.add_argument('--base', help='Common ancestor (default: empty, i.e. everything in THEIRS is new)')
+    parser.add_argument('--ours', default=default_ours, help='Curriculum to merge into (default: the current one)')
+    parser.add_argument('--out', help='Write the result to this JSON file instead of updating OURS')
+    parser.add_argument('--conflicts', help='Conflicts sidecar (default: <out>.conflicts.json)')
+    parser.add_argument('--no-dedupe', action='store_true', help='Keep near-duplicate questions in added sets')
+    args = parser.parse_args()
+    if args.out and Path(args.out).is_dir():
+        parser.error('--out must be a JSON file')
+
+    for path in (args.base, args.ours, args.theirs):
+        if path is not None and not Path(path).exists():
+            print(f"Error: {path} not found.")
+            return 2
+
+    print(f"🔀 Merging {args.theirs} into {args.ours}" + (f" (base {args.base})" if args.base else ""))
+    merge = CurriculumMerge(args.base, args.ours, args.theirs).run()
+
+    if merge.added and not args.no_dedupe:
+        duplicates, thin = merge.drop_near_duplicates()
+        print(f"   Dropped {duplicates} near-duplicate questions; skipped {thin} sets left with too few.")
+    assign_uids([s for s in merge.changes.values() if s is not None] + merge.appended)
+
+    out = Path(args.out or args.ours)
+    if out.is_dir():
+        written = merge.apply(out)
+        print(f"💾 Saved {len(written)} changed shard(s)")
+    elif merge.changes or merge.appended or args.out:
+        total = merge.write(out)
+        print(f"💾 Wrote {total} sets to {out}")
+    stats = merge.stats
+    print(f"   {stats['taken']} taken from theirs, {stats['merged']} merged, "
+          f"{len(merge.added)} added, {stats['deleted']} deleted")
+
+    conflicts = merge.conflicts
+    sidecar = Path(args.conflicts or f"{str(out).rstrip('/')}.conflicts.json")
+    if conflicts:
+        write_json_atomic(sidecar, {'merged_at': datetime.now().isoformat(timespec='seconds'),
+                                    'base': args.base, 'ours': str(args.ours), 'theirs': args.theirs,
+                                    'conflicts': conflicts.records})
+        print(f"⚠️  {len(conflicts)} conflicts kept one side; review {sidecar}")
+        return 1
+    if sidecar.exists():
+        sidecar.unlink()  # From an earlier merge of the same target
+    print("✅ No conflicts")
+    return 0
+
 
 if __name__ == "__main__":
-    main()
+    raise SystemExit(main())
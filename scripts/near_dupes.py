@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate question detection with MinHash + LSH
+Questions are normalized (question text plus answer), cut into character
+shingles and reduced to a MinHash signature; an LSH index over signature
+bands finds candidates in roughly constant time per question, and the
+signature agreement estimates their Jaccard similarity.
+
+Inline use during generation:
+    deduper = QuestionDeduper()
+    deduper.add_curriculum(curriculum)
+    dropped = deduper.filter_set(new_set)   # drops near-duplicate questions in place
+
+Batch use:
+  python scripts/near_dupes.py scan [--threshold 0.8] [--report dupes.json]
+  python scripts/near_dupes.py dedupe [--threshold 0.8] [--min-questions 3]
+"""
+
+import argparse
+import hashlib
+import random
+import re
+import struct
+from collections import defaultdict
+from pathlib import Path
+
+import curriculum_model
+from curriculum_journal import write_json_atomic
+
+PROJECT_ROOT = Path(__file__).parent.parent
+CURRICULUM_FILE = PROJECT_ROOT / 'src' / 'data' / 'curriculum.json'
+
+DEFAULT_THRESHOLD = 0.8
+NUM_PERM = 64
+SHINGLE_SIZE = 4
+
+_PUNCTUATION = re.compile(r"[^\w\s+\-*/=×÷<>%.$]")
+_SPACES = re.compile(r'\s+')
+
+
+def normalize(text):
+    """Lowercase, drop punctuation that doesn't change the math, collapse whitespace"""
+    text = _PUNCTUATION.sub(' ', str(text).lower())
+    text = re.sub(r'(?<!\d)\.|\.(?!\d)', ' ', text)  # Keep decimal points only
+    return _SPACES.sub(' ', text).strip()
+
+
+def question_text(question):
+    """The part of a question that makes it a duplicate: its text and its answer"""
+    return f"{normalize(question.get('question', ''))} => {normalize(question.get('answer', ''))}"
+
+
+def _hash64(data):
+    return struct.unpack('<Q', hashlib.blake2b(data, digest_size=8).digest())[0]
+
+
+class MinHasher:
+    """MinHash signatures over character shingles (XOR-mask permutations of a 64-bit hash)"""
+
+    def __init__(self, num_perm=NUM_PERM, shingle_size=SHINGLE_SIZE, seed=1):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        rng = random.Random(seed)
+        self.masks = [rng.getrandbits(64) for _ in range(num_perm)]
+
+    def shingles(self, text):
+        k = self.shingle_size
+        if len(text) <= k:
+            return {text}
+        return {text[i:i + k] for i in range(len(text) - k + 1)}
+
+    def signature(self, text):
+        hashes = [_hash64(s.encode('utf-8')) for s in self.shingles(text)]
+        return tuple(min(map(mask.__xor__, hashes)) for mask in self.masks)
+
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity from two signatures"""
+    return sum(a == b for a, b in zip(sig_a, sig_b)) / len(sig_a)
+
+
+def choose_bands(threshold, num_perm):
+    """Bands x rows whose LSH S-curve crosses ~(threshold - 0.1), so few true pairs are missed"""
+    target = max(0.05, threshold - 0.1)
+    best = None
+    for bands in range(1, num_perm + 1):
+        if num_perm % bands:
+            continue
+        rows = num_perm // bands
+        crossing = (1 / bands) ** (1 / rows)
+        if best is None or abs(crossing - target) < abs(best[2] - target):
+            best = (bands, rows, crossing)
+    return best[0], best[1]
+
+
+class LSHIndex:
+    """Banded LSH over MinHash signatures; candidates are verified by signature similarity"""
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, num_perm=NUM_PERM):
+        self.threshold = threshold
+        self.bands, self.rows = choose_bands(threshold, num_perm)
+        self.tables = [defaultdict(list) for _ in range(self.bands)]
+        self.signatures = {}
+
+    def _band_keys(self, signature):
+        r = self.rows
+        return [hash(signature[i * r:(i + 1) * r]) for i in range(self.bands)]
+
+    def add(self, key, signature):
+        self.signatures[key] = signature
+        for table, band in zip(self.tables, self._band_keys(signature)):
+            table[band].append(key)
+
+    def query(self, signature):
+        """[(key, similarity)] of indexed items at or above the threshold, most similar first"""
+        candidates = set()
+        for table, band in zip(self.tables, self._band_keys(signature)):
+            bucket = table.get(band)
+            if bucket:
+                candidates.update(bucket)
+        matches = []
+        for key in candidates:
+            sim = similarity(signature, self.signatures[key])
+            if sim >= self.threshold:
+                matches.append((key, sim))
+        matches.sort(key=lambda m: -m[1])
+        return matches
+
+    def __len__(self):
+        return len(self.signatures)
+
+
+class QuestionDeduper:
+    """Near-duplicate check for questions, keyed "<set id>#<question index>" """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, num_perm=NUM_PERM):
+        self.hasher = MinHasher(num_perm)
+        self.index = LSHIndex(threshold, num_perm)
+
+    def signature(self, question):
+        return self.hasher.signature(question_text(question))
+
+    def check(self, question, signature=None):
+        """(key, similarity) of the closest indexed near-duplicate, or None"""
+        matches = self.index.query(signature or self.signature(question))
+        return matches[0] if matches else None
+
+    def add(self, key, question, signature=None):
+        self.index.add(key, signature or self.signature(question))
+
+    def add_curriculum(self, curriculum):
+        for curriculum_set in curriculum:
+            for i, question in enumerate(curriculum_set.get('questions', [])):
+                self.add(f"{curriculum_set.get('id')}#{i}", question)
+
+    def filter_set(self, curriculum_set):
+        """
+        Drop questions that duplicate indexed ones (or each other) from the
+        set in place, index the rest, and return [(question, duplicate key, similarity)].
+        """
+        kept = []
+        dropped = []
+        for question in curriculum_set.get('questions', []):
+            signature = self.signature(question)
+            match = self.check(question, signature)
+            if match:
+                dropped.append((question, match[0], match[1]))
+                continue
+            self.add(f"{curriculum_set.get('id')}#{len(kept)}", question, signature)
+            kept.append(question)
+        curriculum_set['questions'] = kept
+        return dropped
+
+
+def find_clusters(curriculum, threshold=DEFAULT_THRESHOLD):
+    """Groups of near-duplicate question keys (size >= 2), first occurrence first"""
+    deduper = QuestionDeduper(threshold)
+    parent = {}
+    position = {}
+
+    def find(key):
+        while parent[key] != key:
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
+
+    for curriculum_set in curriculum:
+        for i, question in enumerate(curriculum_set.get('questions', [])):
+            key = f"{curriculum_set.get('id')}#{i}"
+            signature = deduper.signature(question)
+            parent[key] = key
+            position[key] = len(position)
+            for match, _ in deduper.index.query(signature):
+                root_a, root_b = find(match), find(key)
+                if root_a != root_b:
+                    # The earlier question stays the cluster root
+                    first, second = sorted((root_a, root_b), key=position.get)
+                    parent[second] = first
+            deduper.add(key, question, signature)
+
+    clusters = defaultdict(list)
+    for key in position:
+        clusters[find(key)].append(key)
+    return [keys for keys in clusters.values() if len(keys) > 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Find or remove near-duplicate questions')
+    parser.add_argument('command', choices=['scan', 'dedupe'])
+    parser.add_argument('--file', default=str(CURRICULUM_FILE))
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument('--report', help='Write clusters to this JSON file (scan)')
+    parser.add_argument('--min-questions', type=int, default=3,
+                        help='Drop sets left with fewer questions (dedupe)')
+    args = parser.parse_args()
+
+    # Slotted sets with shared strings: a fraction of the memory of json.load
+    curriculum = curriculum_model.load(args.file)
+    total = sum(len(s.get('questions', [])) for s in curriculum)
+
+    if args.command == 'scan':
+        clusters = find_clusters(curriculum, args.threshold)
+        redundant = sum(len(c) - 1 for c in clusters)
+        print(f"🔍 {total} questions, {len(clusters)} near-duplicate clusters, {redundant} redundant questions")
+        questions = {
+            f"{s.get('id')}#{i}": q.get('question', '')
+            for s in curriculum for i, q in enumerate(s.get('questions', []))
+        }
+        for keys in sorted(clusters, key=len, reverse=True)[:10]:
+            print(f"  ×{len(keys)} {questions[keys[0]][:80]!r} ({', '.join(keys[:3])}{', ...' if len(keys) > 3 else ''})")
+        if args.report:
+            write_json_atomic(args.report, [
+                {'keep': keys[0], 'duplicates': keys[1:], 'question': questions[keys[0]]} for keys in clusters
+            ])
+            print(f"💾 Report saved to {args.report}")
+        return
+
+    deduper = QuestionDeduper(args.threshold)
+    kept_sets = []
+    dropped = 0
+    emptied = 0
+    for curriculum_set in curriculum:
+        dropped += len(deduper.filter_set(curriculum_set))
+        if len(curriculum_set.get('questions', [])) < args.min_questions:
+            emptied += 1
+            continue
+        kept_sets.append(curriculum_set)
+
+    curriculum_model.dump(kept_sets, args.file)
+    print(f"✅ Removed {dropped} near-duplicate questions; dropped {emptied} sets left with < {args.min_questions} questions")
+    print(f"   {len(kept_sets)} sets, {sum(len(s['questions']) for s in kept_sets)} questions remain")
+
+
+if __name__ == '__main__':
+    main()
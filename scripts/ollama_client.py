@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Persistent HTTP client for a local Ollama server
+Reuses keep-alive connections instead of spawning `ollama run` per prompt,
+pins the model in memory with keep_alive, streams tokens, and runs as many
+requests at once as the server has parallel slots (OLLAMA_NUM_PARALLEL).
+
+Usage:
+  python scripts/ollama_client.py warm
+  python scripts/ollama_client.py bench --requests 20
+  python scripts/ollama_client.py bench --host http://127.0.0.1:11499   # against llm_stub_server.py
+"""
+
+import argparse
+import contextlib
+import http.client
+import json
+import os
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from llm_metrics import note_response
+
+DEFAULT_HOST = os.getenv('OLLAMA_HOST', 'http://127.0.0.1:11434')
+DEFAULT_MODEL = 'qwen2.5-coder:7b'
+DEFAULT_KEEP_ALIVE = '30m'
+
+
+class OllamaError(Exception):
+    """Non-2xx response or error payload from the Ollama server"""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+def _host_url(host):
+    if '://' not in host:
+        host = f"http://{host}"
+    parts = urlsplit(host)
+    return parts.hostname or '127.0.0.1', parts.port or 11434
+
+
+class OllamaClient:
+    """
+    Thread-safe client with a pool of keep-alive connections, one per slot.
+
+    parallel should match the server's OLLAMA_NUM_PARALLEL; more in-flight
+    requests than slots just queue inside Ollama.
+    """
+
+    def __init__(self, model=DEFAULT_MODEL, host=DEFAULT_HOST, parallel=None,
+                 keep_alive=DEFAULT_KEEP_ALIVE, timeout=120, options=None):
+        self.model = model
+        self.host, self.port = _host_url(host)
+        self.parallel = parallel or int(os.getenv('OLLAMA_NUM_PARALLEL', '4'))
+        self.keep_alive = keep_alive
+        self.timeout = timeout
+        self.options = options or {}
+        self._pool = queue.LifoQueue()
+        for _ in range(self.parallel):
+            self._pool.put(None)  # Connections are opened lazily
+
+    def _connect(self):
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    @contextlib.contextmanager
+    def _post(self, path, payload):
+        """POST on a pooled connection; the connection goes back to the pool on exit"""
+        conn = self._pool.get() or self._connect()
+        body = json.dumps(payload).encode('utf-8')
+        headers = {'Content-Type': 'application/json', 'Connection': 'keep-alive'}
+        try:
+            try:
+                conn.request('POST', path, body, headers)
+                response = conn.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # Server dropped an idle keep-alive connection; retry once on a fresh one
+                conn.close()
+                conn = self._connect()
+                conn.request('POST', path, body, headers)
+                response = conn.getresponse()
+
+            if response.status >= 400:
+                detail = response.read().decode('utf-8', 'replace')
+                raise OllamaError(f"Ollama HTTP {response.status}: {detail[:200]}", response.status)
+            yield response
+            response.read()  # Drain so the connection can be reused
+        except BaseException:
+            conn.close()
+            conn = None
+            raise
+        finally:
+            self._pool.put(conn)
+
+    def stream(self, prompt, max_tokens=None, system=None):
+        """Yield response text chunks as the model produces them"""
+        options = dict(self.options)
+        if max_tokens:
+            options['num_predict'] = max_tokens
+        payload = {
+            'model': self.model,
+            'prompt': prompt,
+            'stream': True,
+            'keep_alive': self.keep_alive,
+            'options': options,
+        }
+        if system:
+            payload['system'] = system
+
+        with self._post('/api/generate', payload) as response:
+            # Newline-delimited JSON, one object per token batch
+            for line in response:
+                line = line.strip()
+                if not line:
+                    continue
+                event = json.loads(line)
+                if event.get('error'):
+                    raise OllamaError(event['error'])
+                if event.get('response'):
+                    yield event['response']
+                if event.get('done'):
+                    # The final event carries prompt_eval_count / eval_count
+                    note_response(event)
+                    return
+
+    def generate(self, prompt, max_tokens=None, system=None, on_token=None):
+        """Full response text; on_token(chunk) sees tokens as they stream in"""
+        parts = []
+        for chunk in self.stream(prompt, max_tokens, system):
+            parts.append(chunk)
+            if on_token:
+                on_token(chunk)
+        return ''.join(parts)
+
+    def warm(self):
+        """Load the model and pin it for keep_alive (an empty prompt only loads)"""
+        with self._post('/api/generate', {
+            'model': self.model,
+            'prompt': '',
+            'stream': False,
+            'keep_alive': self.keep_alive,
+        }) as response:
+            return json.loads(response.read() or b'{}')
+
+    def unload(self):
+        """Release the model's memory now rather than after keep_alive"""
+        with self._post('/api/generate', {'model': self.model, 'prompt': '', 'keep_alive': 0, 'stream': False}) as response:
+            response.read()
+
+    def generate_many(self, prompts, max_tokens=None):
+        """Run prompts across all slots; yields (index, text or exception) in prompt order"""
+        def run(item):
+            index, prompt = item
+            try:
+                return index, self.generate(prompt, max_tokens)
+            except Exception as e:
+                return index, e
+
+        with ThreadPoolExecutor(max_workers=self.parallel) as executor:
+            yield from executor.map(run, enumerate(prompts))
+
+    def close(self):
+        while not self._pool.empty():
+            conn = self._pool.get_nowait()
+            if conn is not None:
+                conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Warm or benchmark the local Ollama server')
+    parser.add_argument('command', choices=['warm', 'unload', 'bench'])
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--model', default=DEFAULT_MODEL)
+    parser.add_argument('--parallel', type=int, help='Defaults to OLLAMA_NUM_PARALLEL or 4')
+    parser.add_argument('--requests', type=int, default=12)
+    parser.add_argument('--max-tokens', type=int, default=256)
+    args = parser.parse_args()
+
+    client = OllamaClient(args.model, args.host, parallel=args.parallel)
+
+    if args.command == 'warm':
+        client.warm()
+        print(f"✅ {args.model} loaded (keep_alive={client.keep_alive})")
+        return
+    if args.command == 'unload':
+        client.unload()
+        print(f"✅ {args.model} unloaded")
+        return
+
+    prompt = "Write one Grade 7 multiple choice math question as JSON."
+    client.warm()
+
+    start = time.time()
+    for _ in range(min(args.requests, 3)):
+        client.generate(prompt, args.max_tokens)
+    serial = (time.time() - start) / min(args.requests, 3)
+
+    start = time.time()
+    failures = sum(isinstance(result, Exception) for _, result in
+                   client.generate_many([prompt] * args.requests, args.max_tokens))
+    elapsed = time.time() - start
+
+    print(f"Serial:   {serial:.2f}s/request ({3600 / serial:.0f}/hour)")
+    print(f"Parallel: {elapsed / args.requests:.2f}s/request ({args.requests * 3600 / elapsed:.0f}/hour) "
+          f"with {client.parallel} slots, {failures} failed")
+    client.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""
+Structured progress events for generation runs, and a live monitor
+Each generator process appends one JSON line per event to its own file in
+data/events/: run_started (with the number of jobs), request (provider,
+model, tokens, latency, error), throttled, sets (requested / accepted /
+questions), job_started / job_finished (job, attempt, seconds, ok) and
+run_finished. Request and sets events come from the metrics hooks in
+llm_metrics and job events from the generation engine, so every generator
+reports them without extra code.
+
+The monitor remembers a byte offset per file and only reads what was
+appended since the last refresh, so a refresh costs the same after ten
+minutes or ten hours. It shows progress, sets/hour, ETA, the jobs in
+flight, per-job latency and per-provider health. Over SSH, run it on the generating host in one session instead of
+tailing logs on every refresh.
+
+Usage:
+  python scripts/progress_events.py monitor [--run NAME] [--refresh 2] [--since 12]
+  python scripts/progress_events.py monitor --once
+"""
+
+import argparse
+import atexit
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+EVENTS_DIR = PROJECT_ROOT / 'data' / 'events'
+
+RATE_WINDOW = 300  # Seconds of history behind sets/hour and tokens/second
+LATENCY_SAMPLES = 200
+SHOW_IN_FLIGHT = 3  # Longest-running jobs listed by the monitor
+STALE_SECONDS = 120  # A process with no events for this long shows as idle
+
+
+class EventLog:
+    """Append-only JSONL event file for one process; writes never interrupt generation"""
+
+    def __init__(self, run, events_dir=EVENTS_DIR):
+        self.run = run
+        self.session = f"{socket.gethostname()}:{os.getpid()}"
+        events_dir = Path(events_dir)
+        events_dir.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        self.path = events_dir / f"{run}-{stamp}-{os.getpid()}.jsonl"
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+        self._warned = False
+        self.finished = False
+
+    def emit(self, event, **fields):
+        line = json.dumps({'ts': round(time.time(), 3), 'event': event, 'run': self.run,
+                           'session': self.session, **fields}, ensure_ascii=False, default=str)
+        try:
+            with self._lock:
+                # One write per line, so a reader never sees half an event unless it raced the flush
+                self._file.write(line + '\n')
+                self._file.flush()
+        except (OSError, ValueError) as e:
+            if not self._warned:
+                self._warned = True
+                print(f"⚠️  Progress events not written ({e})")
+
+    def run_started(self, total, **fields):
+        """
+        Call once the job list is known; `total` drives the progress bar and
+        ETA. Workers sharing one queue pass queue=<name> so it counts once.
+        """
+        self.emit('run_started', total=total, **fields)
+
+    def job_started(self, job, attempt=1):
+        self.emit('job_started', job=job_label(job), attempt=attempt)
+
+    def job_finished(self, job, seconds, ok, attempt=1, error=None):
+        fields = {'error': str(error)[:300]} if error is not None else {}
+        self.emit('job_finished', job=job_label(job), attempt=attempt, seconds=round(seconds, 3), ok=ok, **fields)
+
+    def run_finished(self, **fields):
+        if not self.finished:
+            self.finished = True
+            self.emit('run_finished', **fields)
+
+    def close(self):
+        self.run_finished()
+        with self._lock:
+            self._file.close()
+
+
+def job_label(job):
+    """Short name for a job in events: its id, or the first id of a packed batch"""
+    if isinstance(job, dict):
+        return str(job.get('id', '?'))
+    if isinstance(job, (list, tuple)) and job and isinstance(job[0], dict):
+        return job_label(job[0]) + (f" +{len(job) - 1}" if len(job) > 1 else '')
+    return str(job)
+
+
+_events = None
+_events_lock = threading.Lock()
+
+
+def get_events(run=None):
+    """Process-wide event log, named like the metrics run (the script's name)"""
+    global _events
+    with _events_lock:
+        if _events is None:
+            if run is None:
+                run = Path(sys.argv[0]).stem if sys.argv[0] not in ('', '-c') else 'interactive'
+            _events = EventLog(run)
+            atexit.register(_events.close)
+        return _events
+
+
+def use_events(log):
+    """Make `log` the process-wide event log (e.g. a scratch directory for benchmarks)"""
+    global _events
+    with _events_lock:
+        _events = log
+        atexit.register(log.close)
+        return log
+
+
+class Tailer:
+    """Reads only the bytes appended to each event file since the last poll"""
+
+    def __init__(self, events_dir=EVENTS_DIR, since_hours=12, run=None):
+        self.events_dir = Path(events_dir)
+        self.since_hours = since_hours
+        self.run = run
+        self.offsets = {}
+
+    def _files(self):
+        cutoff = time.time() - self.since_hours * 3600
+        pattern = f"{self.run}-*.jsonl" if self.run else '*.jsonl'
+        for path in sorted(self.events_dir.glob(pattern)):
+            if path in self.offsets:
+                yield path
+                continue
+            try:
+                if path.stat().st_mtime >= cutoff:
+                    self.offsets[path] = 0
+                    yield path
+            except FileNotFoundError:
+                continue
+
+    def poll(self):
+        """New events from every file, oldest file first"""
+        events = []
+        for path in self._files():
+            try:
+                with open(path, 'rb') as f:
+                    f.seek(self.offsets[path])
+                    data = f.read()
+            except FileNotFoundError:
+                del self.offsets[path]
+                continue
+            # Leave a line that is still being written for the next poll
+            end = data.rfind(b'\n') + 1
+            self.offsets[path] += end
+            for line in data[:end].splitlines():
+                try:
+                    events.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+        return events
+
+
+def _rate_limited(error):
+    # Imported late: rate_limiter -> llm_metrics -> this module
+    from rate_limiter import RATE_LIMIT_MARKERS
+    return any(marker in error.lower() for marker in RATE_LIMIT_MARKERS)
+
+
+class ProviderHealth:
+    __slots__ = ('requests', 'errors', 'throttled', 'cached', 'latencies', 'tokens',
+                 'last_seen', 'last_error')
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.throttled = 0
+        self.cached = 0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.tokens = deque()  # (ts, output tokens) inside RATE_WINDOW
+        self.last_seen = 0.0
+        self.last_error = None
+
+    def status(self, now):
+        if now - self.last_seen > STALE_SECONDS:
+            return '⚪'
+        error_rate = self.errors / self.requests if self.requests else 0
+        if error_rate > 0.25:
+            return '🔴'
+        if error_rate > 0.05 or self.throttled:
+            return '🟡'
+        return '🟢'
+
+
+class RunState:
+    """Aggregates for one run name across all its processes; memory stays bounded"""
+
+    def __init__(self, name):
+        self.name = name
+        self.totals = {}  # session (or shared queue) -> planned jobs
+        self.sessions = set()
+        self.finished = set()
+        self.accepted = 0
+        self.rejected = 0
+        self.questions = 0
+        self.recent = deque()  # (ts, sets accepted) inside RATE_WINDOW
+        self.started = None
+        self.last_seen = 0.0
+        self.providers = {}
+        self.in_flight = {}  # (session, job) -> (started ts, attempt)
+        self.job_latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.jobs_done = 0
+        self.job_failures = 0  # Attempts that raised or returned nothing
+
+    def apply(self, event):
+        ts = event.get('ts', time.time())
+        self.last_seen = max(self.last_seen, ts)
+        kind = event.get('event')
+        session = event.get('session')
+        self.sessions.add(session)
+        if kind == 'run_started':
+            # Workers on one shared queue each report the queue's size; count it once
+            key = event.get('queue') or session
+            self.totals[key] = max(self.totals.get(key, 0), event.get('total') or 0)
+            self.finished.discard(session)
+            self.started = ts if self.started is None else min(self.started, ts)
+        elif kind == 'run_finished':
+            self.finished.add(session)
+            # Whatever this process still had running was abandoned
+            for key in [key for key in self.in_flight if key[0] == session]:
+                del self.in_flight[key]
+        elif kind == 'job_started':
+            self.in_flight[(session, event.get('job'))] = (ts, event.get('attempt', 1))
+        elif kind == 'job_finished':
+            self.in_flight.pop((session, event.get('job')), None)
+            if event.get('ok'):
+                self.jobs_done += 1
+                self.job_latencies.append(event.get('seconds', 0))
+            else:
+                self.job_failures += 1
+        elif kind == 'sets':
+            accepted = event.get('accepted', 0)
+            self.accepted += accepted
+            self.rejected += max(0, event.get('requested', 0) - accepted)
+            self.questions += event.get('questions', 0)
+            if accepted:
+                self.recent.append((ts, accepted))
+        elif kind in ('request', 'throttled'):
+            key = f"{event.get('provider')}/{event.get('model')}"
+            health = self.providers.setdefault(key, ProviderHealth())
+            health.last_seen = max(health.last_seen, ts)
+            if kind == 'throttled':
+                health.throttled += 1
+                return
+            health.requests += 1
+            if event.get('cached'):
+                health.cached += 1
+                return
+            if event.get('error') and _rate_limited(event['error']):
+                health.throttled += 1
+            elif event.get('error'):
+                health.errors += 1
+                health.last_error = event['error']
+            else:
+                health.latencies.append(event.get('latency', 0))
+                health.tokens.append((ts, event.get('output_tokens', 0)))
+
+    def trim(self, now):
+        cutoff = now - RATE_WINDOW
+        while self.recent and self.recent[0][0] < cutoff:
+            self.recent.popleft()
+        for health in self.providers.values():
+            while health.tokens and health.tokens[0][0] < cutoff:
+                health.tokens.popleft()
+
+    def sets_per_hour(self, now):
+        if not self.recent:
+            return 0.0
+        span = min(RATE_WINDOW, max(now - (self.started or now), 1.0))
+        return sum(count for _, count in self.recent) * 3600 / span
+
+    @property
+    def total(self):
+        return sum(self.totals.values())
+
+    @property
+    def active(self):
+        return len(self.sessions - self.finished)
+
+
+def _duration(seconds):
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    return f"{seconds // 60}m{seconds % 60:02d}s"
+
+
+def _bar(fraction, width=20):
+    filled = int(round(min(max(fraction, 0.0), 1.0) * width))
+    return '█' * filled + '░' * (width - filled)
+
+
+def render(runs, now=None):
+    """Text for the monitor screen"""
+    now = now or time.time()
+    lines = [f"📊 GENERATION MONITOR - {datetime.fromtimestamp(now).strftime('%Y-%m-%d %H:%M:%S')}", '=' * 80]
+    if not runs:
+        lines.append(f"No events yet in {EVENTS_DIR}")
+    for state in sorted(runs.values(), key=lambda s: -s.last_seen):
+        state.trim(now)
+        rate = state.sets_per_hour(now)
+        total = state.total
+        progress = f"{state.accepted} sets"
+        if total:
+            progress = f"{_bar(state.accepted / total)} {state.accepted}/{total} sets ({state.accepted * 100 // total}%)"
+        eta = ''
+        if total and rate and state.accepted < total and state.active:
+            eta = f"  ETA {_duration((total - state.accepted) / rate * 3600)}"
+        status = f"{state.active} running" if state.active else 'finished'
+        if state.active and now - state.last_seen > STALE_SECONDS:
+            status = f"quiet for {_duration(now - state.last_seen)}"
+        lines.append(f"\n🚀 {state.name} ({status})")
+        lines.append(f"   {progress}  {rate:.0f} sets/hour{eta}")
+        lines.append(f"   {state.questions} questions kept, {state.rejected} sets rejected")
+        if state.jobs_done or state.job_failures or state.in_flight:
+            latencies = sorted(state.job_latencies)
+            timing = ''
+            if latencies:
+                timing = (f", p50 {latencies[len(latencies) // 2]:.1f}s"
+                          f" p90 {latencies[min(len(latencies) - 1, len(latencies) * 9 // 10)]:.1f}s per job")
+            lines.append(f"   ⏳ {len(state.in_flight)} jobs in flight, {state.jobs_done} done{timing}, "
+                         f"{state.job_failures} failed attempts")
+            running = sorted(state.in_flight.items(), key=lambda item: item[1][0])[:SHOW_IN_FLIGHT]
+            for (_, job), (started, attempt) in running:
+                retry = f" (attempt {attempt})" if attempt > 1 else ''
+                lines.append(f"      {job}: {_duration(now - started)}{retry}")
+        for key, health in sorted(state.providers.items()):
+            latencies = sorted(health.latencies)
+            p50 = latencies[len(latencies) // 2] if latencies else 0
+            tokens = sum(count for _, count in health.tokens) / RATE_WINDOW
+            errors = f"{health.errors} errors ({health.errors * 100 // max(health.requests, 1)}%)"
+            lines.append(f"   {health.status(now)} {key}: {health.requests} requests, {health.cached} cached, "
+                         f"p50 {p50:.1f}s, {tokens:.0f} tok/s, {health.throttled} 429s, {errors}, "
+                         f"last {_duration(now - health.last_seen)} ago")
+            if health.last_error:
+                lines.append(f"      last error: {health.last_error[:100]}")
+    return '\n'.join(lines)
+
+
+def monitor(run=None, refresh=2.0, since_hours=12, once=False, events_dir=EVENTS_DIR):
+    tailer = Tailer(events_dir, since_hours, run)
+    runs = {}
+    try:
+        while True:
+            for event in tailer.poll():
+                name = event.get('run', '?')
+                runs.setdefault(name, RunState(name)).apply(event)
+            screen = render(runs)
+            if once:
+                print(screen)
+                return
+            # Home the cursor and clear instead of spawning `clear` every refresh
+            sys.stdout.write('\033[H\033[J' + screen + f"\n\n🔄 Refreshing every {refresh}s, Ctrl+C to exit\n")
+            sys.stdout.flush()
+            time.sleep(refresh)
+    except KeyboardInterrupt:
+        print("\n✅ Monitoring stopped by user")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Live progress from generation event files')
+    parser.add_argument('command', choices=['monitor'])
+    parser.add_argument('--run', help='Only this run (script name)')
+    parser.add_argument('--refresh', type=float, default=2.0)
+    parser.add_argument('--since', type=float, default=12, help='Ignore event files older than this many hours')
+    parser.add_argument('--once', action='store_true', help='Print one snapshot and exit')
+    parser.add_argument('--events-dir', default=str(EVENTS_DIR))
+    args = parser.parse_args()
+    monitor(args.run, args.refresh, args.since, args.once, args.events_dir)
+
+
+if __name__ == '__main__':
+    main()
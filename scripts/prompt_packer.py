@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Pack several curriculum sets into one LLM request
+The shared instruction block is sent once per request instead of once per
+set, and the number of sets per request is sized to the model's output
+token limit so the JSON array is not cut off. The response is split per
+set, each set is validated on its own, and only the sets that failed are
+asked for again. Prompts ask for a few more questions than a set needs;
+question_validator keeps the best and a set that falls short keeps its
+good questions, so the retry only has to make up the difference.
+"""
+
+import asyncio
+import time
+from collections import Counter
+
+from json_salvage import is_question, salvage
+from llm_metrics import get_metrics
+from question_validator import describe_rejections, request_count, select_best
+from rate_limiter import is_rate_limited, retry_after
+
+# Output token limits per model (max_output_tokens / max_tokens)
+OUTPUT_TOKEN_LIMITS = {
+    'claude-3-haiku-20240307': 4096,
+    'claude-3-5-sonnet-20241022': 8192,
+    'gemini-2.0-flash-exp': 8192,
+    'gemini-2.0-flash': 8192,
+    'gemini-1.5-flash': 8192,
+    'qwen2.5-coder:7b': 4096,
+}
+DEFAULT_OUTPUT_LIMIT = 4096
+
+# Measured on curriculum.json: ~700 tokens for a set of 8-9 questions
+TOKENS_PER_QUESTION = 80
+TOKENS_PER_SET = 60
+# Leave room for models that run long on explanations
+HEADROOM = 0.8
+
+MIN_QUESTIONS = 5
+
+# A batch still rate limited after the limiter's own retries: back off and try again
+RATE_LIMIT_ATTEMPTS = 3
+RATE_LIMIT_BACKOFF = 30  # Seconds, doubled per attempt unless the provider says otherwise
+
+SET_EXAMPLE = """{
+    "id": "<id given above>",
+    "title": "<title given above>",
+    "description": "Practice <subtopic> for Grade <grade>",
+    "grade_level": <grade>,
+    "topic": "<topic given above>",
+    "questions": [
+      {
+        "question": "Question text",
+        "options": ["Option A", "Option B", "Option C", "Option D"],
+        "answer": "Option A",
+        "explanation": "Why this is correct"
+      }
+    ]
+  }"""
+
+# For topics where questions may carry a diagram description
+ILLUSTRATED_SET_EXAMPLE = SET_EXAMPLE.replace(
+    '"explanation": "Why this is correct"',
+    '"explanation": "Why this is correct",\n        "illustration": "Optional: Description of diagram if needed"'
+)
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token)"""
+    return len(text) // 4 + 1
+
+
+def output_limit(model):
+    return OUTPUT_TOKEN_LIMITS.get(model, DEFAULT_OUTPUT_LIMIT)
+
+
+def set_cost(questions_per_set=10, tokens_per_question=TOKENS_PER_QUESTION):
+    """Expected output tokens for one set (including the over-generated questions)"""
+    return TOKENS_PER_SET + request_count(questions_per_set) * tokens_per_question
+
+
+def pack(jobs, limit=DEFAULT_OUTPUT_LIMIT, questions_per_set=10, max_sets=8,
+         tokens_per_question=TOKENS_PER_QUESTION):
+    """
+    Group jobs into batches whose expected output fits in `limit` tokens.
+    Jobs stay in order and a batch never mixes grades, so the grade-specific
+    instructions apply to every set in it.
+    """
+    per_batch = max(1, min(max_sets, int(limit * HEADROOM) // set_cost(questions_per_set, tokens_per_question)))
+    batches = []
+    batch = []
+    for job in jobs:
+        if batch and (len(batch) >= per_batch or job['grade'] != batch[0]['grade']):
+            batches.append(batch)
+            batch = []
+        batch.append(job)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def set_id(job):
+    """Curriculum id for a job ('set_id' when the job key differs from it)"""
+    return job.get('set_id', job['id'])
+
+
+def describe(job):
+    title = job.get('title') or f"{job['subtopic']} - Set {job['set_num']}"
+    return (f'id "{set_id(job)}", title "{title}", grade_level {job["grade"]}, '
+            f'topic "{job["topic"]}", subtopic "{job["subtopic"]}"')
+
+
+def batch_prompt(jobs, instructions, example=SET_EXAMPLE, questions_per_set=None):
+    """One prompt asking for every set in `jobs` as a JSON array"""
+    listing = '\n'.join(f"{i}. {describe(job)}" for i, job in enumerate(jobs, 1))
+    grade = jobs[0]['grade']
+    count = f"\nWrite {questions_per_set} questions per set." if questions_per_set else ''
+    return f"""Generate {len(jobs)} math curriculum sets for Grade {grade}.
+
+{instructions.strip()}{count}
+
+Sets to generate (use exactly these ids, titles, grade levels and topics):
+{listing}
+
+Return ONLY a valid JSON array (no markdown) with one object per set above, in the same order:
+[
+  {example}
+]"""
+
+
+def validate_set(curriculum_set, min_questions=MIN_QUESTIONS, grade=None, keep=None,
+                 carried=(), rejections=None):
+    """
+    Keep the `keep` best valid questions in place (after any `carried` over
+    from an earlier short response); return an error string if fewer than
+    min_questions remain.
+    """
+    questions = curriculum_set.get('questions')
+    if not isinstance(questions, list):
+        return 'no questions list'
+    seen = {str(q['question']).strip().lower() for q in carried}
+    fresh = [q for q in questions
+             if is_question(q) and str(q['question']).strip().lower() not in seen]
+    valid = select_best(list(carried) + fresh, grade, keep, rejections)
+    curriculum_set['questions'] = valid
+    if len(valid) < min_questions:
+        return f"only {len(valid)} valid questions"
+    return None
+
+
+def split_sets(text, jobs, min_questions=MIN_QUESTIONS, questions_per_set=None, partial=None,
+               rejections=None):
+    """
+    Match the sets in a batched response to their jobs (by id, then by
+    position for sets whose id was changed). Returns (accepted, failed)
+    where accepted is a list of (job, set) and failed a list of jobs.
+    With questions_per_set, a set must reach that many good questions; a
+    short set's questions are kept in `partial` (job id -> questions) and
+    merged into the next response for that job.
+    """
+    partial = {} if partial is None else partial
+    sets = salvage(text, 'set')
+    by_id = {set_id(job): job for job in jobs}
+    matched = {}
+    unmatched = []
+    for curriculum_set in sets:
+        job = by_id.get(curriculum_set.get('id'))
+        if job and job['id'] not in matched:
+            matched[job['id']] = curriculum_set
+        else:
+            unmatched.append(curriculum_set)
+
+    for job in jobs:
+        if job['id'] not in matched and unmatched:
+            matched[job['id']] = unmatched.pop(0)
+
+    accepted = []
+    failed = []
+    for job in jobs:
+        curriculum_set = matched.get(job['id'])
+        earlier = partial.get(job['id'], {}).get('questions', ())
+        needed = questions_per_set or min_questions
+        if curriculum_set is None or validate_set(curriculum_set, needed, job['grade'], questions_per_set,
+                                                  earlier, rejections):
+            if curriculum_set and len(curriculum_set.get('questions') or ()) > len(earlier):
+                partial[job['id']] = curriculum_set
+            failed.append(job)
+            continue
+        partial.pop(job['id'], None)
+        accepted.append((job, _place(job, curriculum_set)))
+    return accepted, failed
+
+
+def _place(job, curriculum_set):
+    # The job, not the model, decides identity and placement
+    curriculum_set['id'] = set_id(job)
+    curriculum_set['grade_level'] = job['grade']
+    curriculum_set['topic'] = job['topic']
+    return curriculum_set
+
+
+def take_partial(jobs, partial, min_questions=MIN_QUESTIONS):
+    """Short sets from the last round that still have min_questions good questions, as (job, set)"""
+    return [(job, _place(job, partial[job['id']])) for job in jobs
+            if len(partial.get(job['id'], {}).get('questions', ())) >= min_questions]
+
+
+def record_yield(jobs, accepted):
+    """Attach the sets and questions kept from the last response to its metrics row"""
+    get_metrics().record_yield(len(jobs), len(accepted),
+                               sum(len(s['questions']) for _, s in accepted), grade=jobs[0]['grade'])
+
+
+def _max_tokens(jobs, limit, questions_per_set, tokens_per_question):
+    return min(limit, int(len(jobs) * set_cost(questions_per_set, tokens_per_question) / HEADROOM) + 256)
+
+
+def _round(text, batch, questions_per_set, partial, log):
+    rejections = Counter()
+    accepted, remaining = split_sets(text, batch, questions_per_set=questions_per_set,
+                                     partial=partial, rejections=rejections)
+    dropped = describe_rejections(rejections)
+    if dropped:
+        log(f"🧹 {dropped}")
+    return accepted, remaining
+
+
+def _prompt(jobs, instructions, example, questions_per_set, limit, tokens_per_question):
+    return (batch_prompt(jobs, instructions, example, request_count(questions_per_set)),
+            _max_tokens(jobs, limit, questions_per_set, tokens_per_question))
+
+
+async def run_batch_async(jobs, complete, instructions, limit=DEFAULT_OUTPUT_LIMIT,
+                          example=SET_EXAMPLE, questions_per_set=10, max_rounds=3, log=print,
+                          tokens_per_question=TOKENS_PER_QUESTION, partial=None, take_short=True):
+    """
+    Generate one packed batch. await complete(prompt, max_tokens) -> text.
+    Returns a list of (job, set or None); only sets short of
+    questions_per_set good questions are re-requested, and after the last
+    round a short set is still used if it has MIN_QUESTIONS.
+
+    Callers that budget every request themselves (GenerationEngine) run a
+    single round and queue the unfinished jobs again, passing the same
+    `partial` dict so short sets keep their questions, and take_short=False
+    until the last round.
+    """
+    results = {}
+    partial = {} if partial is None else partial
+    remaining = list(jobs)
+    for round_num in range(1, max_rounds + 1):
+        if not remaining:
+            break
+        try:
+            text = await complete(*_prompt(remaining, instructions, example, questions_per_set, limit,
+                                           tokens_per_question))
+        except Exception as e:
+            # Nothing accepted yet: let the caller back off and requeue the whole batch
+            if is_rate_limited(e) and not results:
+                raise
+            log(f"⚠️  Batch of {len(remaining)} failed (round {round_num}): {e}")
+            continue
+        batch = remaining
+        accepted, remaining = _round(text, batch, questions_per_set, partial, log)
+        record_yield(batch, accepted)
+        results.update((job['id'], s) for job, s in accepted)
+        if remaining:
+            log(f"🔁 {len(accepted)} accepted, retrying {len(remaining)} sets")
+    if take_short:
+        results.update((job['id'], s) for job, s in take_partial(remaining, partial))
+    return [(job, results.get(job['id'])) for job in jobs]
+
+
+def run_batch(jobs, complete, instructions, limit=DEFAULT_OUTPUT_LIMIT,
+              example=SET_EXAMPLE, questions_per_set=10, max_rounds=3, log=print,
+              tokens_per_question=TOKENS_PER_QUESTION):
+    """run_batch_async for a blocking complete(prompt, max_tokens) -> text"""
+    async def complete_async(prompt, max_tokens):
+        return complete(prompt, max_tokens)
+
+    return asyncio.run(run_batch_async(jobs, complete_async, instructions, limit, example,
+                                       questions_per_set, max_rounds, log, tokens_per_question))
+
+
+def generate_packed(jobs, complete, instructions, limit=DEFAULT_OUTPUT_LIMIT,
+                    example=SET_EXAMPLE, questions_per_set=10, max_sets=8, max_rounds=3, log=print,
+                    tokens_per_question=TOKENS_PER_QUESTION, rate_limit_attempts=RATE_LIMIT_ATTEMPTS,
+                    claim=None):
+    """
+    Pack jobs and run every batch; yields (job, set or None) in job order.
+    A batch that stays rate limited is retried after a back-off, then given
+    up on (None for each of its jobs) so the caller keeps what it has.
+    With `claim`, each job is claimed just before its batch is sent and
+    jobs it refuses (another worker has them) are skipped without a result.
+    """
+    for batch in pack(jobs, limit, questions_per_set, max_sets, tokens_per_question):
+        if claim:
+            batch = [job for job in batch if claim(job)]
+            if not batch:
+                continue
+        for attempt in range(1, rate_limit_attempts + 1):
+            try:
+                results = run_batch(batch, complete, instructions, limit, example,
+                                    questions_per_set, max_rounds, log, tokens_per_question)
+                break
+            except Exception as e:
+                if not is_rate_limited(e):
+                    raise
+                if attempt == rate_limit_attempts:
+                    log(f"❌ Batch of {len(batch)} still rate limited after {attempt} attempts, skipping: {e}")
+                    results = [(job, None) for job in batch]
+                    break
+                delay = retry_after(e) or RATE_LIMIT_BACKOFF * 2 ** (attempt - 1)
+                log(f"⏳ Rate limited, retrying batch of {len(batch)} in {delay:.0f}s")
+                time.sleep(delay)
+        yield from results
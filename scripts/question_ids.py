@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Stable question identity and a linear-time curriculum diff
+Each question carries a persistent `uid` (assigned once, never recomputed,
+so it survives edits and reordering) and has a content hash over its
+normalized fields. diff() compares two snapshots in one pass over each:
+questions are matched by uid, then by content hash within the same set,
+then by position, and come back as added, removed or modified. Tools can
+then audit or upload just the delta instead of the whole corpus.
+
+Snapshots are a curriculum JSON file, a sharded store directory or a .cpk
+pack; the default "new" side is the current curriculum.
+
+Usage:
+  python scripts/question_ids.py assign
+  python scripts/question_ids.py diff old-curriculum.json [new] [--out delta.json] [--show 10]
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import unicodedata
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from curriculum_journal import write_json_atomic
+from curriculum_store import MANIFEST_NAME, CurriculumStore, open_curriculum
+
+UID_FIELD = 'uid'
+# Seeds first-time uids, so the same question gets the same uid on every machine
+UID_NAMESPACE = uuid.UUID('5b0f3a52-6f4e-4c1e-9a57-2f0c6e1d8a43')
+
+_SPACES = re.compile(r'\s+')
+
+
+def _normalize(value):
+    if isinstance(value, str):
+        return _SPACES.sub(' ', unicodedata.normalize('NFC', value)).strip()
+    if isinstance(value, list):
+        return [_normalize(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    return value
+
+
+def content_hash(question):
+    """
+    Hash of everything in a question except its uid, with whitespace and
+    Unicode form normalized and key order ignored
+    """
+    if isinstance(question, dict):
+        question = {k: v for k, v in question.items() if k != UID_FIELD}
+    canonical = json.dumps(_normalize(question), sort_keys=True, ensure_ascii=False)
+    return hashlib.blake2b(canonical.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def assign_uids(sets, taken=None):
+    """
+    Give every question without a uid one; returns how many were assigned.
+    `taken` holds uids already in use elsewhere (it is updated in place).
+    """
+    sets = list(sets)
+    taken = set() if taken is None else taken
+    taken.update(q[UID_FIELD] for s in sets for q in s.get('questions') or []
+                 if isinstance(q, dict) and q.get(UID_FIELD))
+    # Identical questions in sets sharing an id still get distinct uids
+    seen = Counter()
+    assigned = 0
+    for curriculum_set in sets:
+        for question in curriculum_set.get('questions') or []:
+            if not isinstance(question, dict) or question.get(UID_FIELD):
+                continue
+            key = (curriculum_set.get('id'), content_hash(question))
+            while True:
+                seen[key] += 1
+                uid = str(uuid.uuid5(UID_NAMESPACE, f"{key[0]}\n{key[1]}\n{seen[key]}"))
+                if uid not in taken:
+                    break
+            question[UID_FIELD] = uid
+            taken.add(uid)
+            assigned += 1
+    return assigned
+
+
+def load_snapshot(path):
+    """Iterate the sets of a curriculum JSON file, store directory or .cpk pack"""
+    path = Path(path)
+    if path.is_dir() and (path / MANIFEST_NAME).exists():
+        return CurriculumStore(path).sets()
+    if path.suffix == '.cpk':
+        from curriculum_pack import load
+        return iter(load(path))
+    with open(path, 'r', encoding='utf-8') as f:
+        return iter(json.load(f))
+
+
+def _records(sets):
+    for curriculum_set in sets:
+        set_id = curriculum_set.get('id')
+        for position, question in enumerate(curriculum_set.get('questions') or []):
+            uid = question.get(UID_FIELD) if isinstance(question, dict) else None
+            yield {'uid': uid, 'set_id': set_id, 'position': position,
+                   'hash': content_hash(question), 'question': question}
+
+
+def diff(old_sets, new_sets):
+    """
+    {'added': [...], 'removed': [...], 'modified': [...]} between two
+    iterables of sets. Records carry uid, set_id, position, hash and the
+    question; modified ones also old_hash, old_set_id and old_question.
+    Linear: one dict build over the old side, one pass over the new side.
+    """
+    by_uid = {}  # uid -> old records (a list, in case older data repeats a uid)
+    by_hash = {}  # (set id, hash) -> unmatched old records
+    by_position = {}
+    for record in _records(old_sets):
+        if record['uid']:
+            by_uid.setdefault(record['uid'], []).append(record)
+        else:
+            by_hash.setdefault((record['set_id'], record['hash']), []).append(record)
+            by_position[(record['set_id'], record['position'])] = record
+    matched = set()  # id() of old records already paired
+
+    def take(record):
+        matched.add(id(record))
+        return record
+
+    added, modified, unmatched = [], [], []
+    for record in _records(new_sets):
+        old = None
+        if record['uid'] and by_uid.get(record['uid']):
+            old = by_uid[record['uid']].pop()
+        if old is None:
+            # Questions from before uids existed: same content in the same set
+            candidates = by_hash.get((record['set_id'], record['hash']))
+            while candidates and id(candidates[-1]) in matched:
+                candidates.pop()
+            if candidates:
+                take(candidates.pop())
+                continue
+            unmatched.append(record)
+            continue
+        if old['hash'] != record['hash'] or old['set_id'] != record['set_id']:
+            modified.append({**record, 'old_hash': old['hash'], 'old_set_id': old['set_id'],
+                             'old_question': old['question']})
+
+    for record in unmatched:
+        # Same slot in the same set, content changed
+        old = by_position.get((record['set_id'], record['position']))
+        if old is not None and id(old) not in matched:
+            take(old)
+            modified.append({**record, 'old_hash': old['hash'], 'old_set_id': old['set_id'],
+                             'old_question': old['question']})
+        else:
+            added.append(record)
+
+    removed = [r for records in by_uid.values() for r in records]
+    removed += [r for records in by_hash.values() for r in records if id(r) not in matched]
+    return {'added': added, 'removed': removed, 'modified': modified}
+
+
+def changed_set_ids(delta):
+    """Ids of sets with an added, removed or modified question"""
+    ids = set()
+    for kind in ('added', 'removed', 'modified'):
+        for record in delta[kind]:
+            ids.add(record['set_id'])
+            if record.get('old_set_id') is not None:
+                ids.add(record['old_set_id'])
+    return ids
+
+
+def diff_since(snapshot, grades=None):
+    """Delta from an older snapshot to the current curriculum (only `grades`, when given)"""
+    old = load_snapshot(snapshot)
+    if grades is not None:
+        old = (s for s in old if s.get('grade_level') in grades)
+    return diff(old, open_curriculum().sets(grades))
+
+
+def summary(delta):
+    return (f"{len(delta['added'])} added, {len(delta['removed'])} removed, "
+            f"{len(delta['modified'])} modified questions in {len(changed_set_ids(delta))} sets")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Assign question uids or diff two curriculum snapshots')
+    parser.add_argument('command', choices=['assign', 'diff'])
+    parser.add_argument('snapshots', nargs='*', help='diff: OLD [NEW] (NEW defaults to the current curriculum)')
+    parser.add_argument('--out', help='diff: write the delta here as JSON')
+    parser.add_argument('--show', type=int, default=5, help='diff: print this many records per kind')
+    args = parser.parse_args()
+
+    if args.command == 'assign':
+        curriculum = open_curriculum()
+        assigned = assign_uids(curriculum.sets())
+        written = curriculum.save()
+        print(f"🔑 Assigned {assigned} question uids ({len(written)} files rewritten)")
+        return 0
+
+    if not 1 <= len(args.snapshots) <= 2:
+        parser.error('diff needs OLD and optionally NEW')
+    old = load_snapshot(args.snapshots[0])
+    new = load_snapshot(args.snapshots[1]) if len(args.snapshots) == 2 else open_curriculum().sets()
+    delta = diff(old, new)
+    print(f"🔀 {summary(delta)}")
+    for kind in ('added', 'removed', 'modified'):
+        for record in delta[kind][:args.show]:
+            text = record['question'].get('question') if isinstance(record['question'], dict) else record['question']
+            print(f"   {kind[0].upper()} {record['set_id']} q{record['position']}: {str(text)[:80]!r}")
+    if args.out:
+        write_json_atomic(args.out, delta)
+        print(f"💾 Delta written to {args.out}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
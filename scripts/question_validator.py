@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Cheap local checks for generated questions
+Catches the issue types that dominate CURRICULUM_AUDIT_FULL.json before a
+set is saved: answer missing from the options, duplicate options, wrong
+arithmetic and numbers out of range for the grade. Generators ask the model
+for a few more questions than they need and keep the best N that pass, so
+a bad question costs a little extra output instead of a whole re-request.
+
+Usage:
+  python scripts/question_validator.py                      # scan curriculum.json
+  python scripts/question_validator.py --file other.json --show 10
+"""
+
+import argparse
+import ast
+import math
+import operator
+import re
+from collections import Counter
+from fractions import Fraction
+from pathlib import Path
+
+import curriculum_model
+from curriculum_model import Question
+
+PROJECT_ROOT = Path(__file__).parent.parent
+CURRICULUM_FILE = PROJECT_ROOT / 'src' / 'data' / 'curriculum.json'
+
+# Request this many times the questions a set needs, then keep the best
+OVERGENERATE = 1.25
+
+# Per grade: largest number expected in a question, negatives and decimals allowed
+GRADE_RULES = {
+    0: {'max_number': 100, 'negatives': False, 'decimals': False},
+    1: {'max_number': 120, 'negatives': False, 'decimals': False},
+    2: {'max_number': 1000, 'negatives': False, 'decimals': False},
+    3: {'max_number': 10000, 'negatives': False, 'decimals': False},
+    4: {'max_number': 1000000, 'negatives': False, 'decimals': True},
+    5: {'max_number': None, 'negatives': True, 'decimals': True},
+}
+NO_RULES = {'max_number': None, 'negatives': True, 'decimals': True}
+
+# Issues that make a question unusable; anything else only lowers its score
+HARD_ISSUES = {
+    'malformed', 'answer_not_in_options', 'duplicate_options', 'wrong_math_answer', 'negative_for_grade',
+}
+PENALTIES = {
+    'missing_explanation': 0.2,
+    'numbers_too_large': 0.2,
+    'decimals_for_grade': 0.15,
+    'option_count': 0.1,
+    'question_quality': 0.1,
+    'missing_hints': 0.05,
+}
+
+NUMBER = re.compile(r'-?\d[\d,]*(?:\.\d+)?')
+ARITHMETIC = re.compile(r'^[\d\s.,+\-*/()]+$')
+EXPRESSION_PATTERNS = [
+    re.compile(r'^(?:what\s+is|calculate|compute|evaluate|simplify|solve|find)\s*:?\s*(.+?)\s*(?:=\s*(?:\?|_+))?\s*\??$', re.I),
+    re.compile(r'^(.+?)\s*=\s*(?:\?|_+)\s*$'),
+]
+OPERATORS = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Div: operator.truediv}
+
+
+def normalize(text):
+    """Compare options ignoring case, spacing, trailing periods and thousands separators"""
+    text = str(text).strip().lower().rstrip('.')
+    text = re.sub(r'(?<=\d),(?=\d{3}\b)', '', text)
+    return re.sub(r'\s+', ' ', text)
+
+
+def _evaluate(node):
+    if isinstance(node, ast.Expression):
+        return _evaluate(node.body)
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+        return Fraction(str(node.value))
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        value = _evaluate(node.operand)
+        return -value if isinstance(node.op, ast.USub) else value
+    if isinstance(node, ast.BinOp) and type(node.op) in OPERATORS:
+        return OPERATORS[type(node.op)](_evaluate(node.left), _evaluate(node.right))
+    raise ValueError('not arithmetic')
+
+
+def expression(question_text):
+    """The bare arithmetic in 'What is 2 + 3 × 4?' style questions, as Python syntax, or None"""
+    text = str(question_text).strip()
+    for pattern in EXPRESSION_PATTERNS:
+        match = pattern.match(text)
+        if match:
+            break
+    else:
+        return None
+    expr = match.group(1).strip().rstrip('?').strip()
+    # A written fraction binds tighter than division: 1 ÷ 1/2 is 1 ÷ (1/2)
+    expr = re.sub(r'(\d+)/(\d+)', r'(\1/\2)', expr)
+    expr = expr.replace('×', '*').replace('÷', '/').replace('−', '-').replace('–', '-')
+    expr = re.sub(r'(?<=\d)\s*[xX]\s*(?=\d)', '*', expr)
+    expr = re.sub(r'(?<=\d),(?=\d{3}\b)', '', expr)
+    if not ARITHMETIC.match(expr) or not re.search(r'\d\s*[-+*/]\s*[\d(]', expr):
+        return None
+    return expr
+
+
+def evaluate(expr):
+    """Exact value of an arithmetic expression (normal precedence, fractions kept exact) or None"""
+    try:
+        return _evaluate(ast.parse(expr, mode='eval'))
+    except (SyntaxError, ValueError, ZeroDivisionError, RecursionError):
+        return None
+
+
+def parse_number(text):
+    """
+    (value, decimal places) for answers like '14', '-3', '3/4', '1 1/2',
+    '0.75', '$5.50', '12 cm' or '25%'; None for anything else
+    """
+    text = normalize(text).lstrip('$').strip()
+    match = re.match(r'^(-?\d+)\s+(\d+)/(\d+)(?:\s+[a-z]+)?$', text)
+    if match:
+        whole, num, den = (int(g) for g in match.groups())
+        if den == 0:
+            return None
+        value = abs(whole) + Fraction(num, den)
+        return (-value if whole < 0 else value), None
+    match = re.match(r'^(-?\d+)/(\d+)(?:\s+[a-z]+)?$', text)
+    if match:
+        if int(match.group(2)) == 0:
+            return None
+        return Fraction(int(match.group(1)), int(match.group(2))), None
+    match = re.match(r'^(-?\d+(?:\.(\d+))?)\s*(%|[a-z]+(?:\s+[a-z]+)?)?$', text)
+    if match and match.group(3) != '%':
+        places = len(match.group(2)) if match.group(2) else 0
+        return Fraction(match.group(1)), places
+    return None
+
+
+def arithmetic_ok(question_text, answer):
+    """False when the question is plain arithmetic and the answer is not its value; None if not checkable"""
+    expr = expression(question_text)
+    if expr is None:
+        return None
+    expected = evaluate(expr)
+    parsed = parse_number(answer)
+    if expected is None or parsed is None:
+        return None
+    value, places = parsed
+    if places:
+        # A decimal answer only has to be right to the places it gives
+        return abs(value - expected) <= Fraction(1, 2 * 10 ** places)
+    return value == expected
+
+
+def _numbers(text):
+    for match in NUMBER.finditer(str(text)):
+        try:
+            yield float(match.group().replace(',', ''))
+        except ValueError:
+            continue
+
+
+def check_question(question, grade=None):
+    """List of issue codes for one question (empty when it looks fine)"""
+    if not isinstance(question, dict) or not isinstance(question.get('options'), list):
+        return ['malformed']
+    text = question.get('question')
+    answer = question.get('answer')
+    options = question['options']
+    if not isinstance(text, str) or not text.strip() or answer is None or len(options) < 2:
+        return ['malformed']
+
+    issues = []
+    normalized = [normalize(o) for o in options]
+    if answer not in options:
+        # Cosmetic mismatches ('14.' vs '14') are repaired rather than rejected
+        hits = [o for o, n in zip(options, normalized) if n == normalize(answer)]
+        if len(hits) == 1:
+            question['answer'] = answer = hits[0]
+        else:
+            issues.append('answer_not_in_options')
+    if len(set(normalized)) != len(normalized):
+        issues.append('duplicate_options')
+    if arithmetic_ok(text, answer) is False:
+        issues.append('wrong_math_answer')
+
+    if len(options) != 4:
+        issues.append('option_count')
+    if not 10 <= len(text) <= 500 or not re.search(r'[?:]', text) or '??' in text:
+        issues.append('question_quality')
+    if not question.get('explanation'):
+        issues.append('missing_explanation')
+
+    if grade is not None:
+        rules = GRADE_RULES.get(grade, NO_RULES)
+        if grade <= 2 and not question.get('hints'):
+            issues.append('missing_hints')
+        parsed = parse_number(answer)
+        if not rules['negatives'] and parsed and parsed[0] < 0:
+            issues.append('negative_for_grade')
+        if not rules['decimals'] and parsed and parsed[1] and '$' not in str(answer):
+            issues.append('decimals_for_grade')
+        limit = rules['max_number']
+        if limit is not None and any(abs(n) > limit for n in _numbers(text)):
+            issues.append('numbers_too_large')
+    return issues
+
+
+def score(issues):
+    """0 for unusable questions, otherwise 1 minus the soft penalties"""
+    if any(issue in HARD_ISSUES for issue in issues):
+        return 0.0
+    return max(0.05, 1.0 - sum(PENALTIES.get(issue, 0.1) for issue in set(issues)))
+
+
+def request_count(needed):
+    """How many questions to ask for when `needed` must survive validation"""
+    return math.ceil(needed * OVERGENERATE)
+
+
+def select_best(questions, grade=None, keep=None, rejections=None):
+    """
+    Drop unusable questions and keep the `keep` best (all when None), in
+    their original order so the set's difficulty ramp is preserved.
+    Rejection reasons are tallied into the `rejections` Counter.
+    """
+    scored = []
+    for position, question in enumerate(questions):
+        issues = check_question(question, grade)
+        value = score(issues)
+        if value == 0:
+            if rejections is not None:
+                rejections.update(issue for issue in issues if issue in HARD_ISSUES)
+            continue
+        scored.append((value, position, question))
+    if keep is not None and len(scored) > keep:
+        # Best first; ties go to the earlier question
+        if rejections is not None:
+            rejections['surplus'] += len(scored) - keep
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        scored = sorted(scored[:keep], key=lambda item: item[1])
+    return [question for _, _, question in scored]
+
+
+def filter_set(curriculum_set, grade=None, keep=None):
+    """select_best() on a set in place; returns a Counter of rejection reasons"""
+    rejections = Counter()
+    if grade is None:
+        grade = curriculum_set.get('grade_level')
+    curriculum_set['questions'] = select_best(curriculum_set.get('questions') or [], grade, keep, rejections)
+    return rejections
+
+
+def describe_rejections(rejections):
+    """'3 dropped (2 wrong_math_answer, 1 duplicate_options)' for log lines"""
+    dropped = {reason: count for reason, count in rejections.items() if reason != 'surplus' and count}
+    if not dropped:
+        return ''
+    detail = ', '.join(f"{count} {reason}" for reason, count in Counter(dropped).most_common())
+    return f"{sum(dropped.values())} dropped ({detail})"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the local question validators over a curriculum file')
+    parser.add_argument('--file', default=str(CURRICULUM_FILE))
+    parser.add_argument('--show', type=int, default=0, help='Print this many examples per issue')
+    args = parser.parse_args()
+
+    curriculum = curriculum_model.load(args.file)
+
+    counts = Counter()
+    examples = {}
+    questions = rejected = 0
+    for curriculum_set in curriculum:
+        grade = curriculum_set.get('grade_level')
+        for index, question in enumerate(curriculum_set.get('questions', [])):
+            questions += 1
+            issues = check_question(question.to_dict() if isinstance(question, Question) else question, grade)
+            counts.update(set(issues))
+            if score(issues) == 0:
+                rejected += 1
+            for issue in issues:
+                examples.setdefault(issue, []).append((curriculum_set.get('id'), index, question))
+
+    print(f"🔍 {questions} questions in {len(curriculum)} sets, {rejected} would be rejected")
+    for issue, count in counts.most_common():
+        kind = 'reject' if issue in HARD_ISSUES else 'penalty'
+        print(f"   {issue}: {count} ({kind})")
+        for set_id, index, question in examples[issue][:args.show]:
+            text = question.get('question') if isinstance(question, Question) else question
+            answer = question.get('answer') if isinstance(question, Question) else ''
+            print(f"      {set_id} q{index}: {str(text)[:80]!r} -> {answer!r}")
+
+
+if __name__ == '__main__':
+    main()
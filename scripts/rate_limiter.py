@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Adaptive AIMD rate limiter shared by the generator and auditor scripts
+Concurrency grows additively on success and is cut multiplicatively on
+429 / quota errors, honoring Retry-After hints. State is kept per
+provider and model so Claude, Gemini and Ollama runs don't affect each other.
+"""
+
+import asyncio
+import re
+import threading
+import time
+
+from llm_metrics import note_response, note_retry
+
+# Defaults per provider: (initial, maximum) concurrent requests
+PROVIDER_DEFAULTS = {
+    'gemini': (2, 16),
+    'claude': (2, 16),
+    'ollama': (1, 4),
+}
+
+RATE_LIMIT_MARKERS = ('quota', 'rate limit', 'rate_limit', 'resource exhausted',
+                      'resource_exhausted', 'too many requests', 'overloaded')
+# A 429 only counts as a status code ("429 Too Many Requests", "Error code: 429",
+# "HTTP 429"), not as any number in an id, token count or byte offset
+STATUS_429 = re.compile(r'^\W*429\b|\b(?:status|code|http|error)\W{0,3}429\b', re.IGNORECASE)
+
+
+class AdaptiveLimiter:
+    """Concurrency window adjusted with additive-increase / multiplicative-decrease"""
+
+    def __init__(self, name, initial=2, minimum=1, maximum=16,
+                 increase=1.0, decrease=0.5, cooldown=30.0):
+        self.name = name
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = increase
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        self.last_cut = 0.0
+        self.successes = 0
+        self.throttles = 0
+        self._cond = threading.Condition()
+
+    @property
+    def window(self):
+        """Whole number of requests currently allowed in flight"""
+        return max(self.minimum, int(self.limit))
+
+    def _try_start(self, now):
+        if now < self.blocked_until or self.in_flight >= self.window:
+            return False
+        self.in_flight += 1
+        return True
+
+    def _wait_time(self, now):
+        return max(self.blocked_until - now, 0.05)
+
+    def acquire(self):
+        """Block until a request slot is free"""
+        with self._cond:
+            while not self._try_start(time.monotonic()):
+                self._cond.wait(self._wait_time(time.monotonic()))
+
+    async def acquire_async(self):
+        """Async variant of acquire() for the generation engine"""
+        while True:
+            with self._cond:
+                now = time.monotonic()
+                if self._try_start(now):
+                    return
+                wait = self._wait_time(now)
+            await asyncio.sleep(wait)
+
+    def release(self):
+        """Free a slot without adjusting the window (non-quota failures)"""
+        with self._cond:
+            self.in_flight = max(0, self.in_flight - 1)
+            self._cond.notify_all()
+
+    def success(self):
+        """Free a slot and grow the window by roughly one request per round trip"""
+        with self._cond:
+            self.in_flight = max(0, self.in_flight - 1)
+            self.successes += 1
+            self.limit = min(self.maximum, self.limit + self.increase / max(self.limit, 1.0))
+            self._cond.notify_all()
+
+    def throttled(self, retry_after=None):
+        """Free a slot, shrink the window and pause new requests"""
+        with self._cond:
+            now = time.monotonic()
+            self.in_flight = max(0, self.in_flight - 1)
+            self.throttles += 1
+            pause = retry_after if retry_after is not None else self.cooldown
+            self.blocked_until = max(self.blocked_until, now + pause)
+            # A burst of 429s from one window only counts as one congestion signal
+            if now - self.last_cut >= pause:
+                self.limit = max(self.minimum, self.limit * self.decrease)
+                self.last_cut = now
+            self._cond.notify_all()
+
+    def status(self):
+        """Short human-readable state for log lines"""
+        return f"{self.name}: window={self.window} in_flight={self.in_flight} ok={self.successes} 429={self.throttles}"
+
+
+_limiters = {}
+_registry_lock = threading.Lock()
+
+
+def get_limiter(provider, model, **overrides):
+    """Shared limiter for one provider/model pair"""
+    key = (provider, model)
+    with _registry_lock:
+        if key not in _limiters:
+            initial, maximum = PROVIDER_DEFAULTS.get(provider, (1, 8))
+            options = {'initial': initial, 'maximum': maximum}
+            options.update(overrides)
+            _limiters[key] = AdaptiveLimiter(f"{provider}/{model}", **options)
+        return _limiters[key]
+
+
+def is_rate_limited(error):
+    """True for 429 / quota / overload errors from any provider SDK"""
+    status = (getattr(error, 'status_code', None) or getattr(error, 'code', None)
+              or getattr(error, 'status', None))
+    if status in (429, 529):
+        return True
+    text = str(error)
+    if STATUS_429.search(text):
+        return True
+    text = f"{type(error).__name__} {text}".lower()
+    return any(marker in text for marker in RATE_LIMIT_MARKERS)
+
+
+def retry_after(error):
+    """Seconds to wait suggested by the provider, or None"""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if headers:
+        value = headers.get('retry-after') or headers.get('Retry-After')
+        if value:
+            try:
+                return float(value)
+            except ValueError:
+                pass
+
+    # Gemini puts the hint in the error body: "retry_delay { seconds: 17 }" / "retry in 17.2s"
+    text = str(error)
+    match = (re.search(r'retry_delay\s*\{\s*seconds:\s*(\d+)', text)
+             or re.search(r'retry(?:\s+again)?\s+in\s+([\d.]+)\s*s', text, re.IGNORECASE))
+    if match:
+        return float(match.group(1))
+    return None
+
+
+def call_with_limiter(limiter, fn, *args, max_attempts=6, **kwargs):
+    """Call fn under the limiter, retrying rate-limit errors after the advised pause"""
+    for attempt in range(1, max_attempts + 1):
+        limiter.acquire()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            if is_rate_limited(e) and attempt < max_attempts:
+                limiter.throttled(retry_after(e))
+                note_retry()
+                print(f"⚠️ Rate limited ({limiter.status()}), retrying...")
+                continue
+            limiter.release()
+            raise
+        limiter.success()
+        note_response(result)
+        return result
+
+
+async def call_with_limiter_async(limiter, fn, *args, max_attempts=6, **kwargs):
+    """Async variant of call_with_limiter() for coroutine functions"""
+    for attempt in range(1, max_attempts + 1):
+        await limiter.acquire_async()
+        try:
+            result = await fn(*args, **kwargs)
+        except Exception as e:
+            if is_rate_limited(e) and attempt < max_attempts:
+                limiter.throttled(retry_after(e))
+                note_retry()
+                continue
+            limiter.release()
+            raise
+        limiter.success()
+        note_response(result)
+        return result
@@ -21,7 +21,12 @@ if not GEMINI_API_KEY:
     print("❌ Error: VITE_GEMINI_API_KEY not found")
     exit(1)
 
-genai.configure(api_key=GEMINI_API_KEY)
+# GEMINI_API_ENDPOINT points the SDK at llm_stub_server.py for offline runs
+if os.getenv('GEMINI_API_ENDPOINT'):
+    genai.configure(api_key=GEMINI_API_KEY, transport='rest',
+                    client_options={'api_endpoint': os.getenv('GEMINI_API_ENDPOINT')})
+else:
+    genai.configure(api_key=GEMINI_API_KEY)
 model = genai.GenerativeModel('gemini-2.0-flash-exp')
 
 # Paths
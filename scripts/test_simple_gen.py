@@ -4,7 +4,13 @@ from pathlib import Path
 from dotenv import load_dotenv
 
 load_dotenv(Path(__file__).parent.parent / '.env')
-genai.configure(api_key=os.getenv('VITE_GEMINI_API_KEY'))
+# GEMINI_API_ENDPOINT points the SDK at llm_stub_server.py for offline runs
+endpoint = os.getenv('GEMINI_API_ENDPOINT')
+if endpoint:
+    genai.configure(api_key=os.getenv('VITE_GEMINI_API_KEY', 'stub'), transport='rest',
+                    client_options={'api_endpoint': endpoint})
+else:
+    genai.configure(api_key=os.getenv('VITE_GEMINI_API_KEY'))
 
 model = genai.GenerativeModel("gemini-2.0-flash")
 print("Generating...")
@@ -1,8 +1,13 @@
 
+import argparse
 import os
-import json
 from supabase import create_client, Client
 
+from curriculum_schema import validate_all
+from curriculum_store import open_curriculum
+from lesson_plan import parse_grades
+from question_ids import changed_set_ids, diff_since, summary
+
 # Initialize Supabase
 url: str = os.environ.get("VITE_SUPABASE_URL")
 key: str = os.environ.get("VITE_SUPABASE_ANON_KEY")
@@ -23,15 +28,28 @@ if not url or not key:
 
 supabase: Client = create_client(url, key)
 
-INPUT_FILE = "src/data/curriculum.json"
-
-def upload_curriculum():
-    print(f"Loading {INPUT_FILE}...")
-    try:
-        with open(INPUT_FILE, 'r') as f:
-            data = json.load(f)
-    except FileNotFoundError:
-        print(f"❌ File not found: {INPUT_FILE}")
+def upload_curriculum(grades=None, changed_since=None, allow_invalid=False):
+    print("Loading curriculum...")
+    data = list(open_curriculum().sets(grades))
+    if changed_since:
+        delta = diff_since(changed_since, grades)
+        print(f"🔀 Since {changed_since}: {summary(delta)}")
+        changed = changed_set_ids(delta)
+        data = [item for item in data if item.get('id') in changed]
+    invalid = list(validate_all(data))
+    if invalid:
+        for _, item, errors in invalid[:10]:
+            print(f"⚠️  {item.get('id') if isinstance(item, dict) else item}: {errors[0]}"
+                  + (f" (+{len(errors) - 1} more)" if len(errors) > 1 else ''))
+        if allow_invalid:
+            print(f"⚠️  Uploading {len(invalid)} sets that fail validation (--allow-invalid)")
+        else:
+            print(f"⏭️  Skipping {len(invalid)} sets that fail validation "
+                  f"(see `python scripts/curriculum_schema.py`, or pass --allow-invalid)")
+            skipped = {index for index, _, _ in invalid}
+            data = [item for index, item in enumerate(data) if index not in skipped]
+    if not data:
+        print("❌ No curriculum sets found")
         return
 
     print(f"Found {len(data)} curriculum sets. Uploading to Supabase...")
@@ -87,4 +105,11 @@ def upload_curriculum():
     print(f"\nUpload Complete. Success: {success_count}, Skips/Updates included in success. Fail: {fail_count}")
 
 if __name__ == "__main__":
-    upload_curriculum()
+    parser = argparse.ArgumentParser(description='Upload curriculum sets to Supabase')
+    parser.add_argument('--grades', help='Only upload these grades, e.g. 7-9')
+    parser.add_argument('--changed-since', metavar='SNAPSHOT',
+                        help='Only upload sets that changed since this curriculum snapshot')
+    parser.add_argument('--allow-invalid', action='store_true',
+                        help='Upload sets even if they fail schema validation')
+    args = parser.parse_args()
+    upload_curriculum(parse_grades(args.grades), args.changed_since, args.allow_invalid)
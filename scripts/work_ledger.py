@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+SQLite work ledger for resumable generation runs
+Every planned job is one row keyed by a stable job key, with a state
+(pending / leased / done / failed / retired), attempt count, lease owner
+and expiry, and a reference to where its output went. Generators plan
+their full job list up front, claim a job just before paying for a
+request, and mark it done once the output is journaled, so restarts and
+parallel workers skip finished work with a primary-key lookup.
+Replanning with retire=True retires pending jobs the fresh plan no longer
+contains (another run filled their subtopic), so nobody pays for sets
+compaction would drop as duplicates.
+
+Usage:
+  python scripts/work_ledger.py status [run]
+  python scripts/work_ledger.py reset <run> [--failed] [--all]
+"""
+
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+LEDGER_FILE = PROJECT_ROOT / 'data' / 'work_ledger.sqlite'
+DEFAULT_LEASE_SECONDS = 600
+STATES = ('pending', 'leased', 'done', 'failed', 'retired')
+
+
+def default_owner():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class WorkLedger:
+    """
+    Job states for one generator run (run=None only for inspection across
+    runs). Safe to share across threads and processes.
+    """
+
+    def __init__(self, run=None, path=LEDGER_FILE, owner=None, lease_seconds=DEFAULT_LEASE_SECONDS):
+        self.run = run
+        self.path = Path(path)
+        self.owner = owner or default_owner()
+        self.lease_seconds = lease_seconds
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Autocommit; multi-row writes use BEGIN IMMEDIATE
+        self._db = sqlite3.connect(str(self.path), timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                run TEXT NOT NULL,
+                key TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                state TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                lease_owner TEXT,
+                lease_expires REAL,
+                output_ref TEXT,
+                error TEXT,
+                created REAL,
+                updated REAL,
+                PRIMARY KEY (run, key)
+            )
+        ''')
+        self._db.execute('CREATE INDEX IF NOT EXISTS idx_jobs_run_state ON jobs(run, state)')
+
+    def plan(self, jobs, key='id', retire=False):
+        """
+        Register jobs (dicts with a stable key field); existing keys keep their
+        state. With retire (True, or a predicate on a job's payload limiting
+        it to the part of the plan that was recompiled), claimable jobs missing
+        from `jobs` are retired and retired jobs back in `jobs` are pending
+        again. Returns how many were new.
+        """
+        now = time.time()
+        jobs = list(jobs)
+        rows = [(self.run, job[key], json.dumps(job, ensure_ascii=False), now, now) for job in jobs]
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            before = self._db.total_changes
+            self._db.executemany(
+                'INSERT OR IGNORE INTO jobs (run, key, payload, created, updated) VALUES (?, ?, ?, ?, ?)', rows
+            )
+            added = self._db.total_changes - before
+            if retire:
+                planned = {job[key] for job in jobs}
+                self._db.executemany(
+                    "UPDATE jobs SET state = 'pending', updated = ? WHERE run = ? AND key = ? AND state = 'retired'",
+                    [(now, self.run, job_key) for job_key in planned]
+                )
+                claimable = self._db.execute('''
+                    SELECT key, payload FROM jobs
+                    WHERE run = ? AND (state = 'pending' OR (state = 'leased' AND lease_expires < ?))
+                ''', (self.run, now)).fetchall()
+                stale = [(now, self.run, job_key) for job_key, payload in claimable
+                         if job_key not in planned and (retire is True or retire(json.loads(payload)))]
+                self._db.executemany('''
+                    UPDATE jobs SET state = 'retired', lease_owner = NULL, lease_expires = NULL, updated = ?
+                    WHERE run = ? AND key = ?
+                ''', stale)
+            self._db.execute('COMMIT')
+            return added
+
+    def pending(self, limit=None):
+        """Payloads of jobs that can be claimed now: pending, or leased with an expired lease"""
+        sql = '''
+            SELECT payload FROM jobs
+            WHERE run = ? AND (state = 'pending' OR (state = 'leased' AND lease_expires < ?))
+            ORDER BY created, rowid
+        '''
+        params = [self.run, time.time()]
+        if limit:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        with self._lock:
+            return [json.loads(row[0]) for row in self._db.execute(sql, params)]
+
+    def claim(self, key, lease_seconds=None, owner=None):
+        """
+        Atomically lease one job for this owner (or `owner`, when a
+        coordinator leases on a worker's behalf); False if it is done,
+        failed or leased by someone else
+        """
+        now = time.time()
+        expires = now + (lease_seconds or self.lease_seconds)
+        with self._lock:
+            cursor = self._db.execute('''
+                UPDATE jobs SET state = 'leased', attempts = attempts + 1,
+                    lease_owner = ?, lease_expires = ?, updated = ?
+                WHERE run = ? AND key = ? AND (state = 'pending' OR (state = 'leased' AND lease_expires < ?))
+            ''', (owner or self.owner, expires, now, self.run, key, now))
+            return cursor.rowcount == 1
+
+    def lease(self, limit=1, lease_seconds=None, key='id', owner=None):
+        """Claim up to `limit` claimable jobs; returns their payloads"""
+        claimed = []
+        for job in self.pending(limit * 2):
+            if self.claim(job[key], lease_seconds, owner):
+                claimed.append(job)
+                if len(claimed) >= limit:
+                    break
+        return claimed
+
+    def renew(self, key, lease_seconds=None, owner=None):
+        """Extend a lease this owner still holds"""
+        expires = time.time() + (lease_seconds or self.lease_seconds)
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE run = ? AND key = ? AND state = 'leased' AND lease_owner = ?",
+                (expires, self.run, key, owner or self.owner)
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, key, output_ref=None):
+        """Mark a job done and record where its output lives"""
+        with self._lock:
+            self._db.execute('''
+                UPDATE jobs SET state = 'done', output_ref = ?, error = NULL,
+                    lease_owner = NULL, lease_expires = NULL, updated = ?
+                WHERE run = ? AND key = ?
+            ''', (output_ref, time.time(), self.run, key))
+
+    def fail(self, key, error=None, max_attempts=3, owner=None):
+        """
+        Return a job to pending, or mark it failed once it has used
+        max_attempts. With `owner`, only if that owner still holds the lease.
+        """
+        sql = '''
+            UPDATE jobs SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                error = ?, lease_owner = NULL, lease_expires = NULL, updated = ?
+            WHERE run = ? AND key = ?
+        '''
+        params = [max_attempts, str(error)[:500] if error else None, time.time(), self.run, key]
+        if owner:
+            sql += " AND state = 'leased' AND lease_owner = ?"
+            params.append(owner)
+        with self._lock:
+            return self._db.execute(sql, params).rowcount == 1
+
+    def release_all(self, owner=None):
+        """Give back every lease this owner holds without counting the attempt (call on shutdown)"""
+        with self._lock:
+            cursor = self._db.execute('''
+                UPDATE jobs SET state = 'pending', attempts = MAX(attempts - 1, 0),
+                    lease_owner = NULL, lease_expires = NULL, updated = ?
+                WHERE run = ? AND state = 'leased' AND lease_owner = ?
+            ''', (time.time(), self.run, owner or self.owner))
+            return cursor.rowcount
+
+    def state(self, key):
+        with self._lock:
+            row = self._db.execute('SELECT state FROM jobs WHERE run = ? AND key = ?', (self.run, key)).fetchone()
+        return row[0] if row else None
+
+    def is_done(self, key):
+        return self.state(key) == 'done'
+
+    def counts(self):
+        """{run: {state: count}} for this run, or every run when unbound"""
+        sql = 'SELECT run, state, COUNT(*) FROM jobs'
+        params = ()
+        if self.run:
+            sql += ' WHERE run = ?'
+            params = (self.run,)
+        sql += ' GROUP BY run, state ORDER BY run'
+        result = {}
+        with self._lock:
+            for job_run, state, count in self._db.execute(sql, params):
+                result.setdefault(job_run, dict.fromkeys(STATES, 0))[state] = count
+        return result
+
+    def failures(self, run=None, limit=10):
+        with self._lock:
+            return self._db.execute(
+                "SELECT key, attempts, error FROM jobs WHERE run = ? AND state = 'failed' ORDER BY updated DESC LIMIT ?",
+                (run or self.run, limit)
+            ).fetchall()
+
+    def reset(self, states=('failed',)):
+        """Put jobs of the given states back to pending with a fresh attempt count"""
+        placeholders = ','.join('?' * len(states))
+        with self._lock:
+            cursor = self._db.execute(f'''
+                UPDATE jobs SET state = 'pending', attempts = 0, error = NULL,
+                    lease_owner = NULL, lease_expires = NULL, updated = ?
+                WHERE run = ? AND state IN ({placeholders})
+            ''', (time.time(), self.run, *states))
+            return cursor.rowcount
+
+    def mark_done(self, keys, output_ref=None):
+        """Record planned jobs that finished outside the ledger (migration from old progress files)"""
+        now = time.time()
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            self._db.executemany('''
+                UPDATE jobs SET state = 'done', output_ref = COALESCE(output_ref, ?), updated = ?
+                WHERE run = ? AND key = ?
+            ''', [(output_ref, now, self.run, key) for key in keys])
+            self._db.execute('COMMIT')
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def import_progress(ledger, progress_file):
+    """
+    One-time migration of an old {"completed": [...]} progress file: marks
+    those (already planned) keys done and renames the file out of the way.
+    """
+    progress_file = Path(progress_file)
+    if not progress_file.exists():
+        return 0
+    with open(progress_file, 'r') as f:
+        completed = json.load(f).get('completed', [])
+    ledger.mark_done(completed, output_ref=progress_file.name)
+    progress_file.rename(progress_file.with_suffix('.imported.json'))
+    return len(completed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect or reset the generation work ledger')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    status = sub.add_parser('status')
+    status.add_argument('run', nargs='?')
+
+    reset = sub.add_parser('reset')
+    reset.add_argument('run')
+    reset.add_argument('--failed', action='store_true', help='Retry failed jobs (default)')
+    reset.add_argument('--all', action='store_true', help='Also redo done and leased jobs')
+
+    parser.add_argument('--ledger', default=str(LEDGER_FILE))
+    args = parser.parse_args()
+
+    ledger = WorkLedger(args.run, args.ledger)
+
+    if args.command == 'status':
+        counts = ledger.counts()
+        if not counts:
+            print("No jobs in the ledger")
+        for run, states in counts.items():
+            total = sum(states.values())
+            summary = ', '.join(f"{count} {state}" for state, count in states.items() if count)
+            print(f"  {run}: {total} jobs ({summary})")
+            for job_key, attempts, error in ledger.failures(run, limit=5):
+                print(f"      ❌ {job_key} after {attempts} attempts: {error}")
+    elif args.command == 'reset':
+        states = STATES if args.all else ('failed',)
+        print(f"🔄 {ledger.reset(states)} jobs back to pending")
+
+
+if __name__ == '__main__':
+    main()
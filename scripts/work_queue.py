@@ -0,0 +1,471 @@
+#!/usr/bin/env python3
+"""
+Lease-based job queue for running generation on many workers
+Any number of worker processes pull jobs from a shared queue, hold each
+one under a lease that a heartbeat thread keeps renewing, and hand back
+finished sets as journal records. On one host the queue is the SQLite work
+ledger itself; across hosts a small HTTP coordinator owns the ledger and
+the journal, so results land centrally instead of being copied back from
+each VPS and merged by hand. A worker that dies simply stops renewing and
+its jobs return to the queue when the lease runs out.
+
+Usage:
+  python scripts/work_queue.py plan --run grades-7-9 --grades 7-9
+  python scripts/work_queue.py worker --run grades-7-9 --providers gemini,ollama
+  python scripts/work_queue.py serve --run grades-7-9 --grades 7-9 --host 0.0.0.0
+  python scripts/work_queue.py worker --coordinator http://10.0.0.5:8765 --providers ollama
+  python scripts/work_queue.py status [--run grades-7-9 | --coordinator URL]
+"""
+
+import argparse
+import hmac
+import http.client
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from curriculum_journal import JOURNAL_DIR, Journal, compact
+from curriculum_store import open_curriculum
+from lesson_plan import compile_jobs, parse_grades
+from progress_events import get_events
+from prompt_packer import set_id
+from work_ledger import LEDGER_FILE, WorkLedger, default_owner
+
+DEFAULT_PORT = 8765
+DEFAULT_RUN = 'work_queue'
+LEASE_SECONDS = 300
+MAX_ATTEMPTS = 3
+POLL_SECONDS = 5.0
+TOKEN_ENV = 'WORK_QUEUE_TOKEN'
+
+
+def _ref(journal, record):
+    return f"{journal.path.name}#{record.get('id')}"
+
+
+class LocalQueue:
+    """The work ledger used directly (workers on one host share the SQLite file)"""
+
+    def __init__(self, run, ledger_path=LEDGER_FILE, journal_dir=JOURNAL_DIR, owner=None):
+        self.ledger = WorkLedger(run, ledger_path, owner)
+        self.name = run
+        self.owner = self.ledger.owner
+        self.journal_dir = journal_dir
+        self.journal = None
+        self._lock = threading.Lock()
+
+    def lease(self, limit, lease_seconds=LEASE_SECONDS):
+        return self.ledger.lease(limit, lease_seconds)
+
+    def heartbeat(self, keys, lease_seconds=LEASE_SECONDS):
+        """Renew leases; returns the keys this worker no longer holds"""
+        return [key for key in keys if not self.ledger.renew(key, lease_seconds)]
+
+    def complete(self, key, record):
+        """Journal a finished set; False if another worker already delivered this job"""
+        with self._lock:
+            if self.ledger.is_done(key):
+                return False
+            if self.journal is None:
+                self.journal = Journal(f"worker-{self.ledger.run}", self.journal_dir)
+            self.journal.append(record)
+            self.ledger.complete(key, _ref(self.journal, record))
+            return True
+
+    def fail(self, key, error, max_attempts=MAX_ATTEMPTS):
+        return self.ledger.fail(key, error, max_attempts, owner=self.owner)
+
+    def remaining(self):
+        """Jobs not yet finished or failed (pending, or leased by anyone)"""
+        counts = self.ledger.counts().get(self.ledger.run, {})
+        return counts.get('pending', 0) + counts.get('leased', 0)
+
+    def status(self):
+        return {'run': self.ledger.run, 'counts': self.ledger.counts().get(self.ledger.run, {})}
+
+    def release(self):
+        self.ledger.release_all()
+
+    def close(self):
+        if self.journal:
+            self.journal.close()
+        self.ledger.close()
+
+
+class CoordinatorQueue:
+    """Same interface as LocalQueue, talking to a coordinator started with `serve`"""
+
+    def __init__(self, url, owner=None, token=None, timeout=30):
+        parts = urlsplit(url)
+        self.name = url
+        self.host = parts.hostname
+        self.port = parts.port or DEFAULT_PORT
+        self.owner = owner or default_owner()
+        self.token = token or os.getenv(TOKEN_ENV)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _request(self, method, path, payload=None, attempts=5):
+        body = json.dumps({'owner': self.owner, **(payload or {})}).encode('utf-8')
+        headers = {'Content-Type': 'application/json'}
+        if self.token:
+            headers['X-Queue-Token'] = self.token
+        for attempt in range(1, attempts + 1):
+            conn = getattr(self._local, 'conn', None)
+            if conn is None:
+                conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                data = json.loads(response.read() or b'{}')
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                self._local.conn = None
+                if attempt == attempts:
+                    raise
+                # Coordinator restarting; leases outlive a short outage
+                print(f"⚠️  Coordinator unreachable ({e}), retrying in {2 ** attempt}s")
+                time.sleep(2 ** attempt)
+                continue
+            if response.status != 200:
+                raise RuntimeError(f"Coordinator {path}: HTTP {response.status} {data.get('error', '')}")
+            return data
+
+    def lease(self, limit, lease_seconds=LEASE_SECONDS):
+        return self._request('POST', '/lease', {'limit': limit, 'lease_seconds': lease_seconds})['jobs']
+
+    def heartbeat(self, keys, lease_seconds=LEASE_SECONDS):
+        return self._request('POST', '/heartbeat', {'keys': list(keys), 'lease_seconds': lease_seconds})['lost']
+
+    def complete(self, key, record):
+        return self._request('POST', '/complete', {'key': key, 'record': record})['accepted']
+
+    def fail(self, key, error, max_attempts=MAX_ATTEMPTS):
+        return self._request('POST', '/fail', {'key': key, 'error': str(error)[:500]})['returned']
+
+    def remaining(self):
+        return self.status()['remaining']
+
+    def status(self):
+        return self._request('POST', '/status')
+
+    def release(self):
+        try:
+            self._request('POST', '/release', attempts=1)
+        except (OSError, RuntimeError, http.client.HTTPException) as e:
+            print(f"⚠️  Could not release leases ({e}); they expire on their own")
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn:
+            conn.close()
+
+
+class CoordinatorHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            request = json.loads(self.rfile.read(length) or b'{}')
+        except json.JSONDecodeError:
+            self._send_json(400, {'error': 'invalid JSON'})
+            return
+        token = self.headers.get('X-Queue-Token', '')
+        if self.server.token and not hmac.compare_digest(token, self.server.token):
+            self._send_json(403, {'error': 'bad token'})
+            return
+        route = getattr(self.server, f"handle_{self.path.strip('/')}", None)
+        owner = request.get('owner')
+        if route is None or not owner:
+            self._send_json(404 if route is None else 400, {'error': f"unknown request {self.path}"})
+            return
+        self._send_json(200, route(owner, request))
+
+
+class Coordinator(ThreadingHTTPServer):
+    """HTTP front for one run of the work ledger; finished sets go to the coordinator's journal"""
+
+    daemon_threads = True
+
+    def __init__(self, run, host='127.0.0.1', port=DEFAULT_PORT, ledger_path=LEDGER_FILE,
+                 journal_dir=JOURNAL_DIR, token=None, max_attempts=MAX_ATTEMPTS, verbose=False):
+        super().__init__((host, port), CoordinatorHandler)
+        self.run = run
+        self.ledger = WorkLedger(run, ledger_path, owner=f"coordinator:{default_owner()}")
+        self.journal = Journal(f"coordinator-{run}", journal_dir)
+        self.token = token
+        self.max_attempts = max_attempts
+        self.verbose = verbose
+        self.workers = {}
+        self._lock = threading.Lock()
+
+    def _seen(self, owner, **counts):
+        with self._lock:
+            worker = self.workers.setdefault(owner, {'leased': 0, 'done': 0, 'failed': 0})
+            worker['last_seen'] = time.time()
+            for name, count in counts.items():
+                worker[name] += count
+
+    def handle_lease(self, owner, request):
+        jobs = self.ledger.lease(max(1, int(request.get('limit', 1))),
+                                 request.get('lease_seconds') or LEASE_SECONDS, owner=owner)
+        self._seen(owner, leased=len(jobs))
+        return {'jobs': jobs}
+
+    def handle_heartbeat(self, owner, request):
+        lease_seconds = request.get('lease_seconds') or LEASE_SECONDS
+        lost = [key for key in request.get('keys', []) if not self.ledger.renew(key, lease_seconds, owner=owner)]
+        self._seen(owner)
+        return {'lost': lost}
+
+    def handle_complete(self, owner, request):
+        key, record = request['key'], request['record']
+        with self._lock:
+            # A worker whose lease lapsed may deliver after the job was redone; keep the first
+            accepted = not self.ledger.is_done(key)
+            if accepted:
+                self.journal.append(record)
+                self.ledger.complete(key, _ref(self.journal, record))
+        self._seen(owner, done=int(accepted))
+        if accepted:
+            print(f"✅ {key} from {owner}")
+        return {'accepted': accepted}
+
+    def handle_fail(self, owner, request):
+        returned = self.ledger.fail(request['key'], request.get('error'), self.max_attempts, owner=owner)
+        self._seen(owner, failed=1)
+        print(f"❌ {request['key']} from {owner}: {request.get('error')}")
+        return {'returned': returned}
+
+    def handle_release(self, owner, request):
+        released = self.ledger.release_all(owner=owner)
+        with self._lock:
+            self.workers.pop(owner, None)
+        print(f"👋 {owner} left, {released} leases released")
+        return {'released': released}
+
+    def handle_status(self, owner, request):
+        counts = self.ledger.counts().get(self.run, {})
+        now = time.time()
+        with self._lock:
+            workers = {name: {**w, 'idle': round(now - w['last_seen'], 1)} for name, w in self.workers.items()}
+        return {
+            'run': self.run,
+            'counts': counts,
+            'remaining': counts.get('pending', 0) + counts.get('leased', 0),
+            'workers': workers,
+        }
+
+    def close(self):
+        self.server_close()
+        self.journal.close()
+        self.ledger.close()
+
+
+class Heartbeat(threading.Thread):
+    """Renews the leases a worker holds every third of the lease time"""
+
+    def __init__(self, queue, lease_seconds=LEASE_SECONDS):
+        super().__init__(daemon=True)
+        self.queue = queue
+        self.lease_seconds = lease_seconds
+        self.held = set()
+        self.lost = set()
+        self._lock = threading.Lock()
+        self._halt = threading.Event()
+
+    def hold(self, keys):
+        with self._lock:
+            self.held.update(keys)
+
+    def drop(self, key):
+        with self._lock:
+            self.held.discard(key)
+
+    def beat(self):
+        with self._lock:
+            keys = list(self.held)
+        if not keys:
+            return
+        try:
+            lost = self.queue.heartbeat(keys, self.lease_seconds)
+        except Exception as e:
+            print(f"⚠️  Heartbeat failed: {e}")
+            return
+        if lost:
+            print(f"⚠️  Lost {len(lost)} leases (expired or taken over); skipping them")
+            with self._lock:
+                self.lost.update(lost)
+                self.held.difference_update(lost)
+
+    def run(self):
+        while not self._halt.wait(self.lease_seconds / 3):
+            self.beat()
+
+    def stop(self):
+        self._halt.set()
+
+
+def plan(ledger, grades=None, curriculum_file=None):
+    """
+    Register the lesson-plan jobs still missing from the curriculum and
+    retire pending jobs of these grades that are no longer needed; returns
+    how many were new
+    """
+    # Coverage only matters for the planned grades, so only their shards are read
+    curriculum = list(open_curriculum(curriculum_file).sets(grades))
+    retire = True if grades is None else (lambda job: job.get('grade') in grades)
+    return ledger.plan(compile_jobs(grades, curriculum), retire=retire)
+
+
+def run_worker(queue, backends, batch_size=None, lease_seconds=LEASE_SECONDS,
+               max_attempts=MAX_ATTEMPTS, poll=POLL_SECONDS, wait=False, log=print):
+    """
+    Lease jobs in batches and generate them across `backends` until the
+    queue is drained (or forever with `wait`). Returns (done, failed).
+    """
+    # Imported here so `plan`, `serve` and `status` work without provider SDKs
+    from generate_grades_7_9_multi import build_prompt, parse_response
+    from llm_backends import FanOutScheduler
+
+    batch_size = batch_size or sum(b.limiter.maximum for b in backends)
+    get_events().run_started(queue.remaining(), queue=queue.name)
+    heartbeat = Heartbeat(queue, lease_seconds)
+    heartbeat.start()
+    totals = {'done': 0, 'failed': 0}
+
+    def on_result(job, curriculum_set, backend, error):
+        key = job['key']
+        heartbeat.drop(key)
+        if curriculum_set:
+            # Still worth delivering after a lost lease; the queue keeps the first result
+            if queue.complete(key, curriculum_set):
+                totals['done'] += 1
+                log(f"✅ {backend!r} {key}")
+        elif key not in heartbeat.lost:
+            queue.fail(key, error, max_attempts)
+            totals['failed'] += 1
+            log(f"❌ {key}: {error}")
+
+    try:
+        while True:
+            jobs = queue.lease(batch_size, lease_seconds)
+            if not jobs:
+                if not wait and queue.remaining() == 0:
+                    break
+                # Other workers still hold leases that may come back
+                time.sleep(poll)
+                continue
+            heartbeat.hold(job['id'] for job in jobs)
+            log(f"📥 Leased {len(jobs)} jobs")
+            # The ledger key stays in 'key'; the set gets its curriculum id
+            work = [{**job, 'key': job['id'], 'id': set_id(job)} for job in jobs]
+            scheduler = FanOutScheduler(backends)
+            scheduler.run(work, build_prompt, parse_response, on_result,
+                          claim=lambda job: job['key'] not in heartbeat.lost)
+    finally:
+        heartbeat.stop()
+        queue.release()
+    return totals['done'], totals['failed']
+
+
+def print_status(status):
+    counts = status.get('counts', {})
+    total = sum(counts.values())
+    summary = ', '.join(f"{count} {state}" for state, count in counts.items() if count) or 'empty'
+    print(f"📊 {status.get('run')}: {total} jobs ({summary})")
+    for name, worker in sorted(status.get('workers', {}).items()):
+        print(f"   {name}: {worker['done']} done, {worker['failed']} failed, "
+              f"{worker['leased']} leased, last seen {worker['idle']}s ago")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Distributed generation over a leased job queue')
+    parser.add_argument('command', choices=['plan', 'worker', 'serve', 'status'])
+    parser.add_argument('--run', default=DEFAULT_RUN, help='Ledger run name (one queue per run)')
+    parser.add_argument('--grades', help='plan/serve: lesson-plan grades, e.g. 7-9')
+    parser.add_argument('--ledger', default=str(LEDGER_FILE))
+    parser.add_argument('--journal-dir', default=str(JOURNAL_DIR))
+    parser.add_argument('--coordinator', help='worker/status: coordinator URL instead of the local ledger')
+    parser.add_argument('--token', default=os.getenv(TOKEN_ENV), help=f"Shared secret (default: ${TOKEN_ENV})")
+    parser.add_argument('--host', default='127.0.0.1', help='serve: bind address (0.0.0.0 for other hosts)')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--providers', default='gemini', help='worker: e.g. claude,gemini:gemini-2.0-flash,ollama')
+    parser.add_argument('--batch', type=int, help='worker: jobs leased at a time (default: total provider slots)')
+    parser.add_argument('--lease', type=int, default=LEASE_SECONDS, help='Lease length in seconds')
+    parser.add_argument('--wait', action='store_true', help='worker: keep polling after the queue drains')
+    parser.add_argument('--no-compact', action='store_true', help='serve: leave the journal for a later compaction')
+    args = parser.parse_args()
+
+    if args.command == 'plan':
+        ledger = WorkLedger(args.run, args.ledger)
+        added = plan(ledger, parse_grades(args.grades))
+        print(f"📝 {added} new jobs planned for {args.run}")
+        print_status({'run': args.run, 'counts': ledger.counts().get(args.run, {})})
+        return
+
+    if args.command == 'serve':
+        server = Coordinator(args.run, args.host, args.port, args.ledger, args.journal_dir, args.token)
+        added = plan(server.ledger, parse_grades(args.grades)) if args.grades else 0
+        if args.host != '127.0.0.1' and not args.token:
+            print(f"⚠️  Listening on {args.host} without a token; set {TOKEN_ENV} on trusted networks only")
+        print(f"🛰️  Coordinator for {args.run} on http://{args.host}:{args.port} ({added} new jobs planned)")
+        print_status(server.handle_status('coordinator', {}))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("\n👋 Stopping coordinator")
+        finally:
+            journal_path = server.journal.path
+            server.close()
+            if not args.no_compact:
+                added, _ = compact(journals=[journal_path])
+                print(f"💾 {added} sets added to curriculum.json")
+        return
+
+    if args.coordinator:
+        queue = CoordinatorQueue(args.coordinator, token=args.token)
+    else:
+        queue = LocalQueue(args.run, args.ledger, args.journal_dir)
+
+    if args.command == 'status':
+        print_status(queue.status())
+        queue.close()
+        return
+
+    from llm_backends import create_backends
+    backends = create_backends([p.strip() for p in args.providers.split(',') if p.strip()])
+    if not backends:
+        print("❌ No LLM backends available")
+        return
+    print(f"🚀 Worker {queue.owner} via {', '.join(map(repr, backends))}")
+    try:
+        done, failed = run_worker(queue, backends, args.batch, args.lease, wait=args.wait)
+    except KeyboardInterrupt:
+        print("\n👋 Stopped by user, leases released")
+        return
+    finally:
+        queue.close()
+    print(f"🏁 Queue drained: {done} sets delivered, {failed} failed")
+    if not args.coordinator:
+        print("   Fold the worker journals in with: python scripts/curriculum_journal.py compact")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import { getCurriculum } from '../../services/curriculumService';
+import { getSkills, getSkillById } from '../../services/curriculumService';
 import performanceTracker from '../../services/performanceTracker';
 
 /**
@@ -16,13 +16,12 @@ const AdaptiveQuizEngine = ({ studentId, topic, onComplete }) => {
     const [startTime, setStartTime] = useState(Date.now());
     const [score, setScore] = useState({ correct: 0, total: 0 });
     
-    // Curriculum data from Supabase
-    const [curriculumData, setCurriculumData] = useState([]);
+    // Skills for the topic (no questions); a set's questions load when it is picked
     const [topicSets, setTopicSets] = useState([]);
     const [isLoaded, setIsLoaded] = useState(false);
 
     // Select next question based on current difficulty
-    const selectNextQuestion = () => {
+    const selectNextQuestion = async () => {
         // Get recommended difficulty based on recent performance
         const recommendedDifficulty = performanceTracker.getRecommendedDifficulty(performance);
         setCurrentDifficulty(recommendedDifficulty);
@@ -34,7 +33,7 @@ const AdaptiveQuizEngine = ({ studentId, topic, onComplete }) => {
 
         if (matchingSets.length === 0) {
             // Fallback to any difficulty if none match
-            const randomSet = topicSets[Math.floor(Math.random() * topicSets.length)];
+            const randomSet = await getSkillById(topicSets[Math.floor(Math.random() * topicSets.length)].id);
             const randomQuestion = randomSet.questions[Math.floor(Math.random() * randomSet.questions.length)];
             setCurrentQuestion({
                 ...randomQuestion,
@@ -46,7 +45,7 @@ const AdaptiveQuizEngine = ({ studentId, topic, onComplete }) => {
         }
 
         // Select random set and question from matching difficulty
-        const randomSet = matchingSets[Math.floor(Math.random() * matchingSets.length)];
+        const randomSet = await getSkillById(matchingSets[Math.floor(Math.random() * matchingSets.length)].id);
         const randomQuestion = randomSet.questions[Math.floor(Math.random() * randomSet.questions.length)];
 
         setCurrentQuestion({
@@ -58,10 +57,9 @@ const AdaptiveQuizEngine = ({ studentId, topic, onComplete }) => {
         setStartTime(Date.now());
     };
 
-    // Load curriculum data from Supabase
+    // Load the skill list for this topic
     useEffect(() => {
-        getCurriculum().then(data => {
-            setCurriculumData(data);
+        getSkills().then(data => {
             const filtered = data.filter(set =>
                 set.topic?.toLowerCase().includes(topic.toLowerCase())
             );
@@ -76,7 +74,7 @@ const AdaptiveQuizEngine = ({ studentId, topic, onComplete }) => {
     // Initialize first question when data is loaded
     useEffect(() => {
         if (isLoaded && topicSets.length > 0) {
-            selectNextQuestion();
+            selectNextQuestion().catch(err => console.error('Failed to load question:', err));
         }
     }, [isLoaded, topicSets]);
 
@@ -128,7 +126,7 @@ const AdaptiveQuizEngine = ({ studentId, topic, onComplete }) => {
             return;
         }
 
-        selectNextQuestion();
+        selectNextQuestion().catch(err => console.error('Failed to load question:', err));
     };
 
     if (!currentQuestion) {
@@ -1,7 +1,7 @@
 import React, { useState, useEffect, useCallback, useRef } from 'react';
 import { motion, AnimatePresence } from 'framer-motion';
 import { smartScore } from '../../services/smartScore';
-import { getCurriculum } from '../../services/curriculumService';
+import { getPracticeSets } from '../../services/curriculumService';
 import { QuestionRenderer } from '../questions';
 import { generateQuestion, generateInteractiveQuestion } from '../../services/questionGenerators';
 
@@ -53,8 +53,8 @@ const SmartScoreQuiz = ({
   initialScore = 0,
   infiniteMode = true  // Enable infinite practice by default
 }) => {
-  // Curriculum data from Supabase
-  const [curriculumData, setCurriculumData] = useState([]);
+  // This skill's set, or its topic's sets when it has no questions
+  const [practiceSets, setPracticeSets] = useState([]);
   const [curriculumLoaded, setCurriculumLoaded] = useState(false);
   
   // Quiz state - two-step answer flow
@@ -125,34 +125,32 @@ const SmartScoreQuiz = ({
     return generateQuestion(skillType, g, difficulty);
   }, [getSkillType, grade, score]);
 
-  // Load curriculum data from Supabase
+  // Load only the sets this quiz draws from
   useEffect(() => {
-    getCurriculum().then(data => {
-      setCurriculumData(data);
+    setCurriculumLoaded(false);
+    getPracticeSets(skillId, { topic, grade }).then(sets => {
+      setPracticeSets(sets);
       setCurriculumLoaded(true);
     }).catch(err => {
       console.error('Failed to load curriculum:', err);
+      setPracticeSets([]);
       setCurriculumLoaded(true); // Continue anyway
     });
-  }, []);
+  }, [skillId, topic, grade]);
 
   // Load questions for this skill
   useEffect(() => {
     if (!curriculumLoaded) return;
     
-    const skillSet = curriculumData.find(s => s.id === skillId);
-    if (skillSet && skillSet.questions) {
+    const skillSet = practiceSets.find(s => s.id === skillId);
+    if (skillSet?.questions?.length) {
       // Shuffle questions
       const shuffled = [...skillSet.questions].sort(() => Math.random() - 0.5);
       setQuestions(shuffled);
       skillTypeRef.current = skillSet.topic || topic || 'addition';
     } else {
       // Fallback: get questions from topic
-      const topicSets = curriculumData.filter(s => 
-        s.topic?.toLowerCase() === topic?.toLowerCase() &&
-        (grade === undefined || s.grade === grade)
-      );
-      const allQuestions = topicSets.flatMap(s => 
+      const allQuestions = practiceSets.flatMap(s => 
         (s.questions || []).map(q => ({ ...q, skillId: s.id }))
       );
       const shuffled = allQuestions.sort(() => Math.random() - 0.5);
@@ -171,7 +169,7 @@ const SmartScoreQuiz = ({
         });
       }, 100);
     }
-  }, [skillId, topic, grade, infiniteMode, generateNewQuestion, curriculumLoaded, curriculumData]);
+  }, [skillId, topic, grade, infiniteMode, generateNewQuestion, curriculumLoaded, practiceSets]);
 
   // Removed canAnswer/isFirstRender - using phase state instead
 
@@ -1,7 +1,7 @@
 import React, { useReducer, useEffect, useCallback, useRef, useMemo, useState } from 'react';
 import { motion, AnimatePresence } from 'framer-motion';
 import { smartScore } from '../../services/smartScore';
-import { getCurriculum } from '../../services/curriculumService';
+import { getPracticeSets } from '../../services/curriculumService';
 import { QuestionRenderer } from '../questions';
 import { generateQuestion, generateInteractiveQuestion } from '../../services/questionGenerators';
 import StreakCelebration from '../gamification/StreakCelebration';
@@ -251,24 +251,11 @@ const SmartScoreQuizV2 = ({
   useEffect(() => {
     async function loadQuestions() {
       try {
-        const curriculum = await getCurriculum();
-        
-        // Find questions for this skill/topic
-        let questions = [];
-        const skillSet = curriculum.find(s => s.id === skillId);
-        
-        if (skillSet?.questions) {
-          questions = [...skillSet.questions].sort(() => Math.random() - 0.5);
-        } else {
-          // Fallback: get from topic
-          const topicSets = curriculum.filter(s => 
-            s.topic?.toLowerCase() === topic?.toLowerCase() &&
-            (grade === undefined || s.grade === grade)
-          );
-          questions = topicSets
-            .flatMap(s => s.questions || [])
-            .sort(() => Math.random() - 0.5);
-        }
+        // Questions for this skill, or from its topic when it has none
+        const sets = await getPracticeSets(skillId, { topic, grade });
+        let questions = sets
+          .flatMap(s => s.questions || [])
+          .sort(() => Math.random() - 0.5);
         
         // Add generated questions if we don't have enough
         if (infiniteMode && questions.length < 10) {
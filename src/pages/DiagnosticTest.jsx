@@ -3,7 +3,10 @@ import { useNavigate } from 'react-router-dom';
 import { motion, AnimatePresence } from 'framer-motion';
 import { useStore } from '../services/store';
 import { supabase } from '../services/supabase';
-import { getCurriculum } from '../services/curriculumService';
+import { getSkills, getSkillSets } from '../services/curriculumService';
+
+// Skills sampled per grade; 3 questions each leaves plenty to pick 20 from
+const SETS_PER_GRADE = 7;
 
 const DiagnosticTest = () => {
     const navigate = useNavigate();
@@ -13,14 +16,7 @@ const DiagnosticTest = () => {
     const [answers, setAnswers] = useState([]);
     const [questions, setQuestions] = useState([]);
     const [gradeLevel, setGradeLevel] = useState(null);
-    const [curriculumData, setCurriculumData] = useState([]);
-
-    // Load curriculum data
-    useEffect(() => {
-        getCurriculum().then(data => {
-            setCurriculumData(data);
-        }).catch(err => console.error('Failed to load curriculum:', err));
-    }, []);
+    const [loading, setLoading] = useState(false);
 
     useEffect(() => {
         if (step === 'intro' && !gradeLevel && profile) {
@@ -29,14 +25,20 @@ const DiagnosticTest = () => {
         }
     }, [profile, step, gradeLevel]);
 
-    const generateDiagnosticQuestions = (grade) => {
+    const generateDiagnosticQuestions = async (grade) => {
         // Get a mix of questions from the selected grade and surrounding grades
-        const targetGrades = [Math.max(0, grade - 1), grade, Math.min(6, grade + 1)];
+        const targetGrades = [...new Set([Math.max(0, grade - 1), grade, Math.min(6, grade + 1)])];
         const allQuestions = [];
 
-        targetGrades.forEach(g => {
-            const gradeCurriculum = curriculumData.filter(c => c.grade_level === g);
-            gradeCurriculum.forEach(set => {
+        // Only a sample of each grade's skills is loaded, not the whole curriculum
+        const gradeSets = await Promise.all(targetGrades.map(async g => {
+            const skills = await getSkills({ grade: g });
+            const sample = skills.sort(() => Math.random() - 0.5).slice(0, SETS_PER_GRADE);
+            return getSkillSets(sample.map(s => s.id));
+        }));
+
+        targetGrades.forEach((g, i) => {
+            gradeSets[i].forEach(set => {
                 // Take 2-3 questions from each curriculum set
                 const sampleQuestions = set.questions.slice(0, 3).map(q => ({
                     ...q,
@@ -54,10 +56,17 @@ const DiagnosticTest = () => {
         return shuffled.slice(0, 20);
     };
 
-    const startTest = () => {
-        const diagnosticQuestions = generateDiagnosticQuestions(gradeLevel);
-        setQuestions(diagnosticQuestions);
-        setStep('testing');
+    const startTest = async () => {
+        setLoading(true);
+        try {
+            const diagnosticQuestions = await generateDiagnosticQuestions(gradeLevel);
+            setQuestions(diagnosticQuestions);
+            setStep('testing');
+        } catch (err) {
+            console.error('Failed to load curriculum:', err);
+        } finally {
+            setLoading(false);
+        }
     };
 
     const handleAnswer = (selectedAnswer) => {
@@ -193,9 +202,9 @@ const DiagnosticTest = () => {
                             <button
                                 className="btn btn-primary"
                                 onClick={startTest}
-                                disabled={!gradeLevel}
+                                disabled={!gradeLevel || loading}
                             >
-                                Start Test 🚀
+                                {loading ? 'Loading...' : 'Start Test 🚀'}
                             </button>
                         </div>
                     </motion.div>
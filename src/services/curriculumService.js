@@ -1,6 +1,7 @@
 /**
  * Curriculum Service - Fetches curriculum from Supabase
- * Falls back to static JSON if Supabase is unavailable
+ * Falls back to the build-time skill chunks (scripts/curriculum_chunks.py),
+ * then to the static JSON, if Supabase is unavailable
  */
 
 import { supabase } from './supabase';
@@ -9,6 +10,94 @@ let cachedCurriculum = null;
 let cacheTimestamp = 0;
 const CACHE_DURATION = 5 * 60 * 1000; // 5 minutes
 
+// Per-skill chunks: manifest.json is revalidated, everything it points to is content-hashed
+const CHUNK_BASE = `${import.meta.env.BASE_URL}curriculum/`;
+let chunkManifest = null;
+const gradeIndexes = {};
+const skillEntries = {};
+const skillChunks = {};
+
+/**
+ * The chunk manifest, or false if the chunks weren't built
+ */
+function getChunkManifest() {
+  if (!chunkManifest) {
+    chunkManifest = fetch(`${CHUNK_BASE}manifest.json`, { cache: 'no-cache' })
+      .then(response => (response.ok ? response.json() : false))
+      .catch(() => false);
+  }
+  return chunkManifest;
+}
+
+/**
+ * Skill index entries for one grade (or every grade), without questions
+ */
+async function getChunkIndex(grade) {
+  const manifest = await getChunkManifest();
+  if (!manifest) return null;
+
+  const names = grade !== undefined && grade !== ''
+    ? [`grade-${parseInt(grade)}`].filter(name => manifest.grades[name])
+    : Object.keys(manifest.grades);
+
+  const indexes = await Promise.all(names.map(name => {
+    if (!gradeIndexes[name]) {
+      gradeIndexes[name] = fetch(`${CHUNK_BASE}${manifest.grades[name].file}`)
+        .then(response => {
+          if (!response.ok) throw new Error(`${name} index: HTTP ${response.status}`);
+          return response.json();
+        })
+        .then(index => {
+          for (const skill of index.skills) {
+            if (!skillEntries[skill.id]) skillEntries[skill.id] = skill;
+          }
+          return index;
+        })
+        .catch(error => {
+          delete gradeIndexes[name];
+          throw error;
+        });
+    }
+    return gradeIndexes[name];
+  }));
+
+  return indexes.flatMap(index => index.skills.map(skill => ({ ...skill, grade_level: index.grade_level })));
+}
+
+/**
+ * One skill with its questions from its chunk, or null if there is no chunk for it
+ */
+async function getSkillChunk(skillId) {
+  // Usually the grade index the skill was picked from is already loaded
+  if (!skillEntries[skillId]) await getChunkIndex();
+  const entry = skillEntries[skillId];
+  if (!entry) return null;
+
+  if (!skillChunks[entry.file]) {
+    skillChunks[entry.file] = fetch(`${CHUNK_BASE}${entry.file}`)
+      .then(response => {
+        if (!response.ok) throw new Error(`${skillId}: HTTP ${response.status}`);
+        return response.json();
+      })
+      .catch(error => {
+        delete skillChunks[entry.file];
+        throw error;
+      });
+  }
+  return skillChunks[entry.file];
+}
+
+function skillSummary(skill) {
+  return {
+    id: skill.id,
+    title: skill.title,
+    description: skill.description,
+    grade_level: skill.grade_level,
+    topic: skill.topic,
+    difficulty: skill.difficulty
+  };
+}
+
 /**
  * Get all curriculum data (skills with questions)
  * Returns same format as the static curriculum.json
@@ -115,15 +204,17 @@ export async function getSkills(filters = {}) {
 
   } catch (error) {
     console.warn('getSkills failed:', error.message);
+    // Only the requested grade's index, not the whole question bank
+    const indexed = await getChunkIndex(filters.grade).catch(() => null);
+    if (indexed) {
+      const search = filters.search?.toLowerCase();
+      return indexed
+        .filter(s => !filters.topic || s.topic === filters.topic)
+        .filter(s => !search || `${s.title} ${s.description}`.toLowerCase().includes(search))
+        .map(skillSummary);
+    }
     const curriculum = await getCurriculum();
-    return curriculum.map(s => ({
-      id: s.id,
-      title: s.title,
-      description: s.description,
-      grade_level: s.grade_level,
-      topic: s.topic,
-      difficulty: s.difficulty
-    }));
+    return curriculum.map(skillSummary);
   }
 }
 
@@ -163,6 +254,8 @@ export async function getSkillById(skillId) {
 
   } catch (error) {
     console.warn('getSkillById failed:', error.message);
+    const chunk = await getSkillChunk(skillId).catch(() => null);
+    if (chunk || await getChunkManifest()) return chunk;
     const curriculum = await getCurriculum();
     return curriculum.find(s => s.id === skillId) || null;
   }
@@ -198,6 +291,66 @@ export async function getQuestionsForSkill(skillId) {
   }
 }
 
+/**
+ * Get several skills with their questions (pick the ids with getSkills)
+ * Only these skills' questions are loaded, not the whole question bank
+ */
+export async function getSkillSets(skillIds) {
+  if (!skillIds.length) return [];
+  try {
+    const { data: skills, error: skillsError } = await supabase
+      .from('skills')
+      .select('*')
+      .in('id', skillIds);
+
+    if (skillsError) throw skillsError;
+
+    const { data: questions, error: questionsError } = await supabase
+      .from('questions')
+      .select('*')
+      .in('skill_id', skillIds);
+
+    if (questionsError) throw questionsError;
+
+    return skills.map(skill => ({
+      ...skill,
+      questions: questions.filter(q => q.skill_id === skill.id).map(q => ({
+        id: q.id,
+        question: q.question,
+        type: q.type,
+        options: typeof q.options === 'string' ? JSON.parse(q.options) : q.options,
+        answer: q.answer,
+        explanation: q.explanation,
+        hint: q.hint,
+        image: q.image
+      }))
+    }));
+
+  } catch (error) {
+    console.warn('getSkillSets failed:', error.message);
+    const chunks = await Promise.all(skillIds.map(id => getSkillChunk(id).catch(() => null)));
+    if (await getChunkManifest()) return chunks.filter(Boolean);
+    const ids = new Set(skillIds);
+    const curriculum = await getCurriculum();
+    return curriculum.filter(s => ids.has(s.id));
+  }
+}
+
+/**
+ * Sets to practice a skill from: the skill itself, or every skill in its
+ * topic (and grade) when the skill has no questions
+ */
+export async function getPracticeSets(skillId, { topic, grade } = {}) {
+  const skill = skillId ? await getSkillById(skillId).catch(() => null) : null;
+  if (skill?.questions?.length) return [skill];
+
+  const skills = await getSkills({ grade: grade ?? '' });
+  const ids = skills
+    .filter(s => s.topic?.toLowerCase() === topic?.toLowerCase())
+    .map(s => s.id);
+  return getSkillSets(ids);
+}
+
 /**
  * Get all unique topics
  */
@@ -214,7 +367,7 @@ export async function getTopics() {
     return uniqueTopics;
 
   } catch (error) {
-    const curriculum = await getCurriculum();
+    const curriculum = (await getChunkIndex().catch(() => null)) || await getCurriculum();
     return [...new Set(curriculum.map(s => s.topic).filter(Boolean))];
   }
 }
@@ -338,4 +491,4 @@ export async function deleteQuestion(questionId) {
 }
 
 // Default export for backward compatibility
-export default { getCurriculum, getSkills, getSkillById, getQuestionsForSkill, getTopics };
+export default { getCurriculum, getSkills, getSkillById, getSkillSets, getPracticeSets, getQuestionsForSkill, getTopics };
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The scripts are flat modules that import each other by name
+sys.path.insert(0, str(Path(__file__).parent.parent / 'scripts'))
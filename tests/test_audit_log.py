@@ -0,0 +1,29 @@
+from audit_log import AuditLog, issue, superseded
+
+
+def finding(set_id, question, uid=None, answer='4'):
+    details = {'question_uid': uid} if uid else {}
+    return issue('critical', 'wrong_answer', set_id, set_id, question=question, correct_answer=answer, **details)
+
+
+def test_reaudit_supersedes_earlier_findings(tmp_path):
+    log = AuditLog('answers', audit_dir=tmp_path)
+    log.append([finding('s1', 'What is 2+2?', uid='u1', answer='5'), finding('s1', 'What is 3+3?'),
+                finding('s2', 'What is 1+1?', uid='u2')])
+    # A delta audit checked u1 again and found a new problem, and cleared "3+3"
+    log.append([superseded('s1', 'What is 2+2?', 'u1'), superseded('s1', 'what is 3+3'),
+                finding('s1', 'What is 2+2?', uid='u1', answer='4')])
+
+    current = list(log.current(type='wrong_answer'))
+    assert [(r['set_id'], r['question'], r['correct_answer']) for r in current] == [
+        ('s2', 'What is 1+1?', '4'), ('s1', 'What is 2+2?', '4')]
+    assert len(list(log.query(type='wrong_answer'))) == 4
+
+
+def test_markers_only_apply_to_their_question(tmp_path):
+    log = AuditLog('answers', audit_dir=tmp_path)
+    log.append([finding('s1', 'What is 2+2?', uid='u1'), finding('s2', 'What is 2+2?')])
+    log.append([superseded('s1', 'Something else', 'u9')])
+
+    assert len(list(log.current())) == 2
+    assert [r['set_id'] for r in log.current(set_id='s2')] == ['s2']
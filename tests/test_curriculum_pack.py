@@ -0,0 +1,80 @@
+import json
+
+import pytest
+
+from curriculum_pack import EDGE_CASES, HEADER, PackedCurriculum, dump, load, synthetic_corpus
+
+
+def same(a, b):
+    # Equal values and the same key order everywhere
+    return json.dumps(a, ensure_ascii=False) == json.dumps(b, ensure_ascii=False) and a == b
+
+
+@pytest.fixture
+def fixture_sets():
+    return EDGE_CASES + synthetic_corpus(300)
+
+
+@pytest.fixture
+def pack_file(tmp_path, fixture_sets):
+    path = tmp_path / 'curriculum.cpk'
+    assert dump(fixture_sets, path) == len(fixture_sets)
+    return path
+
+
+def test_round_trip_through_mmap(pack_file, fixture_sets):
+    with PackedCurriculum(pack_file) as packed:
+        assert len(packed) == len(fixture_sets)
+        # Decoded lazily, one set at a time
+        assert same(packed[len(fixture_sets) - 1], fixture_sets[-1])
+        assert same(list(packed), fixture_sets)
+    assert same(load(pack_file), fixture_sets)
+
+
+def test_grade_and_topic_filters(pack_file, fixture_sets):
+    with PackedCurriculum(pack_file) as packed:
+        grade_3 = list(packed.sets(grades={3}))
+        fractions = list(packed.sets(topics=['Fractions']))
+    assert same(grade_3, [s for s in fixture_sets if s.get('grade_level') == 3])
+    assert same(fractions, [s for s in fixture_sets if s.get('topic') == 'Fractions'])
+
+
+@pytest.mark.parametrize('keep', [0, 10, HEADER.size, HEADER.size + 7, -1, -100])
+def test_truncated_pack_is_rejected(pack_file, keep):
+    data = pack_file.read_bytes()
+    pack_file.write_bytes(data[:keep] if keep >= 0 else data[:len(data) + keep])
+    with pytest.raises(ValueError):
+        PackedCurriculum(pack_file)
+
+
+def test_trailing_bytes_are_rejected(pack_file):
+    with open(pack_file, 'ab') as f:
+        f.write(b'\0' * 8)
+    with pytest.raises(ValueError):
+        PackedCurriculum(pack_file)
+
+
+def test_bad_magic_is_rejected(pack_file):
+    data = bytearray(pack_file.read_bytes())
+    data[:4] = b'JSON'
+    pack_file.write_bytes(bytes(data))
+    with pytest.raises(ValueError, match='not a version'):
+        PackedCurriculum(pack_file)
+
+
+def test_corrupt_header_counts_are_rejected(pack_file):
+    data = bytearray(pack_file.read_bytes())
+    # Bump the question count (the sixth field) without adding rows
+    magic, version, flags, strings, sets, questions, options, hints, blob = HEADER.unpack_from(data)
+    HEADER.pack_into(data, 0, magic, version, flags, strings, sets, questions + 1, options, hints, blob)
+    pack_file.write_bytes(bytes(data))
+    with pytest.raises(ValueError, match='corrupt'):
+        PackedCurriculum(pack_file)
+
+
+def test_corrupt_string_table_is_rejected(pack_file):
+    data = bytearray(pack_file.read_bytes())
+    data[-1] = ord('x')  # The last string loses its terminator
+    pack_file.write_bytes(bytes(data))
+    with pytest.raises(ValueError, match='corrupt'):
+        PackedCurriculum(pack_file)
@@ -0,0 +1,27 @@
+import json
+
+from curriculum_store import CurriculumStore, split
+
+
+def curriculum_set(set_id, grade=3, topic='Fractions'):
+    return {'id': set_id, 'title': set_id, 'grade_level': grade, 'topic': topic,
+            'questions': [{'question': f"{set_id} q{n}", 'options': ['1', '2', '3', '4'], 'answer': '1'}
+                          for n in range(5)]}
+
+
+def test_saving_a_split_store_rebuilds_the_app_json(tmp_path):
+    source = tmp_path / 'curriculum.json'
+    source.write_text(json.dumps([curriculum_set('3-fractions-1')]))
+    root = tmp_path / 'store'
+    split(source, root)
+
+    store = CurriculumStore(root, export_to=source)
+    store.add(curriculum_set('4-decimals-1', grade=4, topic='Decimals'))
+    store.save()
+
+    assert [s['id'] for s in json.loads(source.read_text())] == ['3-fractions-1', '4-decimals-1']
+
+
+def test_stores_outside_the_project_do_not_export(tmp_path):
+    store = CurriculumStore(tmp_path / 'store')
+    assert store.export_to is None
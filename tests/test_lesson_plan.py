@@ -0,0 +1,60 @@
+import json
+from pathlib import Path
+
+from lesson_plan import compile_jobs, diff, jobs_from_diff
+
+BACKUP = Path(__file__).parent.parent / 'src' / 'data' / 'curriculum.json.backup2'
+
+
+def curriculum_set(set_id, grade=5, topic='Decimals', questions=8):
+    return {'id': set_id, 'title': set_id, 'grade_level': grade, 'topic': topic,
+            'questions': [{'question': f"q{n}"} for n in range(questions)]}
+
+
+def write_plan(tmp_path, target=4):
+    plan = tmp_path / 'lesson_plan.json'
+    plan.write_text(json.dumps({'questions_per_set': 8, 'grades': {'5': {'Decimals': {'Rounding': target}}}}))
+    return plan
+
+
+def test_numbering_continues_after_highest_existing_id(tmp_path):
+    curriculum = [curriculum_set('5-decimals-rounding-1'), curriculum_set('5-decimals-rounding-4')]
+    jobs = compile_jobs(curriculum=curriculum, plan_file=write_plan(tmp_path))
+
+    assert [job['set_id'] for job in jobs] == ['5-decimals-rounding-5', '5-decimals-rounding-6']
+    assert [job['set_num'] for job in jobs] == [5, 6]
+
+
+def test_numbering_without_numbered_ids_counts_covered_sets(tmp_path):
+    curriculum = [curriculum_set('5-dec-rounding-intro', questions=4)]
+    jobs = compile_jobs(curriculum=curriculum, plan_file=write_plan(tmp_path))
+
+    assert [job['set_num'] for job in jobs] == [2, 3, 4, 5]
+
+
+def test_breadth_first_order():
+    rows = [
+        {'grade': 3, 'topic': 'A', 'subtopic': 'X', 'needed': 2, 'last_set': 0},
+        {'grade': 3, 'topic': 'B', 'subtopic': 'Y', 'needed': 1, 'last_set': 7},
+    ]
+    assert [job['set_id'] for job in jobs_from_diff(rows)] == ['3-a-x-1', '3-b-y-8', '3-a-x-2']
+
+
+def test_no_job_reuses_an_id_in_the_backup_curriculum():
+    with open(BACKUP, 'r') as f:
+        curriculum = json.load(f)
+    existing = {s['id'] for s in curriculum}
+    jobs = compile_jobs(curriculum=curriculum)
+
+    assert jobs
+    assert not [job['set_id'] for job in jobs if job['set_id'] in existing]
+
+
+def test_diff_reports_last_set():
+    entries = [{'grade': 5, 'topic': 'Decimals', 'subtopic': 'Rounding', 'target': 4}]
+    coverage = [{'id': '5-decimals-rounding-9', 'title': '', 'topic': 'Decimals', 'grade': 5, 'questions': 8}]
+    [row] = diff(entries, coverage)
+
+    assert row['current_sets'] == 1
+    assert row['last_set'] == 9
+    assert row['needed'] == 3
@@ -0,0 +1,80 @@
+import json
+
+import pytest
+
+from llm_cache import ResponseCache
+from llm_metrics import MetricsStore, get_metrics, use_metrics
+from prompt_packer import run_batch
+
+
+@pytest.fixture(autouse=True)
+def scratch_metrics(tmp_path):
+    # Test calls stay out of the real metrics store
+    previous = get_metrics()
+    use_metrics(MetricsStore(tmp_path / 'metrics.sqlite', run='test'))
+    yield
+    use_metrics(previous)
+
+
+def make_cache(tmp_path, mode='on'):
+    return ResponseCache(tmp_path / 'responses.sqlite', mode=mode)
+
+
+def replies(*texts):
+    calls = []
+
+    def request():
+        calls.append(texts[len(calls)])
+        return calls[-1]
+    return request, calls
+
+
+def test_response_that_fails_parse_is_not_cached(tmp_path):
+    cache = make_cache(tmp_path)
+    request, calls = replies('garbage', '[1]')
+    with pytest.raises(ValueError):
+        cache.complete('p', 'm', 'prompt', {}, request, json.loads)
+
+    # A new process asks the API again rather than replaying the garbage
+    cache = make_cache(tmp_path)
+    assert cache.complete('p', 'm', 'prompt', {}, request, json.loads) == [1]
+    assert calls == ['garbage', '[1]']
+    assert make_cache(tmp_path).complete('p', 'm', 'prompt', {}, request, json.loads) == [1]
+    assert len(calls) == 2
+
+
+def test_stored_response_that_fails_parse_is_replaced(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.complete('p', 'm', 'prompt', {}, replies('not json')[0])
+
+    request, calls = replies('{"ok": true}')
+    assert make_cache(tmp_path).complete('p', 'm', 'prompt', {}, request, json.loads) == {'ok': True}
+    assert calls == ['{"ok": true}']
+
+
+def test_asking_again_in_one_process_is_a_retry(tmp_path):
+    cache = make_cache(tmp_path)
+    request, calls = replies('first', 'second')
+    assert cache.complete('p', 'm', 'prompt', {}, request) == 'first'
+    assert cache.complete('p', 'm', 'prompt', {}, request) == 'second'
+    # The retry's response replaced the stored one
+    assert make_cache(tmp_path).complete('p', 'm', 'prompt', {}, request) == 'second'
+    assert calls == ['first', 'second']
+
+
+def test_packed_retry_after_garbage_calls_the_api(tmp_path):
+    cache = make_cache(tmp_path)
+    job = {'id': 'j1', 'set_id': '3-fractions-1', 'grade': 3, 'topic': 'Fractions', 'subtopic': 'Halves',
+           'set_num': 1}
+    questions = [{'question': f"What is {n} + {n}?", 'options': [str(2 * n), str(2 * n + 1), str(2 * n + 2),
+                                                               str(2 * n + 3)],
+                  'answer': str(2 * n), 'explanation': 'Add them.'} for n in range(1, 6)]
+    good = json.dumps({'sets': [{'id': '3-fractions-1', 'title': 'Halves', 'questions': questions}]})
+    request, calls = replies('garbage', good)
+
+    def complete(prompt, max_tokens):
+        return cache.complete('p', 'm', prompt, {'max_tokens': max_tokens}, request)
+
+    [(_, curriculum_set)] = run_batch([job], complete, 'Make questions.', questions_per_set=5, log=lambda m: None)
+    assert len(calls) == 2
+    assert curriculum_set is not None and len(curriculum_set['questions']) == 5
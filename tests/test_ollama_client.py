@@ -0,0 +1,122 @@
+import json
+import socket
+
+import pytest
+
+from llm_stub_server import StubServer
+from ollama_client import OllamaClient, OllamaError
+
+
+class RecordingStubServer(StubServer):
+    """Stub server that remembers every connection it accepted"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.connections = []
+
+    def process_request(self, request, client_address):
+        self.connections.append(request)
+        super().process_request(request, client_address)
+
+    def drop_connections(self):
+        for conn in self.connections:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+def start_server(**kwargs):
+    server = RecordingStubServer(port=0, latency=0, load_time=0, **kwargs)
+    return server, server.start()
+
+
+@pytest.fixture
+def stub():
+    server, url = start_server(parallel=4)
+    yield server, url
+    server.shutdown()
+    server.server_close()
+
+
+def prompt_for(set_id):
+    return f'Return a set like {{"id": "{set_id}", "title": "T", "grade_level": 7, "topic": "Stub"}}'
+
+
+def test_sequential_requests_reuse_one_connection(stub):
+    server, url = stub
+    client = OllamaClient('stub-model', url, parallel=2)
+    for n in range(5):
+        assert json.loads(client.generate(prompt_for(f"set-{n}")))['id'] == f"set-{n}"
+    client.close()
+
+    assert server.requests == 5
+    assert len(server.connections) == 1
+
+
+def test_reconnects_after_server_drops_idle_connection(stub):
+    server, url = stub
+    client = OllamaClient('stub-model', url, parallel=1)
+    client.generate(prompt_for('before'))
+    server.drop_connections()
+
+    text = client.generate(prompt_for('after'))
+    client.close()
+
+    assert json.loads(text)['id'] == 'after'
+    assert len(server.connections) == 2
+
+
+def test_stream_yields_chunks_in_order(stub):
+    _, url = stub
+    client = OllamaClient('stub-model', url, parallel=1)
+    chunks = []
+    text = client.generate(prompt_for('streamed'), on_token=chunks.append)
+    client.close()
+
+    assert len(chunks) > 1
+    assert ''.join(chunks) == text
+    assert json.loads(text)['id'] == 'streamed'
+
+
+def test_http_error_raises_and_connection_is_replaced():
+    server, url = start_server(parallel=1, rate_limit_rate=1.0)
+    client = OllamaClient('stub-model', url, parallel=1)
+    try:
+        with pytest.raises(OllamaError) as excinfo:
+            client.generate(prompt_for('throttled'))
+        assert excinfo.value.status == 429
+        server.rate_limit_rate = 0.0
+        assert json.loads(client.generate(prompt_for('ok')))['id'] == 'ok'
+    finally:
+        client.close()
+        server.shutdown()
+        server.server_close()
+
+
+def test_generate_many_keeps_prompt_order_across_slots(stub):
+    server, url = stub
+    server.latency.mean = 0.05  # Long enough for requests to overlap
+    client = OllamaClient('stub-model', url, parallel=3)
+    ids = [f"set-{n}" for n in range(9)]
+    results = list(client.generate_many([prompt_for(set_id) for set_id in ids]))
+    client.close()
+
+    assert [index for index, _ in results] == list(range(9))
+    assert [json.loads(text)['id'] for _, text in results] == ids
+    assert 1 < server.max_in_flight <= 3
+    assert len(server.connections) <= 3
+
+
+def test_generate_many_returns_errors_in_place():
+    server, url = start_server(parallel=2, rate_limit_rate=1.0)
+    client = OllamaClient('stub-model', url, parallel=2)
+    try:
+        results = list(client.generate_many([prompt_for('a'), prompt_for('b')]))
+    finally:
+        client.close()
+        server.shutdown()
+        server.server_close()
+
+    assert [index for index, _ in results] == [0, 1]
+    assert all(isinstance(result, OllamaError) and result.status == 429 for _, result in results)
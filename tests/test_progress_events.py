@@ -0,0 +1,40 @@
+import json
+
+from progress_events import EventLog, RunState, job_label, render
+
+
+def test_job_events_track_in_flight_and_latency(tmp_path):
+    log = EventLog('engine-test', tmp_path)
+    log.job_started({'id': 'a'})
+    log.job_started([{'id': 'b'}, {'id': 'c'}], attempt=2)
+    log.job_finished({'id': 'a'}, 1.5, ok=True)
+    log.close()
+
+    state = RunState('engine-test')
+    with open(log.path) as f:
+        events = [json.loads(line) for line in f]
+    for event in events[:-1]:  # Everything before run_finished
+        state.apply(event)
+
+    assert [job for _, job in state.in_flight] == ['b +1']
+    assert list(state.job_latencies) == [1.5]
+    assert 'jobs in flight' in render({'engine-test': state})
+
+    state.apply(events[-1])
+    assert not state.in_flight
+
+
+def test_failed_attempts_are_counted_not_timed():
+    state = RunState('r')
+    state.apply({'event': 'job_started', 'job': 'x', 'session': 's', 'ts': 1.0})
+    state.apply({'event': 'job_finished', 'job': 'x', 'session': 's', 'ts': 2.0, 'seconds': 1.0, 'ok': False})
+
+    assert state.job_failures == 1
+    assert not state.job_latencies
+    assert not state.in_flight
+
+
+def test_job_label():
+    assert job_label({'id': 'set-1'}) == 'set-1'
+    assert job_label([{'id': 'set-1'}]) == 'set-1'
+    assert job_label('plain') == 'plain'
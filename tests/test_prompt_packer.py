@@ -0,0 +1,72 @@
+import asyncio
+import json
+
+import progress_events
+from generation_engine import GenerationEngine
+from progress_events import EventLog
+from prompt_packer import generate_packed, run_batch_async
+from work_ledger import WorkLedger
+
+JOB = {'id': 'j1', 'set_id': '3-fractions-1', 'grade': 3, 'topic': 'Fractions', 'subtopic': 'Halves', 'set_num': 1}
+
+
+def response(first, count):
+    questions = [{'question': f"What is {n} + {n}?", 'options': [str(2 * n + k) for k in range(4)],
+                  'answer': str(2 * n), 'explanation': 'Add them.'} for n in range(first, first + count)]
+    return json.dumps({'sets': [{'id': JOB['set_id'], 'title': 'Halves', 'questions': questions}]})
+
+
+def test_single_round_keeps_short_set_for_the_next_request():
+    texts = [response(1, 3), response(10, 3)]
+    calls = []
+
+    async def complete(prompt, max_tokens):
+        calls.append(prompt)
+        return texts[len(calls) - 1]
+
+    partial = {}
+    [(_, first)] = asyncio.run(run_batch_async([JOB], complete, 'Make questions.', questions_per_set=5,
+                                               max_rounds=1, log=lambda m: None, partial=partial,
+                                               take_short=False))
+    assert first is None and len(calls) == 1
+    assert len(partial[JOB['id']]['questions']) == 3
+
+    [(_, second)] = asyncio.run(run_batch_async([JOB], complete, 'Make questions.', questions_per_set=5,
+                                                max_rounds=1, log=lambda m: None, partial=partial))
+    assert len(calls) == 2
+    assert second is not None and len(second['questions']) == 5
+
+
+def test_engine_runs_jobs_submitted_from_on_result(tmp_path, monkeypatch):
+    monkeypatch.setattr(progress_events, '_events', EventLog('engine-test', tmp_path))
+    seen = []
+
+    async def worker(job):
+        seen.append(job)
+        return job
+
+    def on_result(job, result):
+        if job < 3:
+            engine.submit(job + 1)
+
+    engine = GenerationEngine(worker, concurrency=2)
+    engine.run_sync([1], on_result)
+    assert seen == [1, 2, 3]
+
+
+def test_packed_jobs_another_worker_holds_are_skipped(tmp_path):
+    ledger = WorkLedger('packed', tmp_path / 'ledger.sqlite')
+    held = dict(JOB, id='j2', set_id='3-fractions-2')
+    ledger.plan([JOB, held])
+    WorkLedger('packed', tmp_path / 'ledger.sqlite', owner='other').claim('j2')
+    calls = []
+
+    def complete(prompt, max_tokens):
+        calls.append(prompt)
+        return response(1, 5)
+
+    results = list(generate_packed([JOB, held], complete, 'Make questions.', questions_per_set=5,
+                                   log=lambda m: None, claim=lambda job: ledger.claim(job['id'])))
+    assert [job['id'] for job, _ in results] == ['j1']
+    assert len(calls) == 1 and held['set_id'] not in calls[0]
+    assert ledger.state('j1') == 'leased'
@@ -0,0 +1,31 @@
+from work_ledger import WorkLedger
+
+
+def job(key, grade=7):
+    return {'id': key, 'grade': grade}
+
+
+def test_replan_retires_jobs_the_fresh_plan_dropped(tmp_path):
+    ledger = WorkLedger('run', tmp_path / 'ledger.sqlite')
+    ledger.plan([job('a'), job('b'), job('c')])
+    ledger.complete('a')
+
+    # Another generator filled b's subtopic; the fresh plan only needs c and d
+    assert ledger.plan([job('c'), job('d')], retire=True) == 1
+    assert [j['id'] for j in ledger.pending()] == ['c', 'd']
+    assert ledger.state('b') == 'retired' and ledger.state('a') == 'done'
+    assert not ledger.claim('b')
+
+    # Needed again later: back to pending
+    ledger.plan([job('b')], retire=True)
+    assert ledger.state('b') == 'pending'
+
+
+def test_retire_predicate_limits_the_replanned_part(tmp_path):
+    ledger = WorkLedger('run', tmp_path / 'ledger.sqlite')
+    ledger.plan([job('a', grade=7), job('b', grade=8)])
+    assert ledger.claim('a')
+
+    ledger.plan([], retire=lambda payload: payload['grade'] == 8)
+    assert ledger.state('a') == 'leased'  # Held by a worker, left alone
+    assert ledger.state('b') == 'retired'